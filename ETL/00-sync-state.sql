@@ -0,0 +1,55 @@
+-- =====================================================================
+-- ARCHIVO 00: ESTADO DE LA SINCRONIZACIÓN INCREMENTAL CON GRAVITY FORMS
+-- =====================================================================
+-- Idempotente: utils/cron/daily_sync.sh lo ejecuta al inicio de cada pasada.
+--
+--   * sync_state: marca de agua por instancia (último entry_id / date_created
+--     consolidado por 03-load-from-csv.sql). La extracción 01 continúa desde
+--     ahí, así que pasadas frecuentes (cada hora) no reprocesan nada y una
+--     pasada fallida o saltada se recupera sola en la siguiente.
+--   * sync_runs: una fila por ejecución con filas extraídas / geocodificadas /
+--     cargadas y el tiempo de cada etapa.
+--   * load_steps: dentro de la etapa de carga, filas y milisegundos de cada
+--     sentencia de 03 (staging, pisos, bloques, afiliadas...).
+--
+-- Esquema propio, fuera de sindicato_inq: PostgREST no lo expone.
+-- =====================================================================
+
+CREATE SCHEMA IF NOT EXISTS sindicato_etl;
+
+CREATE TABLE IF NOT EXISTS sindicato_etl.sync_state (
+    instancia TEXT PRIMARY KEY,
+    ultimo_entry_id BIGINT NOT NULL DEFAULT 0,
+    ultima_fecha_creacion TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sindicato_etl.sync_runs (
+    id BIGSERIAL PRIMARY KEY,
+    instancia TEXT NOT NULL,
+    started_at TIMESTAMPTZ NOT NULL,
+    finished_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    estado TEXT NOT NULL CHECK (estado IN ('ok', 'sin_datos', 'error')),
+    etapa_fallida TEXT, -- 'extraccion' | 'geocodificacion' | 'carga'
+    desde_entry_id BIGINT, -- marca de agua al empezar (NULL = primera pasada, últimas 24h)
+    hasta_entry_id BIGINT, -- nueva marca de agua tras la carga
+    filas_extraidas INTEGER,
+    filas_geocodificadas INTEGER,
+    pisos_cargados INTEGER,
+    afiliadas_cargadas INTEGER,
+    extract_ms INTEGER,
+    geocode_ms INTEGER,
+    load_ms INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_runs_instancia_started ON sindicato_etl.sync_runs (instancia, started_at DESC);
+
+-- Desglose por paso de cada carga (03-load-from-csv.sql): filas afectadas y tiempo
+CREATE TABLE IF NOT EXISTS sindicato_etl.load_steps (
+    run_id BIGINT NOT NULL REFERENCES sindicato_etl.sync_runs (id) ON DELETE CASCADE,
+    orden INTEGER NOT NULL,
+    paso TEXT NOT NULL,
+    filas BIGINT,
+    ms NUMERIC(12, 1),
+    PRIMARY KEY (run_id, orden)
+);
@@ -3,12 +3,84 @@
 -- REFACTORIZADO: INTEGRACIÓN DE POSTGIS Y ACTUALIZACIONES IDEMPOTENTES
 -- SEGURO: FILTRADO ESTRICTO DE CREACIÓN DE BLOQUES SOLO PARA PROPIEDAD VERTICAL
 -- =====================================================================
+-- Estructura de la carga (pensada también para backfills grandes):
+--   * Todo corre en UNA transacción: datos, marca de agua y métricas se
+--     consolidan juntos o no se consolida nada.
+--   * El CSV se copia tal cual a staging_gravity_raw (TEXT) y se transforma
+--     en UNA sola pasada a staging_gravity, ya tipada y normalizada
+--     (nulos literales, dirección calculada, dirección de bloque, NIF, fechas,
+--     coordenadas, cuota, IBAN...). Se indexa y se analiza antes de cruzarla.
+--   * Cada paso registra filas afectadas y milisegundos (pg_temp.etl_step);
+--     al final se guardan en sindicato_etl.load_steps junto a la fila de
+--     sindicato_etl.sync_runs y se imprimen en el log.
+-- =====================================================================
 
 SET search_path TO sindicato_inq, public;
 SET datestyle = 'ISO, DMY';  
 
--- 1. Crear tabla temporal de staging (Sincronizada con campos de enriquecimiento)
-CREATE TEMP TABLE staging_gravity (
+-- Cualquier error aborta el script: así la marca de agua (paso 7.5) solo avanza
+-- si la carga completa terminó bien.
+\set ON_ERROR_STOP on
+
+-- Variables que pasa utils/cron/daily_sync.sh (-v ...). Requiere haber ejecutado
+-- antes ETL/00-sync-state.sql. Sin ellas (ejecución manual) se registra como 'manual'.
+\if :{?instancia}
+\else
+    \set instancia manual
+\endif
+\if :{?started_at}
+\else
+    \set started_at ''
+\endif
+\if :{?desde_entry_id}
+\else
+    \set desde_entry_id ''
+\endif
+\if :{?extract_ms}
+\else
+    \set extract_ms ''
+\endif
+\if :{?geocode_ms}
+\else
+    \set geocode_ms ''
+\endif
+
+BEGIN;
+
+-- Los DISTINCT ON / hash joins de un backfill grande caben en memoria
+SET LOCAL work_mem = '64MB';
+
+-- ====================================================================================
+-- 0. CRONOMETRAJE POR PASO
+-- ====================================================================================
+-- etl.step_started marca el final del paso anterior; cada CALL registra el tramo
+-- transcurrido desde entonces y reinicia la marca.
+CREATE TEMP TABLE etl_load_steps (
+    orden SERIAL,
+    paso TEXT NOT NULL,
+    filas BIGINT,
+    ms NUMERIC(12, 1)
+) ON COMMIT DROP;
+
+CREATE PROCEDURE pg_temp.etl_step(p_paso TEXT, p_filas BIGINT)
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO etl_load_steps (paso, filas, ms)
+    VALUES (
+        p_paso,
+        p_filas,
+        EXTRACT(EPOCH FROM clock_timestamp() - current_setting('etl.step_started')::TIMESTAMPTZ) * 1000
+    );
+    PERFORM set_config('etl.step_started', clock_timestamp()::TEXT, true);
+END;
+$$;
+
+SELECT set_config('etl.step_started', clock_timestamp()::TEXT, true) AS load_started \gset
+
+-- ====================================================================================
+-- 1-2. CARGA DEL CSV EN BRUTO
+-- ====================================================================================
+CREATE TEMP TABLE staging_gravity_raw (
     entry_id TEXT, date_created TEXT, first_name TEXT, last_name TEXT,
     nif_dni TEXT, birth_date TEXT, gender TEXT, phone TEXT, email TEXT,
     address_full_google TEXT, address_street TEXT, address_number TEXT,
@@ -17,12 +89,10 @@ CREATE TEMP TABLE staging_gravity (
     contract_start_date TEXT, landlord_contact_type TEXT, field_41 TEXT,
     field_46 TEXT, field_48 TEXT, field_49_1 TEXT, membership_type TEXT,
     fee_amount TEXT, fee_period TEXT, fee_formatted TEXT, bank_iban TEXT,
-    ref_catastral TEXT, coordenadas TEXT, geocoded_address TEXT, 
-    computed_address TEXT
-);
+    ref_catastral TEXT, coordenadas TEXT, geocoded_address TEXT
+) ON COMMIT DROP;
 
--- 2. Cargar datos del CSV
-COPY staging_gravity (
+COPY staging_gravity_raw (
     entry_id, date_created, first_name, last_name, nif_dni, birth_date, gender, 
     phone, email, address_full_google, address_street, address_number, 
     address_floor, address_door, address_city, address_postcode, num_people_in_home, 
@@ -32,75 +102,158 @@ COPY staging_gravity (
 )
 FROM '/csv-data/mariadb_export.csv'
 WITH (FORMAT csv, DELIMITER ',', HEADER true);
+CALL pg_temp.etl_step('copy csv', :ROW_COUNT);
 
 -- ====================================================================================
--- 2.5 SANITIZACIÓN DE NULOS LITERALES
+-- 3. STAGING TIPADA: SANITIZACIÓN + NORMALIZACIÓN EN UNA SOLA PASADA
 -- ====================================================================================
-UPDATE staging_gravity
-SET
-    first_name = NULLIF(first_name, 'NULL'),
-    last_name = NULLIF(last_name, 'NULL'),
-    nif_dni = NULLIF(nif_dni, 'NULL'),
-    birth_date = NULLIF(birth_date, 'NULL'),
-    gender = NULLIF(gender, 'NULL'),
-    phone = NULLIF(phone, 'NULL'),
-    email = NULLIF(email, 'NULL'),
-    address_full_google = NULLIF(address_full_google, 'NULL'),
-    address_street = NULLIF(address_street, 'NULL'),
-    address_number = NULLIF(address_number, 'NULL'),
-    address_floor = NULLIF(address_floor, 'NULL'),
-    address_door = NULLIF(address_door, 'NULL'),
-    address_city = NULLIF(address_city, 'NULL'),
-    address_postcode = NULLIF(address_postcode, 'NULL'),
-    num_people_in_home = NULLIF(num_people_in_home, 'NULL'),
-    tenure_type = NULLIF(tenure_type, 'NULL'),
-    contract_start_date = NULLIF(contract_start_date, 'NULL'),
-    landlord_contact_type = NULLIF(landlord_contact_type, 'NULL'),
-    field_41 = NULLIF(field_41, 'NULL'),
-    field_46 = NULLIF(field_46, 'NULL'),
-    field_48 = NULLIF(field_48, 'NULL'),
-    field_49_1 = NULLIF(field_49_1, 'NULL'),
-    membership_type = NULLIF(membership_type, 'NULL'),
-    fee_amount = NULLIF(fee_amount, 'NULL'),
-    fee_period = NULLIF(fee_period, 'NULL'),
-    fee_formatted = NULLIF(fee_formatted, 'NULL'),
-    bank_iban = NULLIF(bank_iban, 'NULL'),
-    ref_catastral = NULLIF(ref_catastral, 'NULL'),
-    coordenadas = NULLIF(coordenadas, 'NULL'),
-    geocoded_address = NULLIF(geocoded_address, 'NULL');
+CREATE TEMP TABLE staging_gravity (
+    entry_id BIGINT,
+    date_created TIMESTAMP,
+    nombre TEXT,
+    apellidos TEXT,
+    nif TEXT,               -- UPPER(TRIM()), igual que afiliadas.cif
+    fecha_nac DATE,
+    genero TEXT,
+    telefono TEXT,
+    email TEXT,
+    municipio TEXT,
+    cp INTEGER,
+    n_personas INTEGER,
+    regimen TEXT,
+    fecha_firma DATE,
+    inmobiliaria TEXT,
+    propiedad TEXT,
+    prop_vertical TEXT,
+    nivel_participacion TEXT,
+    cuota DECIMAL(8, 2),
+    periodicidad INTEGER,
+    iban TEXT,              -- NULL si no es un IBAN válido
+    ref_catastral TEXT,
+    coordenadas geometry(Point, 4326),
+    computed_address TEXT,  -- dirección del piso
+    bloque_direccion TEXT   -- calle y número, para los bloques de propiedad vertical
+) ON COMMIT DROP;
 
--- ====================================================================================
--- 3. NORMALIZACIÓN AVANZADA DE DIRECCIÓN (Basada en geocoded_address)
--- ====================================================================================
-UPDATE staging_gravity
-SET computed_address = 
+INSERT INTO staging_gravity
+SELECT
+    CAST(r.entry_id AS BIGINT),
+    CAST(r.date_created AS TIMESTAMP),
+    TRIM(r.first_name),
+    TRIM(r.last_name),
+    NULLIF(UPPER(TRIM(r.nif_dni)), ''),
+    CAST(NULLIF(r.birth_date, '') AS DATE),
+    TRIM(r.gender),
+    TRIM(r.phone),
+    TRIM(r.email),
+    TRIM(r.address_city),
+    CAST(NULLIF(REGEXP_REPLACE(r.address_postcode, '[^0-9]', '', 'g'), '') AS INTEGER),
+    CAST(NULLIF(REGEXP_REPLACE(r.num_people_in_home, '[^0-9]', '', 'g'), '') AS INTEGER),
+    TRIM(r.tenure_type),
+    CAST(NULLIF(r.contract_start_date, '') AS DATE),
+    TRIM(r.field_46),
+    TRIM(r.field_48),
+    TRIM(r.field_49_1),
+    TRIM(r.membership_type),
+    CAST(REPLACE(NULLIF(r.fee_amount, ''), ',', '.') AS DECIMAL(8, 2)),
+    CASE TRIM(LOWER(r.fee_period)) WHEN 'año' THEN 1 WHEN 'mes' THEN 12 ELSE 0 END,
+    CASE WHEN r.iban_limpio ~ '^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$' THEN r.iban_limpio END,
+    NULLIF(TRIM(r.ref_catastral), ''),
+    CASE WHEN NULLIF(TRIM(r.coordenadas), '') IS NOT NULL THEN
+        ST_SetSRID(ST_MakePoint(
+            CAST(TRIM(SPLIT_PART(r.coordenadas, ',', 2)) AS DOUBLE PRECISION),
+            CAST(TRIM(SPLIT_PART(r.coordenadas, ',', 1)) AS DOUBLE PRECISION)
+        ), 4326)
+    END,
+    -- Dirección del piso: la geocodificada o, si la geolocalización falló por completo,
+    -- la reconstruida a partir de los campos del formulario
+    CASE
+        WHEN r.geocoded_address IS NOT NULL THEN
+            INITCAP(
+                REGEXP_REPLACE(
+                    REGEXP_REPLACE(TRIM(r.geocoded_address), '\yCalle\y', 'C.', 'ig'),
+                    '\yAvenida\y', 'Av.', 'ig'
+                )
+            )
+        WHEN r.address_full_google IS NOT NULL THEN
+            INITCAP(
+                REGEXP_REPLACE(
+                    REGEXP_REPLACE(TRIM(SPLIT_PART(r.address_full_google, ',', 1)), '\yCalle\y', 'C.', 'ig'),
+                    '\yAvenida\y', 'Av.', 'ig'
+                )
+            ) || 
+            CASE WHEN NULLIF(TRIM(r.address_number), '') IS NOT NULL THEN ', ' || TRIM(r.address_number) ELSE '' END ||
+            CASE WHEN NULLIF(TRIM(r.address_floor), '') IS NOT NULL THEN ', Piso ' || TRIM(r.address_floor) ELSE '' END ||
+            CASE WHEN NULLIF(TRIM(r.address_door), '') IS NOT NULL THEN ', Pta ' || TRIM(r.address_door) ELSE '' END
+    END,
+    -- Dirección del bloque: primeras dos partes de la dirección geocodificada
     INITCAP(
         REGEXP_REPLACE(
-            REGEXP_REPLACE(TRIM(geocoded_address), '\yCalle\y', 'C.', 'ig'),
+            REGEXP_REPLACE(
+                TRIM(SPLIT_PART(r.geocoded_address, ',', 1)) || 
+                CASE WHEN NULLIF(TRIM(SPLIT_PART(r.geocoded_address, ',', 2)), '') IS NOT NULL 
+                     THEN ', ' || TRIM(SPLIT_PART(r.geocoded_address, ',', 2)) ELSE '' END,
+                '\yCalle\y', 'C.', 'ig'
+            ),
             '\yAvenida\y', 'Av.', 'ig'
         )
     )
-WHERE geocoded_address IS NOT NULL;
+FROM (
+    -- Sanitización de nulos literales ('NULL' exportado por MariaDB)
+    SELECT
+        entry_id, date_created,
+        NULLIF(first_name, 'NULL') AS first_name,
+        NULLIF(last_name, 'NULL') AS last_name,
+        NULLIF(nif_dni, 'NULL') AS nif_dni,
+        NULLIF(birth_date, 'NULL') AS birth_date,
+        NULLIF(gender, 'NULL') AS gender,
+        NULLIF(phone, 'NULL') AS phone,
+        NULLIF(email, 'NULL') AS email,
+        NULLIF(address_full_google, 'NULL') AS address_full_google,
+        NULLIF(address_number, 'NULL') AS address_number,
+        NULLIF(address_floor, 'NULL') AS address_floor,
+        NULLIF(address_door, 'NULL') AS address_door,
+        NULLIF(address_city, 'NULL') AS address_city,
+        NULLIF(address_postcode, 'NULL') AS address_postcode,
+        NULLIF(num_people_in_home, 'NULL') AS num_people_in_home,
+        NULLIF(tenure_type, 'NULL') AS tenure_type,
+        NULLIF(contract_start_date, 'NULL') AS contract_start_date,
+        NULLIF(field_46, 'NULL') AS field_46,
+        NULLIF(field_48, 'NULL') AS field_48,
+        NULLIF(field_49_1, 'NULL') AS field_49_1,
+        NULLIF(membership_type, 'NULL') AS membership_type,
+        NULLIF(fee_amount, 'NULL') AS fee_amount,
+        NULLIF(fee_period, 'NULL') AS fee_period,
+        UPPER(REGEXP_REPLACE(NULLIF(bank_iban, 'NULL'), '\s+', '', 'g')) AS iban_limpio,
+        NULLIF(ref_catastral, 'NULL') AS ref_catastral,
+        NULLIF(coordenadas, 'NULL') AS coordenadas,
+        NULLIF(geocoded_address, 'NULL') AS geocoded_address
+    FROM staging_gravity_raw
+) r;
+CALL pg_temp.etl_step('staging tipada', :ROW_COUNT);
 
--- Fallback por si la geolocalización falló por completo
-UPDATE staging_gravity
-SET computed_address = 
-    INITCAP(
-        REGEXP_REPLACE(
-            REGEXP_REPLACE(TRIM(SPLIT_PART(address_full_google, ',', 1)), '\yCalle\y', 'C.', 'ig'),
-            '\yAvenida\y', 'Av.', 'ig'
-        )
-    ) || 
-    CASE WHEN NULLIF(TRIM(address_number), '') IS NOT NULL THEN ', ' || TRIM(address_number) ELSE '' END ||
-    CASE WHEN NULLIF(TRIM(address_floor), '') IS NOT NULL THEN ', Piso ' || TRIM(address_floor) ELSE '' END ||
-    CASE WHEN NULLIF(TRIM(address_door), '') IS NOT NULL THEN ', Pta ' || TRIM(address_door) ELSE '' END
-WHERE computed_address IS NULL AND address_full_google IS NOT NULL;
+-- Las tablas temporales no las analiza autovacuum: sin ANALYZE el planificador
+-- supone unas pocas filas y elige nested loops sobre todo el backfill.
+CREATE INDEX ON staging_gravity (computed_address);
+CREATE INDEX ON staging_gravity (nif);
+CREATE INDEX ON staging_gravity (ref_catastral) WHERE ref_catastral IS NOT NULL;
+ANALYZE staging_gravity;
+CALL pg_temp.etl_step('indices + analyze staging', NULL);
+
+-- Métricas de extracción / geocodificación y nueva marca de agua candidata
+SELECT
+    COUNT(*) AS filas_extraidas,
+    COUNT(coordenadas) AS filas_geocodificadas,
+    COALESCE(MAX(entry_id)::TEXT, '') AS hasta_entry_id,
+    COALESCE(MAX(date_created)::TEXT, '') AS hasta_fecha
+FROM staging_gravity \gset
 
 -- 4. Poblar Empresas
 INSERT INTO empresas (nombre)
-SELECT DISTINCT TRIM(field_48) FROM staging_gravity
-WHERE NULLIF(TRIM(field_48), '') IS NOT NULL
-  AND NOT EXISTS (SELECT 1 FROM empresas WHERE nombre = TRIM(staging_gravity.field_48));
+SELECT DISTINCT s.propiedad FROM staging_gravity s
+WHERE NULLIF(s.propiedad, '') IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM empresas e WHERE e.nombre = s.propiedad);
+CALL pg_temp.etl_step('empresas', :ROW_COUNT);
 
 -- ====================================================================================
 -- 5. POBLAR PISOS 
@@ -110,22 +263,11 @@ INSERT INTO pisos (
     fecha_firma, ref_catastral, coordenadas
 )
 SELECT DISTINCT ON (computed_address)
-    computed_address,
-    TRIM(address_city), 
-    CAST(NULLIF(REGEXP_REPLACE(address_postcode, '[^0-9]', '', 'g'), '') AS INTEGER),
-    TRIM(field_46), TRIM(field_48), TRIM(field_49_1),
-    CAST(NULLIF(REGEXP_REPLACE(num_people_in_home, '[^0-9]', '', 'g'), '') AS INTEGER),
-    CAST(NULLIF(contract_start_date, '') AS DATE),
-    NULLIF(TRIM(ref_catastral), ''),
-    CASE WHEN NULLIF(TRIM(coordenadas), '') IS NOT NULL THEN
-        ST_SetSRID(ST_MakePoint(
-            CAST(TRIM(SPLIT_PART(coordenadas, ',', 2)) AS DOUBLE PRECISION),
-            CAST(TRIM(SPLIT_PART(coordenadas, ',', 1)) AS DOUBLE PRECISION)
-        ), 4326)
-    ELSE NULL END
+    computed_address, municipio, cp, inmobiliaria, propiedad, prop_vertical, n_personas,
+    fecha_firma, ref_catastral, coordenadas
 FROM staging_gravity 
 WHERE computed_address IS NOT NULL
-ORDER BY computed_address, CAST(entry_id AS INTEGER) DESC 
+ORDER BY computed_address, entry_id DESC 
 ON CONFLICT (direccion) DO UPDATE SET
     ref_catastral = COALESCE(EXCLUDED.ref_catastral, pisos.ref_catastral),
     coordenadas = COALESCE(EXCLUDED.coordenadas, pisos.coordenadas),
@@ -137,10 +279,13 @@ ON CONFLICT (direccion) DO UPDATE SET
     n_personas = EXCLUDED.n_personas,
     fecha_firma = EXCLUDED.fecha_firma,
     updated_at = CURRENT_TIMESTAMP;
+CALL pg_temp.etl_step('pisos', :ROW_COUNT);
 
 -- ====================================================================================
 -- 5.1 ORQUESTACIÓN DE PARENTALIDAD DE BLOQUES (FILTRADO SELECTIVO CORREGIDO)
 -- ====================================================================================
+-- La propagación por catastro (PASOS A y D) se limita a las referencias
+-- catastrales del lote: el resto de pisos no ha cambiado desde la última carga.
 
 -- PASO A: Si ya existe un bloque asociado a este Catastro en la BD, vincular automáticamente
 UPDATE pisos p
@@ -148,53 +293,36 @@ SET bloque_id = sub.max_bloque_id
 FROM (
     SELECT ref_catastral, MAX(bloque_id) as max_bloque_id
     FROM pisos
-    WHERE ref_catastral IS NOT NULL AND bloque_id IS NOT NULL
+    WHERE ref_catastral IN (SELECT ref_catastral FROM staging_gravity WHERE ref_catastral IS NOT NULL)
+      AND bloque_id IS NOT NULL
     GROUP BY ref_catastral
 ) sub
 WHERE p.ref_catastral = sub.ref_catastral
   AND p.bloque_id IS NULL;
+CALL pg_temp.etl_step('bloques: vincular por catastro', :ROW_COUNT);
 
 -- PASO B: Crear el Bloque base ÚNICAMENTE si es una Propiedad Vertical ('Si')
 INSERT INTO bloques (direccion, empresa_id)
-SELECT DISTINCT
-    INITCAP(
-        REGEXP_REPLACE(
-            REGEXP_REPLACE(
-                TRIM(SPLIT_PART(s.geocoded_address, ',', 1)) || 
-                CASE WHEN NULLIF(TRIM(SPLIT_PART(s.geocoded_address, ',', 2)), '') IS NOT NULL 
-                     THEN ', ' || TRIM(SPLIT_PART(s.geocoded_address, ',', 2)) ELSE '' END,
-                '\yCalle\y', 'C.', 'ig'
-            ),
-            '\yAvenida\y', 'Av.', 'ig'
-        )
-    ),
-    e.id
+SELECT DISTINCT s.bloque_direccion, e.id
 FROM staging_gravity s
-LEFT JOIN empresas e ON TRIM(s.field_48) = e.nombre
+LEFT JOIN empresas e ON s.propiedad = e.nombre
 JOIN pisos p ON p.direccion = s.computed_address
 WHERE UPPER(TRIM(p.prop_vertical)) = 'SI'
   AND p.ref_catastral IS NOT NULL
   AND p.bloque_id IS NULL
+  AND s.bloque_direccion IS NOT NULL
 ON CONFLICT (direccion) DO NOTHING;
+CALL pg_temp.etl_step('bloques: crear', :ROW_COUNT);
 
 -- PASO C: Vincular el bloque recién creado al piso (Protección añadida para asegurar consistencia)
 UPDATE pisos p
 SET bloque_id = b.id
 FROM staging_gravity s
-JOIN bloques b ON b.direccion = INITCAP(
-    REGEXP_REPLACE(
-        REGEXP_REPLACE(
-            TRIM(SPLIT_PART(s.geocoded_address, ',', 1)) || 
-            CASE WHEN NULLIF(TRIM(SPLIT_PART(s.geocoded_address, ',', 2)), '') IS NOT NULL 
-                 THEN ', ' || TRIM(SPLIT_PART(s.geocoded_address, ',', 2)) ELSE '' END,
-            '\yCalle\y', 'C.', 'ig'
-        ),
-        '\yAvenida\y', 'Av.', 'ig'
-    )
-)
+JOIN bloques b ON b.direccion = s.bloque_direccion
 WHERE p.direccion = s.computed_address
   AND UPPER(TRIM(p.prop_vertical)) = 'SI'
   AND p.bloque_id IS NULL;
+CALL pg_temp.etl_step('bloques: vincular creados', :ROW_COUNT);
 
 -- PASO D: Efecto Cascada - Propagar bloque_id a otros pisos con el mismo Catastro
 UPDATE pisos p
@@ -202,20 +330,24 @@ SET bloque_id = sub.max_bloque_id
 FROM (
     SELECT ref_catastral, MAX(bloque_id) as max_bloque_id
     FROM pisos
-    WHERE ref_catastral IS NOT NULL AND bloque_id IS NOT NULL
+    WHERE ref_catastral IN (SELECT ref_catastral FROM staging_gravity WHERE ref_catastral IS NOT NULL)
+      AND bloque_id IS NOT NULL
     GROUP BY ref_catastral
 ) sub
 WHERE p.ref_catastral = sub.ref_catastral
   AND p.bloque_id IS NULL;
+CALL pg_temp.etl_step('bloques: cascada por catastro', :ROW_COUNT);
 
 -- ====================================================================================
 -- 5.5 LIMPIEZA DE FACTURACIÓN ANTERIOR
 -- ====================================================================================
-DELETE FROM facturacion
-WHERE afiliada_id IN (
-    SELECT id FROM afiliadas 
-    WHERE UPPER(TRIM(cif)) IN (SELECT UPPER(TRIM(nif_dni)) FROM staging_gravity)
-);
+-- afiliadas.cif ya se guarda en mayúsculas y sin espacios (trigger de normalización),
+-- así que la comparación directa usa su índice único.
+DELETE FROM facturacion f
+USING afiliadas a
+WHERE f.afiliada_id = a.id
+  AND a.cif IN (SELECT nif FROM staging_gravity WHERE nif IS NOT NULL);
+CALL pg_temp.etl_step('facturacion: limpiar', :ROW_COUNT);
 
 -- ====================================================================================
 -- 6. POBLAR AFILIADAS
@@ -224,24 +356,24 @@ INSERT INTO afiliadas (
     piso_id, nombre, apellidos, cif, fecha_nac, genero, 
     email, telefono, estado, regimen, fecha_alta, nivel_participacion, afiliacion
 )
-SELECT DISTINCT ON (UPPER(TRIM(s.nif_dni)))
+SELECT DISTINCT ON (s.nif)
     p.id,
-    TRIM(s.first_name),
-    TRIM(s.last_name),
-    UPPER(TRIM(s.nif_dni)), 
-    CAST(NULLIF(s.birth_date, '') AS DATE),
-    TRIM(s.gender),
-    TRIM(s.email),
-    TRIM(s.phone),
+    s.nombre,
+    s.apellidos,
+    s.nif, 
+    s.fecha_nac,
+    s.genero,
+    s.email,
+    s.telefono,
     'Alta', 
-    TRIM(s.tenure_type),
-    CAST(NULLIF(SPLIT_PART(s.date_created, ' ', 1), '') AS DATE), 
-    TRIM(s.membership_type),
+    s.regimen,
+    CAST(s.date_created AS DATE), 
+    s.nivel_participacion,
     'Importado'
 FROM staging_gravity s
 JOIN pisos p ON s.computed_address = p.direccion
-WHERE s.nif_dni IS NOT NULL AND TRIM(s.nif_dni) != ''
-ORDER BY UPPER(TRIM(s.nif_dni)), CAST(s.entry_id AS INTEGER) DESC
+WHERE s.nif IS NOT NULL
+ORDER BY s.nif, s.entry_id DESC
 ON CONFLICT (cif) DO UPDATE SET
     piso_id = EXCLUDED.piso_id,
     nombre = EXCLUDED.nombre,
@@ -256,23 +388,65 @@ ON CONFLICT (cif) DO UPDATE SET
     nivel_participacion = EXCLUDED.nivel_participacion,
     afiliacion = 'Importado',
     updated_at = CURRENT_TIMESTAMP;
+CALL pg_temp.etl_step('afiliadas', :ROW_COUNT);
 
 -- ====================================================================================
 -- 7. POBLAR FACTURACIÓN
 -- ====================================================================================
 INSERT INTO facturacion (afiliada_id, cuota, periodicidad, forma_pago, iban)
-SELECT DISTINCT ON (UPPER(TRIM(s.nif_dni)))
+SELECT DISTINCT ON (s.nif)
     a.id,
-    CAST(REPLACE(NULLIF(s.fee_amount, ''), ',', '.') AS DECIMAL(8, 2)),
-    CASE TRIM(LOWER(s.fee_period)) WHEN 'año' THEN 1 WHEN 'mes' THEN 12 ELSE 0 END,
-    CASE WHEN UPPER(REGEXP_REPLACE(s.bank_iban, '\s+', '', 'g')) ~ '^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$' THEN 'Domiciliación' ELSE 'Metálico' END,
-    CASE WHEN UPPER(REGEXP_REPLACE(s.bank_iban, '\s+', '', 'g')) ~ '^[A-Z]{2}[0-9]{2}[A-Z0-9]{11,30}$' THEN UPPER(REGEXP_REPLACE(s.bank_iban, '\s+', '', 'g')) ELSE NULL END
+    s.cuota,
+    s.periodicidad,
+    CASE WHEN s.iban IS NOT NULL THEN 'Domiciliación' ELSE 'Metálico' END,
+    s.iban
 FROM staging_gravity s
-JOIN afiliadas a ON UPPER(TRIM(s.nif_dni)) = UPPER(TRIM(a.cif))
+JOIN afiliadas a ON a.cif = s.nif
 WHERE NOT EXISTS (
     SELECT 1 FROM facturacion f WHERE f.afiliada_id = a.id
 )
-ORDER BY UPPER(TRIM(s.nif_dni)), CAST(s.entry_id AS INTEGER) DESC;
+ORDER BY s.nif, s.entry_id DESC;
+CALL pg_temp.etl_step('facturacion', :ROW_COUNT);
+
+-- ====================================================================================
+-- 7.5 MARCA DE AGUA Y MÉTRICAS DE LA EJECUCIÓN
+-- ====================================================================================
+-- Solo se llega aquí si todo lo anterior terminó bien (ON_ERROR_STOP) y se
+-- consolida en el mismo COMMIT que los datos. Una carga fallida deja la marca
+-- donde estaba y la siguiente pasada repite la ventana; las cargas de arriba son
+-- UPSERT, así que repetir entradas es inocuo.
+INSERT INTO sindicato_etl.sync_state AS st (instancia, ultimo_entry_id, ultima_fecha_creacion)
+SELECT :'instancia', NULLIF(:'hasta_entry_id', '')::BIGINT, NULLIF(:'hasta_fecha', '')::TIMESTAMP
+WHERE NULLIF(:'hasta_entry_id', '') IS NOT NULL
+ON CONFLICT (instancia) DO UPDATE SET
+    ultimo_entry_id = GREATEST(st.ultimo_entry_id, EXCLUDED.ultimo_entry_id),
+    ultima_fecha_creacion = GREATEST(st.ultima_fecha_creacion, EXCLUDED.ultima_fecha_creacion),
+    updated_at = CURRENT_TIMESTAMP;
+
+INSERT INTO sindicato_etl.sync_runs (
+    instancia, started_at, estado, desde_entry_id, hasta_entry_id,
+    filas_extraidas, filas_geocodificadas, pisos_cargados, afiliadas_cargadas,
+    extract_ms, geocode_ms, load_ms
+) VALUES (
+    :'instancia',
+    COALESCE(NULLIF(:'started_at', '')::TIMESTAMPTZ, :'load_started'::TIMESTAMPTZ),
+    'ok',
+    NULLIF(:'desde_entry_id', '')::BIGINT,
+    NULLIF(:'hasta_entry_id', '')::BIGINT,
+    :filas_extraidas, :filas_geocodificadas,
+    (SELECT filas FROM etl_load_steps WHERE paso = 'pisos'),
+    (SELECT filas FROM etl_load_steps WHERE paso = 'afiliadas'),
+    NULLIF(:'extract_ms', '')::INTEGER,
+    NULLIF(:'geocode_ms', '')::INTEGER,
+    (EXTRACT(EPOCH FROM clock_timestamp() - :'load_started'::TIMESTAMPTZ) * 1000)::INTEGER
+)
+RETURNING id AS run_id \gset
+
+INSERT INTO sindicato_etl.load_steps (run_id, orden, paso, filas, ms)
+SELECT :run_id, orden, paso, filas, ms FROM etl_load_steps;
+
+-- Desglose en el log de la pasada: dónde se fue el tiempo
+SELECT orden, paso, filas, ms FROM etl_load_steps ORDER BY orden;
 
--- 8. Limpieza final de la tabla de staging
-DROP TABLE staging_gravity;
\ No newline at end of file
+-- 8. Las tablas de staging y de pasos son ON COMMIT DROP
+COMMIT;
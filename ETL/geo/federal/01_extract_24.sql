@@ -1,4 +1,10 @@
 -- example extraction query from a source wordpress gravity forms database (Mysql/ Mariadb)
+--
+-- INCREMENTAL: daily_sync.sh runs `SET @since_entry_id = <watermark>;` before
+-- this query (watermark in sindicato_etl.sync_state, see ETL/00-sync-state.sql),
+-- so only entries above the last id loaded into Postgres are extracted and
+-- the range scan stays on the entry primary key. With the variable unset
+-- (manual runs, first sync) it falls back to the last 24 hours.
 
 SELECT
     e.id                                                              AS entry_id,
@@ -121,7 +127,7 @@ FROM mod685_gf_entry e
 
 -- DEDUP BY NIF/DNI: if the same person (same field '5' value) submitted
 -- more than once within the window, keep only their latest entry. Scoped
--- to the same 30-day window as the outer query, matching the pattern from
+-- to the same incremental window as the outer query, matching the pattern from
 -- the reference query - it does not dedup across the full table history,
 -- only among entries already in scope.
 INNER JOIN (
@@ -130,7 +136,8 @@ INNER JOIN (
     JOIN mod685_gf_entry_meta m_sub ON e_sub.id = m_sub.entry_id
     WHERE e_sub.form_id = 1
       AND m_sub.meta_key = '5'  -- NIF/DNI
-      AND e_sub.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY)
+      AND e_sub.id > COALESCE(@since_entry_id, 0)
+      AND (@since_entry_id IS NOT NULL OR e_sub.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY))
     GROUP BY m_sub.meta_value
 ) latest_entries ON e.id = latest_entries.max_id
 
@@ -138,9 +145,10 @@ LEFT JOIN mod685_gf_entry_meta m
        ON e.id = m.entry_id
           AND m.meta_key NOT IN ('submission_speeds', 'gform_product_info_1_')
 
--- TARGET ONLY MEMBERSHIP FORM & OPEN THE TIMEFRAME
+-- TARGET ONLY MEMBERSHIP FORM & INCREMENTAL WINDOW (watermark, or last 24h without one)
 WHERE e.form_id = 1
-  AND e.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY)
+  AND e.id > COALESCE(@since_entry_id, 0)
+  AND (@since_entry_id IS NOT NULL OR e.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY))
 
 GROUP BY e.id, e.date_created
 
@@ -1,3 +1,9 @@
+-- INCREMENTAL: daily_sync.sh runs `SET @since_entry_id = <watermark>;` before
+-- this query (watermark in sindicato_etl.sync_state, see ETL/00-sync-state.sql),
+-- so only entries above the last id loaded into Postgres are extracted and
+-- the range scan stays on the entry primary key. With the variable unset
+-- (manual runs, first sync) it falls back to the last 24 hours.
+
 SELECT
     e.id                                                              AS entry_id,
     e.date_created,
@@ -83,8 +89,9 @@ INNER JOIN (
     FROM e11fa05ad42a_gf_entry e_sub
     JOIN e11fa05ad42a_gf_entry_meta m_sub ON e_sub.id = m_sub.entry_id
     WHERE m_sub.meta_key = '22'
-      -- DYNAMIC DATE FILTER
-      AND e_sub.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY)
+      -- INCREMENTAL FILTER (watermark, or last 24h without one)
+      AND e_sub.id > COALESCE(@since_entry_id, 0)
+      AND (@since_entry_id IS NOT NULL OR e_sub.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY))
     GROUP BY m_sub.meta_value
 ) latest_entries ON e.id = latest_entries.max_id
 
@@ -92,8 +99,9 @@ LEFT JOIN e11fa05ad42a_gf_entry_meta m
        ON e.id = m.entry_id
           AND m.meta_key NOT IN ('submission_speeds', 'gform_product_info_1_')
 
--- DYNAMIC DATE FILTER
-WHERE e.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY)
+-- INCREMENTAL FILTER (watermark, or last 24h without one)
+WHERE e.id > COALESCE(@since_entry_id, 0)
+  AND (@since_entry_id IS NOT NULL OR e.date_created >= DATE_SUB(NOW(), INTERVAL 1 DAY))
 
 GROUP BY e.id, e.date_created
 
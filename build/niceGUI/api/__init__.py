@@ -1,8 +1,9 @@
-from .client import APIClient
+from .client import APIClient, PageFetchError
 from .validate import TableValidator, validator
 
 __all__ = [
     "TableValidator",
     "validator",
     "APIClient",
+    "PageFetchError",
 ]
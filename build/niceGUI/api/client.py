@@ -1,33 +1,155 @@
 import httpx
 import logging
-from typing import Dict, List, Optional, Any, Tuple
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 from nicegui import ui, app
 from api.validate import validator
+from api.pool_metrics import HTTPPoolMetrics, InstrumentedTransport
+from metrics import CACHE_REQUESTS
 from difflib import SequenceMatcher
 
 log = logging.getLogger(__name__)
 
+# Seconds a dashboard aggregate is served from memory before asking Postgres again
+STATS_CACHE_TTL = 30.0
+# Entries kept at most (one per session and filter set); the oldest go first
+STATS_CACHE_MAXSIZE = 256
+
+# Rows per request for the keyset-paginated rpc_page_* functions, and the
+# server-side cap they apply to p_limit
+KEYSET_PAGE_SIZE = 1000
+KEYSET_MAX_PAGE_SIZE = 5000
+
+# rpc_search matches trigrams, so shorter queries cannot hit anything
+SEARCH_MIN_CHARS = 3
+
+# Unique keys rpc_check_import_conflicts can look up ("tabla.campo" -> RPC argument).
+# pisos.direccion is left out: rows sharing a piso reuse it (IMPORT_PARENT_KEY_ARGS)
+IMPORT_UNIQUE_KEY_ARGS = {
+    "afiliadas.cif": "p_cifs",
+    "afiliadas.num_afiliada": "p_num_afiliadas",
+}
+
+# Parent tables the importer builds once per distinct key instead of once per
+# row, resolved against the database by rpc_resolve_import_parents
+# (tabla -> (key column, RPC argument))
+IMPORT_PARENT_KEY_ARGS = {
+    "bloques": ("direccion", "p_bloques"),
+    "pisos": ("direccion", "p_pisos"),
+}
+
+# Rows sent per rpc_dry_run_import call (one transaction, rolled back, each)
+DRY_RUN_CHUNK_SIZE = 500
+
+# Bearer token that replaces the session's one inside `APIClient.bearer_token`
+# (background import jobs run outside any user request)
+_bearer_override: ContextVar[Optional[str]] = ContextVar("bearer_override", default=None)
+
+# rpc_mapa_pisos returns individual pisos from this zoom level on (clusters below)
+MAP_ROWS_MIN_ZOOM = 16
+
 # =====================================================================
 #  GENERIC METHODS
 # =====================================================================
 
 
+class PageFetchError(RuntimeError):
+    """A keyset page after the first could not be read; the rows so far are incomplete."""
+
+
 class APIClient:
     """
     Enhanced PostgREST API client with JWT injection, config-driven validation,
     and detailed error reporting.
     """
 
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, settings: Any = None):
         self.base_url = base_url
         self.client: Optional[httpx.AsyncClient] = None
+        self._stats_cache: "OrderedDict[Tuple, Tuple[float, Dict]]" = OrderedDict()
+        # Pool sizing / timeouts come from config.Config (HTTP_*); a replaced
+        # copy can be passed in, e.g. by the load test
+        self.settings = settings
+        self.metrics = HTTPPoolMetrics()
+        self._transport: Optional[InstrumentedTransport] = None
 
     def _ensure_client(self) -> httpx.AsyncClient:
         """Ensure the HTTP client is initialized."""
         if self.client is None:
-            self.client = httpx.AsyncClient(timeout=30.0)
+            self.client = self._build_client()
         return self.client
 
+    def _build_client(self) -> httpx.AsyncClient:
+        """Shared pool to PostgREST, sized and timed from the HTTP_* settings."""
+        if self.settings is None:
+            from config import config
+
+            self.settings = config
+        s = self.settings
+        http2 = s.HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                log.warning("HTTP2 is enabled but the 'h2' package is missing; using HTTP/1.1.")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=s.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=s.HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=s.HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            connect=s.HTTP_CONNECT_TIMEOUT,
+            read=s.HTTP_READ_TIMEOUT,
+            write=s.HTTP_WRITE_TIMEOUT,
+            pool=s.HTTP_POOL_TIMEOUT,
+        )
+        self._transport = InstrumentedTransport(
+            httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+            self.metrics,
+            self.base_url or "",
+        )
+        return httpx.AsyncClient(timeout=timeout, transport=self._transport)
+
+    def _operation_timeout(self, seconds: Optional[float]):
+        """
+        Per-call read/write budget (e.g. a slow RPC); connect and pool waits
+        keep their configured limits. None means the client defaults, not
+        "no timeout" as it would in httpx.
+        """
+        if seconds is None:
+            return httpx.USE_CLIENT_DEFAULT
+        s = self.settings
+        return httpx.Timeout(
+            seconds, connect=s.HTTP_CONNECT_TIMEOUT, pool=s.HTTP_POOL_TIMEOUT
+        )
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of the PostgREST pool: connections in use / idle, requests in
+        flight, time spent waiting for a connection and latency per
+        "<VERB> <table or rpc/fn>" (count, errors, avg/p50/p95/max in ms).
+        """
+        pool = self._transport.pool if self._transport else None
+        return self.metrics.snapshot(pool)
+
+    @contextmanager
+    def bearer_token(self, token: str):
+        """
+        Sends `token` instead of the session's JWT for the requests made inside
+        the block by the current task (e.g. a background import job acting for
+        the user who queued it).
+        """
+        reset = _bearer_override.set(token)
+        try:
+            yield
+        finally:
+            _bearer_override.reset(reset)
+
     def _get_auth_headers(self) -> Dict[str, str]:
         """
         Retrieves the JWT from the current user session to inject into the request.
@@ -38,7 +160,11 @@ class APIClient:
         - Catches RuntimeError: If called from a background task or startup script 
           (outside a user context), this fails safely.
         - Returns: A dict with the Authorization header, or empty dict if no user.
+        - A token set with `bearer_token()` takes precedence.
         """
+        override = _bearer_override.get()
+        if override:
+            return {"Authorization": f"Bearer {override}"}
         try:
             # "db_token" must match the key you set in your login logic
             token = app.storage.user.get("db_token")
@@ -124,8 +250,12 @@ class APIClient:
         payload: Optional[Dict[str, Any]] = None,
         *,
         timeout: Optional[float] = None,
+        notify: bool = True,
     ) -> Optional[Any]:
-        """Call a PostgREST RPC endpoint and return the JSON response."""
+        """
+        Call a PostgREST RPC endpoint and return the JSON response.
+        With notify=False failures are only logged (background tasks without a page).
+        """
         client = self._ensure_client()
         url = f"{self.base_url}/rpc/{fn_name}"
 
@@ -137,7 +267,7 @@ class APIClient:
                 url, 
                 json=payload or {}, 
                 headers=headers, 
-                timeout=timeout
+                timeout=self._operation_timeout(timeout),
             )
             response.raise_for_status()
             if response.text == "":
@@ -151,16 +281,202 @@ class APIClient:
                 log.info(f"RPC '{fn_name}' not found (404); falling back if supported.")
                 return None
             log.error(f"HTTP Error calling RPC '{fn_name}'", exc_info=True)
-            ui.notify(
-                f"Error HTTP {e.response.status_code} al invocar {fn_name}: {e.response.text}",
-                type="negative",
-            )
+            if notify:
+                ui.notify(
+                    f"Error HTTP {e.response.status_code} al invocar {fn_name}: {e.response.text}",
+                    type="negative",
+                )
             return None
         except Exception as e:
             log.error(f"Unexpected error calling RPC '{fn_name}'", exc_info=True)
-            ui.notify(f"Error al invocar función {fn_name}: {str(e)}", type="negative")
+            if notify:
+                ui.notify(f"Error al invocar función {fn_name}: {str(e)}", type="negative")
             return None
 
+    async def iter_pages(
+        self,
+        fn_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        *,
+        page_size: int = KEYSET_PAGE_SIZE,
+        cursor_field: str = "id",
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[List[Dict]]:
+        """
+        Lazily walk a keyset-paginated RPC (`rpc_page_afiliadas`, `rpc_page_pisos`,
+        `rpc_page_bloques`, `rpc_page_conflictos`), yielding one page at a time.
+
+        `filters` uses the RPC argument names without the `p_` prefix
+        (e.g. {"estado": "Alta", "nodo_id": 3}); None values mean "unfiltered".
+        Each request passes the last row's `cursor_field` as `p_after_id`, so
+        every page costs the same however deep it is. Stops on a short or empty
+        page.
+
+        If the first call fails (RPC not deployed, timeout) nothing is yielded,
+        so callers can fall back; an empty result yields one empty page instead.
+        A failure on a later page raises PageFetchError rather than ending the
+        walk early with a truncated result.
+        """
+        page_size = max(1, min(page_size, KEYSET_MAX_PAGE_SIZE))
+        base_payload = {f"p_{key}": value for key, value in (filters or {}).items()}
+        after = None
+        while True:
+            payload = {**base_payload, "p_after_id": after, "p_limit": page_size}
+            page = await self.call_rpc(fn_name, payload, timeout=timeout)
+            if page is None:
+                if after is None:
+                    return
+                raise PageFetchError(f"{fn_name}: no se pudo leer la página tras el id {after}")
+            if not page and after is not None:
+                return
+            yield page
+            after = page[-1].get(cursor_field) if page else None
+            if len(page) < page_size or after is None:
+                return
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 20,
+        tipos: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Unified accent-insensitive search via `rpc_search` (afiliadas, pisos,
+        bloques, conflictos and diario entries). Returns ranked hits shaped
+        {tipo, tabla, id, titulo, detalle, score}; `tabla`/`id` is the record
+        to open. Queries shorter than SEARCH_MIN_CHARS return nothing.
+        """
+        query = (query or "").strip()
+        if len(query) < SEARCH_MIN_CHARS:
+            return []
+        result = await self.call_rpc(
+            "rpc_search",
+            {"p_query": query, "p_limit": limit, "p_tipos": tipos},
+            timeout=5.0,
+        )
+        return result if isinstance(result, list) else []
+
+    async def check_import_conflicts(
+        self, candidates: Dict[str, List[str]]
+    ) -> Optional[Dict[str, set]]:
+        """
+        Which of the candidate unique values of an import already exist, in one
+        `rpc_check_import_conflicts` call (one set-membership query per key).
+        `candidates` is keyed like IMPORT_UNIQUE_KEY_ARGS; the result maps each
+        key to the set of values found. None if the RPC is unavailable.
+        """
+        payload = {
+            arg: sorted(set(candidates.get(key) or [])) or None
+            for key, arg in IMPORT_UNIQUE_KEY_ARGS.items()
+        }
+        if not any(payload.values()):
+            return {}
+        rows = await self.call_rpc("rpc_check_import_conflicts", payload, timeout=30.0)
+        if rows is None:
+            return None
+        found: Dict[str, set] = {}
+        for row in rows:
+            found.setdefault(f"{row['tabla']}.{row['campo']}", set()).add(row["valor"])
+        return found
+
+    async def resolve_import_parents(
+        self, values: Dict[str, List[str]], *, notify: bool = True
+    ) -> Optional[Dict[str, Dict[str, Tuple[str, Optional[int]]]]]:
+        """
+        Match keys and existing ids for the parent values of an import, in one
+        `rpc_resolve_import_parents` call. `values` is keyed like
+        IMPORT_PARENT_KEY_ARGS; the result maps tabla -> value -> (key, id or
+        None). None if the RPC is unavailable.
+        """
+        payload = {
+            arg: sorted(set(values.get(table) or [])) or None
+            for table, (_, arg) in IMPORT_PARENT_KEY_ARGS.items()
+        }
+        if not any(payload.values()):
+            return {}
+        rows = await self.call_rpc("rpc_resolve_import_parents", payload, timeout=30.0, notify=notify)
+        if rows is None:
+            return None
+        resolved: Dict[str, Dict[str, Tuple[str, Optional[int]]]] = {}
+        for row in rows:
+            resolved.setdefault(row["tabla"], {})[row["valor"]] = (row["clave"], row["id"])
+        return resolved
+
+    async def dry_run_import(
+        self, plan: Dict[str, Any], rows: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Inserts `rows` inside `rpc_dry_run_import` and rolls everything back,
+        so triggers, constraints and RLS answer exactly as in the real import.
+        `plan` carries execution_order and foreign_keys; each row is
+        {row_number, preview_label, tables: {tabla: payload}}. Returns one
+        {row_number, status, preview_label, issues} per row, or None if the
+        RPC is unavailable.
+        """
+        if not rows:
+            return []
+        result = await self.call_rpc(
+            "rpc_dry_run_import", {"p_plan": plan, "p_rows": rows}, timeout=60.0
+        )
+        return result if isinstance(result, list) else None
+
+    async def get_map_pisos(
+        self,
+        bounds: Dict[str, float],
+        zoom: int,
+        max_rows: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Pisos inside a map viewport via `rpc_mapa_pisos`. `bounds` holds
+        west/south/east/north in degrees. Below MAP_ROWS_MIN_ZOOM the RPC
+        returns grid clusters ({tipo: "cluster", n_pisos, n_afiliadas, lat, lng});
+        single-piso cells and every row from that zoom on come back as
+        {tipo: "piso", piso_id, bloque_id, direccion, ...}.
+        """
+        result = await self.call_rpc(
+            "rpc_mapa_pisos",
+            {
+                "p_west": bounds["west"],
+                "p_south": bounds["south"],
+                "p_east": bounds["east"],
+                "p_north": bounds["north"],
+                "p_zoom": int(zoom),
+                "p_max_rows": max_rows,
+            },
+            timeout=10.0,
+        )
+        return result if isinstance(result, list) else []
+
+    async def get_nearby_pisos(
+        self,
+        *,
+        piso_id: Optional[int] = None,
+        bloque_id: Optional[int] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        radius_m: int = 250,
+        limit: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """
+        Pisos within `radius_m` metres of a piso, a bloque (centroid of its
+        geocoded pisos) or a lat/lng point, nearest first, each with its
+        afiliadas count (`rpc_pisos_cercanos`). Empty if the centre has no
+        coordinates.
+        """
+        result = await self.call_rpc(
+            "rpc_pisos_cercanos",
+            {
+                "p_piso_id": piso_id,
+                "p_bloque_id": bloque_id,
+                "p_lat": lat,
+                "p_lng": lng,
+                "p_radio_m": radius_m,
+                "p_limit": limit,
+            },
+            timeout=10.0,
+        )
+        return result if isinstance(result, list) else []
+
     async def get_bloque_suggestions(
         self,
         addresses: List[Dict[str, Any]],
@@ -199,16 +515,65 @@ class APIClient:
         suggestion = suggestions[0]
         return suggestion.get("suggested_bloque_id")
 
+    async def get_conflict_stats(
+        self, filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Pre-aggregated conflict counts (total, estado, causa, ambito, nodo) for a
+        filter set, via `rpc_conflict_stats`. Results are cached for
+        STATS_CACHE_TTL seconds per JWT, since RLS decides what each user counts.
+        Returns None if the RPC is unavailable so callers can fall back.
+        """
+        filters = filters or {}
+        payload = {
+            "p_nodo_id": filters.get("nodo_id"),
+            "p_estado": filters.get("estado"),
+            "p_causa": filters.get("causa"),
+            "p_ambito": filters.get("ambito"),
+        }
+        cache_key = (
+            self._get_auth_headers().get("Authorization"),
+            tuple(sorted(payload.items())),
+        )
+        cached = self._stats_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < STATS_CACHE_TTL:
+            CACHE_REQUESTS.inc(cache="conflict_stats", result="hit")
+            return cached[1]
+        CACHE_REQUESTS.inc(cache="conflict_stats", result="miss")
+
+        result = await self.call_rpc("rpc_conflict_stats", payload, timeout=10.0)
+        if not isinstance(result, dict):
+            return None
+        self._store_stats(cache_key, result)
+        return result
+
+    def _store_stats(self, cache_key: Tuple, result: Dict):
+        """Caches an aggregate, dropping expired entries and the oldest beyond STATS_CACHE_MAXSIZE."""
+        now = time.monotonic()
+        self._stats_cache.pop(cache_key, None)
+        # Insertion order is age order, so the expired entries are at the front
+        while self._stats_cache:
+            stored_at, _ = next(iter(self._stats_cache.values()))
+            if now - stored_at < STATS_CACHE_TTL and len(self._stats_cache) < STATS_CACHE_MAXSIZE:
+                break
+            self._stats_cache.popitem(last=False)
+        self._stats_cache[cache_key] = (now, result)
+
+    def invalidate_stats_cache(self):
+        """Drop cached aggregates after a write that changes them."""
+        self._stats_cache.clear()
+
     async def create_record(
         self,
         table: str,
-        data: Dict,
+        data: Union[Dict, List[Dict]],
         validate: bool = True,
         show_validation_errors: bool = True,
         return_representation: bool = True,
     ) -> Tuple[Optional[Dict], Optional[str]]:
         """
-        Create a new record.
+        Create a new record (or, with a list and validate=False, several in
+        one bulk INSERT).
         Returns a tuple: (record_data, error_message).
         """
         if validate:
@@ -293,8 +658,13 @@ class APIClient:
         data: Dict,
         validate: bool = True,
         show_validation_errors: bool = True,
+        notify_errors: bool = True,
     ) -> Optional[Dict]:
-        """Update a record from a dictionary with optional validation."""
+        """
+        Update a record from a dictionary with optional validation.
+        With notify_errors=False failures are only logged (row-by-row loops
+        that report them elsewhere, background tasks without a page).
+        """
         if validate:
             is_valid, errors = validator.validate_record(table, data, "update")
             if not is_valid:
@@ -329,7 +699,9 @@ class APIClient:
                     )
             return updated_record
         except httpx.HTTPStatusError as e:
-            if e.response.status_code == 404:
+            if not notify_errors:
+                log.warning(f"HTTP {e.response.status_code} updating '{table}' {record_id}: {e.response.text}")
+            elif e.response.status_code == 404:
                 # If 404/Empty result on update, it might be RLS hiding the row
                 ui.notify("No se pudo actualizar. Es posible que no tengas permisos.", type="warning")
             elif e.response.status_code == 403: # Forbidden
@@ -341,7 +713,8 @@ class APIClient:
             log.error(
                 f"Error updating record ID '{record_id}' in '{table}'", exc_info=True
             )
-            ui.notify(f"Error al actualizar registro: {str(e)}", type="negative")
+            if notify_errors:
+                ui.notify(f"Error al actualizar registro: {str(e)}", type="negative")
             return None
 
     async def delete_record(self, table: str, record_id: int) -> bool:
@@ -375,6 +748,7 @@ class APIClient:
         if self.client:
             await self.client.aclose()
             self.client = None
+            self._transport = None
 
     # =====================================================================
     #  ENHANCED UTILITY METHODS
@@ -418,6 +792,16 @@ class APIClient:
         """Explicitly validate record data without performing any database operations."""
         return validator.validate_record(table, data, operation)
 
+    async def validate_column_data(
+        self,
+        table: str,
+        columns: Dict[str, List[Any]],
+        operation: str = "create",
+        row_count: Optional[int] = None,
+    ) -> List[List[str]]:
+        """Batch validation of column-shaped rows (one error list per row); no database I/O."""
+        return validator.validate_columns(table, columns, operation, row_count)
+
     def get_table_schema(self, table: str) -> Optional[Dict]:
         """Get table configuration from TABLE_INFO."""
         from config import TABLE_INFO
@@ -458,6 +842,35 @@ class APIClient:
     #  RELATIONSHIP HELPERS
     # =====================================================================
 
+    async def get_embedded_record(
+        self, table: str, record_id: Any, select: str
+    ) -> Optional[Dict]:
+        """
+        Fetch one record together with its embedded relations in a single request.
+
+        Returns the record (or {} if it does not exist / is not visible), or None
+        if PostgREST cannot resolve the embedding so the caller can fall back to
+        per-table queries.
+        """
+        client = self._ensure_client()
+        url = f"{self.base_url}/{table}?{self._build_pk_filter(table, record_id)}"
+        headers = self._get_auth_headers()
+
+        try:
+            response = await client.get(url, params={"select": select}, headers=headers)
+            response.raise_for_status()
+            records = response.json()
+            return records[0] if records else {}
+        except httpx.HTTPStatusError as e:
+            # 400 = PGRST200/PGRST201 (relationship not found or ambiguous)
+            log.info(
+                f"Embedding on '{table}' failed ({e.response.status_code}); falling back if supported."
+            )
+            return None
+        except Exception:
+            log.error(f"Unexpected error embedding relations for '{table}'", exc_info=True)
+            return None
+
     async def get_related_records(
         self, table: str, record_id: Any, relation_table: str
     ) -> List[Dict]:
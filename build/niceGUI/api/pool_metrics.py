@@ -0,0 +1,161 @@
+# build/niceGUI/api/pool_metrics.py
+"""
+Instrumentation for the shared httpx pool to PostgREST.
+
+`InstrumentedTransport` wraps the real transport, so every APIClient request
+is measured in one place: latency by endpoint (table or rpc/<fn>) and verb,
+errors, requests in flight, and how long each request waited for a pool
+connection. Wait time comes from httpcore's `trace` extension: the first
+connect_tcp / send_request_headers event marks the moment a connection was
+assigned.
+
+Every observation is also fed to the process-wide Prometheus series in
+metrics.py (summed over all APIClient pools), served at /metrics.
+"""
+
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+import metrics
+
+# Recent samples kept per series for the percentiles
+SAMPLE_SIZE = 512
+
+_CONNECTION_ACQUIRED_EVENTS = (
+    "connection.connect_tcp.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+)
+
+
+def _percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Series:
+    """Count / error / total plus a bounded window of recent samples (seconds)."""
+
+    __slots__ = ("count", "errors", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.errors += int(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(_percentile(self.samples, 0.5) * 1000, 2),
+            "p95_ms": round(_percentile(self.samples, 0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class HTTPPoolMetrics:
+    """In-memory counters for one APIClient; read them with snapshot()."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.wait = _Series()
+        self.latency: Dict[Tuple[str, str], _Series] = defaultdict(_Series)
+
+    def request_started(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        metrics.POSTGREST_IN_FLIGHT.inc()
+
+    def connection_acquired(self, seconds: float):
+        self.wait.observe(seconds)
+        metrics.POSTGREST_POOL_WAIT_SECONDS.observe(seconds)
+
+    def request_finished(self, endpoint: str, verb: str, seconds: float, error: bool):
+        self.in_flight -= 1
+        self.latency[(endpoint, verb)].observe(seconds, error)
+        metrics.POSTGREST_IN_FLIGHT.dec()
+        metrics.POSTGREST_REQUEST_SECONDS.observe(seconds, endpoint=endpoint, method=verb)
+        if error:
+            metrics.POSTGREST_REQUEST_ERRORS.inc(endpoint=endpoint, method=verb)
+
+    def snapshot(self, pool: Any = None) -> Dict[str, Any]:
+        connections = list(getattr(pool, "connections", None) or [])
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "connections_in_use": len(connections) - idle,
+            "connections_idle": idle,
+            "requests_in_flight": self.in_flight,
+            "peak_requests_in_flight": self.peak_in_flight,
+            "pool_wait": self.wait.summary(),
+            "latency": {
+                f"{verb} {endpoint}": series.summary()
+                for (endpoint, verb), series in sorted(self.latency.items())
+            },
+        }
+
+
+def endpoint_label(url: httpx.URL, base_path: str = "") -> str:
+    """'/api/rpc/rpc_search' -> 'rpc/rpc_search', '/api/afiliadas' -> 'afiliadas'."""
+    path = url.path
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+    return path.strip("/") or "/"
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Delegates to an AsyncHTTPTransport and records HTTPPoolMetrics."""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, metrics: HTTPPoolMetrics, base_url: str = ""):
+        self._transport = transport
+        self.metrics = metrics
+        self._base_path = urlsplit(base_url).path.rstrip("/")
+
+    @property
+    def pool(self) -> Optional[Any]:
+        """The underlying httpcore connection pool (None for non-standard transports)."""
+        return getattr(self._transport, "_pool", None)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        acquired: Optional[float] = None
+        outer_trace = request.extensions.get("trace")
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            nonlocal acquired
+            if acquired is None and event_name in _CONNECTION_ACQUIRED_EVENTS:
+                acquired = time.perf_counter()
+                self.metrics.connection_acquired(acquired - started)
+            if outer_trace is not None:
+                await outer_trace(event_name, info)
+
+        request.extensions = {**request.extensions, "trace": trace}
+        endpoint = endpoint_label(request.url, self._base_path)
+        self.metrics.request_started()
+        error = True
+        try:
+            response = await self._transport.handle_async_request(request)
+            error = response.status_code >= 500
+            return response
+        finally:
+            # Time to response headers; the body is read by the client afterwards
+            self.metrics.request_finished(endpoint, request.method, time.perf_counter() - started, error)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -1,8 +1,97 @@
 # Create a singleton instance for easy import across the application
 from config import TABLE_INFO
 from datetime import datetime
+from functools import lru_cache
 import re
-from typing import Dict, Any, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+_EMAIL_RE = re.compile(r"^[^@]+@[^@]+\.[^@]+$")
+
+
+def _is_blank(value: Any) -> bool:
+    return value is None or str(value).strip() == ""
+
+
+@lru_cache(maxsize=4096)
+def _is_valid_date_string(value: str) -> bool:
+    """ISO 8601 date (YYYY-MM-DD) or full ISO timestamp; memoized, imports repeat dates a lot."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+        return True
+    except ValueError:
+        try:
+            # Fallback for full ISO format with time, etc.
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return True
+        except ValueError:
+            return False
+
+
+class ValidationPlan:
+    """
+    Rules of one TABLE_INFO entry, compiled once: required fields, enum sets,
+    precompiled regexes, and the naming-convention checks (email / date / id)
+    resolved per field name the first time that name is seen.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.required_fields: Tuple[str, ...] = tuple(config.get("required_fields", []))
+        # (field, allowed values for membership, original list for the message)
+        self.options: List[Tuple[str, frozenset, list]] = []
+        for field, options in config.get("field_options", {}).items():
+            try:
+                allowed = frozenset(options)
+            except TypeError:
+                allowed = None  # unhashable options: fall back to list membership
+            self.options.append((field, allowed, options))
+        self.patterns: List[Tuple[str, Any, str]] = [
+            (
+                field,
+                re.compile(info["regex"]),
+                info.get("error_message", f"Formato inválido para el campo '{field}'"),
+            )
+            for field, info in config.get("field_patterns", {}).items()
+            if info.get("regex")
+        ]
+        self._patterned_fields = frozenset(config.get("field_patterns", {}))
+        self._type_checks: Dict[str, Tuple[Callable[[Any], Optional[str]], ...]] = {}
+
+    def type_checks(self, field: str) -> Tuple[Callable[[Any], Optional[str]], ...]:
+        """Naming-convention checks that apply to `field` (each returns an error or None)."""
+        checks = self._type_checks.get(field)
+        if checks is None:
+            lowered = field.lower()
+            found = []
+            # Email validation (can be replaced by a pattern in config.py)
+            if "email" in lowered and field not in self._patterned_fields:
+                message = f"Formato de email inválido para '{field}'"
+                found.append(lambda v, m=message: None if _EMAIL_RE.match(str(v)) else m)
+            if "fecha" in lowered or "date" in lowered:
+                message = f"Formato de fecha inválido para '{field}' (se esperaba AAAA-MM-DD)"
+                found.append(lambda v, m=message: None if TableValidator._is_valid_date(v) else m)
+            if field.endswith("_id"):
+                message = f"El formato del ID para '{field}' debe ser numérico"
+                found.append(lambda v, m=message: None if _is_int_like(v) else m)
+            checks = self._type_checks[field] = tuple(found)
+        return checks
+
+    def option_error(self, field: str, allowed: Optional[frozenset], options: list, value: Any) -> Optional[str]:
+        try:
+            ok = value in allowed if allowed is not None else value in options
+        except TypeError:
+            ok = value in options
+        if ok:
+            return None
+        return f"Valor inválido para {field}: '{value}'. Debe ser uno de: {options}"
+
+
+def _is_int_like(value: Any) -> bool:
+    try:
+        int(value)
+        return True
+    except (ValueError, TypeError):
+        return False
 
 
 class TableValidator:
@@ -10,6 +99,14 @@ class TableValidator:
 
     def __init__(self):
         self.table_info = TABLE_INFO
+        self._plans: Dict[str, ValidationPlan] = {}
+
+    def plan(self, table: str) -> Optional[ValidationPlan]:
+        """Compiled rules for `table` (built on first use), or None if the table is unknown."""
+        plan = self._plans.get(table)
+        if plan is None and table in self.table_info:
+            plan = self._plans[table] = ValidationPlan(self.table_info[table])
+        return plan
 
     def validate_record(
         self, table: str, data: Dict[str, Any], operation: str = "create"
@@ -17,80 +114,104 @@ class TableValidator:
         """
         Validate a record against table configuration using a prioritized set of rules.
         """
-        if table not in self.table_info:
+        plan = self.plan(table)
+        if plan is None:
             return False, [f"Unknown table: {table}"]
 
-        config = self.table_info[table]
         errors = []
 
         # Rule 1: Validate required fields (for 'create' operations)
         if operation == "create":
-            required_fields = config.get("required_fields", [])
-            for field in required_fields:
-                value = data.get(field)
-                if value is None or str(value).strip() == "":
+            for field in plan.required_fields:
+                if _is_blank(data.get(field)):
                     errors.append(f"Falta el campo obligatorio: {field}")
 
         # Rule 2: Validate field options (enums)
-        field_options = config.get("field_options", {})
-        for field, options in field_options.items():
+        for field, allowed, options in plan.options:
             value = data.get(field)
-            if value is not None and str(value).strip() != "":
-                if value not in options:
-                    errors.append(
-                        f"Valor inválido para {field}: '{value}'. Debe ser uno de: {options}"
-                    )
+            if not _is_blank(value):
+                error = plan.option_error(field, allowed, options, value)
+                if error:
+                    errors.append(error)
 
         # Rule 3: Validate field patterns (regex for formats like IBAN, email, etc.)
-        field_patterns = config.get("field_patterns", {})
-        for field, pattern_info in field_patterns.items():
+        for field, regex, message in plan.patterns:
             value = data.get(field)
-            if value is not None and str(value).strip() != "":
-                regex = pattern_info.get("regex")
-                if regex and not re.match(regex, str(value)):
-                    error_message = pattern_info.get(
-                        "error_message", f"Formato inválido para el campo '{field}'"
-                    )
-                    errors.append(error_message)
+            if not _is_blank(value) and not regex.match(str(value)):
+                errors.append(message)
 
         # Rule 4: Validate field types based on naming conventions (fallback)
-        errors.extend(self._validate_field_types(table, data))
+        for field, value in data.items():
+            if _is_blank(value):
+                continue
+            for check in plan.type_checks(field):
+                error = check(value)
+                if error:
+                    errors.append(error)
 
         # Rule 5: Validate relationships (placeholder for future expansion)
         errors.extend(self._validate_relationships(table, data))
 
         return len(errors) == 0, errors
 
-    def _validate_field_types(self, table: str, data: Dict[str, Any]) -> List[str]:
-        """Validate field types based on naming conventions."""
-        errors = []
-        # Get the config for the current table to correctly check for existing patterns.
-        config = self.table_info.get(table, {})
+    def validate_columns(
+        self,
+        table: str,
+        columns: Dict[str, List[Any]],
+        operation: str = "create",
+        row_count: Optional[int] = None,
+    ) -> List[List[str]]:
+        """
+        Batch form of validate_record for column-shaped data (one list per
+        field, all the same length), as built by the import preview. Each rule
+        runs down its whole column at once; the result holds one error list per
+        row, identical (same messages, same order) to calling validate_record
+        on that row. `row_count` is only needed when `columns` may be empty.
+        """
+        if row_count is None:
+            row_count = max((len(values) for values in columns.values()), default=0)
+        n_rows = row_count
+        plan = self.plan(table)
+        if plan is None:
+            return [[f"Unknown table: {table}"] for _ in range(n_rows)]
 
-        for field, value in data.items():
-            if value is None or str(value).strip() == "":
+        errors: List[List[str]] = [[] for _ in range(n_rows)]
+        missing = [None] * n_rows
+
+        if operation == "create":
+            for field in plan.required_fields:
+                message = f"Falta el campo obligatorio: {field}"
+                for i, value in enumerate(columns.get(field, missing)):
+                    if _is_blank(value):
+                        errors[i].append(message)
+
+        for field, allowed, options in plan.options:
+            if field not in columns:
                 continue
+            for i, value in enumerate(columns[field]):
+                if not _is_blank(value):
+                    error = plan.option_error(field, allowed, options, value)
+                    if error:
+                        errors[i].append(error)
 
-            # Email validation (can be replaced by a pattern in config.py)
-            if "email" in field.lower():
-                # Avoid re-validating if a pattern already exists for this field
-                if not config.get("field_patterns", {}).get(field):
-                    if not re.match(r"^[^@]+@[^@]+\.[^@]+$", str(value)):
-                        errors.append(f"Formato de email inválido para '{field}'")
-
-            # Date validation
-            if any(date_word in field.lower() for date_word in ["fecha", "date"]):
-                if not self._is_valid_date(value):
-                    errors.append(
-                        f"Formato de fecha inválido para '{field}' (se esperaba AAAA-MM-DD)"
-                    )
-
-            # ID field validation
-            if field.endswith("_id"):
-                try:
-                    int(value)
-                except (ValueError, TypeError):
-                    errors.append(f"El formato del ID para '{field}' debe ser numérico")
+        for field, regex, message in plan.patterns:
+            if field not in columns:
+                continue
+            for i, value in enumerate(columns[field]):
+                if not _is_blank(value) and not regex.match(str(value)):
+                    errors[i].append(message)
+
+        for field, values in columns.items():
+            checks = plan.type_checks(field)
+            if not checks:
+                continue
+            for i, value in enumerate(values):
+                if _is_blank(value):
+                    continue
+                for check in checks:
+                    error = check(value)
+                    if error:
+                        errors[i].append(error)
 
         return errors
 
@@ -98,21 +219,13 @@ class TableValidator:
         """Placeholder for validating foreign key relationships."""
         return []
 
-    def _is_valid_date(self, value: Any) -> bool:
+    @staticmethod
+    def _is_valid_date(value: Any) -> bool:
         """Check if a value is a valid ISO 8601 date string (YYYY-MM-DD)."""
         if isinstance(value, datetime):
             return True
         if isinstance(value, str):
-            try:
-                datetime.strptime(value, "%Y-%m-%d")
-                return True
-            except ValueError:
-                try:
-                    # Fallback for full ISO format with time, etc.
-                    datetime.fromisoformat(value.replace("Z", "+00:00"))
-                    return True
-                except ValueError:
-                    return False
+            return _is_valid_date_string(value)
         return False
 
     def get_field_constraints(self, table: str, field: str) -> Dict[str, Any]:
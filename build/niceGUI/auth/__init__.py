@@ -1,10 +1,11 @@
 from .user_management import UserManagementView
 from .user_profile import UserProfileView
-from .token_utils import create_db_token
+from .token_utils import create_db_token, create_service_token
 
 __all__ = [
     "UserManagementView",
     "UserProfileView",
     "create_login_page",
     "create_db_token",
+    "create_service_token",
 ]
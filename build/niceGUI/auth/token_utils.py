@@ -24,4 +24,16 @@ def create_db_token(user_id: int, alias: str, roles: list[str]) -> str:
         "exp": time.time() + 10800,  # Expires in 3 hours (same as the session)
         "iat": time.time(),
     }
-    return jwt.encode(payload, SECRET, algorithm="HS256")
\ No newline at end of file
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+def create_service_token(role: str, ttl: int = 300) -> str:
+    """Mint a short-lived JWT for a background task that runs as a DB role.
+
+    Unlike `create_db_token` there is no user behind it: no `sub` nor
+    `roles` claims, so every RLS policy keyed on them denies. PostgREST
+    SETs ROLE into `role`, which must be granted to app_user (e.g.
+    mv_maintainer in 07-init-materialized_views.sql).
+    """
+    now = time.time()
+    payload = {"role": role, "exp": now + ttl, "iat": now}
+    return jwt.encode(payload, SECRET, algorithm="HS256")
@@ -6,10 +6,15 @@ from .filters import FilterPanel
 from .exporter import export_to_csv, export_to_json
 from .importer import CSVImporterDialog
 from .relationship_explorer import RelationshipExplorer
+from .global_search import GlobalSearch
+from .map_panel import MapPanel
 from .utils import _clean_record
 from .base_view import BaseView
-from .importer_utils import parse_date, short_address, transform_and_validate_row
+from .importer_utils import parse_date, short_address, transform_and_validate_frame, transform_and_validate_row
 from .validation_preview import ValidationPreviewPanel
+from .import_jobs_panel import ImportJobsPanel
+from .progress_panel import ProgressPanel
+from .loop_profiler_panel import LoopProfilerPanel
 
 __all__ = [
     "DataTable",
@@ -20,10 +25,16 @@ __all__ = [
     "export_to_json",
     "CSVImporterDialog",
     "RelationshipExplorer",
+    "GlobalSearch",
+    "MapPanel",
     "_clean_record",
     "BaseView",
     "parse_date",
     "short_address",
     "transform_and_validate_row",
+    "transform_and_validate_frame",
     "ValidationPreviewPanel",
+    "ImportJobsPanel",
+    "ProgressPanel",
+    "LoopProfilerPanel",
 ]
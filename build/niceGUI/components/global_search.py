@@ -0,0 +1,96 @@
+# build/niceGUI/components/global_search.py
+"""
+Header search box backed by `rpc_search`: one indexed, accent-insensitive
+lookup across afiliadas, pisos, bloques and conflictos. Picking a hit opens
+the record with its relationship tree in a dialog.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from nicegui import ui
+
+from api.client import APIClient, SEARCH_MIN_CHARS
+from components.relationship_explorer import RelationshipExplorer
+
+# Icon per hit type returned by rpc_search
+HIT_ICONS = {
+    "afiliada": "person",
+    "piso": "home",
+    "bloque": "apartment",
+    "conflicto": "gavel",
+    "diario": "history_edu",
+}
+
+
+class GlobalSearch:
+    """Debounced search input with a result menu; rendered inside the header."""
+
+    def __init__(self, api_client: APIClient):
+        self.api = api_client
+        self.input: Optional[ui.input] = None
+        self.menu: Optional[ui.menu] = None
+        self.results_container: Optional[ui.column] = None
+        # Only the latest request may paint results (answers can arrive out of order)
+        self._request_seq = 0
+
+    def create(self) -> ui.input:
+        self.input = (
+            ui.input(
+                placeholder="Buscar afiliada, dirección, conflicto…",
+                on_change=lambda e: self._search(e.value),
+            )
+            .props("dense outlined clearable debounce=300")
+            .classes("w-72")
+        )
+        with self.input.add_slot("prepend"):
+            ui.icon("search")
+        with self.input:
+            self.menu = ui.menu().props("no-focus no-parent-event fit")
+            with self.menu:
+                self.results_container = ui.column().classes("w-full gap-0 p-1")
+        return self.input
+
+    async def _search(self, value: Optional[str]):
+        query = (value or "").strip()
+        self._request_seq += 1
+        seq = self._request_seq
+        if len(query) < SEARCH_MIN_CHARS:
+            self.menu.close()
+            return
+
+        hits = await self.api.search(query)
+        if seq != self._request_seq:
+            return
+        self._render_hits(hits)
+
+    def _render_hits(self, hits: List[Dict[str, Any]]):
+        self.results_container.clear()
+        with self.results_container:
+            if not hits:
+                ui.label("Sin resultados").classes("text-gray-500 p-2")
+            for hit in hits:
+                with ui.item(on_click=lambda h=hit: self._open_hit(h)).classes("w-full"):
+                    with ui.item_section().props("avatar"):
+                        ui.icon(HIT_ICONS.get(hit.get("tipo"), "search"), color="orange-600")
+                    with ui.item_section():
+                        ui.item_label(hit.get("titulo") or f"{hit.get('tabla')} #{hit.get('id')}")
+                        if hit.get("detalle"):
+                            ui.item_label(hit["detalle"]).props("caption lines=1")
+        self.menu.open()
+
+    async def _open_hit(self, hit: Dict[str, Any]):
+        self.menu.close()
+        table, record_id = hit.get("tabla"), hit.get("id")
+        record = await self.api.get_record_by_id(table, record_id)
+        if not record:
+            ui.notify("No se pudo abrir el registro (¿sin permisos?).", type="warning")
+            return
+
+        with ui.dialog() as dialog, ui.card().classes("w-full max-w-5xl"):
+            with ui.row().classes("w-full items-center"):
+                ui.label(hit.get("titulo") or table).classes("text-h6")
+                ui.space()
+                ui.button(icon="close", on_click=dialog.close).props("flat round dense")
+            details = ui.column().classes("w-full")
+        dialog.open()
+        await RelationshipExplorer(self.api, details).show_details(record, table, "admin")
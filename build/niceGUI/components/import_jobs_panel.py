@@ -0,0 +1,159 @@
+# build/niceGUI/components/import_jobs_panel.py
+"""
+Background import jobs of the current user (services/import_jobs.py): live
+progress of the ones running in this process, cancel, resume of interrupted
+ones and a CSV of the rows that failed. Any tab that opens the importer
+attaches to the same jobs.
+"""
+
+import csv
+import io
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from nicegui import ui
+
+from services.import_jobs import ACTIVE_STATES, ImportJobManager, JobOwner
+
+log = logging.getLogger(__name__)
+
+# Seconds between progress repaints
+POLL_INTERVAL = 1.0
+
+ESTADO_LABELS = {
+    "en_cola": ("En cola", "blue-grey-6"),
+    "en_curso": ("En curso", "orange-8"),
+    "completado": ("Completado", "green-8"),
+    "cancelado": ("Cancelado", "grey-7"),
+    "error": ("Error", "red-8"),
+}
+
+
+def job_progress(job: Dict[str, Any]) -> Optional[float]:
+    """Fraction of rows processed, or None while the total is unknown."""
+    total = job.get("total_filas")
+    if not total:
+        return None
+    return min(1.0, (job.get("filas_procesadas") or 0) / total)
+
+
+class ImportJobsPanel:
+    """Card listing the latest import jobs with their controls."""
+
+    def __init__(self, manager: ImportJobManager, owner: Callable[[], JobOwner]):
+        self.manager = manager
+        self._owner = owner
+        self.container: Optional[ui.column] = None
+        self._jobs: List[Dict[str, Any]] = []
+        self._painted: tuple = ()
+        self._timer: Optional[ui.timer] = None
+
+    def create(self) -> ui.card:
+        with ui.card().classes("w-full p-3") as card:
+            with ui.row().classes("w-full items-center justify-between"):
+                ui.label("Importaciones en Segundo Plano").classes("text-subtitle2")
+                ui.button(icon="refresh", on_click=self.refresh).props("flat round dense").tooltip("Recargar trabajos")
+            ui.label(
+                "Las importaciones siguen aunque cierres esta pestaña; puedes volver a ver su progreso desde cualquier otra."
+            ).classes("text-xs text-gray-500")
+            self.container = ui.column().classes("w-full gap-2")
+        self._timer = ui.timer(POLL_INTERVAL, self._tick)
+        ui.timer(0.1, self.refresh, once=True)
+        return card
+
+    async def refresh(self):
+        try:
+            self._jobs = await self.manager.list_jobs()
+        except Exception as e:
+            log.error("Could not load import jobs", exc_info=True)
+            ui.notify(f"Error al cargar las importaciones: {e}", type="negative")
+            return
+        self._paint(force=True)
+
+    async def _tick(self):
+        if not self._jobs:
+            return
+        finished = False
+        for i, job in enumerate(self._jobs):
+            live = self.manager.status(job["id"])
+            if live:
+                finished |= job["estado"] in ACTIVE_STATES and live["estado"] not in ACTIVE_STATES
+                self._jobs[i] = {**job, **live}
+        if finished:
+            await self.refresh()  # final counters come from the database
+        else:
+            self._paint()
+
+    def _paint(self, force: bool = False):
+        key = tuple(
+            (j["id"], j["estado"], j.get("filas_procesadas"), j.get("cancelacion_solicitada")) for j in self._jobs
+        )
+        if not self.container or (key == self._painted and not force):
+            return
+        self._painted = key
+        self.container.clear()
+        with self.container:
+            if not self._jobs:
+                ui.label("No hay importaciones todavía.").classes("text-sm text-gray-500")
+            for job in self._jobs:
+                self._render_job(job)
+
+    def _render_job(self, job: Dict[str, Any]):
+        label, color = ESTADO_LABELS.get(job["estado"], (job["estado"], "grey-7"))
+        if job.get("interrumpido"):
+            label, color = "Interrumpido", "purple-7"
+        total = job.get("total_filas")
+        processed = job.get("filas_procesadas") or 0
+
+        with ui.column().classes("w-full gap-1 border rounded p-2"):
+            with ui.row().classes("w-full items-center gap-2"):
+                ui.badge(label, color=color)
+                ui.label(f"#{job['id']} {job.get('archivo') or 'CSV'}").classes("text-sm font-medium")
+                ui.label(
+                    f"{processed}{'/' + str(total) if total else ''} filas · "
+                    f"{job.get('filas_ok') or 0} ok · {job.get('filas_error') or 0} con error"
+                ).classes("text-xs text-gray-600")
+                ui.space()
+                if job["estado"] in ACTIVE_STATES and not job.get("cancelacion_solicitada"):
+                    ui.button("Cancelar", icon="stop", on_click=lambda j=job: self._cancel(j)).props(
+                        "flat dense color=red-8"
+                    )
+                if job.get("interrumpido") or job["estado"] == "error":
+                    ui.button("Reanudar", icon="play_arrow", on_click=lambda j=job: self._resume(j)).props(
+                        "flat dense color=orange-8"
+                    )
+                if job.get("filas_error"):
+                    ui.button("Filas con error", icon="download", on_click=lambda j=job: self._download_failed(j)).props(
+                        "flat dense color=blue-grey-7"
+                    )
+            progress = job_progress(job)
+            if job["estado"] in ACTIVE_STATES:
+                bar = ui.linear_progress(value=progress or 0, show_value=False).props("instant-feedback")
+                if progress is None:
+                    bar.props("indeterminate")
+            if job.get("mensaje"):
+                ui.label(job["mensaje"]).classes("text-xs text-red-700")
+
+    async def _cancel(self, job: Dict[str, Any]):
+        if await self.manager.cancel(job["id"], self._owner()):
+            ui.notify(f"Cancelando la importación #{job['id']}…", type="info")
+        await self.refresh()
+
+    async def _resume(self, job: Dict[str, Any]):
+        resumed = await self.manager.resume(job, self._owner())
+        if resumed:
+            ui.notify(
+                f"Importación #{job['id']} reanudada desde la fila {resumed.processed + 1}.", type="positive"
+            )
+        else:
+            ui.notify(f"No se pudo reanudar la importación #{job['id']}.", type="negative")
+        await self.refresh()
+
+    async def _download_failed(self, job: Dict[str, Any]):
+        rows = await self.manager.failed_rows(job["id"])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["fila", "error"])
+        for row in rows:
+            writer.writerow([row["fila"], row.get("mensaje") or ""])
+        ui.download(b"\xef\xbb\xbf" + buffer.getvalue().encode("utf-8"), f"importacion_{job['id']}_errores.csv")
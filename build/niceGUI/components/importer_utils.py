@@ -3,16 +3,19 @@
 import pandas as pd
 import re
 from datetime import date, datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 from api.validate import validator
 
+# Formats parse_date tries, in order
+DATE_FORMATS = ("%d/%m/%Y", "%Y-%m-%d")
+
 
 def parse_date(date_str: str) -> Optional[str]:
     """Safely parses a date string from multiple formats."""
     if not date_str:
         return None
-    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt).date().isoformat()
         except (ValueError, TypeError):
@@ -153,3 +156,166 @@ def transform_and_validate_row(row: pd.Series) -> Optional[Dict[str, Any]]:
 
     except Exception:
         return None
+
+
+# =====================================================================
+# Whole-frame form of transform_and_validate_row
+# =====================================================================
+
+# Gravity Forms columns read by the transformer (address parts in join order)
+_ADDRESS_COLUMNS = (9, 10, 11, 12, 14, 13)
+_CUOTA_COLUMNS = (23, 24, 25)
+_TEXT_COLUMNS = (0, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 20, 21, 23, 24, 25, 26)
+_CUOTA_RE = r"(\d+[\.,]?\d*)\s*€\s*(mes|año)"
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """parse_date for a whole column: one to_datetime pass per explicit format."""
+    parsed = pd.Series(None, index=values.index, dtype=object)
+    pending = values != ""
+    for fmt in DATE_FORMATS:
+        if not pending.any():
+            break
+        dates = pd.to_datetime(values[pending], format=fmt, errors="coerce")
+        ok = dates.notna()
+        parsed[ok[ok].index] = dates[ok].dt.strftime("%Y-%m-%d")
+        pending[ok[ok].index] = False
+    # Leftovers (mostly invalid, some outside pandas' timestamp range such as
+    # year 1600) go through parse_date, once per distinct value
+    leftovers = values[pending]
+    parsed[leftovers.index] = leftovers.map({v: parse_date(v) for v in leftovers.unique()})
+    return parsed
+
+
+def _digits_to_int(values: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """int(v) if v.isdigit() else None; also the rows where int() would have raised."""
+    digits = values.str.isdigit().fillna(False).astype(bool)
+    numbers = pd.to_numeric(values.where(digits), errors="coerce")
+    invalid = digits & numbers.isna()
+    return numbers.where(digits & ~invalid).astype("Int64"), invalid
+
+
+def _short_addresses(addresses: pd.Series) -> pd.Series:
+    """short_address for a whole column, on the exploded comma-separated tokens."""
+    tokens = addresses.str.split(",").explode().str.strip()
+    tokens = tokens[tokens.notna() & (tokens != "")]
+    position = tokens.groupby(level=0).cumcount()
+    first = tokens[position == 0]
+    later = tokens[position > 0].str.replace(" ", "", regex=False)
+    house_number = later[later.str.fullmatch(r"\d+[A-Za-z]?")].groupby(level=0).first()
+
+    result = pd.Series("", index=addresses.index, dtype=object)
+    result[first.index] = first
+    append = first.index[~first.str.contains(r"\d+[A-Za-z]?\s*$") & first.index.isin(house_number.index)]
+    result[append] = first[append] + " " + house_number[append]
+    return result
+
+
+def _objects(values: pd.Series, keep: Optional[pd.Series] = None) -> pd.Series:
+    """Python objects for to_dict: the value where `keep` (default: non-null), else None."""
+    mask = values.notna() if keep is None else keep
+    return values.astype(object).where(mask, None)
+
+
+def transform_and_validate_frame(frame: pd.DataFrame) -> Tuple[List[Dict[str, Any]], pd.DataFrame]:
+    """
+    Whole-frame form of `transform_and_validate_row`: the same records, built
+    with vectorized string operations, `to_datetime` with the explicit
+    formats of `parse_date` and one `validate_columns` batch per table.
+
+    Returns (records, rejected). `rejected` holds the input rows
+    `transform_and_validate_row` would have returned None for, with a
+    `motivo` column saying why.
+    """
+    frame = frame.reset_index(drop=True) if not frame.index.is_unique else frame
+    index = frame.index
+    empty = pd.Series("", index=index, dtype=object)
+    raw = {i: frame[i] if i in frame.columns else empty for i in _TEXT_COLUMNS}
+
+    # transform_and_validate_row calls .strip() on every cell it reads
+    motivo = pd.Series(None, index=index, dtype=object)
+    for i in reversed(_TEXT_COLUMNS):
+        if pd.api.types.infer_dtype(raw[i], skipna=False) == "string":
+            continue
+        not_text = ~raw[i].map(lambda v: isinstance(v, str)).astype(bool)
+        motivo[not_text] = f"Valor vacío o no textual en la columna {i}"
+    text = {i: raw[i].where(motivo.isna(), "").astype(object).str.strip() for i in _TEXT_COLUMNS}
+
+    nombre = text[0].str.strip('<>"')
+    motivo[motivo.isna() & (nombre == "")] = "Falta el nombre"
+
+    full_address = text[_ADDRESS_COLUMNS[0]]
+    for i in _ADDRESS_COLUMNS[1:]:
+        part = text[i]
+        full_address = full_address.where(part == "", (full_address + ", " + part).where(full_address != "", part))
+    final_address = full_address.str.replace(r"\s*,\s*", ", ", regex=True).str.strip(" ,")
+
+    cuota_str = text[_CUOTA_COLUMNS[0]]
+    for i in _CUOTA_COLUMNS[1:]:
+        cuota_str = cuota_str.where(cuota_str != "", text[i])
+    cuota_match = cuota_str.str.extract(_CUOTA_RE)
+    cuota = pd.to_numeric(cuota_match[0].str.replace(",", ".", regex=False), errors="coerce")
+    motivo[motivo.isna() & cuota_match[0].notna() & cuota.isna()] = "Cuota no numérica"
+    iban_raw = text[26].str.replace(" ", "", regex=False)
+
+    cp, bad_cp = _digits_to_int(text[14])
+    n_personas, bad_n_personas = _digits_to_int(text[15])
+    motivo[motivo.isna() & (bad_cp | bad_n_personas)] = "Número no válido en código postal o personas"
+
+    accepted = motivo.isna()
+    rejected = frame[~accepted].assign(motivo=motivo[~accepted])
+    if not accepted.any():
+        return [], rejected
+
+    def take(values: pd.Series) -> List[Any]:
+        return _objects(values[accepted]).tolist()
+
+    n = int(accepted.sum())
+    tables = {
+        "afiliada": ("afiliadas", {
+            "nombre": take(nombre),
+            "apellidos": take((text[2] + " " + text[3]).str.strip()),
+            "genero": take(text[4]),
+            "fecha_nac": take(_parse_dates(text[5])),
+            "cif": take(text[6].str.upper()),
+            "telefono": take(text[7]),
+            "email": take(text[8]),
+            "fecha_alta": [date.today().isoformat()] * n,
+            "regimen": take(text[17]),
+            "estado": ["Alta"] * n,
+            "piso_id": [None] * n,
+        }),
+        "piso": ("pisos", {
+            "direccion": take(final_address),
+            "municipio": take(text[13]),
+            "cp": take(cp),
+            "n_personas": take(n_personas),
+            "inmobiliaria": take(text[18]),
+            "propiedad": take(text[20]),
+            "prop_vertical": take(text[21]),
+            "fecha_firma": take(_parse_dates(text[16])),
+            "bloque_id": [None] * n,
+        }),
+        "bloque": ("bloques", {"direccion": take(_short_addresses(final_address))}),
+        "facturacion": ("facturacion", {
+            "cuota": cuota[accepted].fillna(0.0).astype(float).tolist(),
+            "periodicidad": cuota_match[1].eq("año")[accepted].map({True: 12, False: 1}).tolist(),
+            "forma_pago": iban_raw.ne("")[accepted].map({True: "Domiciliación", False: "Otro"}).tolist(),
+            "iban": take(_objects(iban_raw.str.upper(), iban_raw != "")),
+            "afiliada_id": [None] * n,
+        }),
+    }
+
+    # One column batch per table; errors in the per-row order (afiliada, piso, bloque, facturacion)
+    errors: List[List[str]] = [[] for _ in range(n)]
+    for table, columns in tables.values():
+        for row_errors, table_errors in zip(errors, validator.validate_columns(table, columns, row_count=n)):
+            row_errors.extend(table_errors)
+
+    records = []
+    for i in range(n):
+        record = {key: {field: values[i] for field, values in columns.items()} for key, (_, columns) in tables.items()}
+        record["meta"] = {"bloque": None, "bloque_manual": None, "nif_exists": False, "piso_exists": False}
+        record["validation"] = {"is_valid": not errors[i], "errors": errors[i], "warnings": []}
+        records.append(record)
+    return records, rejected
@@ -0,0 +1,105 @@
+# build/niceGUI/components/loop_profiler_panel.py
+"""
+Admin panel for the event-loop monitor (services/loop_monitor.py): the
+recent stalls with their view and handler, and a button that samples the
+loop for N seconds and downloads the profile report.
+"""
+
+import logging
+from typing import Optional
+
+from nicegui import ui
+
+from services.loop_monitor import LoopLagMonitor, ProfileReport
+
+log = logging.getLogger(__name__)
+
+STALL_COLUMNS = [
+    {"name": "at", "label": "Hora", "field": "at", "align": "left"},
+    {"name": "seconds", "label": "Bloqueo (s)", "field": "seconds", "align": "right"},
+    {"name": "view", "label": "Vista", "field": "view", "align": "left"},
+    {"name": "handler", "label": "Manejador", "field": "handler", "align": "left"},
+    {"name": "location", "label": "Ubicación", "field": "location", "align": "left"},
+]
+
+
+class LoopProfilerPanel:
+    def __init__(self, monitor: LoopLagMonitor):
+        self.monitor = monitor
+        self.report: Optional[ProfileReport] = None
+        self.seconds_input: Optional[ui.number] = None
+        self.profile_button: Optional[ui.button] = None
+        self.download_button: Optional[ui.button] = None
+        self.summary_label: Optional[ui.label] = None
+        self.stalls_table: Optional[ui.table] = None
+
+    def create(self) -> ui.expansion:
+        with ui.expansion("Rendimiento del servidor", icon="speed").classes("w-full") as expansion:
+            ui.label(
+                f"Bloqueos del bucle de eventos de más de {self.monitor.threshold:g} s "
+                "(afectan a todas las sesiones a la vez)."
+            ).classes("text-sm text-gray-600")
+            with ui.row().classes("w-full items-center gap-2"):
+                ui.button("Actualizar", icon="refresh", on_click=self._refresh_stalls).props("flat dense")
+            self.stalls_table = ui.table(columns=STALL_COLUMNS, rows=[], row_key="at").props("dense flat").classes("w-full")
+
+            ui.separator()
+            with ui.row().classes("w-full items-center gap-2"):
+                self.seconds_input = ui.number(
+                    "Segundos", value=10, min=1, max=self.monitor.max_profile_seconds, step=1
+                ).classes("w-28")
+                self.profile_button = ui.button(
+                    "Capturar perfil", icon="timer", on_click=self._profile
+                ).props("color=orange-600")
+                self.download_button = ui.button(
+                    "Descargar informe", icon="download", on_click=self._download
+                ).props("flat dense color=blue-grey-7")
+                self.summary_label = ui.label("").classes("text-xs text-gray-600")
+            self.download_button.set_visibility(False)
+        self._refresh_stalls()
+        return expansion
+
+    def _refresh_stalls(self):
+        if not self.stalls_table:
+            return
+        self.stalls_table.rows = [
+            {
+                "at": stall.at.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+                "seconds": f"{stall.seconds:.3f}",
+                "view": stall.view or "—",
+                "handler": stall.handler or "—",
+                "location": stall.location or "—",
+            }
+            for stall in reversed(self.monitor.stalls)
+        ]
+        self.stalls_table.update()
+
+    async def _profile(self):
+        if self.monitor.profiling:
+            ui.notify("Ya hay una captura de perfil en curso.", type="warning")
+            return
+        seconds = float(self.seconds_input.value or 10)
+        self.profile_button.disable()
+        self.summary_label.set_text(f"Capturando {seconds:g} s...")
+        try:
+            self.report = await self.monitor.profile(seconds)
+        except Exception as e:
+            log.exception("Event loop profiling failed")
+            ui.notify(f"Error al capturar el perfil: {e}", type="negative")
+            self.summary_label.set_text("")
+            return
+        finally:
+            self.profile_button.enable()
+        busy = self.report.samples - self.report.idle_samples
+        self.summary_label.set_text(
+            f"{self.report.samples} muestras en {self.report.seconds:.1f} s, {busy} con el bucle ocupado."
+        )
+        self.download_button.set_visibility(True)
+        self._refresh_stalls()
+
+    def _download(self):
+        if self.report:
+            ui.download(
+                self.report.to_text().encode("utf-8"),
+                f"perfil_bucle_{self.report.created_at:%Y%m%d_%H%M%S}.txt",
+            )
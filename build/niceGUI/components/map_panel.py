@@ -0,0 +1,192 @@
+# build/niceGUI/components/map_panel.py
+"""
+Map of geocoded pisos for the views explorer. The viewport is fetched from
+`rpc_mapa_pisos` on every pan/zoom (grid clusters when zoomed out, single
+pisos when zoomed in), and `rpc_pisos_cercanos` answers "who lives within R
+metres" of a clicked point, a piso or a bloque.
+"""
+
+import logging
+import math
+from typing import Any, Dict, List, Optional
+
+from nicegui import ui
+
+from api.client import APIClient
+
+log = logging.getLogger(__name__)
+
+# Initial view: Madrid centre
+DEFAULT_CENTER = (40.4168, -3.7038)
+DEFAULT_ZOOM = 12
+# Viewport rows / clusters drawn per refresh
+MAP_MAX_ROWS = 500
+RADIUS_OPTIONS = [100, 250, 500, 1000, 2000]
+
+
+def leaflet_bounds(raw: Any) -> Optional[Dict[str, float]]:
+    """Converts the JSON of Leaflet's `map.getBounds()` into west/south/east/north."""
+    try:
+        south_west, north_east = raw["_southWest"], raw["_northEast"]
+        return {
+            "west": float(south_west["lng"]),
+            "south": float(south_west["lat"]),
+            "east": float(north_east["lng"]),
+            "north": float(north_east["lat"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def marker_style(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """circleMarker options: clusters grow with log(n_pisos); pisos with afiliadas stand out."""
+    if hit.get("tipo") == "cluster":
+        radius = 6 + 4 * math.log10(max(hit.get("n_pisos") or 1, 1))
+        return {"radius": round(radius, 1), "color": "#ea580c", "fillOpacity": 0.5, "weight": 1}
+    has_afiliadas = (hit.get("n_afiliadas") or 0) > 0
+    return {
+        "radius": 5,
+        "color": "#c2410c" if has_afiliadas else "#6b7280",
+        "fillOpacity": 0.8,
+        "weight": 1,
+    }
+
+
+def marker_tooltip(hit: Dict[str, Any]) -> str:
+    if hit.get("tipo") == "cluster":
+        return f"{hit.get('n_pisos', 0)} pisos · {hit.get('n_afiliadas', 0)} afiliadas"
+    return f"{hit.get('direccion') or 'Piso #' + str(hit.get('piso_id'))} · {hit.get('n_afiliadas', 0)} afiliadas"
+
+
+class MapPanel:
+    """Collapsible Leaflet map with viewport clusters and a radius search."""
+
+    def __init__(self, api_client: APIClient):
+        self.api = api_client
+        self.map: Optional[ui.leaflet] = None
+        self.expansion: Optional[ui.expansion] = None
+        self.radius_select: Optional[ui.select] = None
+        self.summary_label: Optional[ui.label] = None
+        self.nearby_container: Optional[ui.column] = None
+        self._viewport_layers: List[Any] = []
+        self._nearby_layers: List[Any] = []
+        # Only the latest viewport request may repaint (pans overlap)
+        self._viewport_seq = 0
+
+    def create(self) -> ui.expansion:
+        self.expansion = ui.expansion("Mapa de pisos", icon="map").classes("w-full")
+        with self.expansion:
+            with ui.row().classes("w-full items-center gap-4"):
+                self.radius_select = ui.select(
+                    {r: f"{r} m" for r in RADIUS_OPTIONS}, value=250, label="Radio"
+                ).classes("w-32")
+                ui.label("Haz clic en el mapa o en una fila de piso/bloque para ver quién vive cerca.").classes(
+                    "text-caption text-grey-7"
+                )
+            self.map = ui.leaflet(center=DEFAULT_CENTER, zoom=DEFAULT_ZOOM).classes("w-full h-[480px]")
+            self.map.on("map-moveend", self._on_viewport_change)
+            self.map.on("map-click", self._on_map_click)
+            self.summary_label = ui.label().classes("text-body2")
+            self.nearby_container = ui.column().classes("w-full")
+        self.expansion.on_value_change(self._on_toggle)
+        return self.expansion
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self.expansion and self.expansion.value)
+
+    async def _on_toggle(self, e):
+        if e.value:
+            await self.refresh_viewport()
+
+    async def _on_viewport_change(self, e):
+        await self.refresh_viewport(zoom=e.args.get("zoom"))
+
+    async def _on_map_click(self, e):
+        latlng = e.args.get("latlng") or {}
+        if "lat" in latlng and "lng" in latlng:
+            await self.show_nearby(lat=latlng["lat"], lng=latlng["lng"])
+
+    async def refresh_viewport(self, zoom: Optional[int] = None):
+        """Redraws the clusters / pisos of the visible box."""
+        if not self.map:
+            return
+        self._viewport_seq += 1
+        seq = self._viewport_seq
+        try:
+            await self.map.initialized()
+            bounds = leaflet_bounds(await self.map.run_map_method("getBounds"))
+            if bounds is None:
+                return
+            hits = await self.api.get_map_pisos(bounds, zoom if zoom is not None else self.map.zoom, MAP_MAX_ROWS)
+        except Exception as e:
+            log.warning("Map viewport refresh failed", exc_info=True)
+            ui.notify(f"Error al cargar el mapa: {e}", type="negative")
+            return
+        if seq != self._viewport_seq:
+            return
+        self._replace_layers(self._viewport_layers, hits)
+
+    async def show_nearby(
+        self,
+        *,
+        piso_id: Optional[int] = None,
+        bloque_id: Optional[int] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+    ):
+        """Lists and highlights the pisos within the selected radius of a point, piso or bloque."""
+        radius = int(self.radius_select.value or 250) if self.radius_select else 250
+        rows = await self.api.get_nearby_pisos(
+            piso_id=piso_id, bloque_id=bloque_id, lat=lat, lng=lng, radius_m=radius
+        )
+        self.nearby_container.clear()
+        if not rows:
+            self.summary_label.set_text("Sin pisos geolocalizados en ese radio.")
+            self._replace_layers(self._nearby_layers, [])
+            return
+
+        total_afiliadas = sum(r.get("n_afiliadas") or 0 for r in rows)
+        self.summary_label.set_text(
+            f"{len(rows)} pisos y {total_afiliadas} afiliadas a menos de {radius} m"
+        )
+        if lat is None or lng is None:
+            lat, lng = rows[0]["lat"], rows[0]["lng"]
+        self.map.set_center((lat, lng))
+        self._replace_layers(
+            self._nearby_layers,
+            [{**r, "tipo": "piso"} for r in rows],
+            circle=((lat, lng), radius),
+        )
+        with self.nearby_container:
+            ui.table(
+                columns=[
+                    {"name": "direccion", "label": "Dirección", "field": "direccion", "align": "left"},
+                    {"name": "distancia_m", "label": "Distancia (m)", "field": "distancia_m", "sortable": True},
+                    {"name": "n_afiliadas", "label": "Afiliadas", "field": "n_afiliadas", "sortable": True},
+                ],
+                rows=[
+                    {**r, "distancia_m": round(r.get("distancia_m") or 0)} for r in rows
+                ],
+                row_key="piso_id",
+                pagination=10,
+            ).classes("w-full").props("dense flat")
+
+    def _replace_layers(self, layers: List[Any], hits: List[Dict[str, Any]], circle=None):
+        for layer in layers:
+            self.map.remove_layer(layer)
+        layers.clear()
+        if circle is not None:
+            (lat, lng), radius = circle
+            layers.append(
+                self.map.generic_layer(
+                    name="circle",
+                    args=[[lat, lng], {"radius": radius, "color": "#2563eb", "fillOpacity": 0.08, "weight": 1}],
+                )
+            )
+        for hit in hits:
+            layer = self.map.generic_layer(
+                name="circleMarker", args=[[hit["lat"], hit["lng"]], marker_style(hit)]
+            )
+            layer.run_method("bindTooltip", marker_tooltip(hit))
+            layers.append(layer)
@@ -0,0 +1,64 @@
+# build/niceGUI/components/progress_panel.py
+"""
+Progress bar + one summary line + report download for a long row-by-row
+operation, repainted from a throttled `ProgressTracker` (services/progress.py)
+instead of one log line per row.
+"""
+
+from typing import Any, Dict, Optional
+
+from nicegui import ui
+
+from services.progress import ProgressTracker
+
+
+class ProgressPanel:
+    def __init__(self, report_name: str):
+        self.report_name = report_name
+        self.tracker: Optional[ProgressTracker] = None
+        self.bar: Optional[ui.linear_progress] = None
+        self.label: Optional[ui.label] = None
+        self.download_button: Optional[ui.button] = None
+
+    def create(self) -> ui.column:
+        with ui.column().classes("w-full gap-1") as column:
+            self.bar = ui.linear_progress(value=0, show_value=False).props("instant-feedback").classes("w-full")
+            with ui.row().classes("w-full items-center gap-2"):
+                self.label = ui.label("").classes("text-xs text-gray-600")
+                ui.space()
+                self.download_button = ui.button(
+                    "Informe por fila", icon="download", on_click=self._download
+                ).props("flat dense color=blue-grey-7")
+        self.bar.set_visibility(False)
+        self.download_button.set_visibility(False)
+        return column
+
+    def start(self, total: Optional[int] = None) -> ProgressTracker:
+        """A fresh tracker for one run, painting into this panel."""
+        self.tracker = ProgressTracker(total, on_flush=self._paint)
+        if self.download_button:
+            self.download_button.set_visibility(False)
+        self._paint(self.tracker.snapshot())
+        return self.tracker
+
+    def finish(self):
+        if not self.tracker:
+            return
+        self.tracker.finish()
+        if self.download_button:
+            self.download_button.set_visibility(self.tracker.processed > 0)
+
+    def _paint(self, snapshot: Dict[str, Any]):
+        if self.bar:
+            self.bar.set_visibility(not snapshot["finished"])
+            self.bar.set_value(round(snapshot["fraction"] or 0, 3))
+            if snapshot["fraction"] is None:
+                self.bar.props("indeterminate")
+            else:
+                self.bar.props(remove="indeterminate")
+        if self.label:
+            self.label.set_text(self.tracker.summary())
+
+    def _download(self):
+        if self.tracker and self.tracker.entries:
+            ui.download(self.tracker.to_csv_bytes(), f"{self.report_name}.csv")
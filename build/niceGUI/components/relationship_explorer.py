@@ -1,13 +1,87 @@
-from typing import Dict, List, Set, Optional
+import asyncio
+import time
+from typing import Any, Dict, List, Set, Optional, Tuple
 from nicegui import ui
 from api.client import APIClient
 from config import TABLE_INFO, VIEW_INFO
 
+# Prefijos de los alias usados al embeber relaciones en una sola petición
+PARENT_PREFIX = "parent__"
+CHILD_PREFIX = "child__"
+REF_PREFIX = "ref__"
+EMBED_PREFIXES = (PARENT_PREFIX, CHILD_PREFIX, REF_PREFIX)
+
+# Segundos que un árbol/subárbol ya visitado se reutiliza sin volver a la API
+TREE_CACHE_TTL = 30.0
+
+
+def _parent_alias(fk_field: str) -> str:
+    return f"{PARENT_PREFIX}{fk_field}"
+
+
+def _child_alias(relation: Dict) -> str:
+    return f"{CHILD_PREFIX}{relation['table']}__{relation['foreign_key']}"
+
+
+def _ref_alias(fk_field: str) -> str:
+    return f"{REF_PREFIX}{fk_field}"
+
+
+def _strip_embeds(record: Dict) -> Dict:
+    """Drops the embedded-relation aliases, leaving only the record's own columns."""
+    return {k: v for k, v in record.items() if not k.startswith(EMBED_PREFIXES)}
+
+
+def build_parent_select(relations: Dict) -> List[str]:
+    """PostgREST select items embedding parents (and grandparents) from `relations`."""
+    items = []
+    for fk_field, rel_info in relations.items():
+        parent_table = rel_info.get("view")
+        if not parent_table:
+            continue
+        inner = ["*", *build_parent_select(rel_info.get("relations") or {})]
+        items.append(
+            f"{_parent_alias(fk_field)}:{parent_table}!{fk_field}({','.join(inner)})"
+        )
+    return items
+
+
+def build_child_select(relations: List[Dict]) -> List[str]:
+    """PostgREST select items embedding children (and grandchildren) plus FK display refs."""
+    items = []
+    for relation in relations:
+        child_table = relation["table"]
+        fk = relation["foreign_key"]
+        inner = ["*"]
+        for ref_fk, ref_info in TABLE_INFO.get(child_table, {}).get("relations", {}).items():
+            display_cols = {"id", *ref_info["display_field"].split(",")}
+            inner.append(
+                f"{_ref_alias(ref_fk)}:{ref_info['view']}!{ref_fk}({','.join(sorted(display_cols))})"
+            )
+        inner.extend(build_child_select(relation.get("child_relations") or []))
+        items.append(f"{_child_alias(relation)}:{child_table}!{fk}({','.join(inner)})")
+    return items
+
+
+def build_tree_select(table_info: Dict) -> str:
+    """Full select string for one-round-trip fetching of a record's relationship tree."""
+    return ",".join(
+        [
+            "*",
+            *build_parent_select(table_info.get("relations", {})),
+            *build_child_select(table_info.get("child_relations", [])),
+        ]
+    )
+
 
 class RelationshipExplorer:
     """
     A reusable component to display multi-level parent and child relationships for a given record,
     driven by a nested configuration in TABLE_INFO.
+
+    The whole tree is fetched in one PostgREST request using resource embedding
+    derived from the same config. If the embedding cannot be resolved, each level
+    is fetched concurrently instead, reusing subtrees visited recently.
     """
 
     def __init__(self, api_client: APIClient, container: ui.column):
@@ -19,6 +93,17 @@ class RelationshipExplorer:
         self.api = api_client
         self.container = container
         self.calling_view = "admin"  # Default view context
+        self._cache: Dict[Tuple, Tuple[float, Any]] = {}
+
+    def _cache_get(self, key: Tuple) -> Optional[Any]:
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[0] < TREE_CACHE_TTL:
+            return entry[1]
+        self._cache.pop(key, None)
+        return None
+
+    def _cache_set(self, key: Tuple, value: Any):
+        self._cache[key] = (time.monotonic(), value)
 
     async def show_details(self, record: Dict, source_name: str, calling_view: str):
         """
@@ -49,6 +134,12 @@ class RelationshipExplorer:
             )
             return
 
+        parent_relations = table_info.get("relations", {})
+        child_relations = table_info.get("child_relations", [])
+        tree = await self._fetch_tree(
+            base_table_name, record, record_id, parent_relations, child_relations
+        )
+
         with self.container:
             ui.label(
                 f"Explorador de Relaciones para '{base_table_name}' (ID: {record_id})"
@@ -59,32 +150,168 @@ class RelationshipExplorer:
                 with ui.column().classes("w-full md:flex-1"):
                     ui.label("Genealogía (Padres):").classes("text-lg font-semibold")
                     with ui.card().classes("w-full"):
-                        parent_relations = table_info.get("relations", {})
                         if not parent_relations:
                             ui.label("No hay relaciones padre configuradas.").classes(
                                 "text-gray-500 p-2"
                             )
                         else:
-                            await self._render_parent_level(record, parent_relations, 0)
+                            self._render_parent_level(tree, parent_relations, 0)
 
                 # Display Child (Downstream) Relationships
                 with ui.column().classes("w-full md:flex-1"):
                     ui.label("Dependencias (Hijos):").classes("text-lg font-semibold")
                     with ui.card().classes("w-full"):
-                        child_relations = table_info.get("child_relations", [])
                         if not child_relations:
                             ui.label("No hay relaciones hija configuradas.").classes(
                                 "text-gray-500 p-2"
                             )
                         else:
-                            await self._render_child_level(
-                                record_id, child_relations, 0
-                            )
+                            self._render_child_level(tree, child_relations, 0)
 
-    async def _render_parent_level(
-        self, child_record: Dict, relations: Dict, level: int
+    # =====================================================================
+    #  FETCHING
+    # =====================================================================
+
+    async def _fetch_tree(
+        self,
+        table: str,
+        record: Dict,
+        record_id: Any,
+        parent_relations: Dict,
+        child_relations: List[Dict],
+    ) -> Dict:
+        """Returns `record` enriched with the embedded parent/child aliases."""
+        cache_key = ("tree", table, str(record_id))
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        tree = None
+        if parent_relations or child_relations:
+            tree = await self.api.get_embedded_record(
+                table, record_id, build_tree_select(TABLE_INFO.get(table, {}))
+            )
+        if tree is None:
+            tree = dict(record)
+            try:
+                await asyncio.gather(
+                    self._fetch_parents(tree, parent_relations),
+                    self._fetch_children(tree, record_id, child_relations),
+                )
+            except Exception as e:
+                ui.notify(f"Error al cargar relaciones de '{table}': {e}", type="negative")
+        elif not tree:
+            # Registro no visible por la tabla base: nos quedamos con lo que tenemos
+            tree = dict(record)
+
+        self._cache_set(cache_key, tree)
+        return tree
+
+    async def _get_cached_records(self, table: str, filters: Dict) -> List[Dict]:
+        key = ("records", table, tuple(sorted(filters.items())))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        records = await self.api.get_records(table, filters=dict(filters))
+        self._cache_set(key, records)
+        return records
+
+    async def _fetch_parents(self, child_record: Dict, relations: Dict):
+        """Fallback: fetches every parent of a level concurrently, then recurses."""
+        pending = [
+            (fk_field, rel_info)
+            for fk_field, rel_info in relations.items()
+            if child_record.get(fk_field) and rel_info.get("view")
+        ]
+        results = await asyncio.gather(
+            *(
+                self._get_cached_records(
+                    rel_info["view"], {"id": f"eq.{child_record[fk_field]}"}
+                )
+                for fk_field, rel_info in pending
+            )
+        )
+        nested = []
+        for (fk_field, rel_info), parents in zip(pending, results):
+            if not parents:
+                continue
+            parent_record = dict(parents[0])
+            child_record[_parent_alias(fk_field)] = parent_record
+            if rel_info.get("relations"):
+                nested.append(self._fetch_parents(parent_record, rel_info["relations"]))
+        await asyncio.gather(*nested)
+
+    async def _fetch_children(
+        self, parent_record: Dict, parent_id: Any, relations: List[Dict]
     ):
-        """Recursively fetches and displays parent and grandparent records."""
+        """Fallback: fetches every child table of a level concurrently, then recurses."""
+        results = await asyncio.gather(
+            *(
+                self._get_cached_records(
+                    relation["table"], {relation["foreign_key"]: f"eq.{parent_id}"}
+                )
+                for relation in relations
+            )
+        )
+        nested = []
+        for relation, children in zip(relations, results):
+            child_table_info = TABLE_INFO.get(relation["table"], {})
+            children = [dict(c) for c in children]
+            parent_record[_child_alias(relation)] = children
+            nested.append(self._attach_refs(children, child_table_info))
+            grandchildren = relation.get("child_relations") or []
+            if grandchildren:
+                id_field = child_table_info.get("id_field", "id")
+                nested.extend(
+                    self._fetch_children(child, child.get(id_field), grandchildren)
+                    for child in children
+                    if child.get(id_field)
+                )
+        await asyncio.gather(*nested)
+
+    async def _attach_refs(self, records: List[Dict], table_info: Dict):
+        """Fallback: attaches the display refs that embedding would have returned."""
+        replacement_records = await self._get_replacement_records(records, table_info)
+        for fk_field, by_id in replacement_records.items():
+            for r in records:
+                if r.get(fk_field) in by_id:
+                    r[_ref_alias(fk_field)] = by_id[r[fk_field]]
+
+    async def _get_replacement_records(
+        self, records: List[Dict], table_info: Dict
+    ) -> Dict[str, Dict[Any, Dict]]:
+        """
+        Pre-fetches all related records for foreign keys, one concurrent query per FK.
+        This is much more performant than fetching one record at a time.
+        """
+        relations = table_info.get("relations", {})
+        pending = []
+        for fk_field, rel_info in relations.items():
+            all_ids: Set[int] = {
+                r.get(fk_field) for r in records if r.get(fk_field) is not None
+            }
+            if all_ids:
+                pending.append((fk_field, rel_info, sorted(all_ids)))
+
+        results = await asyncio.gather(
+            *(
+                self._get_cached_records(
+                    rel_info["view"], {"id": f"in.({','.join(map(str, ids))})"}
+                )
+                for _, rel_info, ids in pending
+            )
+        )
+        return {
+            fk_field: {r["id"]: r for r in related}
+            for (fk_field, _, _), related in zip(pending, results)
+        }
+
+    # =====================================================================
+    #  RENDERING
+    # =====================================================================
+
+    def _render_parent_level(self, child_record: Dict, relations: Dict, level: int):
+        """Recursively displays the (already fetched) parent and grandparent records."""
         indent_class = f"pl-{level * 4}"  # Indent deeper for each level
         if not any(child_record.get(fk) for fk in relations):
             ui.label("No se encontraron registros padre.").classes(
@@ -94,96 +321,67 @@ class RelationshipExplorer:
 
         for fk_field, rel_info in relations.items():
             parent_id = child_record.get(fk_field)
-            if not parent_id:
-                continue
-
             parent_table = rel_info.get("view")
-            if not parent_table:
+            parent_record = child_record.get(_parent_alias(fk_field))
+            if not parent_id or not parent_table or not parent_record:
                 continue
 
-            try:
-                parents = await self.api.get_records(
-                    parent_table, filters={"id": f"eq.{parent_id}"}
-                )
-                if not parents:
-                    continue
-
-                parent_record = parents[0]
-                parent_info = TABLE_INFO.get(parent_table, {})
-                hidden_fields = set(parent_info.get("hidden_fields", []))
+            parent_info = TABLE_INFO.get(parent_table, {})
+            hidden_fields = set(parent_info.get("hidden_fields", []))
 
-                with ui.expansion(
-                    f"Padre en '{parent_table}' (ID: {parent_id})", icon="arrow_upward"
-                ).classes(f"w-full {indent_class}"):
-                    # Display the fields of the current parent
-                    self._display_record_fields(parent_record, hidden_fields)
+            with ui.expansion(
+                f"Padre en '{parent_table}' (ID: {parent_id})", icon="arrow_upward"
+            ).classes(f"w-full {indent_class}"):
+                # Display the fields of the current parent
+                self._display_record_fields(_strip_embeds(parent_record), hidden_fields)
 
-                    # --- RECURSIVE CALL for Grandparents ---
-                    if "relations" in rel_info and rel_info["relations"]:
-                        await self._render_parent_level(
-                            parent_record, rel_info["relations"], level + 1
-                        )
-
-            except Exception as e:
-                ui.notify(
-                    f"Error al cargar padre de '{parent_table}': {e}", type="negative"
-                )
+                # --- RECURSIVE CALL for Grandparents ---
+                if rel_info.get("relations"):
+                    self._render_parent_level(
+                        parent_record, rel_info["relations"], level + 1
+                    )
 
-    async def _render_child_level(
-        self, parent_id: int, relations: List[Dict], level: int
+    def _render_child_level(
+        self, parent_record: Dict, relations: List[Dict], level: int
     ):
-        """Recursively fetches and displays child and grandchild records."""
+        """Recursively displays the (already fetched) child and grandchild records."""
         indent_class = f"pl-{level * 4}"  # Indent deeper for each level
 
         for relation in relations:
             child_table = relation["table"]
-            fk = relation["foreign_key"]
             child_table_info = TABLE_INFO.get(child_table, {})
             hidden_fields = set(child_table_info.get("hidden_fields", []))
+            children = parent_record.get(_child_alias(relation)) or []
+
+            with ui.expansion(
+                f"Hijos en '{child_table}' ({len(children)})", icon="arrow_downward"
+            ).classes(f"w-full {indent_class}"):
+                if not children:
+                    ui.label("No se encontraron registros.").classes(
+                        "text-gray-500 p-2"
+                    )
+                    continue
 
-            try:
-                children = await self.api.get_records(
-                    child_table, filters={fk: f"eq.{parent_id}"}
+                # Readable names for foreign keys, taken from the embedded refs
+                replacement_maps = self._get_replacement_maps(
+                    children, child_table_info
                 )
 
-                with ui.expansion(
-                    f"Hijos en '{child_table}' ({len(children)})", icon="arrow_downward"
-                ).classes(f"w-full {indent_class}"):
-                    if not children:
-                        ui.label("No se encontraron registros.").classes(
-                            "text-gray-500 p-2"
-                        )
-                        continue
-
-                    # Pre-fetch data for replacing foreign keys with readable names
-                    replacement_maps = await self._get_replacement_maps(
-                        children, child_table_info
-                    )
-
-                    for child in children:
-                        child_id = child.get(child_table_info.get("id_field", "id"))
-                        card_title = f"{child_table.rstrip('s')} ID: {child_id}"
+                for child in children:
+                    child_id = child.get(child_table_info.get("id_field", "id"))
+                    card_title = f"{child_table.rstrip('s')} ID: {child_id}"
 
-                        with ui.card().classes("w-full my-1"):
-                            ui.label(card_title).classes("text-md font-semibold mb-2")
-                            self._display_record_fields(
-                                child, hidden_fields, replacement_maps
-                            )
-
-                        # --- RECURSIVE CALL for Grandchildren ---
-                        if (
-                            "child_relations" in relation
-                            and relation["child_relations"]
-                            and child_id
-                        ):
-                            await self._render_child_level(
-                                child_id, relation["child_relations"], level + 1
-                            )
+                    with ui.card().classes("w-full my-1"):
+                        ui.label(card_title).classes("text-md font-semibold mb-2")
+                        self._display_record_fields(
+                            _strip_embeds(child), hidden_fields, replacement_maps
+                        )
 
-            except Exception as e:
-                ui.notify(
-                    f"Error al cargar hijos de '{child_table}': {e}", type="negative"
-                )
+                    # --- RECURSIVE CALL for Grandchildren ---
+                    if relation.get("child_relations") and child_id:
+                        self._render_child_level(
+                            child, relation["child_relations"], level + 1
+                        )
 
     def _display_record_fields(
         self,
@@ -206,40 +404,18 @@ class RelationshipExplorer:
                     ui.label(f"{key}:").classes("font-semibold w-32 opacity-70")
                     ui.label(str(display_value))
 
-    async def _get_replacement_maps(
-        self, records: List[Dict], table_info: Dict
-    ) -> Dict:
-        """
-        Pre-fetches all related records for foreign keys to create replacement maps.
-        This is much more performant than fetching one record at a time.
-        """
-        relations = table_info.get("relations", {})
-        if not relations:
-            return {}
-
-        replacement_maps = {}
-        for fk_field, rel_info in relations.items():
-            all_ids: Set[int] = {
-                r.get(fk_field) for r in records if r.get(fk_field) is not None
-            }
-            if not all_ids:
-                continue
-
-            target_view = rel_info["view"]
+    def _get_replacement_maps(self, records: List[Dict], table_info: Dict) -> Dict:
+        """Builds FK -> display value maps from the refs embedded in each record."""
+        replacement_maps: Dict[str, Dict] = {}
+        for fk_field, rel_info in table_info.get("relations", {}).items():
             display_field = rel_info["display_field"]
-            id_list_str = ",".join(map(str, all_ids))
-
-            related_records = await self.api.get_records(
-                target_view, filters={"id": f"in.({id_list_str})"}
-            )
-
-            # Create a mapping from ID to the desired display value
-            id_to_display_map = {
-                r["id"]: " ".join(
-                    str(r.get(df, "")) for df in display_field.split(",")
-                ).strip()
-                for r in related_records
-            }
-            replacement_maps[fk_field] = id_to_display_map
-
+            id_to_display_map = {}
+            for r in records:
+                ref = r.get(_ref_alias(fk_field))
+                if ref and ref.get("id") is not None:
+                    id_to_display_map[ref["id"]] = " ".join(
+                        str(ref.get(df, "")) for df in display_field.split(",")
+                    ).strip()
+            if id_to_display_map:
+                replacement_maps[fk_field] = id_to_display_map
         return replacement_maps
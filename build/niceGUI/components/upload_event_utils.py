@@ -1,9 +1,9 @@
 """Helpers for dealing with NiceGUI upload events across versions."""
 
 import inspect
-from typing import Any
+from typing import Any, AsyncIterator
 
-__all__ = ["read_upload_event_bytes"]
+__all__ = ["read_upload_event_bytes", "iter_upload_event_chunks"]
 
 
 async def read_upload_event_bytes(event: Any) -> bytes:
@@ -34,6 +34,16 @@ async def read_upload_event_bytes(event: Any) -> bytes:
     )
 
 
+async def iter_upload_event_chunks(event: Any, chunk_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """Yield an upload's bytes in chunks when the NiceGUI version supports it (file.iterate)."""
+    iterate = getattr(getattr(event, "file", None), "iterate", None)
+    if callable(iterate):
+        async for chunk in iterate(chunk_size=chunk_size):
+            yield _ensure_bytes(chunk)
+        return
+    yield await read_upload_event_bytes(event)
+
+
 def _ensure_bytes(data: Any) -> bytes:
     """Coerce different payload types into bytes for downstream processing."""
     if data is None:
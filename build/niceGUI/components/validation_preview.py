@@ -17,11 +17,15 @@ class ValidationPreviewPanel:
 
     Expects each result dict shaped like:
         {"row_number": int, "status": "valid" | "error",
-         "preview_label": str, "issues": List[str]}
+         "preview_label": str, "issues": List[str],
+         "conflicts": List[str]}   # optional: duplicate keys (file / database)
     — which is exactly what
     `services.relational_import_service.MultiTableImportService.validate_relational_import`
     returns, but nothing here depends on that specific caller: any importer
     that can produce this shape can reuse this panel.
+
+    For large streamed files the caller may pass only the flagged rows plus
+    `total_count`; the summary and counters then cover the whole file.
     """
 
     def __init__(self):
@@ -30,6 +34,7 @@ class ValidationPreviewPanel:
         self.table: Optional[DataTable] = None
         self.summary_label: Optional[ui.label] = None
         self._results: List[Dict[str, Any]] = []
+        self._total: Optional[int] = None
 
     def create(self) -> ui.column:
         with ui.column().classes("w-full gap-2") as container:
@@ -41,16 +46,20 @@ class ValidationPreviewPanel:
 
         return container
 
-    def set_results(self, results: List[Dict[str, Any]]):
-        """Feeds a new batch of validation results into the panel and refreshes it."""
+    def set_results(self, results: List[Dict[str, Any]], total_count: Optional[int] = None):
+        """
+        Feeds a new batch of validation results into the panel and refreshes it.
+        `total_count` (rows in the file) is only needed when `results` omits valid rows.
+        """
         self._results = results
+        self._total = total_count
 
         display_rows = [
             {
                 "Fila": r["row_number"],
-                "Estado": "✔ Válido" if r["status"] == "valid" else f"✘ {len(r['issues'])} error(es)",
+                "Estado": self._status_text(r),
                 "Resumen": r["preview_label"],
-                "Detalle": "; ".join(r["issues"]) if r["issues"] else "—",
+                "Detalle": "; ".join(self._row_messages(r)) or "—",
             }
             for r in results
         ]
@@ -63,6 +72,21 @@ class ValidationPreviewPanel:
     def clear(self):
         self.set_results([])
 
+    @staticmethod
+    def _row_messages(result: Dict[str, Any]) -> List[str]:
+        return list(result["issues"]) + list(result.get("conflicts") or [])
+
+    @staticmethod
+    def _status_text(result: Dict[str, Any]) -> str:
+        if result["status"] == "valid":
+            return "✔ Válido"
+        parts = []
+        if result["issues"]:
+            parts.append(f"{len(result['issues'])} error(es)")
+        if result.get("conflicts"):
+            parts.append(f"{len(result['conflicts'])} duplicado(s)")
+        return "✘ " + " · ".join(parts or ["error"])
+
     def _refresh_summary(self):
         if not self.summary_label:
             return
@@ -78,8 +102,11 @@ class ValidationPreviewPanel:
             self.summary_label.set_text(f"✔ Las {total} filas pasan la validación previa.")
             self.summary_label.classes(replace="text-sm text-green-700")
         else:
+            duplicates = self.conflict_count
             self.summary_label.set_text(
-                f"⚠ {total - errors} de {total} filas pasan la validación · {errors} con errores."
+                f"⚠ {total - errors} de {total} filas pasan la validación · {errors} con errores"
+                + (f" ({duplicates} por claves duplicadas)." if duplicates else ".")
+                + (" Solo se listan las filas con errores." if self._total is not None else "")
             )
             self.summary_label.classes(replace="text-sm text-orange-700")
 
@@ -87,9 +114,14 @@ class ValidationPreviewPanel:
     def error_count(self) -> int:
         return sum(1 for r in self._results if r["status"] != "valid")
 
+    @property
+    def conflict_count(self) -> int:
+        """Rows with a duplicate unique key, in the file or against the database."""
+        return sum(1 for r in self._results if r.get("conflicts"))
+
     @property
     def total_count(self) -> int:
-        return len(self._results)
+        return self._total if self._total is not None else len(self._results)
 
     def to_csv_bytes(self) -> bytes:
         """Renders the current results as a downloadable CSV validation report."""
@@ -102,7 +134,7 @@ class ValidationPreviewPanel:
                     r["row_number"],
                     "valido" if r["status"] == "valid" else "error",
                     r["preview_label"],
-                    "; ".join(r["issues"]),
+                    "; ".join(self._row_messages(r)),
                 ]
             )
         return b"\xef\xbb\xbf" + buffer.getvalue().encode("utf-8")
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 from dataclasses import dataclass
 import os
+import tempfile
 
 
 @dataclass
@@ -9,13 +10,63 @@ class Config:
     """Application configuration settings."""
 
     API_BASE_URL: str = os.environ.get("POSTGREST_API_URL")
-    APP_HOST: str = "0.0.0.0"
-    APP_PORT: int = 8081
+    APP_HOST: str = os.environ.get("APP_HOST", "0.0.0.0")
+    APP_PORT: int = int(os.environ.get("APP_PORT", "8081"))
     INSTANCE_NAME: str = os.environ.get("INSTANCE_NAME")
     APP_TITLE: str = (
         f"Gestión Sindicato de Inquilinas {os.environ.get('INSTANCE_NAME')}"
     )
     PAGE_SIZE_OPTIONS: list = None
+    # Opt-in materialized views (see VIEW_INFO "materialized"): how often the
+    # app asks Postgres to refresh dirty ones, and the debounce windows passed on.
+    MV_REFRESH_INTERVAL: int = int(os.environ.get("MV_REFRESH_INTERVAL", "60"))
+    MV_QUIET_SECONDS: int = int(os.environ.get("MV_QUIET_SECONDS", "30"))
+    MV_MAX_DELAY_SECONDS: int = int(os.environ.get("MV_MAX_DELAY_SECONDS", "300"))
+    # Shared httpx pool to PostgREST (api/client.py). Every session goes
+    # through it, so max_connections bounds concurrent requests; the rest wait
+    # up to HTTP_POOL_TIMEOUT for a slot (see APIClient.pool_stats()).
+    HTTP_MAX_CONNECTIONS: int = int(os.environ.get("HTTP_MAX_CONNECTIONS", "50"))
+    HTTP_MAX_KEEPALIVE: int = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+    HTTP_KEEPALIVE_EXPIRY: float = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+    HTTP_CONNECT_TIMEOUT: float = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT: float = float(os.environ.get("HTTP_READ_TIMEOUT", "30"))
+    HTTP_WRITE_TIMEOUT: float = float(os.environ.get("HTTP_WRITE_TIMEOUT", "30"))
+    HTTP_POOL_TIMEOUT: float = float(os.environ.get("HTTP_POOL_TIMEOUT", "10"))
+    # Needs the `h2` package (httpx[http2]) and PostgREST behind a TLS proxy;
+    # ignored with a warning when h2 is not installed.
+    HTTP2: bool = os.environ.get("HTTP2", "false").lower() in ("1", "true", "yes")
+    # Background import jobs (services/import_jobs.py): CSV copies live in
+    # IMPORT_JOBS_DIR (a writable volume, so a job can resume after a restart),
+    # at most IMPORT_JOB_CONCURRENCY jobs run at once over their own small pool
+    # of IMPORT_JOB_HTTP_CONNECTIONS, and progress is committed every
+    # IMPORT_JOB_CHUNK_ROWS rows.
+    IMPORT_JOBS_DIR: str = os.environ.get(
+        "IMPORT_JOBS_DIR", os.path.join(tempfile.gettempdir(), "import_jobs")
+    )
+    IMPORT_JOB_CONCURRENCY: int = int(os.environ.get("IMPORT_JOB_CONCURRENCY", "1"))
+    IMPORT_JOB_CHUNK_ROWS: int = int(os.environ.get("IMPORT_JOB_CHUNK_ROWS", "100"))
+    IMPORT_JOB_HTTP_CONNECTIONS: int = int(os.environ.get("IMPORT_JOB_HTTP_CONNECTIONS", "4"))
+    # Public /join form (services/join_queue.py): sign-ups wait in a queue of
+    # at most JOIN_QUEUE_MAX and are saved in batches of JOIN_BATCH_SIZE (or
+    # whatever arrived within JOIN_BATCH_WAIT seconds) over JOIN_HTTP_CONNECTIONS
+    # of their own; each IP may submit JOIN_RATE_LIMIT times per JOIN_RATE_WINDOW seconds.
+    JOIN_QUEUE_MAX: int = int(os.environ.get("JOIN_QUEUE_MAX", "500"))
+    JOIN_BATCH_SIZE: int = int(os.environ.get("JOIN_BATCH_SIZE", "50"))
+    JOIN_BATCH_WAIT: float = float(os.environ.get("JOIN_BATCH_WAIT", "0.5"))
+    JOIN_RATE_LIMIT: int = int(os.environ.get("JOIN_RATE_LIMIT", "5"))
+    JOIN_RATE_WINDOW: float = float(os.environ.get("JOIN_RATE_WINDOW", "60"))
+    JOIN_HTTP_CONNECTIONS: int = int(os.environ.get("JOIN_HTTP_CONNECTIONS", "2"))
+    # /metrics (metrics.py) answers requests carrying METRICS_TOKEN (Bearer or
+    # ?token=) or coming from METRICS_ALLOWED_IPS (addresses / CIDRs, comma-separated)
+    METRICS_TOKEN: str = os.environ.get("METRICS_TOKEN", "")
+    METRICS_ALLOWED_IPS: str = os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1")
+    # Event-loop monitor (services/loop_monitor.py): a heartbeat every LOOP_LAG_INTERVAL
+    # seconds; stalls over LOOP_LAG_THRESHOLD are logged with their view and handler
+    # (0 disables). Admin profiles sample every PROFILER_SAMPLE_INTERVAL s, at most PROFILER_MAX_SECONDS.
+    LOOP_LAG_INTERVAL: float = float(os.environ.get("LOOP_LAG_INTERVAL", "0.1"))
+    LOOP_LAG_THRESHOLD: float = float(os.environ.get("LOOP_LAG_THRESHOLD", "0.25"))
+    PROFILER_SAMPLE_INTERVAL: float = float(os.environ.get("PROFILER_SAMPLE_INTERVAL", "0.005"))
+    PROFILER_MAX_SECONDS: float = float(os.environ.get("PROFILER_MAX_SECONDS", "60"))
 
     def __post_init__(self):
         if self.PAGE_SIZE_OPTIONS is None:
@@ -71,7 +122,7 @@ TABLE_INFO = {
     "bloques": {
         "display_name": "Bloques",
         "id_field": "id",
-        "hidden_fields": ["id"],
+        "hidden_fields": ["id", "direccion_normalizada"],
         "fields": [
             "direccion",
             "empresa_id",
@@ -109,6 +160,7 @@ TABLE_INFO = {
             "n_personas",
             "fecha_firma",
             "provincia_id",
+            "direccion_normalizada",
         ],
         "fields": [
             "direccion",
@@ -370,6 +422,8 @@ VIEW_INFO = {
         "display_name": "Detalle de Afiliadas",
         "base_table": "afiliadas",
         "hidden_fields": ["id", "piso_id", "entramado_id", "empresa_id", "nodo_id"],
+        "page_rpc": "rpc_page_afiliadas",
+        "materialized": False,
     },
     "v_conflictos_detalle": {
         "display_name": "Detalle de Conflictos",
@@ -386,11 +440,14 @@ VIEW_INFO = {
         "display_name": "Resumen de Nodos",
         "base_table": "nodos",
         "hidden_fields": ["id", "nodo_id"],
+        "materialized": False,
     },
     "v_resumen_bloques": {
         "display_name": "Resumen de Bloques",
         "base_table": "bloques",
         "hidden_fields": ["id", "empresa_id", "nodo_id"],
+        "page_rpc": "rpc_page_bloques",
+        "materialized": False,
     },
     "v_resumen_entramados_empresas": {
         "display_name": "Resumen de Entramados",
@@ -406,9 +463,26 @@ VIEW_INFO = {
         "display_name": "Vista consolidada de Pisos-Bloques",
         "base_table": "pisos",
         "hidden_fields": ["id"],
+        "page_rpc": "rpc_page_pisos",
+        "materialized": False,
     },
 }
 
+# Views flagged "materialized" are read from their `<view>_mv` twin, backed by
+# the materialized views in 07-init-materialized_views.sql. "page_rpc" names
+# the keyset-pagination RPC over a view (03-init-createViews.sql), for callers
+# that walk it with APIClient.iter_pages; the views explorer renders the whole
+# result at once and reads it with a single capped request instead.
+MATERIALIZED_VIEW_SUFFIX = "_mv"
+
+
+def view_read_source(view_name: str) -> str:
+    """Relation the UI should read for a VIEW_INFO view."""
+    if VIEW_INFO.get(view_name, {}).get("materialized"):
+        return f"{view_name}{MATERIALIZED_VIEW_SUFFIX}"
+    return view_name
+
+
 VIEW_ORDER = [
     "v_afiliadas_detalle",
     "v_conflictos_detalle",
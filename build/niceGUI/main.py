@@ -4,17 +4,18 @@ import locale
 from datetime import timedelta, datetime, timezone
 from pathlib import Path
 from typing import Optional
-from nicegui import ui, app
+from nicegui import ui, app, background_tasks, Client
 
 from logging_config import setup_logging
-from config import config
+from config import config, view_read_source, HOUSING_UNION_IMPORT_CONFIG
 
 setup_logging()
 
 from fastapi import Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
+import metrics
 from api.client import APIClient
 
 from state.app_state import AppState
@@ -24,6 +25,7 @@ from views.admin import AdminView
 from views.views_explorer import ViewsExplorerView
 from views.conflicts import ConflictsView
 from views.generic_importer import GenericRelationalImporterView
+from components.global_search import GlobalSearch
 
 from auth.login import create_login_page
 from auth.token_utils import create_db_token
@@ -31,6 +33,10 @@ from auth.user_management import UserManagementView
 from auth.user_profile import UserProfileView
 
 from views.public_form import PublicJoinForm
+from services.import_jobs import ImportJobManager
+from services.join_queue import JoinSubmissionQueue
+from services.loop_monitor import LoopLagMonitor
+from services.materialized_views import refresh_materialized_views_loop
 
 
 # Ensure /join is in unrestricted_page_routes to bypass AuthMiddleware
@@ -38,6 +44,8 @@ from views.public_form import PublicJoinForm
 log = logging.getLogger(__name__)
 unrestricted_page_routes = {"/login"}
 unrestricted_page_routes.add("/join")
+# /metrics has its own token / IP check (see metrics_endpoint)
+unrestricted_page_routes.add("/metrics")
 
 # =====================================================================
 # AUTHENTICATION MIDDLEWARE  (restricts routes & adds server-side 3h expiration)
@@ -99,7 +107,7 @@ class Application:
                 "nodos", order="nombre.asc"
             )
             records = await self.api_client.get_records(
-                "v_afiliadas_detalle", limit=20000
+                view_read_source("v_afiliadas_detalle"), limit=20000
             )
             self.state.all_afiliadas_options = {
                 r["id"]: f'{r.get("Nombre Completo", "")} (ID: {r.get("id")})'
@@ -121,8 +129,9 @@ class Application:
             ui.notify("Acceso no autorizado.", type="negative")
             return
         self.current_view = view_name
-        for name, container in self.view_containers.items():
-            container.visible = name == view_name
+        with metrics.VIEW_LOAD_SECONDS.time(view=view_name, phase="show"):
+            for name, container in self.view_containers.items():
+                container.visible = name == view_name
 
     def create_header(self):
         with ui.header().classes("bg-white shadow-lg").props("id=main-header"):
@@ -136,6 +145,7 @@ class Application:
                     "text-xl font-italic text-gray-400"
                 )
                 ui.space()
+                GlobalSearch(self.api_client).create()
 
                 with ui.row().classes("gap-2"):
                     if self.has_role("admin"):
@@ -224,14 +234,16 @@ class Application:
 
     def create_views(self):
         try:
-            self.views["home"] = HomeView(self.show_view)
+            self.views["home"] = HomeView(self.show_view, self.api_client)
             self.views["user_profile"] = UserProfileView(self.api_client)
             if self.has_role("admin", "sistemas"):
-                self.views["admin"] = AdminView(self.api_client)
+                self.views["admin"] = AdminView(self.api_client, loop_monitor=loop_monitor)
                 self.views["user_management"] = UserManagementView(self.api_client)
             if self.has_role("admin", "gestor"):
                 self.views["views"] = ViewsExplorerView(self.api_client)
-                self.views["generic_importer"] = GenericRelationalImporterView(self.api_client)
+                self.views["generic_importer"] = GenericRelationalImporterView(
+                    self.api_client, job_manager=import_job_manager
+                )
             if self.has_role("admin", "gestor", "actas"):
                 self.views["conflicts"] = ConflictsView(self.api_client, self.state)
             with ui.column().classes("w-full min-h-screen bg-gray-50 p-0 gap-0"):
@@ -240,7 +252,7 @@ class Application:
                         "w-full p-0 gap-0"
                     )
                     container.visible = False
-                    with container:
+                    with container, metrics.VIEW_LOAD_SECONDS.time(view=name, phase="create"):
                         view.create()
             self.show_view("home")
         except Exception as e:
@@ -257,11 +269,17 @@ class Application:
 # =====================================================================
 
 api_singleton = APIClient(config.API_BASE_URL)
+# Background CSV imports, on their own small pool (see services/import_jobs.py)
+import_job_manager = ImportJobManager.from_config(HOUSING_UNION_IMPORT_CONFIG)
+# Public /join sign-ups, queued and batch-saved on their own pool (see services/join_queue.py)
+join_queue = JoinSubmissionQueue.from_config()
+# Logs event-loop stalls with their view/handler; admins can profile the loop (see services/loop_monitor.py)
+loop_monitor = LoopLagMonitor.from_config()
 app_state_init = AppState()
 app_instance: Optional[Application] = None
 
 # Initialize the public form
-public_form = PublicJoinForm(api_singleton)
+public_form = PublicJoinForm(api_singleton, join_queue=join_queue)
 public_form.setup_public_routes() 
 
 # =====================================================================
@@ -279,19 +297,55 @@ async def main_page_entry():
     token = create_db_token(user_id, username, user_roles)
     app.storage.user["db_token"] = token  # Store it in the session!
     log.info(f"User session lifetime set to {app.storage.user.lifetime}")
+    # A local reference: another session's page may replace the global while this one awaits
+    application = Application(api_client=api_singleton, state=app_state_init)
     global app_instance
-    app_instance = Application(api_client=api_singleton, state=app_state_init)
-    await app_instance.initialize_global_data()
-    app_instance.create_header()
-    app_instance.create_views()
+    app_instance = application
+    await application.initialize_global_data()
+    application.create_header()
+    application.create_views()
+
+
+# =====================================================================
+# PROMETHEUS METRICS  (see metrics.py)
+# =====================================================================
+
+metrics.ACTIVE_CLIENTS.set_function(lambda: len(Client.instances))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    # Behind nginx the peer is the proxy; it forwards the real address in X-Real-IP
+    client_ip = request.headers.get("x-real-ip") or (request.client.host if request.client else "")
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    supplied = supplied or request.query_params.get("token", "")
+    if not metrics.scrape_allowed(client_ip, supplied, config.METRICS_TOKEN, config.METRICS_ALLOWED_IPS):
+        log.warning(f"Rejected /metrics scrape from {client_ip}")
+        return Response(status_code=403)
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
 # keep your login page exactly as you had it
 create_login_page(api_client=api_singleton)
 
 
+@app.on_startup
+async def startup_handler():
+    import_job_manager.start()
+    join_queue.start()
+    loop_monitor.start()
+    # Always started: it also turns the change triggers off when no view is enabled
+    background_tasks.create(
+        refresh_materialized_views_loop(api_singleton),
+        name="materialized_views_refresh",
+    )
+
+
 @app.on_shutdown
 async def shutdown_handler():
+    await import_job_manager.stop()
+    await join_queue.stop()
+    await loop_monitor.stop()
     if app_instance:
         await app_instance.cleanup()
 
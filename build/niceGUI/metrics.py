@@ -0,0 +1,261 @@
+# build/niceGUI/metrics.py
+"""
+Prometheus-style metrics of the NiceGUI app, served as text at /metrics
+(see main.py; protected by METRICS_TOKEN / METRICS_ALLOWED_IPS).
+
+A minimal in-process registry (counters, gauges, histograms with labels)
+rendered in the Prometheus text exposition format, so scraping needs no
+extra dependency. Instrumented today:
+
+  * PostgREST latency / errors by endpoint and verb, pool waits and requests
+    in flight (fed by api/pool_metrics.py for every APIClient)
+  * active NiceGUI clients, view build / switch times (main.py)
+  * import rows and their duration (MultiTableImportService.import_row)
+  * CartoCiudad lookups, retries and errors (services/geolink_service.py)
+  * cache hits / misses (APIClient.get_conflict_stats)
+  * event-loop lag and stalls by view (services/loop_monitor.py)
+"""
+
+import hmac
+import ipaddress
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers a cached PostgREST read up to a slow geocoder call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; `set_function` reads it at scrape time instead."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                yield f"{self.name} {_format_value(self._function())}"
+            except Exception:
+                pass
+            return
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label set: bucket counts (not cumulative), sum, count
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            counts, totals = self._series.setdefault(key, ([0] * len(self.buckets), [0.0, 0.0]))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observes the seconds spent inside the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(series[1][1]) if series else 0
+
+    def _samples(self):
+        for key, (counts, (total, count)) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = "+Inf" if math.isinf(bound) else _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {int(count)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+# Content type of the text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# =====================================================================
+#  APPLICATION METRICS
+# =====================================================================
+
+POSTGREST_REQUEST_SECONDS = histogram(
+    "postgrest_request_duration_seconds", "PostgREST request latency to response headers.", ("endpoint", "method")
+)
+POSTGREST_REQUEST_ERRORS = counter(
+    "postgrest_request_errors_total", "PostgREST requests that failed (transport error or 5xx).", ("endpoint", "method")
+)
+POSTGREST_POOL_WAIT_SECONDS = histogram(
+    "postgrest_pool_wait_seconds", "Time a PostgREST request waited for a pool connection."
+)
+POSTGREST_IN_FLIGHT = gauge("postgrest_requests_in_flight", "PostgREST requests currently in flight.")
+
+ACTIVE_CLIENTS = gauge("nicegui_active_clients", "Connected NiceGUI clients (browser tabs).")
+VIEW_LOAD_SECONDS = histogram(
+    "nicegui_view_load_seconds", "Time to build (create) or switch to (show) a view.", ("view", "phase")
+)
+
+IMPORT_ROWS = counter("import_rows_total", "CSV rows imported, by outcome.", ("outcome",))
+IMPORT_ROW_SECONDS = histogram("import_row_duration_seconds", "Time to import one CSV row across its tables.")
+
+GEOLINK_LOOKUPS = counter("geolink_lookups_total", "CartoCiudad lookups, by result.", ("result",))
+GEOLINK_RETRIES = counter("geolink_retries_total", "CartoCiudad requests retried after an error.")
+GEOLINK_LOOKUP_SECONDS = histogram("geolink_lookup_duration_seconds", "CartoCiudad lookup time, retries included.")
+
+CACHE_REQUESTS = counter("cache_requests_total", "In-process cache lookups.", ("cache", "result"))
+
+EVENT_LOOP_LAG_SECONDS = histogram(
+    "event_loop_lag_seconds", "How late the loop-lag heartbeat woke up.", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+EVENT_LOOP_STALLS = counter("event_loop_stalls_total", "Loop stalls above LOOP_LAG_THRESHOLD, by view.", ("view",))
+
+
+def scrape_allowed(client_ip: str, supplied_token: str, token: str, allowed_networks: str) -> bool:
+    """
+    /metrics access: the right METRICS_TOKEN (when one is set), or a client
+    address inside METRICS_ALLOWED_IPS (comma-separated addresses or CIDRs).
+    """
+    if token and supplied_token and hmac.compare_digest(supplied_token, token):
+        return True
+    try:
+        address = ipaddress.ip_address(client_ip)
+    except ValueError:
+        return False
+    for network in filter(None, (n.strip() for n in allowed_networks.split(","))):
+        try:
+            if address in ipaddress.ip_network(network, strict=False):
+                return True
+        except ValueError:
+            continue
+    return False
@@ -1,8 +1,30 @@
 from .relational_import_service import MultiTableImportService
+from .import_jobs import ImportJobManager, JobOwner
+from .join_queue import JoinSubmission, JoinSubmissionQueue, RateLimiter
+from .progress import ProgressTracker
+from .loop_monitor import LoopLagMonitor, ProfileReport
 from .geolink_service import lookup_cadastral_data, to_ewkt_point
+from .materialized_views import (
+    enabled_materialized_views,
+    materialized_views_enabled,
+    refresh_materialized_views,
+    refresh_materialized_views_loop,
+)
 
 __all__ = [
     "MultiTableImportService",
+    "ImportJobManager",
+    "JobOwner",
+    "JoinSubmission",
+    "JoinSubmissionQueue",
+    "RateLimiter",
+    "ProgressTracker",
+    "LoopLagMonitor",
+    "ProfileReport",
     "lookup_cadastral_data",
     "to_ewkt_point",
+    "enabled_materialized_views",
+    "materialized_views_enabled",
+    "refresh_materialized_views",
+    "refresh_materialized_views_loop",
 ]
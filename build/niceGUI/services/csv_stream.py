@@ -0,0 +1,150 @@
+# build/niceGUI/services/csv_stream.py
+"""
+Incremental CSV ingestion for the relational importer.
+
+An upload is copied chunk by chunk into a spooled temporary file (memory up
+to SPOOL_MAX_MEMORY, disk beyond that) while an incremental decoder decides
+the encoding. Rows are then read back through a buffered text wrapper and
+`csv.DictReader` as a generator, so a large historical export never exists
+as one bytes object, one decoded string or one list of dicts.
+"""
+
+import codecs
+import csv
+import io
+import os
+import shutil
+import tempfile
+from itertools import islice
+from typing import Any, AsyncIterable, Dict, Iterable, Iterator, List, Optional
+
+# Bytes per read while spooling and decoding
+STREAM_CHUNK_BYTES = 1024 * 1024
+# Above this size the spooled upload moves from memory to a temp file
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+# Rows handed to validation / import per batch
+IMPORT_CHUNK_ROWS = 1000
+# Spreadsheet exports that are not UTF-8 are almost always Windows-1252
+FALLBACK_ENCODING = "cp1252"
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def sniff_bom(head: bytes) -> Optional[str]:
+    """Encoding announced by a byte-order mark at the start of the file, if any."""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+class _EncodingSniffer:
+    """Fed every chunk of the upload: UTF-8 unless a BOM says otherwise or a chunk fails to decode."""
+
+    def __init__(self):
+        self.encoding: Optional[str] = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._utf8 = True
+
+    def feed(self, chunk: bytes, final: bool = False):
+        if self.encoding is None:
+            self.encoding = sniff_bom(chunk) or ""
+        if self.encoding or not self._utf8:
+            return
+        try:
+            # Split multibyte sequences stay buffered until the next chunk
+            self._decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            self._utf8 = False
+
+    def result(self) -> str:
+        self.feed(b"", final=True)
+        return self.encoding or ("utf-8" if self._utf8 else FALLBACK_ENCODING)
+
+
+class CsvUpload:
+    """
+    A spooled CSV upload that can be read as rows any number of times.
+
+    `progress` is the fraction of bytes consumed by the current pass;
+    `row_count` is known once a pass has reached the end of the file.
+    """
+
+    def __init__(self, spool: Any, size: int, encoding: str, name: str = ""):
+        self._spool = spool
+        self.size = size
+        self.encoding = encoding
+        self.name = name
+        self.row_count: Optional[int] = None
+
+    @classmethod
+    async def from_chunks(cls, chunks: AsyncIterable[bytes], name: str = "") -> "CsvUpload":
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+        sniffer = _EncodingSniffer()
+        size = 0
+        try:
+            async for chunk in chunks:
+                sniffer.feed(chunk)
+                spool.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            spool.close()
+            raise
+        return cls(spool, size, sniffer.result(), name)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, name: str = "") -> "CsvUpload":
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, mode="w+b")
+        spool.write(data)
+        sniffer = _EncodingSniffer()
+        sniffer.feed(data)
+        return cls(spool, len(data), sniffer.result(), name)
+
+    @classmethod
+    def open(cls, path: str, encoding: str, name: str = "") -> "CsvUpload":
+        """Reopens a CSV saved with `save_to` (e.g. by a background import job)."""
+        return cls(open(path, "rb"), os.path.getsize(path), encoding, name)
+
+    def save_to(self, path: str):
+        """Copies the raw bytes to `path`, one buffer at a time."""
+        self._spool.seek(0)
+        with open(path, "wb") as target:
+            shutil.copyfileobj(self._spool, target, STREAM_CHUNK_BYTES)
+
+    @property
+    def progress(self) -> float:
+        if not self.size or self._spool.closed:
+            return 1.0
+        return min(1.0, self._spool.tell() / self.size)
+
+    def iter_rows(self) -> Iterator[Dict[str, Any]]:
+        """Yields the rows as dicts (csv.DictReader), decoding one buffer at a time."""
+        self._spool.seek(0)
+        text = io.TextIOWrapper(self._spool, encoding=self.encoding, newline="")
+        count = 0
+        try:
+            for row in csv.DictReader(text):
+                count += 1
+                yield row
+            self.row_count = count
+        finally:
+            # Leave the spool open for the next pass (unless the upload was closed under us)
+            if not self._spool.closed:
+                text.detach()
+
+    def iter_row_chunks(self, size: int = IMPORT_CHUNK_ROWS) -> Iterator[List[Dict[str, Any]]]:
+        return iter_chunks(self.iter_rows(), size)
+
+    def close(self):
+        self._spool.close()
+
+
+def iter_chunks(rows: Iterable[Dict[str, Any]], size: int = IMPORT_CHUNK_ROWS) -> Iterator[List[Dict[str, Any]]]:
+    """Groups any row iterable into lists of at most `size` rows."""
+    iterator = iter(rows)
+    while chunk := list(islice(iterator, max(1, size))):
+        yield chunk
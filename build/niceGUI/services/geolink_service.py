@@ -31,10 +31,13 @@ copies in sync by hand.
 
 import asyncio
 import logging
+import time
 from typing import Optional, Tuple
 
 import httpx
 
+from metrics import GEOLINK_LOOKUP_SECONDS, GEOLINK_LOOKUPS, GEOLINK_RETRIES
+
 log = logging.getLogger(__name__)
 
 API_URL = "https://www.cartociudad.es/geocoder/api/geocoder/candidates"
@@ -66,8 +69,26 @@ async def lookup_cadastral_data(
     already-stored `pisos` row.
     """
     if not address or len(address.strip()) < 5:
+        GEOLINK_LOOKUPS.inc(result="skipped")
+        return None, None, None
+
+    started = time.perf_counter()
+    result = "error"
+    try:
+        found = await _lookup(address, municipality)
+        if found is not None:
+            result = "match" if any(v is not None for v in found) else "no_match"
+            return found
         return None, None, None
+    finally:
+        GEOLINK_LOOKUPS.inc(result=result)
+        GEOLINK_LOOKUP_SECONDS.observe(time.perf_counter() - started)
+
 
+async def _lookup(
+    address: str, municipality: Optional[str]
+) -> Optional[Tuple[Optional[str], Optional[float], Optional[float]]]:
+    """The CartoCiudad request with its retries; None once they are exhausted."""
     params = {"q": address.strip(), "limit": 1}
     if municipality:
         params["municipio_filter"] = str(municipality).strip()
@@ -102,9 +123,10 @@ async def lookup_cadastral_data(
                         ex,
                     )
                 else:
+                    GEOLINK_RETRIES.inc()
                     await asyncio.sleep(RETRY_BACKOFF_BASE * attempt)
 
-    return None, None, None
+    return None
 
 
 def to_ewkt_point(lat: float, lng: float) -> str:
@@ -0,0 +1,400 @@
+# build/niceGUI/services/import_jobs.py
+"""
+Background CSV import jobs.
+
+The importer tab no longer drives `process_relational_import` from the
+user's websocket handler: it copies the spooled upload into IMPORT_JOBS_DIR,
+records an `import_jobs` row and queues the job here. IMPORT_JOB_CONCURRENCY
+worker tasks (started from main.py) import the rows over their own small
+PostgREST pool, so a big file neither depends on the browser tab staying
+open nor takes connections from interactive sessions.
+
+Every IMPORT_JOB_CHUNK_ROWS rows, `rpc_import_job_commit` stores the per-row
+results and advances the job's watermark in one transaction. A job that was
+interrupted (app restart, error) keeps its watermark and can be resumed by
+its owner; rows after it are imported again from the saved CSV. The worker
+acts as the user who queued the job, with a token minted per chunk so the
+3-hour session expiry never cuts a long import short.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional
+
+from api.client import APIClient
+from services.csv_stream import CsvUpload, iter_chunks
+from services.relational_import_service import MultiTableImportService, ParentIndex
+
+log = logging.getLogger(__name__)
+
+JOBS_TABLE = "import_jobs"
+JOB_ROWS_TABLE = "import_job_filas"
+COMMIT_RPC = "rpc_import_job_commit"
+ACTIVE_STATES = ("en_cola", "en_curso")
+# Read back from the database with the job list
+JOB_COLUMNS = (
+    "id,archivo,estado,total_filas,filas_procesadas,filas_ok,filas_error,"
+    "cancelacion_solicitada,mensaje,created_at,started_at,finished_at,ruta_archivo,codificacion"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class JobOwner:
+    """Who queued a job; the worker mints that user's token to act for them."""
+
+    user_id: int
+    username: str
+    roles: tuple
+
+    def token(self) -> str:
+        # Imported here: the auth package pulls in the UI components
+        from auth.token_utils import create_db_token
+
+        return create_db_token(self.user_id, self.username, list(self.roles))
+
+
+@dataclasses.dataclass
+class ImportJob:
+    """In-memory state of a job queued or running in this process."""
+
+    id: int
+    path: str
+    encoding: str
+    owner: JobOwner
+    archivo: str = ""
+    total: Optional[int] = None
+    processed: int = 0  # committed watermark (rows)
+    current: int = 0  # last row imported, committed or not
+    ok: int = 0
+    errors: int = 0
+    estado: str = "en_cola"
+    mensaje: Optional[str] = None
+    cancel_requested: bool = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Same keys as an `import_jobs` row, with live progress."""
+        return {
+            "id": self.id,
+            "archivo": self.archivo,
+            "estado": self.estado,
+            "total_filas": self.total,
+            "filas_procesadas": max(self.processed, self.current),
+            "filas_ok": self.ok,
+            "filas_error": self.errors,
+            "cancelacion_solicitada": self.cancel_requested,
+            "mensaje": self.mensaje,
+            "en_este_proceso": True,
+        }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ImportJobManager:
+    """Queue, bounded worker pool and registry of background import jobs."""
+
+    def __init__(
+        self,
+        api_client: APIClient,
+        schema_config: Dict[str, Any],
+        *,
+        jobs_dir: str,
+        concurrency: int = 1,
+        chunk_rows: int = 100,
+        owner_token: Callable[[JobOwner], str] = JobOwner.token,
+    ):
+        self.api = api_client
+        self.service = MultiTableImportService(api_client, schema_config)
+        self.jobs_dir = jobs_dir
+        self.concurrency = max(1, concurrency)
+        self.chunk_rows = max(1, chunk_rows)
+        self._owner_token = owner_token
+        self.jobs: Dict[int, ImportJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    @classmethod
+    def from_config(cls, schema_config: Dict[str, Any], settings: Any = None) -> "ImportJobManager":
+        """Builds the manager with its own PostgREST pool sized by IMPORT_JOB_HTTP_CONNECTIONS."""
+        if settings is None:
+            from config import config as settings
+        connections = max(1, settings.IMPORT_JOB_HTTP_CONNECTIONS)
+        pool_settings = dataclasses.replace(
+            settings,
+            HTTP_MAX_CONNECTIONS=connections,
+            HTTP_MAX_KEEPALIVE=min(connections, settings.HTTP_MAX_KEEPALIVE),
+        )
+        return cls(
+            APIClient(settings.API_BASE_URL, settings=pool_settings),
+            schema_config,
+            jobs_dir=settings.IMPORT_JOBS_DIR,
+            concurrency=settings.IMPORT_JOB_CONCURRENCY,
+            chunk_rows=settings.IMPORT_JOB_CHUNK_ROWS,
+        )
+
+    # -----------------------------------------------------------------
+    # Lifecycle (main.py startup / shutdown)
+    # -----------------------------------------------------------------
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"import_job_worker_{n}")
+            for n in range(self.concurrency)
+        ]
+        log.info(f"Import job workers started ({self.concurrency}).")
+
+    async def stop(self):
+        """Stops the workers; running jobs keep their watermark and can be resumed."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.api.close()
+
+    # -----------------------------------------------------------------
+    # Operations used by the importer tab
+    # -----------------------------------------------------------------
+    async def submit(self, upload: CsvUpload, owner: JobOwner) -> Optional[ImportJob]:
+        """Saves the upload, records the job and queues it. None if the job row could not be created."""
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        name = f"{uuid.uuid4().hex}.csv"
+        path = os.path.join(self.jobs_dir, name)
+        await asyncio.to_thread(upload.save_to, path)
+
+        with self.api.bearer_token(self._owner_token(owner)):
+            record, error = await self.api.create_record(
+                JOBS_TABLE,
+                {
+                    "archivo": upload.name or None,
+                    "ruta_archivo": name,  # only the name: the path is rebuilt under jobs_dir
+                    "codificacion": upload.encoding,
+                    "total_filas": upload.row_count,
+                },
+                validate=False,
+            )
+        if not record or "id" not in record:
+            log.error(f"Could not create import job row: {error}")
+            os.remove(path)
+            return None
+
+        job = ImportJob(
+            id=record["id"],
+            path=path,
+            encoding=upload.encoding,
+            owner=owner,
+            archivo=upload.name,
+            total=upload.row_count,
+        )
+        self._enqueue(job)
+        return job
+
+    async def resume(self, row: Dict[str, Any], owner: JobOwner) -> Optional[ImportJob]:
+        """Queues an interrupted job again from its committed watermark."""
+        live = self.jobs.get(row["id"])
+        if live and live.estado in ACTIVE_STATES:
+            return live
+        path = self._job_path(row.get("ruta_archivo"))
+        if path is None or not os.path.exists(path):
+            await self._update(owner, row["id"], {
+                "estado": "error", "mensaje": "El CSV del trabajo ya no está disponible.",
+            })
+            return None
+
+        job = ImportJob(
+            id=row["id"],
+            path=path,
+            encoding=row.get("codificacion") or "utf-8",
+            owner=owner,
+            archivo=row.get("archivo") or "",
+            total=row.get("total_filas"),
+            processed=row.get("filas_procesadas") or 0,
+            ok=row.get("filas_ok") or 0,
+            errors=row.get("filas_error") or 0,
+        )
+        job.current = job.processed
+        await self._update(owner, job.id, {
+            "estado": "en_cola", "cancelacion_solicitada": False, "mensaje": None, "finished_at": None,
+        })
+        self._enqueue(job)
+        return job
+
+    def _job_path(self, name: Optional[str]) -> Optional[str]:
+        """
+        Path of a job's CSV from its `ruta_archivo`, or None unless it is a
+        file directly inside jobs_dir. The row is writable by its owner, so
+        its value is never used as a path as-is.
+        """
+        if not name:
+            return None
+        jobs_dir = os.path.realpath(self.jobs_dir)
+        path = os.path.realpath(os.path.join(jobs_dir, os.path.basename(name)))
+        if os.path.dirname(path) != jobs_dir:
+            return None
+        return path
+
+    async def cancel(self, job_id: int, owner: JobOwner) -> bool:
+        """Asks a job to stop after the row in progress; a job not running here is closed at once."""
+        live = self.jobs.get(job_id)
+        if live and live.estado in ACTIVE_STATES:
+            live.cancel_requested = True
+            return await self._update(owner, job_id, {"cancelacion_solicitada": True})
+        return await self._update(owner, job_id, {
+            "estado": "cancelado", "cancelacion_solicitada": True, "finished_at": _now(),
+        })
+
+    def status(self, job_id: int) -> Optional[Dict[str, Any]]:
+        job = self.jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    async def list_jobs(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        The session user's latest jobs (RLS: own jobs, all for admin), with
+        live progress for the ones running here. Active jobs that no worker
+        here knows about were interrupted and are flagged `interrumpido`.
+        """
+        rows = await self.api.get_records(
+            JOBS_TABLE, filters={"select": JOB_COLUMNS}, order="id.desc", limit=limit
+        )
+        jobs = []
+        for row in rows or []:
+            live = self.status(row["id"])
+            merged = {**row, **live} if live else {**row, "en_este_proceso": False}
+            merged["interrumpido"] = merged["estado"] in ACTIVE_STATES and not live
+            jobs.append(merged)
+        return jobs
+
+    async def failed_rows(self, job_id: int) -> List[Dict[str, Any]]:
+        return await self.api.get_records(
+            JOB_ROWS_TABLE,
+            filters={"job_id": f"eq.{job_id}", "estado": "eq.error", "select": "fila,mensaje"},
+            order="fila.asc",
+        )
+
+    # -----------------------------------------------------------------
+    # Worker
+    # -----------------------------------------------------------------
+    def _enqueue(self, job: ImportJob):
+        if self._queue is None:
+            raise RuntimeError("ImportJobManager.start() has not been called")
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                if job.cancel_requested:
+                    await self._finish(job, "cancelado")
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Runs outside any page context: log instead of notifying
+                log.exception(f"Import job {job_id} crashed")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ImportJob):
+        job.estado = "en_curso"
+        await self._update(job.owner, job.id, {
+            "estado": "en_curso", "started_at": _now(), "mensaje": None,
+        })
+        try:
+            upload = CsvUpload.open(job.path, job.encoding, job.archivo)
+        except OSError as e:
+            await self._finish(job, "error", f"No se pudo abrir el CSV: {e}")
+            return
+
+        try:
+            rows = islice(enumerate(upload.iter_rows(), start=1), job.processed, None)
+            # Shared bloques / pisos of the whole job, each built once
+            parents = ParentIndex()
+            for chunk in iter_chunks(rows, self.chunk_rows):
+                results = []
+                # One fresh token per chunk: valid well past the session expiry
+                with self.api.bearer_token(self._owner_token(job.owner)):
+                    await self.service.resolve_parents(
+                        [raw_row for _, raw_row in chunk], parents, notify=False
+                    )
+                    for fila, raw_row in chunk:
+                        if job.cancel_requested:
+                            break
+                        outcome = await self.service.import_row(raw_row, parents, notify=False)
+                        error = f"[{outcome.table}] {outcome.error}" if outcome.error else None
+                        results.append({
+                            "fila": fila,
+                            "estado": "error" if error else "ok",
+                            "mensaje": error,
+                            "ids": outcome.ids or None,
+                        })
+                        job.current = fila
+                    if results:
+                        await self._commit(job, results)
+                if job.cancel_requested:
+                    await self._finish(job, "cancelado")
+                    return
+
+            if upload.row_count is not None:
+                job.total = upload.row_count
+            await self._finish(job, "completado")
+        except asyncio.CancelledError:
+            # App shutting down: the watermark stays, the owner can resume
+            job.estado = "en_curso"
+            raise
+        except Exception as e:
+            log.exception(f"Import job {job.id} failed")
+            await self._finish(job, "error", str(e))
+        finally:
+            upload.close()
+
+    async def _commit(self, job: ImportJob, results: List[Dict[str, Any]]):
+        state = await self.api.call_rpc(
+            COMMIT_RPC,
+            {"p_job_id": job.id, "p_hasta_fila": results[-1]["fila"], "p_filas": results},
+            timeout=60.0,
+            notify=False,
+        )
+        row = state[0] if isinstance(state, list) and state else None
+        if row is None:
+            raise RuntimeError(f"No se pudo confirmar el trozo hasta la fila {results[-1]['fila']}")
+        job.processed = row["filas_procesadas"]
+        job.ok = row["filas_ok"]
+        job.errors = row["filas_error"]
+        job.cancel_requested = job.cancel_requested or bool(row.get("cancelacion_solicitada"))
+
+    async def _finish(self, job: ImportJob, estado: str, mensaje: Optional[str] = None):
+        job.estado = estado
+        job.mensaje = mensaje
+        await self._update(job.owner, job.id, {
+            "estado": estado,
+            "mensaje": mensaje,
+            "total_filas": job.total,
+            "finished_at": _now(),
+        })
+        if estado in ("completado", "cancelado"):
+            # An errored job keeps its CSV so it can be resumed
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+        log.info(f"Import job {job.id} {estado}: {job.ok} ok, {job.errors} con error")
+
+    async def _update(self, owner: JobOwner, job_id: int, data: Dict[str, Any]) -> bool:
+        with self.api.bearer_token(self._owner_token(owner)):
+            updated = await self.api.update_record(
+                JOBS_TABLE, job_id, {**data, "updated_at": _now()},
+                validate=False, show_validation_errors=False, notify_errors=False,
+            )
+        return updated is not None
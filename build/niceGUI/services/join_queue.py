@@ -0,0 +1,253 @@
+# build/niceGUI/services/join_queue.py
+"""
+Burst-tolerant intake for the public /join form.
+
+The form used to look the CIF up and insert the sign-up inline, on the same
+PostgREST pool as the staff UI. Now it only runs `rpc_join_lookup` (one
+indexed query), hands the sign-up to a bounded queue and thanks the person
+straight away. A single worker drains the queue in batches: new sign-ups go
+to PostgREST as one bulk INSERT, pending ones ('Bienvenida') are updated.
+Everything runs over a small pool of JOIN_HTTP_CONNECTIONS and as web_anon,
+so a campaign link going viral cannot starve the internal tools; a full
+queue and the per-IP RateLimiter turn the excess away instead.
+"""
+
+import asyncio
+import dataclasses
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from api.client import APIClient
+
+log = logging.getLogger(__name__)
+
+TABLE = "afiliadas"
+LOOKUP_RPC = "rpc_join_lookup"
+
+
+@dataclasses.dataclass
+class JoinSubmission:
+    """A sanitized sign-up; `afiliada_id` is the pending row it updates, if any."""
+
+    data: Dict[str, Any]
+    afiliada_id: Optional[int] = None
+
+    @property
+    def cif(self) -> str:
+        return self.data.get("cif") or ""
+
+
+class RateLimiter:
+    """Sliding window of at most `limit` hits per key every `window` seconds."""
+
+    def __init__(self, limit: int, window: float, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._hits: Dict[str, Deque[float]] = {}
+        self._next_prune = 0.0
+
+    def allow(self, key: str) -> bool:
+        now = self._clock()
+        if now >= self._next_prune:
+            self._prune(now)
+        hits = self._hits.setdefault(key, deque())
+        while hits and now - hits[0] >= self.window:
+            hits.popleft()
+        if len(hits) >= self.limit:
+            return False
+        hits.append(now)
+        return True
+
+    def _prune(self, now: float):
+        """Forgets keys with no hit inside the window, so the dict stays small."""
+        self._hits = {k: h for k, h in self._hits.items() if h and now - h[-1] < self.window}
+        self._next_prune = now + self.window
+
+
+class JoinSubmissionQueue:
+    def __init__(
+        self,
+        api: APIClient,
+        maxsize: int = 500,
+        batch_size: int = 50,
+        batch_wait: float = 0.5,
+        rate_limit: int = 5,
+        rate_window: float = 60.0,
+    ):
+        self.api = api
+        self.maxsize = max(1, maxsize)
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.limiter = RateLimiter(rate_limit, rate_window)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, settings: Any = None) -> "JoinSubmissionQueue":
+        """Builds the queue with its own PostgREST pool sized by JOIN_HTTP_CONNECTIONS."""
+        if settings is None:
+            from config import config as settings
+        connections = max(1, settings.JOIN_HTTP_CONNECTIONS)
+        pool_settings = dataclasses.replace(
+            settings,
+            HTTP_MAX_CONNECTIONS=connections,
+            HTTP_MAX_KEEPALIVE=min(connections, settings.HTTP_MAX_KEEPALIVE),
+        )
+        return cls(
+            APIClient(settings.API_BASE_URL, settings=pool_settings),
+            maxsize=settings.JOIN_QUEUE_MAX,
+            batch_size=settings.JOIN_BATCH_SIZE,
+            batch_wait=settings.JOIN_BATCH_WAIT,
+            rate_limit=settings.JOIN_RATE_LIMIT,
+            rate_window=settings.JOIN_RATE_WINDOW,
+        )
+
+    # -----------------------------------------------------------------
+    # Lifecycle (main.py startup / shutdown)
+    # -----------------------------------------------------------------
+    def start(self):
+        if self._worker_task:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker_task = asyncio.create_task(self._worker(), name="join_queue_worker")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Gives the worker `drain_timeout` seconds to save what is queued, then stops it."""
+        if not self._worker_task:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Join queue stopped with {self._queue.qsize()} sign-ups unsaved")
+        self._worker_task.cancel()
+        await asyncio.gather(self._worker_task, return_exceptions=True)
+        self._worker_task = None
+        await self.api.close()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    # -----------------------------------------------------------------
+    # Called from the /join page
+    # -----------------------------------------------------------------
+    def allow(self, client_ip: str) -> bool:
+        return self.limiter.allow(client_ip or "?")
+
+    async def lookup(
+        self, cif: str, email: str = "", nombre: str = "", apellidos: str = "", notify: bool = True
+    ) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        ('nueva' | 'pendiente' | 'afiliada', id of the pending row) from
+        rpc_join_lookup, or None if the RPC is unavailable. The worker passes
+        notify=False: it has no page to show an error on.
+        """
+        rows = await self.api.call_rpc(
+            LOOKUP_RPC,
+            {"p_cif": cif, "p_email": email or None, "p_nombre": nombre or None, "p_apellidos": apellidos or None},
+            notify=notify,
+        )
+        if not rows:
+            return None
+        return rows[0]["estado_registro"], rows[0]["afiliada_id"]
+
+    def submit(self, submission: JoinSubmission) -> bool:
+        """Queues the sign-up; False when the queue is full (or not started)."""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait(submission)
+        except asyncio.QueueFull:
+            log.warning(f"Join queue full ({self.maxsize}); sign-up rejected")
+            return False
+        return True
+
+    # -----------------------------------------------------------------
+    # Worker
+    # -----------------------------------------------------------------
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.flush(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Runs outside any page context: log instead of notifying
+                log.exception(f"Join queue lost a batch of {len(batch)} sign-ups")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def flush(self, batch: List[JoinSubmission]):
+        """Saves a batch: one bulk INSERT for new sign-ups, an UPDATE per pending one."""
+        # The same person submitting twice in a burst: the last one wins
+        latest: Dict[str, JoinSubmission] = {}
+        for submission in batch:
+            latest.pop(submission.cif, None)
+            latest[submission.cif] = submission
+        new = [s for s in latest.values() if s.afiliada_id is None]
+        for submission in latest.values():
+            if submission.afiliada_id is not None:
+                await self._save_one(self._update, submission)
+        if not new:
+            return
+
+        created, error = await self.api.create_record(
+            TABLE, [s.data for s in new], validate=False, show_validation_errors=False,
+            return_representation=False,
+        )
+        if created:
+            log.info(f"Join queue saved {len(new)} new sign-ups")
+            return
+        if len(new) > 1:
+            log.info(f"Bulk insert of {len(new)} sign-ups failed ({error}); saving them one by one")
+        for submission in new:
+            await self._save_one(self._insert_one, submission)
+
+    async def _save_one(self, save: Callable[[JoinSubmission], Awaitable[None]], submission: JoinSubmission):
+        """Runs one row's save; a failure is logged and never drops the rest of the batch."""
+        try:
+            await save(submission)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Runs outside any page context: log instead of notifying
+            log.exception(f"Join sign-up could not be saved (CIF {submission.cif[-3:]:*>9})")
+
+    async def _insert_one(self, submission: JoinSubmission):
+        created, error = await self.api.create_record(
+            TABLE, submission.data, validate=False, show_validation_errors=False,
+            return_representation=False,
+        )
+        if created:
+            return
+        if error and "Duplicado" in error:
+            # Signed up meanwhile (another tab, the import...): update it if still pending
+            found = await self.lookup(submission.cif, notify=False)
+            if found and found[0] == "pendiente":
+                await self._update(dataclasses.replace(submission, afiliada_id=found[1]))
+                return
+            log.info(f"Join sign-up for an existing member ignored (CIF {submission.cif[-3:]:*>9})")
+            return
+        log.error(f"Join sign-up could not be saved: {error}")
+
+    async def _update(self, submission: JoinSubmission):
+        updated = await self.api.update_record(
+            TABLE, submission.afiliada_id, submission.data, validate=False, show_validation_errors=False,
+            notify_errors=False,
+        )
+        if not updated:
+            log.error(f"Join sign-up could not update pending afiliada {submission.afiliada_id}")
@@ -0,0 +1,323 @@
+# build/niceGUI/services/loop_monitor.py
+"""
+Event-loop lag monitor and on-demand sampling profiler.
+
+Every NiceGUI session shares one asyncio loop, so a slow synchronous handler
+(`DataTable.refresh`, `FilterPanel.refresh`, a big `apply_filters_and_sort`)
+freezes every user at once. `LoopLagMonitor` makes those stalls visible:
+
+  * a heartbeat coroutine sleeps LOOP_LAG_INTERVAL seconds and measures how
+    late it wakes up (the loop lag, exported as event_loop_lag_seconds);
+  * a watchdog thread notices when the heartbeat is overdue by more than
+    LOOP_LAG_THRESHOLD and snapshots the loop thread's stack right then, so
+    the warning names the view and handler that were running, not whatever
+    happened to run next.
+
+`LoopLagMonitor.profile(seconds)` samples the loop thread's stack every
+PROFILER_SAMPLE_INTERVAL seconds from a worker thread and returns a
+`ProfileReport` (top functions plus folded stacks, ready for flamegraph.pl
+or speedscope). The admin panel (components/loop_profiler_panel.py) offers
+it as a download.
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# build/niceGUI: frames from these files are "ours" when naming a handler
+APP_ROOT = Path(__file__).resolve().parents[1]
+
+# Innermost frames meaning the loop is idle, waiting for I/O
+_IDLE_FUNCTIONS = {"select", "poll"}
+
+Frame = Tuple[str, str, int]  # (short path, qualified function, line)
+
+
+@functools.lru_cache(maxsize=4096)
+def _app_relative(filename: str, root: Path) -> Optional[str]:
+    """Path relative to `root`, or None for files outside it (cached: the profiler asks per frame)."""
+    try:
+        return Path(filename).resolve().relative_to(root).as_posix()
+    except (ValueError, OSError):
+        return None
+
+
+def _short_path(filename: str, root: Path = APP_ROOT) -> str:
+    relative = _app_relative(filename, root)
+    if relative is not None:
+        return relative
+    parts = Path(filename).parts
+    if "site-packages" in parts:
+        return "/".join(parts[parts.index("site-packages") + 1:])
+    return "/".join(parts[-2:])
+
+
+def _walk(frame) -> List[Any]:
+    """The frames of a stack, outermost first."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _frame_info(frame, root: Path = APP_ROOT) -> Frame:
+    code = frame.f_code
+    return _short_path(code.co_filename, root), getattr(code, "co_qualname", code.co_name), frame.f_lineno
+
+
+def _is_app_frame(frame, root: Path) -> bool:
+    return _app_relative(frame.f_code.co_filename, root) is not None
+
+
+def _format_frame(info: Frame) -> str:
+    return f"{info[0]}:{info[2]} in {info[1]}"
+
+
+@dataclass
+class Stall:
+    """One stretch of time the loop was blocked, with what was running."""
+
+    at: datetime
+    seconds: float
+    view: Optional[str] = None
+    handler: Optional[str] = None
+    location: Optional[str] = None
+    stack: List[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return (
+            f"Event loop blocked for {self.seconds:.3f} s"
+            f" (view: {self.view or '?'}, handler: {self.handler or '?'}, at: {self.location or '?'})"
+        )
+
+
+def describe_stack(frame, root: Path = APP_ROOT) -> Dict[str, Any]:
+    """
+    View, handler and location of a (possibly foreign-thread) stack: the
+    handler is the outermost frame from the app's own code, the view the
+    outermost `...View` class on the way, the location the innermost frame.
+    """
+    frames = _walk(frame)
+    app_frames = [f for f in frames if _is_app_frame(f, root)]
+    handler = _frame_info(app_frames[0], root) if app_frames else None
+    view = None
+    for f in app_frames:
+        owner = _frame_info(f, root)[1].split(".")[0]
+        if owner.endswith("View"):
+            view = owner
+            break
+    return {
+        "view": view,
+        "handler": f"{handler[0]}:{handler[1]}" if handler else None,
+        "location": _format_frame(_frame_info(frames[-1], root)) if frames else None,
+        "stack": [_format_frame(_frame_info(f, root)) for f in app_frames],
+    }
+
+
+class ProfileReport:
+    """Aggregated samples of one profiling run."""
+
+    def __init__(self, stacks: Dict[Tuple[Frame, ...], int], seconds: float, interval: float):
+        self.stacks = stacks
+        self.seconds = seconds
+        self.interval = interval
+        self.created_at = datetime.now()
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    @property
+    def idle_samples(self) -> int:
+        return sum(n for stack, n in self.stacks.items() if stack and stack[-1][1].split(".")[-1] in _IDLE_FUNCTIONS)
+
+    def top(self, limit: int = 25) -> List[Dict[str, Any]]:
+        """Functions by inclusive samples ('total') with their own ('self') share."""
+        total: collections.Counter = collections.Counter()
+        own: collections.Counter = collections.Counter()
+        for stack, n in self.stacks.items():
+            if not stack:
+                continue
+            own[stack[-1][:2]] += n
+            for key in {frame[:2] for frame in stack}:
+                total[key] += n
+        samples = self.samples or 1
+        return [
+            {
+                "function": f"{path}:{name}",
+                "total": count,
+                "self": own[(path, name)],
+                "total_pct": round(100 * count / samples, 1),
+                "self_pct": round(100 * own[(path, name)] / samples, 1),
+            }
+            for (path, name), count in total.most_common(limit)
+        ]
+
+    def folded(self) -> List[str]:
+        """One `frame;frame;frame count` line per distinct stack (flamegraph.pl / speedscope)."""
+        folded: collections.Counter = collections.Counter()
+        for stack, n in self.stacks.items():
+            folded[";".join(f"{path}:{name}" for path, name, _ in stack)] += n
+        return [f"{stack} {n}" for stack, n in folded.most_common()]
+
+    def to_text(self) -> str:
+        busy = self.samples - self.idle_samples
+        lines = [
+            f"Perfil del bucle de eventos - {self.created_at:%Y-%m-%d %H:%M:%S}",
+            f"Duración: {self.seconds:.1f} s, una muestra cada {self.interval * 1000:.1f} ms",
+            f"Muestras: {self.samples} ({busy} ocupado, {self.idle_samples} en espera de E/S)",
+            "",
+            "Funciones por muestras (total incluye las llamadas que hacen, propio no):",
+            f"{'total':>7} {'%':>6} {'propio':>7} {'%':>6}  función",
+        ]
+        for row in self.top():
+            lines.append(
+                f"{row['total']:>7} {row['total_pct']:>6} {row['self']:>7} {row['self_pct']:>6}  {row['function']}"
+            )
+        lines += ["", "# Pilas plegadas (flamegraph.pl / speedscope):", *self.folded()]
+        return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval; run it from another thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[Tuple[Frame, ...], int] = collections.Counter()
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is not None:
+            self.stacks[tuple(_frame_info(f) for f in _walk(frame))] += 1
+
+    def run(self, seconds: float) -> ProfileReport:
+        started = time.perf_counter()
+        deadline = started + seconds
+        while (now := time.perf_counter()) < deadline:
+            self.sample()
+            time.sleep(max(0.0, min(self.interval, deadline - now)))
+        return ProfileReport(dict(self.stacks), time.perf_counter() - started, self.interval)
+
+
+class LoopLagMonitor:
+    def __init__(
+        self,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        history: int = 50,
+        sample_interval: float = 0.005,
+        max_profile_seconds: float = 60.0,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.max_profile_seconds = max_profile_seconds
+        self.stalls: Deque[Stall] = collections.deque(maxlen=history)
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick = time.monotonic()
+        self._captured: Optional[Dict[str, Any]] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._profiling = False
+
+    @classmethod
+    def from_config(cls, settings: Any = None) -> "LoopLagMonitor":
+        if settings is None:
+            from config import config as settings
+        return cls(
+            interval=settings.LOOP_LAG_INTERVAL,
+            threshold=settings.LOOP_LAG_THRESHOLD,
+            sample_interval=settings.PROFILER_SAMPLE_INTERVAL,
+            max_profile_seconds=settings.PROFILER_MAX_SECONDS,
+        )
+
+    # -----------------------------------------------------------------
+    # Lag sampling
+    # -----------------------------------------------------------------
+
+    def start(self):
+        """Starts the heartbeat (on the running loop) and its watchdog thread."""
+        if self._heartbeat_task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stopping.clear()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="loop_lag_heartbeat")
+        if self.threshold > 0:
+            self._watchdog = threading.Thread(target=self._watch, name="loop_lag_watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        if not self._heartbeat_task:
+            return
+        self._stopping.set()
+        self._heartbeat_task.cancel()
+        await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+        self._heartbeat_task = None
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            captured, self._captured = self._captured, None
+            self._last_tick = now
+            lag = max(0.0, now - expected)
+            metrics.EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if self.threshold > 0 and lag >= self.threshold:
+                self._record_stall(lag, captured)
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval / 2):
+            overdue = time.monotonic() - self._last_tick - self.interval
+            if self._captured is None and overdue > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._captured = describe_stack(frame)
+
+    def _record_stall(self, lag: float, captured: Optional[Dict[str, Any]]):
+        stall = Stall(at=datetime.now(), seconds=lag, **(captured or {}))
+        self.stalls.append(stall)
+        metrics.EVENT_LOOP_STALLS.inc(view=stall.view or "unknown")
+        details = "\n  ".join(stall.stack)
+        log.warning(stall.describe() + (f"\n  {details}" if details else ""))
+
+    # -----------------------------------------------------------------
+    # On-demand profiling
+    # -----------------------------------------------------------------
+
+    @property
+    def profiling(self) -> bool:
+        return self._profiling
+
+    async def profile(self, seconds: float) -> ProfileReport:
+        """Samples the loop thread for `seconds` (capped at PROFILER_MAX_SECONDS), one run at a time."""
+        if self._profiling:
+            raise RuntimeError("Ya hay una captura de perfil en curso")
+        seconds = max(0.1, min(float(seconds), self.max_profile_seconds))
+        profiler = SamplingProfiler(threading.get_ident(), self.sample_interval)
+        self._profiling = True
+        try:
+            log.info(f"Profiling the event loop for {seconds:.1f} s")
+            return await asyncio.to_thread(profiler.run, seconds)
+        finally:
+            self._profiling = False
@@ -0,0 +1,84 @@
+# build/niceGUI/services/materialized_views.py
+"""
+Background driver for the opt-in materialized views.
+
+Postgres keeps a debounced, append-only change log
+(07-init-materialized_views.sql); this loop just asks it, every
+MV_REFRESH_INTERVAL seconds, to refresh the views that have gone quiet.
+Each round also tells it which views VIEW_INFO has enabled, so the change
+triggers exist only on the tables those views read. With nothing dirty the
+RPC is a no-op.
+
+The RPC is only executable by the `mv_maintainer` role, so rounds run with
+a short-lived service token for it instead of a user's session.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+
+from auth.token_utils import create_service_token
+from config import VIEW_INFO, config
+
+log = logging.getLogger(__name__)
+
+REFRESH_RPC = "rpc_refresh_materialized_views"
+REFRESH_TIMEOUT = 120.0
+MAINTENANCE_ROLE = "mv_maintainer"
+
+
+def materialized_views_enabled() -> bool:
+    """True if any VIEW_INFO view is configured to read from its materialized twin."""
+    return any(info.get("materialized") for info in VIEW_INFO.values())
+
+
+def enabled_materialized_views() -> List[str]:
+    """Names of the materialized views backing the enabled VIEW_INFO views."""
+    return sorted(
+        "mv_" + view.removeprefix("v_")
+        for view, info in VIEW_INFO.items()
+        if info.get("materialized")
+    )
+
+
+async def refresh_materialized_views(api_client) -> list:
+    """Runs one debounced refresh round; returns the views refreshed and their timings."""
+    with api_client.bearer_token(create_service_token(MAINTENANCE_ROLE)):
+        refreshed = await api_client.call_rpc(
+            REFRESH_RPC,
+            {
+                "p_enabled": enabled_materialized_views(),
+                "p_quiet_seconds": config.MV_QUIET_SECONDS,
+                "p_max_delay_seconds": config.MV_MAX_DELAY_SECONDS,
+            },
+            timeout=REFRESH_TIMEOUT,
+        )
+    for row in refreshed or []:
+        log.info(
+            f"Materialized view '{row.get('mv_name')}' refreshed in {row.get('duration_ms')} ms"
+        )
+    return refreshed or []
+
+
+async def refresh_materialized_views_loop(
+    api_client, interval: Optional[int] = None
+):
+    """
+    Periodic refresh task, started from main.py. With no view enabled it
+    runs a single round, so the database drops the change triggers, and stops.
+    """
+    interval = interval or config.MV_REFRESH_INTERVAL
+    log.info(f"Materialized view refresh loop started (every {interval}s).")
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_materialized_views(api_client)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Runs outside any page context: log instead of notifying
+            log.warning("Materialized view refresh round failed", exc_info=True)
+            continue
+        if not materialized_views_enabled():
+            log.info("No materialized views enabled; refresh loop stopped.")
+            return
@@ -0,0 +1,125 @@
+# build/niceGUI/services/progress.py
+"""
+Throttled progress of long row-by-row operations (CSV import, bulk piso ->
+bloque linking, geolink enrichment).
+
+Pushing one `ui.log` line or notification per row costs a websocket message
+each, which dominated small-row imports. A `ProgressTracker` only counts:
+every row is recorded in memory (for the downloadable report) and the
+`on_flush` callback receives an aggregated snapshot (counters, rate, ETA)
+at most every `interval` seconds, plus once more at `finish()`.
+"""
+
+import csv
+import io
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+# Seconds between two repaints of the progress widgets
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+OK = "ok"
+ERROR = "error"
+SKIPPED = "omitido"
+STATUS_LABELS = {OK: "Correcto", ERROR: "Error", SKIPPED: "Omitido"}
+
+
+class ProgressEntry(NamedTuple):
+    """One processed item of the report."""
+
+    number: int
+    item: str
+    status: str
+    message: str
+
+
+class ProgressTracker:
+    def __init__(
+        self,
+        total: Optional[int] = None,
+        on_flush: Optional[Callable[[Dict[str, Any]], None]] = None,
+        interval: float = PROGRESS_FLUSH_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.total = total
+        self.on_flush = on_flush
+        self.interval = interval
+        self._clock = clock
+        self.started = clock()
+        self.finished: Optional[float] = None
+        self.counts: Dict[str, int] = {OK: 0, ERROR: 0, SKIPPED: 0}
+        self.entries: List[ProgressEntry] = []
+        self._last_flush = self.started
+
+    @property
+    def processed(self) -> int:
+        return len(self.entries)
+
+    def record(self, status: str, item: Any = "", message: str = ""):
+        """Counts one processed item and flushes if `interval` has passed since the last flush."""
+        self.counts[status] = self.counts.get(status, 0) + 1
+        self.entries.append(ProgressEntry(self.processed + 1, str(item), status, message))
+        if self._clock() - self._last_flush >= self.interval:
+            self.flush()
+
+    def finish(self):
+        self.finished = self._clock()
+        self.flush()
+
+    def flush(self):
+        self._last_flush = self._clock()
+        if self.on_flush:
+            self.on_flush(self.snapshot())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters, elapsed seconds, rows per second, ETA in seconds and fraction done (None when unknown)."""
+        elapsed = (self.finished or self._clock()) - self.started
+        rate = self.processed / elapsed if elapsed > 0 else None
+        eta = None
+        if rate and self.total is not None and self.finished is None:
+            eta = max(0.0, (self.total - self.processed) / rate)
+        fraction = min(1.0, self.processed / self.total) if self.total else None
+        return {
+            **self.counts,
+            "processed": self.processed,
+            "total": self.total,
+            "elapsed": elapsed,
+            "rate": rate,
+            "eta": eta,
+            "fraction": 1.0 if self.finished is not None else fraction,
+            "finished": self.finished is not None,
+        }
+
+    def summary(self) -> str:
+        s = self.snapshot()
+        of_total = f"/{s['total']}" if s["total"] is not None else ""
+        parts = [f"{s['processed']}{of_total} procesadas", f"{s[OK]} correctas", f"{s[ERROR]} con error"]
+        if s[SKIPPED]:
+            parts.append(f"{s[SKIPPED]} omitidas")
+        if s["rate"]:
+            parts.append(f"{s['rate']:.1f}/s")
+        if s["eta"] is not None:
+            parts.append(f"quedan {format_duration(s['eta'])}")
+        elif s["finished"]:
+            parts.append(f"en {format_duration(s['elapsed'])}")
+        return " · ".join(parts)
+
+    def to_csv_bytes(self) -> bytes:
+        """The per-item report (UTF-8 with BOM, for spreadsheets)."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["n", "elemento", "estado", "mensaje"])
+        for entry in self.entries:
+            writer.writerow([entry.number, entry.item, STATUS_LABELS.get(entry.status, entry.status), entry.message])
+        return b"\xef\xbb\xbf" + buffer.getvalue().encode("utf-8")
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
@@ -1,13 +1,47 @@
 # build/niceGUI/services/relational_import_service.py
-import csv
-import io
 import logging
-from typing import Any, AsyncGenerator, Dict, List, Set, Tuple
+import time
+from typing import Any, AsyncGenerator, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
-from api.client import APIClient
+from api.client import APIClient, DRY_RUN_CHUNK_SIZE, IMPORT_PARENT_KEY_ARGS, IMPORT_UNIQUE_KEY_ARGS
+from metrics import IMPORT_ROW_SECONDS, IMPORT_ROWS
+from services.csv_stream import IMPORT_CHUNK_ROWS, CsvUpload, iter_chunks
+from services.progress import ERROR, OK, ProgressTracker
 
 log = logging.getLogger(__name__)
 
+# How each unique key is named in the preview: (in-file duplicate, existing row)
+UNIQUE_KEY_LABELS = {
+    "afiliadas.cif": ("el CIF", "una afiliada con el CIF"),
+    "afiliadas.num_afiliada": ("el número de afiliada", "una afiliada con el número"),
+}
+
+
+class RowImportOutcome(NamedTuple):
+    """Result of `MultiTableImportService.import_row`: ids created, and the failing table / error if any."""
+
+    ids: Dict[str, int]
+    table: Optional[str] = None
+    error: Optional[str] = None
+    exception: bool = False
+
+
+class ParentIndex:
+    """
+    Shared parent rows (IMPORT_PARENT_KEY_ARGS: bloques, pisos) of one
+    import run, by match key: filled by `resolve_parents` with the existing
+    ones, then by `import_row` with the ones it creates, so each distinct
+    parent is built once and its id reaches every row that names it.
+    """
+
+    def __init__(self):
+        self.keys: Dict[str, Dict[str, str]] = {}  # tabla -> CSV value -> match key
+        self.ids: Dict[str, Dict[str, int]] = {}  # tabla -> match key -> id
+        self.errors: Dict[str, Dict[str, str]] = {}  # tabla -> match key -> creation error
+
+    def key(self, table: str, value: str) -> str:
+        return self.keys.get(table, {}).get(value, value)
+
 
 class MultiTableImportService:
     """
@@ -22,15 +56,18 @@ class MultiTableImportService:
         self.table_mappings: Dict[str, Dict[str, str]] = schema_config.get("mappings", {})
 
     async def parse_csv_bytes(self, csv_bytes: bytes) -> List[Dict[str, Any]]:
-        """Safely decodes and extracts structured raw records."""
+        """
+        Safely decodes and extracts structured raw records. Small in-memory
+        payloads only; uploads go through `CsvUpload` and its row generator.
+        """
+        upload = CsvUpload.from_bytes(csv_bytes)
         try:
-            content = csv_bytes.decode("utf-8-sig")
-            file_like = io.StringIO(content)
-            reader = csv.DictReader(file_like)
-            return list(reader)
+            return list(upload.iter_rows())
         except Exception as e:
             log.error(f"Failed to parse CSV byte stream: {e}")
             raise RuntimeError(f"CSV data parsing failure: {str(e)}")
+        finally:
+            upload.close()
 
     # =====================================================================
     # Shared payload construction.
@@ -90,6 +127,60 @@ class MultiTableImportService:
         values = [v.strip() for v in raw_row.values() if v and v.strip()]
         return " / ".join(values[:3]) if values else "(fila vacía)"
 
+    # =====================================================================
+    # Shared parents — planning pre-pass over a chunk of rows.
+    #
+    # Many rows of a real export name the same bloque or piso. Creating the
+    # parent once per row made every sibling after the first fail with a
+    # 23505 on `direccion` and lose its whole lineage.
+    # =====================================================================
+    def _parent_values(self, raw_row: Dict[str, Any]) -> Dict[str, str]:
+        """{tabla: key value} for the parent tables (IMPORT_PARENT_KEY_ARGS) this row fills in."""
+        values: Dict[str, str] = {}
+        for table_name, (column, _) in IMPORT_PARENT_KEY_ARGS.items():
+            if table_name not in self.execution_order:
+                continue
+            payload, _, has_user_data = self._build_table_payload(table_name, raw_row)
+            if has_user_data and payload.get(column):
+                values[table_name] = payload[column]
+        return values
+
+    async def resolve_parents(
+        self, raw_records: List[Dict[str, Any]], parents: ParentIndex, notify: bool = True
+    ) -> None:
+        """
+        Resolves the parent values of a chunk that `parents` has not seen yet
+        with one `rpc_resolve_import_parents` call: their match key (bloques
+        by normalize_address_for_match, pisos by exact direccion) and the id
+        of the existing row, if any. Without the RPC each value is its own
+        key and nothing is reused from the database. notify=False for
+        callers outside a page (the background import worker).
+        """
+        pending: Dict[str, Set[str]] = {}
+        for raw_row in raw_records:
+            for table_name, value in self._parent_values(raw_row).items():
+                if value not in parents.keys.get(table_name, {}):
+                    pending.setdefault(table_name, set()).add(value)
+        if not pending:
+            return
+
+        resolved = await self.api.resolve_import_parents(
+            {table_name: list(values) for table_name, values in pending.items()},
+            notify=notify,
+        )
+        if resolved is None:
+            log.info("rpc_resolve_import_parents unavailable; sharing parents by exact value only.")
+            resolved = {}
+
+        for table_name, values in pending.items():
+            keys = parents.keys.setdefault(table_name, {})
+            ids = parents.ids.setdefault(table_name, {})
+            for value in values:
+                key, existing_id = resolved.get(table_name, {}).get(value, (value, None))
+                keys[value] = key
+                if existing_id is not None:
+                    ids.setdefault(key, existing_id)
+
     # =====================================================================
     # Dry-run validation — never calls create_record, never touches the DB.
     # =====================================================================
@@ -99,22 +190,61 @@ class MultiTableImportService:
         """
         Replays the exact same field-mapping/cleaning logic used by
         `process_relational_import`, but instead of inserting rows, checks
-        each table's resulting payload against `TableValidator` (through
-        `api.validate_record_data`, which performs no network I/O at all)
-        and against the caller-supplied set of mandatory CSV headers.
-
-        Known limitation: this cannot detect DB-side uniqueness conflicts
-        (e.g. a CIF that already exists) since that requires a live query
-        against current table state, not just the config-driven rules
-        `TableValidator` knows about. Those are still only caught when the
-        real import actually runs.
+        each table's resulting payloads against `TableValidator` (one
+        column batch per table through `api.validate_column_data`, which
+        performs no network I/O at all) and against the caller-supplied set
+        of mandatory CSV headers.
+
+        Unique keys (CIF, nº de afiliada) are checked too:
+        repeats inside the file, and values that already exist in the
+        database, the latter with a single `rpc_check_import_conflicts` call.
+        Those land in each result's "conflicts" list, apart from "issues".
         """
         results: List[Dict[str, Any]] = []
+        async for chunk_results in self.validate_relational_import_chunks([raw_records], mandatory_headers):
+            results.extend(chunk_results)
+        return results
 
-        for idx, raw_row in enumerate(raw_records, start=1):
-            issues: List[str] = []
-
-            for table_name in self.execution_order:
+    async def validate_relational_import_chunks(
+        self, row_chunks: Iterable[List[Dict[str, Any]]], mandatory_headers: Set[str]
+    ) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        """
+        Streaming form of `validate_relational_import`: validates one chunk
+        of rows at a time (e.g. `CsvUpload.iter_row_chunks()`) and yields its
+        results, numbered across the whole file. Only the unique-key values
+        seen so far are kept between chunks, so in-file duplicates are still
+        found; the database check is one RPC per chunk.
+        """
+        first_seen: Dict[str, Dict[str, int]] = {}
+        start = 0
+        for chunk in row_chunks:
+            yield await self._validate_chunk(chunk, start, mandatory_headers, first_seen)
+            start += len(chunk)
+
+    async def _validate_chunk(
+        self,
+        raw_records: List[Dict[str, Any]],
+        start: int,
+        mandatory_headers: Set[str],
+        first_seen: Dict[str, Dict[str, int]],
+    ) -> List[Dict[str, Any]]:
+        issues: List[List[str]] = [[] for _ in raw_records]
+        # "tabla.campo" -> [(row index, value as the database would store it)]
+        unique_candidates: Dict[str, List[Tuple[int, str]]] = {}
+
+        # One column batch per table: TableValidator runs each rule down the
+        # whole column instead of re-walking the rules row by row.
+        for table_name in self.execution_order:
+            mapping = self.table_mappings.get(table_name, {})
+            mandatory = [
+                (db_column, csv_header)
+                for db_column, csv_header in mapping.items()
+                if csv_header in mandatory_headers
+            ]
+            rows: List[int] = []
+            columns: Dict[str, List[Any]] = {}
+
+            for i, raw_row in enumerate(raw_records):
                 payload, has_user_mappings, has_user_data = self._build_table_payload(
                     table_name, raw_row
                 )
@@ -122,97 +252,312 @@ class MultiTableImportService:
                 if has_user_mappings and not has_user_data:
                     continue  # mirrors the "skip empty optional sub-block" rule below
 
-                mapping = self.table_mappings.get(table_name, {})
-                for db_column, csv_header in mapping.items():
-                    if csv_header in mandatory_headers and not payload.get(db_column):
-                        issues.append(f"Falta el campo obligatorio: {csv_header}")
-
-                _, table_errors = await self.api.validate_record_data(
-                    table_name, payload, "create"
-                )
-                issues.extend(table_errors)
-
-            results.append(
-                {
-                    "row_number": idx,
-                    "status": "error" if issues else "valid",
-                    "preview_label": self._preview_label(raw_row),
-                    "issues": issues,
-                }
+                for db_column, csv_header in mandatory:
+                    if not payload.get(db_column):
+                        issues[i].append(f"Falta el campo obligatorio: {csv_header}")
+
+                rows.append(i)
+                for db_column, value in payload.items():
+                    columns.setdefault(db_column, []).append(value)
+                    key = f"{table_name}.{db_column}"
+                    if value is not None and key in IMPORT_UNIQUE_KEY_ARGS:
+                        # fn_normalize_afiliada_data stores CIFs upper-cased
+                        normalized = str(value).upper() if db_column == "cif" else str(value)
+                        unique_candidates.setdefault(key, []).append((i, normalized))
+
+            if not rows:
+                continue
+            table_errors = await self.api.validate_column_data(
+                table_name, columns, "create", row_count=len(rows)
+            )
+            for i, row_errors in zip(rows, table_errors):
+                issues[i].extend(row_errors)
+
+        conflicts = await self._find_unique_conflicts(
+            unique_candidates, len(raw_records), start, first_seen
+        )
+
+        return [
+            {
+                "row_number": idx,
+                "status": "error" if (row_issues or row_conflicts) else "valid",
+                "preview_label": self._preview_label(raw_row),
+                "issues": row_issues,
+                "conflicts": row_conflicts,
+            }
+            for idx, (raw_row, row_issues, row_conflicts) in enumerate(
+                zip(raw_records, issues, conflicts), start=start + 1
             )
+        ]
+
+    async def _find_unique_conflicts(
+        self,
+        candidates: Dict[str, List[Tuple[int, str]]],
+        row_count: int,
+        start: int = 0,
+        first_seen: Optional[Dict[str, Dict[str, int]]] = None,
+    ) -> List[List[str]]:
+        """
+        Per-row unique-key conflicts: later repeats of a value within the file
+        (the first occurrence would be inserted, the rest rejected) and values
+        already present in the database. `first_seen` ("tabla.campo" -> value
+        -> file row number) carries earlier chunks' values.
+        """
+        conflicts: List[List[str]] = [[] for _ in range(row_count)]
+        first_seen = {} if first_seen is None else first_seen
+
+        for key, values in candidates.items():
+            in_file_label = UNIQUE_KEY_LABELS[key][0]
+            first_row = first_seen.setdefault(key, {})
+            for i, value in values:
+                if value in first_row:
+                    conflicts[i].append(
+                        f"Duplicado en el archivo: {in_file_label} '{value}' ya aparece en la fila {first_row[value]}"
+                    )
+                else:
+                    first_row[value] = start + i + 1
+
+        existing = await self.api.check_import_conflicts(
+            {key: [value for _, value in values] for key, values in candidates.items()}
+        )
+        if existing is None:
+            log.info("rpc_check_import_conflicts unavailable; skipping database uniqueness pre-check.")
+            return conflicts
+
+        for key, values in candidates.items():
+            found = existing.get(key)
+            if not found:
+                continue
+            db_label = UNIQUE_KEY_LABELS[key][1]
+            for i, value in values:
+                if value in found:
+                    conflicts[i].append(f"Ya existe {db_label} '{value}'")
+        return conflicts
 
+    # =====================================================================
+    # Database simulation — real inserts inside a transaction that is
+    # always rolled back (rpc_dry_run_import).
+    # =====================================================================
+    def _foreign_key_plan(self) -> Dict[str, Dict[str, str]]:
+        """{"pisos": {"bloque_id": "bloques"}, ...} from the `__fk__` mappings."""
+        plan: Dict[str, Dict[str, str]] = {}
+        for table_name, mapping in self.table_mappings.items():
+            for db_column, csv_header in mapping.items():
+                if str(csv_header).startswith("__fk__"):
+                    parent_table = csv_header.replace("__fk__", "").split(".")[0]
+                    plan.setdefault(table_name, {})[db_column] = parent_table
+        return plan
+
+    async def simulate_relational_import(
+        self, raw_records: Iterable[Dict[str, Any]], chunk_size: int = DRY_RUN_CHUNK_SIZE
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Sends the same per-table payloads `process_relational_import` would
+        insert to `rpc_dry_run_import`, which inserts them for real (triggers,
+        FKs, CHECK/UNIQUE constraints, RLS) and rolls the transaction back.
+        Results have the `validate_relational_import` shape, so they feed
+        `ValidationPreviewPanel` directly.
+
+        Each chunk is its own transaction: a repeated key is caught within a
+        chunk, across chunks only by the preview's in-file duplicate check.
+        Returns None if the RPC is unavailable.
+        """
+        results: List[Dict[str, Any]] = []
+        async for chunk_results in self.simulate_relational_import_chunks(iter_chunks(raw_records, chunk_size)):
+            if chunk_results is None:
+                return None
+            results.extend(chunk_results)
         return results
 
+    async def simulate_relational_import_chunks(
+        self, row_chunks: Iterable[List[Dict[str, Any]]]
+    ) -> AsyncGenerator[Optional[List[Dict[str, Any]]], None]:
+        """
+        Streaming form of `simulate_relational_import`: one `rpc_dry_run_import`
+        call per chunk, yielding its results. Yields None once and stops if
+        the RPC is unavailable.
+        """
+        plan = {
+            "execution_order": self.execution_order,
+            "foreign_keys": self._foreign_key_plan(),
+        }
+        parents = ParentIndex()
+        start = 0
+        for chunk in row_chunks:
+            # Shared parents: the RPC reuses existing ones and creates each new key once per chunk
+            await self.resolve_parents(chunk, parents)
+            rows: List[Dict[str, Any]] = []
+            for idx, raw_row in enumerate(chunk, start=start + 1):
+                tables: Dict[str, Dict[str, Any]] = {}
+                for table_name in self.execution_order:
+                    payload, has_user_mappings, has_user_data = self._build_table_payload(
+                        table_name, raw_row
+                    )
+                    if has_user_mappings and not has_user_data:
+                        continue  # same "skip empty optional sub-block" rule as the real run
+                    tables[table_name] = payload
+                row = {"row_number": idx, "preview_label": self._preview_label(raw_row), "tables": tables}
+                shared = {
+                    table_name: {
+                        "clave": parents.key(table_name, value),
+                        "id": parents.ids.get(table_name, {}).get(parents.key(table_name, value)),
+                    }
+                    for table_name, value in self._parent_values(raw_row).items()
+                }
+                if shared:
+                    row["parents"] = shared
+                rows.append(row)
+            start += len(chunk)
+
+            chunk_results = await self.api.dry_run_import(plan, rows)
+            if chunk_results is None:
+                log.info("rpc_dry_run_import unavailable; database simulation skipped.")
+                yield None
+                return
+            yield [{**r, "issues": list(r.get("issues") or []), "conflicts": []} for r in chunk_results]
+
     # =====================================================================
     # Real import run.
     # =====================================================================
-    async def process_relational_import(
-        self, raw_records: List[Dict[str, Any]]
-    ) -> AsyncGenerator[str, None]:
-        """
-        Sequentially loops rows, extracts specific target schemas, posts
-        records via PostgREST, and binds child foreign keys down the pipeline.
+    async def import_row(
+        self, raw_row: Dict[str, Any], parents: Optional[ParentIndex] = None, notify: bool = True
+    ) -> "RowImportOutcome":
         """
-        total = len(raw_records)
-        success_count = 0
-        failed_count = 0
+        Inserts one flat CSV row table by table in execution order, binding
+        each child's FKs to the ids just created. Stops at the first table
+        that fails; rows already inserted for earlier tables stay.
 
-        yield f"Starting processing loop for {total} relational rows...\n"
+        With `parents` (see `resolve_parents`), a bloque or piso whose key is
+        already known is reused instead of inserted, and one that failed to
+        be created fails its siblings with the same error.
 
-        for idx, raw_row in enumerate(raw_records, start=1):
-            generated_lineage_keys: Dict[str, int] = {}
-            row_failed = False
-
-            yield f"[{idx}/{total}] Processing row lineage keys..."
+        With notify=False validation errors only go into the outcome, never to
+        `ui.notify` (the background import worker has no page to show them).
+        """
+        started = time.perf_counter()
+        outcome = await self._import_row(raw_row, parents, notify)
+        IMPORT_ROW_SECONDS.observe(time.perf_counter() - started)
+        IMPORT_ROWS.inc(outcome="ok" if outcome.error is None else "error")
+        return outcome
+
+    async def _import_row(
+        self, raw_row: Dict[str, Any], parents: Optional[ParentIndex], notify: bool = True
+    ) -> "RowImportOutcome":
+        generated_lineage_keys: Dict[str, int] = {}
+
+        for table_name in self.execution_order:
+            mapping = self.table_mappings.get(table_name, {})
+
+            db_payload, has_user_mappings, has_user_data = self._build_table_payload(
+                table_name, raw_row
+            )
 
-            for table_name in self.execution_order:
-                mapping = self.table_mappings.get(table_name, {})
+            if has_user_mappings and not has_user_data:
+                continue
+
+            # ---- Hydrate the registered foreign key lineage ----
+            for db_column, csv_header in mapping.items():
+                if str(csv_header).startswith("__fk__"):
+                    parent_table = csv_header.replace("__fk__", "").split(".")[0]
+                    parent_id = generated_lineage_keys.get(parent_table)
+                    # Si el padre opcional (ej: bloques) se omitió, la FK se asigna como None
+                    db_payload[db_column] = parent_id if parent_id else None
+
+            parent_key = None
+            if parents is not None and table_name in IMPORT_PARENT_KEY_ARGS:
+                value = db_payload.get(IMPORT_PARENT_KEY_ARGS[table_name][0])
+                if value:
+                    parent_key = parents.key(table_name, value)
+                    known_id = parents.ids.get(table_name, {}).get(parent_key)
+                    if known_id is not None:
+                        generated_lineage_keys[table_name] = known_id
+                        continue
+                    known_error = parents.errors.get(table_name, {}).get(parent_key)
+                    if known_error:
+                        return RowImportOutcome(generated_lineage_keys, table_name, known_error)
+
+            try:
+                # `create_record` returns a (record, error_message) tuple — NOT the
+                # raw record itself. The previous version of this loop checked
+                # `isinstance(result, list)` / `isinstance(result, dict)` against
+                # that tuple, which is neither, so it always fell through to the
+                # "error" branch even on a successful insert, marking every row
+                # failed and aborting the chain after the very first table. Fixed
+                # by unpacking the tuple, matching how `api.batch_create` already
+                # consumes `create_record` elsewhere in this codebase.
+                record, error_msg = await self.api.create_record(
+                    table_name, db_payload, show_validation_errors=notify
+                )
 
-                db_payload, has_user_mappings, has_user_data = self._build_table_payload(
-                    table_name, raw_row
+                if record and "id" in record:
+                    generated_lineage_keys[table_name] = record["id"]
+                    if parent_key is not None:
+                        parents.ids.setdefault(table_name, {})[parent_key] = record["id"]
+                else:
+                    if parent_key is not None:
+                        parents.errors.setdefault(table_name, {})[parent_key] = error_msg or "Unknown error"
+                    return RowImportOutcome(generated_lineage_keys, table_name, error_msg or "Unknown error")
+
+            except Exception as ex:
+                log.error(
+                    f"API relational block insertion failure on table {table_name}: {ex}"
                 )
+                return RowImportOutcome(generated_lineage_keys, table_name, str(ex), exception=True)
 
-                if has_user_mappings and not has_user_data:
-                    continue
+        return RowImportOutcome(generated_lineage_keys)
+
+    async def process_relational_import(
+        self,
+        raw_records: Iterable[Dict[str, Any]],
+        total: Optional[int] = None,
+        chunk_size: int = IMPORT_CHUNK_ROWS,
+        progress: Optional[ProgressTracker] = None,
+    ) -> AsyncGenerator[str, None]:
+        """
+        Sequentially loops rows, extracts specific target schemas, posts
+        records via PostgREST, and binds child foreign keys down the pipeline.
+        `raw_records` may be a generator (`CsvUpload.iter_rows()`): rows are
+        consumed `chunk_size` at a time, each chunk's shared parents
+        resolved up front (`resolve_parents`), never held all at once.
 
-                # ---- Hydrate the registered foreign key lineage ----
-                for db_column, csv_header in mapping.items():
-                    if str(csv_header).startswith("__fk__"):
-                        parent_table = csv_header.replace("__fk__", "").split(".")[0]
-                        parent_id = generated_lineage_keys.get(parent_table)
-                        # Si el padre opcional (ej: bloques) se omitió, la FK se asigna como None
-                        db_payload[db_column] = parent_id if parent_id else None
+        With a `progress` tracker each row's outcome is recorded there and
+        only the opening line, one line per chunk and the summary are
+        yielded, instead of a status line (or two) per row.
+        """
+        if total is None and hasattr(raw_records, "__len__"):
+            total = len(raw_records)
+        of_total = f"/{total}" if total is not None else ""
+        success_count = 0
+        failed_count = 0
 
-                try:
-                    # `create_record` returns a (record, error_message) tuple — NOT the
-                    # raw record itself. The previous version of this loop checked
-                    # `isinstance(result, list)` / `isinstance(result, dict)` against
-                    # that tuple, which is neither, so it always fell through to the
-                    # "error" branch even on a successful insert, marking every row
-                    # failed and aborting the chain after the very first table. Fixed
-                    # by unpacking the tuple, matching how `api.batch_create` already
-                    # consumes `create_record` elsewhere in this codebase.
-                    record, error_msg = await self.api.create_record(table_name, db_payload)
-
-                    if record and "id" in record:
-                        generated_lineage_keys[table_name] = record["id"]
-                    else:
-                        yield f" -> Error loading into table '{table_name}': {error_msg}\n"
-                        row_failed = True
-                        break
-
-                except Exception as ex:
-                    log.error(
-                        f"API relational block insertion failure on table {table_name}: {ex}"
+        yield f"Starting processing loop for {total if total is not None else 'streamed'} relational rows...\n"
+
+        parents = ParentIndex()
+        idx = 0
+        for chunk in iter_chunks(raw_records, chunk_size):
+            await self.resolve_parents(chunk, parents)
+            for raw_row in chunk:
+                idx += 1
+                if progress is None:
+                    yield f"[{idx}{of_total}] Processing row lineage keys..."
+
+                outcome = await self.import_row(raw_row, parents)
+                if outcome.error is None:
+                    success_count += 1
+                else:
+                    failed_count += 1
+                if progress is not None:
+                    progress.record(
+                        OK if outcome.error is None else ERROR,
+                        f"Fila {idx}: {self._preview_label(raw_row)}",
+                        f"[{outcome.table}] {outcome.error}" if outcome.error else "",
                     )
-                    yield f" -> Critical Exception on table '{table_name}': {str(ex)}\n"
-                    row_failed = True
-                    break
-
-            if row_failed:
-                failed_count += 1
-            else:
-                success_count += 1
+                elif outcome.exception:
+                    yield f" -> Critical Exception on table '{outcome.table}': {outcome.error}\n"
+                elif outcome.error:
+                    yield f" -> Error loading into table '{outcome.table}': {outcome.error}\n"
+            if progress is not None:
+                yield f"[{idx}{of_total}] rows processed"
 
         yield (
             f"\n*** Import Pipeline Finished ***\n"
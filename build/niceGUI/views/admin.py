@@ -1,6 +1,6 @@
 # build/niceGUI/views/admin.py (Enhanced for Client-Side State)
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from nicegui import ui, app
 
 from api.client import APIClient
@@ -12,14 +12,17 @@ from components.importer import CSVImporterDialog
 from components.filters import FilterPanel
 from components.relationship_explorer import RelationshipExplorer
 from components.base_view import BaseView
+from components.loop_profiler_panel import LoopProfilerPanel
+from services.loop_monitor import LoopLagMonitor
 from config import TABLE_INFO
 
 
 class AdminView(BaseView):
     """Enhanced admin view for table management with client-side (per-tab) state."""
 
-    def __init__(self, api_client: APIClient):
+    def __init__(self, api_client: APIClient, loop_monitor: Optional[LoopLagMonitor] = None):
         self.api = api_client
+        self.loop_monitor = loop_monitor
         if "admin_view_state" not in app.storage.client:
             app.storage.client["admin_view_state"] = GenericViewState()
         self.state: GenericViewState = app.storage.client["admin_view_state"]
@@ -81,6 +84,11 @@ class AdminView(BaseView):
                 self.api, self.detail_container
             )
 
+            # Event-loop stalls and profiler: admin only, not 'sistemas'
+            if self.loop_monitor and self.has_role("admin"):
+                ui.separator().classes("my-4")
+                LoopProfilerPanel(self.loop_monitor).create()
+
         # If a table was already selected in this tab, reload its data
         if self.state.selected_entity_name.value:
             ui.timer(0.1, self._refresh_data, once=True)
@@ -12,6 +12,9 @@ from components.base_view import BaseView
 from components.dialogs import EnhancedRecordDialog, ConfirmationDialog
 from config import TABLE_INFO
 
+# Entradas del diario que se piden por página (keyset sobre created_at, id)
+HISTORY_PAGE_SIZE = 20
+
 
 class ConflictsView(BaseView):
     """Enhanced conflicts management view using client-side (per-tab) state."""
@@ -22,12 +25,18 @@ class ConflictsView(BaseView):
         if "conflicts_view_state" not in app.storage.client:
             client_state = GenericViewState()  
             client_state.history = []  
+            client_state.history_has_more = False
             app.storage.client["conflicts_view_state"] = client_state
         self.state: GenericViewState = app.storage.client["conflicts_view_state"]
         
         # Cache for holding unfiltered select options to keep track during text filtering
         self.unfiltered_conflict_options: Dict[int, str] = {} 
         self.history_container = None
+        self.history_list = None
+        self.history_footer = None
+        self._history_cards: Dict[int, ui.card] = {}
+        self._last_saved_note: Optional[Dict] = None
+        self._last_conflict_update: Dict = {}
         self.info_container = None
         self.conflict_select = None
         self.stats_card = None
@@ -124,7 +133,6 @@ class ConflictsView(BaseView):
             with ui.row().classes("w-full gap-4 items-start flex-wrap md:flex-nowrap"):
                 with ui.column().classes("w-full md:w-96 md:shrink-0 gap-4"):
                     self.stats_card = ui.card().classes("w-full p-4")
-                    self._display_statistics()
                     with ui.row().classes("w-full gap-2"):
                         ui.button(
                             "Añadir Nota", icon="add_comment", on_click=self._add_note
@@ -143,9 +151,16 @@ class ConflictsView(BaseView):
 
     async def _load_conflicts(self):
         try:
-            conflicts = await self.api.get_records(
-                "v_conflictos_enhanced", order="id.desc"
-            )
+            # Keyset pages (id.desc); plain view read only if the RPC is not
+            # deployed (nothing yielded). A failed later page raises instead of
+            # leaving a truncated list.
+            pages = [page async for page in self.api.iter_pages("rpc_page_conflictos")]
+            if pages:
+                conflicts = [conflict for page in pages for conflict in page]
+            else:
+                conflicts = await self.api.get_records(
+                    "v_conflictos_enhanced", order="id.desc"
+                )
             self.state.set_records(conflicts)
             await self._apply_filters()
 
@@ -233,7 +248,7 @@ class ConflictsView(BaseView):
                 self.conflict_select.value = None
                 self._clear_displays()
 
-        self._display_statistics()
+        await self._display_statistics()
 
     def _clear_filters(self):
         self.filter_nodo.value = None
@@ -242,28 +257,54 @@ class ConflictsView(BaseView):
         self.filter_ambito.value = None  
         ui.timer(0.1, self._apply_filters, once=True)
 
-    def _display_statistics(self):
+    async def _get_statistics(self) -> Dict:
+        """Aggregates from `rpc_conflict_stats`; counts loaded records if unavailable."""
+        stats = await self.api.get_conflict_stats(self.state.filters)
+        if stats is not None:
+            return stats
+        records = self.state.filtered_records
+        return {
+            "total": len(records),
+            "estado": Counter((c.get("estado") or "Sin estado") for c in records),
+            "ambito": Counter((c.get("ambito") or "Sin ámbito") for c in records),
+            "causa": Counter((c.get("causa") or "Sin causa") for c in records),
+            "nodo": Counter((c.get("nodo_nombre") or "Sin nodo") for c in records),
+        }
+
+    async def _display_statistics(self):
         if not self.stats_card:
             return
+        stats = await self._get_statistics()
         self.stats_card.clear()
         with self.stats_card:
             ui.label("Estadísticas").classes("text-h6 mb-2")
-            status_counts = Counter(
-                (c.get("estado") or "Sin estado") for c in self.state.filtered_records
-            )
             with ui.row().classes("w-full gap-4 flex-wrap"):
                 ui.chip(
-                    f"Total: {len(self.state.filtered_records)}",
+                    f"Total: {stats.get('total', 0)}",
                     color="blue",
                     icon="inventory",
                 )
-                for estado, count in sorted(status_counts.items()):
+                for estado, count in sorted(stats.get("estado", {}).items()):
                     color = {
                         "Abierto": "red",
                         "Victoria": "green",
                         "Cerrado": "gray",
                     }.get(estado, "blue")
                     ui.chip(f"{estado}: {count}", color=color)
+            with ui.expansion("Desglose", icon="bar_chart").classes("w-full"):
+                for key, label in (
+                    ("ambito", "Ámbito"),
+                    ("causa", "Causa"),
+                    ("nodo", "Nodo"),
+                ):
+                    counts = stats.get(key, {})
+                    if not counts:
+                        continue
+                    ui.label(label).classes("text-subtitle2 font-bold mt-2")
+                    for name, count in sorted(counts.items(), key=lambda kv: -kv[1]):
+                        with ui.row().classes("w-full text-sm"):
+                            ui.label(name).classes("flex-grow")
+                            ui.label(str(count)).classes("font-semibold")
 
     async def _on_conflict_change(self, conflict_id: Optional[int]):
         self.conflict_select.set_options(self.unfiltered_conflict_options)  # safe here, value already committed
@@ -333,33 +374,99 @@ class ConflictsView(BaseView):
                             str(value) if value not in [None, ""] else "-"
                         ).classes("flex-grow")
 
+    @staticmethod
+    def _history_cursor_filter(last_entry: Dict) -> Dict[str, str]:
+        """Build the PostgREST keyset filter for entries older than `last_entry`.
+
+        Mirrors `ORDER BY created_at DESC, id DESC` (NULLs first, as Postgres
+        does by default) so it can be served by
+        `idx_diario_conflictos_conflicto_fecha`.
+        """
+        created_at = last_entry.get("created_at")
+        entry_id = last_entry.get("id")
+        if created_at is None:
+            return {"or": f"(created_at.not.is.null,and(created_at.is.null,id.lt.{entry_id}))"}
+        return {
+            "or": f'(created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{entry_id}))'
+        }
+
+    async def _fetch_history_page(
+        self, conflict_id: int, last_entry: Optional[Dict] = None
+    ) -> tuple[List[Dict], bool]:
+        """Fetch one page of diary entries; returns (entries, has_more)."""
+        filters = {"conflicto_id": f"eq.{conflict_id}"}
+        if last_entry:
+            filters.update(self._history_cursor_filter(last_entry))
+        # Pedimos una fila extra para saber si quedan entradas más antiguas
+        records = await self.api.get_records(
+            "v_diario_conflictos_con_afiliada",
+            filters,
+            order="created_at.desc,id.desc",
+            limit=HISTORY_PAGE_SIZE + 1,
+        )
+        return records[:HISTORY_PAGE_SIZE], len(records) > HISTORY_PAGE_SIZE
+
     async def _load_conflict_history(self):
         selected_conflict = self.state.selected_item.value
         if not self.history_container or not selected_conflict:
             return
         self.history_container.clear()
+        self._history_cards = {}
         try:
-            history_records = await self.api.get_records(
-                "v_diario_conflictos_con_afiliada",
-                {"conflicto_id": f'eq.{selected_conflict["id"]}'},
-                order="created_at.desc",
-            )
-            self.state.history = history_records
+            page, has_more = await self._fetch_history_page(selected_conflict["id"])
+            self.state.history = page
+            self.state.history_has_more = has_more
             with self.history_container:
                 ui.label("Historial del conflicto").classes(
                     "text-subtitle1 font-semibold mb-2"
                 )
-                if self.state.history:
-                    for entry in self.state.history:
-                        self._create_history_entry(entry)
-                else:
-                    ui.label("No se encontraron entradas en el historial").classes(
-                        "text-gray-500"
-                    )
+                self.history_list = ui.column().classes("w-full gap-0")
+                self.history_footer = ui.column().classes("w-full items-center")
+            self._render_history_entries(page)
+            self._render_history_footer()
         except Exception as e:
             ui.notify(f"Error loading history: {str(e)}", type="negative")
 
-    def _create_history_entry(self, entry: dict):
+    async def _load_older_history(self):
+        selected_conflict = self.state.selected_item.value
+        if not selected_conflict or not self.state.history:
+            return
+        try:
+            page, has_more = await self._fetch_history_page(
+                selected_conflict["id"], self.state.history[-1]
+            )
+            self.state.history.extend(page)
+            self.state.history_has_more = has_more
+            self._render_history_entries(page)
+            self._render_history_footer()
+        except Exception as e:
+            ui.notify(f"Error loading history: {str(e)}", type="negative")
+
+    def _render_history_entries(self, entries: List[Dict]):
+        if not self.history_list:
+            return
+        with self.history_list:
+            for entry in entries:
+                self._history_cards[entry["id"]] = self._create_history_entry(entry)
+
+    def _render_history_footer(self):
+        if not self.history_footer:
+            return
+        self.history_footer.clear()
+        with self.history_footer:
+            if not self.state.history:
+                ui.label("No se encontraron entradas en el historial").classes(
+                    "text-gray-500"
+                )
+            elif self.state.history_has_more:
+                ui.button(
+                    "Cargar entradas anteriores",
+                    icon="expand_more",
+                    on_click=self._load_older_history,
+                ).props("flat color=orange-600")
+
+    def _create_history_entry(self, entry: dict) -> ui.card:
         title = f"{entry.get('created_at', 'Sin fecha').split('T')[0]}"
         if entry.get("usuario_alias"):
             title += f" |-----| AUTOR: {entry['usuario_alias']}"
@@ -367,7 +474,7 @@ class ConflictsView(BaseView):
             title += f" | ACCION: {entry['accion']}"
         if entry.get("tarea_actual"):
             title += f" | TAREA: {entry['tarea_actual']}"
-        with ui.card().classes("w-full mb-2"):
+        with ui.card().classes("w-full mb-2") as card:
             with ui.expansion(title).classes("w-full"):
                 with ui.element("div").classes("p-2"):
                     with ui.row().classes("w-full gap-2 items-center"):
@@ -414,6 +521,7 @@ class ConflictsView(BaseView):
                                 ui.label(entry["tarea_actual"]).classes(
                                     "text-gray-700 whitespace-pre-wrap"
                                 )
+        return card
 
     async def _add_note(self):
         selected_conflict = self.state.selected_item.value
@@ -472,6 +580,7 @@ class ConflictsView(BaseView):
             if not result:
                 ui.notify(f"Error al crear conflicto: {error}", type="negative")
                 return False
+            self.api.invalidate_stats_cache()
             if primera_tarea:
                 user_id = app.storage.user.get("user_id")
                 nota_data = {
@@ -540,6 +649,7 @@ class ConflictsView(BaseView):
                 success = result is not None
             if not success:
                 return False
+            self._last_saved_note = result
             conflict_update = {}
             if data.get("tarea_actual"):
                 conflict_update["tarea_actual"] = data.get("tarea_actual")
@@ -550,24 +660,80 @@ class ConflictsView(BaseView):
                 else:
                     conflict_update["estado"] = data["estado"]
                     conflict_update["fecha_cierre"] = None  
+            self._last_conflict_update = {}
             if conflict_update:
-                await self.api.update_record(
+                if await self.api.update_record(
                     "conflictos", selected_conflict["id"], conflict_update
-                )
+                ):
+                    self._last_conflict_update = conflict_update
             return True
 
         return _handler
 
     async def _on_note_saved(self):
-        await self._load_conflicts()
-        if self.state.selected_item.value:
-            await self._on_conflict_change(self.state.selected_item.value["id"])
+        """Apply a saved note locally instead of reloading conflicts and history."""
+        selected_conflict = self.state.selected_item.value
+        saved = self._last_saved_note
+        self._last_saved_note = None
+        if not selected_conflict or not saved:
+            return
+        if self._last_conflict_update:
+            selected_conflict.update(self._last_conflict_update)
+            self._last_conflict_update = {}
+            self.api.invalidate_stats_cache()
+            await self._apply_filters()
+            await self._display_conflict_info()
+
+        # La fila devuelta es la de la tabla; completamos los campos de la vista
+        existing = next(
+            (h for h in self.state.history if h.get("id") == saved.get("id")), None
+        )
+        entry = {
+            **(existing or {}),
+            **saved,
+            "usuario_alias": (existing or {}).get("usuario_alias")
+            or app.storage.user.get("username"),
+            "afiliada_nombre_completo": selected_conflict.get(
+                "afiliada_nombre_completo"
+            ),
+        }
+        self._upsert_history_entry(entry, is_new=existing is None)
+
+    def _upsert_history_entry(self, entry: Dict, is_new: bool):
+        if not self.history_list:
+            return
+        entry_id = entry.get("id")
+        old_card = self._history_cards.get(entry_id)
+        with self.history_list:
+            card = self._create_history_entry(entry)
+        self._history_cards[entry_id] = card
+        index = None if is_new else next(
+            (i for i, h in enumerate(self.state.history) if h.get("id") == entry_id), None
+        )
+        if index is None:
+            # New, or no longer in the history (reloaded while the dialog was open)
+            self.state.history.insert(0, entry)
+            card.move(target_index=0)
+        else:
+            self.state.history[index] = entry
+        if old_card is not None:
+            if index is not None:
+                card.move(target_index=self.history_list.default_slot.children.index(old_card))
+            old_card.delete()
+        self._render_history_footer()
+
+    def _remove_history_entry(self, entry_id: int):
+        self.state.history = [h for h in self.state.history if h.get("id") != entry_id]
+        card = self._history_cards.pop(entry_id, None)
+        if card is not None:
+            card.delete()
+        self._render_history_footer()
 
     def _delete_note(self, note: dict):
         async def _confirm_delete():
             if await self.api.delete_record("diario_conflictos", note["id"]):
                 ui.notify("Nota eliminada con éxito.", type="positive")
-                await self._load_conflict_history()
+                self._remove_history_entry(note["id"])
 
         ConfirmationDialog(
             title="Eliminar Nota",
@@ -582,3 +748,6 @@ class ConflictsView(BaseView):
             self.info_container.clear()
         if self.history_container:
             self.history_container.clear()
+        self.history_list = None
+        self.history_footer = None
+        self._history_cards = {}
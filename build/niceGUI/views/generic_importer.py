@@ -10,16 +10,22 @@ from components.base_view import BaseView
 from components.data_table import DataTable
 from components.dialogs import ConfirmationDialog
 from components.filters import FilterPanel
-from components.upload_event_utils import read_upload_event_bytes
+from components.import_jobs_panel import ImportJobsPanel
+from components.progress_panel import ProgressPanel
+from components.upload_event_utils import iter_upload_event_chunks
 from components.validation_preview import ValidationPreviewPanel
 from config import TABLE_INFO, HOUSING_UNION_IMPORT_CONFIG, IMPORT_FIELD_DESCRIPTIONS, IMPORT_MANDATORY_FIELDS
+from services.import_jobs import ImportJobManager, JobOwner
 from services.geolink_service import RATE_LIMIT_SLEEP, lookup_cadastral_data, to_ewkt_point
-from services.relational_import_service import MultiTableImportService
+from services.csv_stream import IMPORT_CHUNK_ROWS, STREAM_CHUNK_BYTES, CsvUpload
+from services.progress import ERROR, OK, SKIPPED
+from services.relational_import_service import DRY_RUN_CHUNK_SIZE, MultiTableImportService
 from state.base import BaseTableState
 
 log = logging.getLogger(__name__)
 
 PISOS_HUERFANOS_VIEW = "v_sugerencias_pisos_huerfanos"
+REBUILD_SUGGESTIONS_RPC = "rpc_rebuild_sugerencias_pisos_huerfanos"
 COL_PISO_ID = "piso_id"
 COL_BLOQUE_ID = "ID Bloque Sugerido"
 COL_PISO_DIR = "Dirección Piso"
@@ -29,6 +35,11 @@ MIN_LINK_SCORE = 0.80
 MAX_LINK_SCORE = 1.00
 DEFAULT_LINK_SCORE = 0.85
 
+# Per-client slot holding the spooled CsvUpload of the importer tab
+UPLOAD_STORAGE_KEY = "generic_importer_upload"
+# Files with more rows than this only list their flagged rows in the preview
+PREVIEW_FULL_ROWS = 1000
+
 
 class GenericRelationalImporterView(BaseView):
     """
@@ -37,7 +48,8 @@ class GenericRelationalImporterView(BaseView):
       1. Importador CSV Relacional, con vista previa de validación antes
          de insertar (ver `_render_generic_importer_tab`).
       2. Vinculación automática Piso -> Bloque, basada en la vista SQL
-         `v_sugerencias_pisos_huerfanos`.
+         `v_sugerencias_pisos_huerfanos` (tabla de sugerencias mantenida por
+         triggers en la BBDD).
       3. Enriquecimiento Geolink: relanza `pisos` sin `ref_catastral`/`coordenadas`
          contra CartoCiudad para completar esos campos.
 
@@ -63,18 +75,27 @@ class GenericRelationalImporterView(BaseView):
     TAB_LINKER_NAME = "2. Vinculación Piso-Bloque"
     TAB_GEOLINK_NAME = "3. Enriquecimiento Geolink"
 
-    def __init__(self, api_client: APIClient):
+    def __init__(self, api_client: APIClient, job_manager: Optional[ImportJobManager] = None):
 
         # TAB 1: IMPORTADOR CSV GENÉRICO + VISTA PREVIA DE VALIDACIÓN
         self.api = api_client
         schema_config: Dict[str, Any] = HOUSING_UNION_IMPORT_CONFIG
         self.service = MultiTableImportService(api_client, schema_config)
-        if "generic_importer_records" not in app.storage.client:
-            app.storage.client["generic_importer_records"] = []
-        self.raw_records: List[Dict[str, Any]] = app.storage.client["generic_importer_records"]
+        # Only the spooled file is kept per client; rows are streamed from it on demand
+        self._client_storage = app.storage.client
+        self._client_storage.setdefault(UPLOAD_STORAGE_KEY, None)
         self.import_button: Optional[ui.button] = None
         self.download_report_button: Optional[ui.button] = None
+        self.simulate_button: Optional[ui.button] = None
+        self.progress_bar: Optional[ui.linear_progress] = None
+        # With a manager, "Procesar e Insertar" queues a background job; without
+        # one (tests, scripts) the import runs inline as before
+        self.job_manager = job_manager
+        self.jobs_panel: Optional[ImportJobsPanel] = None
         self.summary_log: Optional[ui.log] = None
+        # Row-by-row runs report counters / rate / ETA here and keep the per-row
+        # detail for download, instead of one ui.log line per row
+        self.import_progress = ProgressPanel("informe_importacion")
         self.preview_panel: Optional[ValidationPreviewPanel] = None
         self.preview_container: Optional[ui.column] = None
         self.required_headers: List[str] = []
@@ -93,6 +114,7 @@ class GenericRelationalImporterView(BaseView):
         self.link_table: Optional[DataTable] = None
         self.link_table_container: Optional[ui.column] = None
         self.link_log: Optional[ui.log] = None
+        self.link_progress = ProgressPanel("informe_vinculacion_pisos")
         self.link_execute_button: Optional[ui.button] = None
         self._link_tab_loaded = False  # lazy loading
         
@@ -104,6 +126,7 @@ class GenericRelationalImporterView(BaseView):
         self.geolink_filter_container: Optional[ui.column] = None
         self.geolink_filter_panel: Optional[FilterPanel] = None
         self.geolink_log: Optional[ui.log] = None
+        self.geolink_progress = ProgressPanel("informe_geolink")
         self.geolink_execute_button: Optional[ui.button] = None
         self._geolink_tab_loaded = False  # lazy loadginh
 
@@ -189,7 +212,7 @@ class GenericRelationalImporterView(BaseView):
 
                 self.import_button = ui.button(
                     "Procesar e Insertar", icon="play_arrow", on_click=self._confirm_and_execute_pipeline
-                ).props("color=orange-600").set_enabled(len(self.raw_records) > 0)
+                ).props("color=orange-600").set_enabled(self.upload is not None)
 
                 self.download_report_button = ui.button(
                     "Descargar Informe de Validación",
@@ -197,13 +220,32 @@ class GenericRelationalImporterView(BaseView):
                     on_click=self._download_validation_report,
                 ).props("color=blue-grey-7 outline").set_enabled(False)
 
+                self.simulate_button = ui.button(
+                    "Simular en Base de Datos",
+                    icon="science",
+                    on_click=self._run_database_simulation,
+                ).props("color=blue-grey-7 outline").tooltip(
+                    "Inserta las filas dentro de una transacción que se deshace al terminar: "
+                    "triggers, restricciones y permisos responden igual que en la importación real"
+                ).set_enabled(self.upload is not None)
+
+            self.progress_bar = ui.linear_progress(value=0, show_value=False).props("instant-feedback").classes("w-full")
+            self.progress_bar.set_visibility(False)
+
+            if self.job_manager:
+                self.jobs_panel = ImportJobsPanel(self.job_manager, self._job_owner)
+                self.jobs_panel.create()
+            else:
+                self.import_progress.create()
+
             # Validation preview
             with ui.card().classes("w-full p-3"):
                 ui.label("Vista Previa de Validación").classes("text-subtitle2 mb-1")
                 ui.markdown(
                     "Cada fila se valida contra las reglas de campo obligatorio, formato y "
                     "opciones válidas *antes* de intentar insertarla, para saber de antemano "
-                    "qué filas es probable que la base de datos rechace."
+                    "qué filas es probable que la base de datos rechace. *Simular en Base de Datos* "
+                    "las inserta de verdad dentro de una transacción que se deshace al terminar."
                 ).classes("text-xs text-gray-500 mb-2")
                 self.preview_container = ui.column().classes("w-full relative")
                 with self.preview_container:
@@ -239,51 +281,136 @@ class GenericRelationalImporterView(BaseView):
             return
         ui.download(self.preview_panel.to_csv_bytes(), "informe_validacion_importacion.csv")
 
+    @property
+    def upload(self) -> Optional[CsvUpload]:
+        return self._client_storage.get(UPLOAD_STORAGE_KEY)
+
+    def _replace_upload(self, upload: Optional[CsvUpload]):
+        previous = self.upload
+        if previous is not None and previous is not upload:
+            previous.close()
+        self._client_storage[UPLOAD_STORAGE_KEY] = upload
+
+    def _set_progress(self, value: Optional[float]):
+        """Muestra la barra con `value` (0-1) o la oculta con None."""
+        if not self.progress_bar:
+            return
+        self.progress_bar.set_visibility(value is not None)
+        if value is not None:
+            self.progress_bar.set_value(round(value, 3))
+
+    def _sync_importer_buttons(self):
+        for button in (self.import_button, self.simulate_button):
+            if button:
+                button.set_enabled(self.upload is not None)
+
     async def _handle_upload_flow(self, e: events.UploadEventArguments):
         try:
-            csv_bytes = await read_upload_event_bytes(e)
-            parsed_data = await self.service.parse_csv_bytes(csv_bytes)
-
-            self.raw_records.clear()
-            self.raw_records.extend(parsed_data)
+            # Trozo a trozo a un fichero temporal: nunca el archivo entero en memoria
+            upload = await CsvUpload.from_chunks(
+                iter_upload_event_chunks(e, STREAM_CHUNK_BYTES),
+                name=getattr(getattr(e, "file", None), "name", "") or "",
+            )
+            self._replace_upload(upload)
 
             if self.summary_log:
                 self.summary_log.clear()
-                self.summary_log.push(f"Archivo cargado correctamente. Registros detectados en plantilla: {len(self.raw_records)}")
-
-            if self.import_button:
-                self.import_button.set_enabled(len(self.raw_records) > 0)
-
-            ui.notify(f"Archivo cargado: {len(self.raw_records)} registros listos para procesar.", type="info")
+                self.summary_log.push(
+                    f"Archivo cargado correctamente: {upload.size / 1_048_576:.1f} MB, codificación {upload.encoding}."
+                )
+            self._sync_importer_buttons()
 
             await self._run_validation_preview()
+
+            if upload.row_count is not None:
+                if self.summary_log:
+                    self.summary_log.push(f"Registros detectados en plantilla: {upload.row_count}")
+                ui.notify(f"Archivo cargado: {upload.row_count} registros listos para procesar.", type="info")
         except Exception as ex:
             log.error("Fallo de pre-extracción en el flujo de subida de datos", exc_info=True)
             ui.notify(f"Error procesando archivo CSV: {ex}", type="negative")
 
+    async def _collect_preview_results(self, chunk_results: Any, upload: CsvUpload) -> Optional[int]:
+        """
+        Vuelca en el panel los resultados que llegan trozo a trozo. Con más de
+        PREVIEW_FULL_ROWS filas solo se conservan las marcadas. Devuelve el
+        total de filas, o None si el origen dejó de estar disponible.
+        """
+        results: List[Dict[str, Any]] = []
+        total = 0
+        async for chunk in chunk_results:
+            if chunk is None:
+                return None
+            total += len(chunk)
+            results.extend(chunk)
+            if total > PREVIEW_FULL_ROWS:
+                results = [r for r in results if r["status"] != "valid"]
+            self._set_progress(upload.progress)
+            await asyncio.sleep(0)  # deja respirar al bucle entre trozos
+
+        self.preview_panel.set_results(results, total if total > PREVIEW_FULL_ROWS else None)
+        if self.download_report_button:
+            self.download_report_button.set_enabled(total > 0)
+        return total
+
     async def _run_validation_preview(self):
-        """Ejecuta el dry-run de validación y refresca el panel de vista previa."""
-        if not self.raw_records or not self.preview_panel or not self.preview_container:
+        """Ejecuta el dry-run de validación por trozos y refresca el panel de vista previa."""
+        upload = self.upload
+        if upload is None or not self.preview_panel or not self.preview_container:
             return
 
         with self.preview_container:
             spinner = ui.spinner(size="lg", color="orange-600").classes("absolute-center")
+        self._set_progress(0)
         try:
-            results = await self.service.validate_relational_import(
-                self.raw_records, self.mandatory_fields
+            await self._collect_preview_results(
+                self.service.validate_relational_import_chunks(
+                    upload.iter_row_chunks(IMPORT_CHUNK_ROWS), self.mandatory_fields
+                ),
+                upload,
             )
-            self.preview_panel.set_results(results)
-            if self.download_report_button:
-                self.download_report_button.set_enabled(len(results) > 0)
         except Exception as ex:
             log.error("Fallo al ejecutar la vista previa de validación", exc_info=True)
             ui.notify(f"Error al validar la vista previa: {ex}", type="negative")
         finally:
             spinner.delete()
+            self._set_progress(None)
+
+    async def _run_database_simulation(self):
+        """Sustituye la vista previa por el resultado exacto de insertar y deshacer (rpc_dry_run_import)."""
+        upload = self.upload
+        if upload is None or not self.preview_panel or not self.preview_container:
+            return
+
+        if self.simulate_button:
+            self.simulate_button.set_enabled(False)
+        with self.preview_container:
+            spinner = ui.spinner(size="lg", color="orange-600").classes("absolute-center")
+        self._set_progress(0)
+        try:
+            total = await self._collect_preview_results(
+                self.service.simulate_relational_import_chunks(upload.iter_row_chunks(DRY_RUN_CHUNK_SIZE)),
+                upload,
+            )
+            if total is None:
+                ui.notify("La simulación en base de datos no está disponible; se mantiene la vista previa.", type="warning")
+                return
+            failed = self.preview_panel.error_count
+            ui.notify(
+                f"Simulación completada sin cambios en la base de datos: {total - failed} filas se insertarían, {failed} fallarían.",
+                type="positive" if failed == 0 else "warning",
+            )
+        except Exception as ex:
+            log.error("Fallo al simular la importación en la base de datos", exc_info=True)
+            ui.notify(f"Error al simular la importación: {ex}", type="negative")
+        finally:
+            spinner.delete()
+            self._set_progress(None)
+            self._sync_importer_buttons()
 
     async def _confirm_and_execute_pipeline(self):
         """Avisa antes de insertar si la vista previa ya detectó filas con errores."""
-        if not self.raw_records:
+        if self.upload is None:
             return
 
         error_count = self.preview_panel.error_count if self.preview_panel else 0
@@ -292,7 +419,7 @@ class GenericRelationalImporterView(BaseView):
                 title="Filas con errores detectados",
                 message=(
                     f"La vista previa marcó {error_count} de {self.preview_panel.total_count} filas "
-                    "con problemas de formato o campos obligatorios ausentes. Es probable que esas "
+                    "con problemas de formato, campos obligatorios ausentes o claves duplicadas. Es probable que esas "
                     "filas concretas sean rechazadas durante la inserción, mientras que el resto se "
                     "procesará con normalidad. ¿Deseas continuar de todos modos?"
                 ),
@@ -303,20 +430,34 @@ class GenericRelationalImporterView(BaseView):
         else:
             await self._execute_pipeline()
 
+    def _job_owner(self) -> JobOwner:
+        user = app.storage.user
+        return JobOwner(user.get("user_id"), user.get("username"), tuple(user.get("roles", [])))
+
     async def _execute_pipeline(self):
-        if not self.raw_records:
+        if self.job_manager:
+            await self._submit_import_job()
+            return
+        upload = self.upload
+        if upload is None:
             return
         if self.import_button:
             self.import_button.set_enabled(False)
         if self.summary_log:
             self.summary_log.clear()
 
+        progress = self.import_progress.start(upload.row_count)
         try:
-            async for status_update in self.service.process_relational_import(self.raw_records):
+            # Las filas se leen del fichero temporal una a una según se insertan;
+            # el detalle por fila va al informe y no a la consola
+            async for status_update in self.service.process_relational_import(
+                upload.iter_rows(), total=upload.row_count, progress=progress
+            ):
                 if self.summary_log:
                     self.summary_log.push(status_update)
 
-            self.raw_records.clear()
+            self._replace_upload(None)
+            upload.close()
             if self.preview_panel:
                 self.preview_panel.clear()
             if self.download_report_button:
@@ -327,8 +468,36 @@ class GenericRelationalImporterView(BaseView):
             if self.summary_log:
                 self.summary_log.push(f"\nCRITICAL TRACEBACK: {str(ex)}")
         finally:
-            if self.import_button:
-                self.import_button.set_enabled(len(self.raw_records) > 0)
+            self.import_progress.finish()
+            self._sync_importer_buttons()
+
+    async def _submit_import_job(self):
+        """Encola la importación en segundo plano: sigue aunque se cierre la pestaña."""
+        upload = self.upload
+        if upload is None:
+            return
+        if self.import_button:
+            self.import_button.set_enabled(False)
+        try:
+            job = await self.job_manager.submit(upload, self._job_owner())
+            if job is None:
+                ui.notify("No se pudo crear el trabajo de importación.", type="negative")
+                return
+            self._replace_upload(None)
+            if self.preview_panel:
+                self.preview_panel.clear()
+            if self.download_report_button:
+                self.download_report_button.set_enabled(False)
+            if self.summary_log:
+                self.summary_log.push(f"Importación #{job.id} encolada; su progreso aparece en 'Importaciones en Segundo Plano'.")
+            ui.notify(f"Importación #{job.id} encolada en segundo plano.", type="positive")
+            if self.jobs_panel:
+                await self.jobs_panel.refresh()
+        except Exception as ex:
+            log.error("Fallo al encolar la importación", exc_info=True)
+            ui.notify(f"Error al encolar la importación: {ex}", type="negative")
+        finally:
+            self._sync_importer_buttons()
 
     # TAB 2: VINCULACIÓN AUTOMÁTICA PISO -> BLOQUE
     def _render_piso_bloque_linker_tab(self):
@@ -338,7 +507,8 @@ class GenericRelationalImporterView(BaseView):
                 ui.markdown(
                     f"Usa la vista `{PISOS_HUERFANOS_VIEW}` (similitud de direcciones, "
                     "`pg_trgm`) para sugerir a qué bloque pertenece cada piso todavía sin "
-                    "asignar, y permite vincularlos en bloque a partir de un umbral de confianza."
+                    "asignar, y permite vincularlos en bloque a partir de un umbral de confianza. "
+                    "Las sugerencias se actualizan solas al crear o editar pisos y bloques."
                 ).classes("text-sm text-gray-600")
 
             with ui.row().classes("w-full items-center gap-4 bg-gray-50 p-4 rounded-md"):
@@ -356,6 +526,13 @@ class GenericRelationalImporterView(BaseView):
                     "Buscar Sugerencias", icon="refresh", on_click=self._load_link_suggestions
                 ).props("color=blue-grey-7 outline")
 
+                if self.has_role("admin"):
+                    ui.button(
+                        "Recalcular Todo", icon="restart_alt", on_click=self._rebuild_link_suggestions
+                    ).props("color=blue-grey-7 flat").tooltip(
+                        "Reconstruye desde cero la tabla de sugerencias (normalmente no es necesario)"
+                    )
+
                 self.link_execute_button = ui.button(
                     "Vincular Automáticamente", icon="bolt", on_click=self._confirm_bulk_link
                 ).props("color=positive").set_enabled(False)
@@ -369,6 +546,8 @@ class GenericRelationalImporterView(BaseView):
                 )
                 self.link_table.create()
 
+            self.link_progress.create()
+
             with ui.card().classes("w-full p-2 h-40 bg-gray-50"):
                 ui.label("Registro de Vinculación").classes("text-caption text-gray-600 mb-1")
                 self.link_log = ui.log(max_lines=50).classes("w-full h-28 bg-white font-mono text-xs border rounded p-2")
@@ -385,6 +564,8 @@ class GenericRelationalImporterView(BaseView):
         Recarga todas las sugerencias (la vista ya filtra score > 0.5) y vuelve a
         aplicar el umbral local. Se dispara la primera vez que se entra en esta
         pestaña (vía `_on_tab_change`) y también al pulsar "Buscar Sugerencias".
+        La vista solo lee la tabla `sugerencias_pisos_huerfanos`: la búsqueda
+        difusa la hacen los triggers al cambiar pisos o bloques, no esta consulta.
         """
         with self.link_table_container:
             spinner = ui.spinner(size="lg", color="orange-600").classes("absolute-center")
@@ -402,6 +583,21 @@ class GenericRelationalImporterView(BaseView):
         finally:
             spinner.delete()
 
+    async def _rebuild_link_suggestions(self):
+        """Recalcula la tabla de sugerencias completa (solo admin) y recarga el listado."""
+        with self.link_table_container:
+            spinner = ui.spinner(size="lg", color="orange-600").classes("absolute-center")
+        try:
+            rebuilt = await self.api.call_rpc(REBUILD_SUGGESTIONS_RPC, {}, timeout=120.0)
+        finally:
+            spinner.delete()
+        if rebuilt is None:
+            ui.notify("No se pudo recalcular la tabla de sugerencias.", type="warning")
+            return
+        if self.link_log:
+            self.link_log.push(f"Sugerencias recalculadas: {rebuilt} pisos con bloque candidato.")
+        await self._load_link_suggestions()
+
     def _refresh_link_table(self):
         """Filtra las sugerencias ya cargadas por el umbral actual y refresca la tabla."""
         qualifying = [r for r in self._all_link_suggestions if (r.get(COL_SCORE) or 0) >= self.link_threshold]
@@ -437,28 +633,30 @@ class GenericRelationalImporterView(BaseView):
         if self.link_log:
             self.link_log.clear()
 
-        success, failed = 0, 0
-        for row in targets:
-            piso_id = row.get(COL_PISO_ID)
-            bloque_id = row.get(COL_BLOQUE_ID)
-            piso_addr = row.get(COL_PISO_DIR, piso_id)
-
-            if piso_id is None or bloque_id is None:
-                failed += 1
-                if self.link_log:
-                    self.link_log.push(f"✘ Fila sin piso_id/bloque_id válidos: {row}")
-                continue
-
-            result = await self.api.update_record("pisos", piso_id, {"bloque_id": bloque_id})
-            if result:
-                success += 1
-                if self.link_log:
-                    self.link_log.push(f"✔ Piso #{piso_id} ({piso_addr}) → Bloque #{bloque_id}")
-            else:
-                failed += 1
-                if self.link_log:
-                    self.link_log.push(f"✘ Piso #{piso_id} ({piso_addr}): fallo al vincular")
+        progress = self.link_progress.start(len(targets))
+        try:
+            for row in targets:
+                piso_id = row.get(COL_PISO_ID)
+                bloque_id = row.get(COL_BLOQUE_ID)
+                piso_addr = row.get(COL_PISO_DIR, piso_id)
 
+                if piso_id is None or bloque_id is None:
+                    progress.record(ERROR, f"Fila {row.get('id', '?')}", "Fila sin piso_id/bloque_id válidos")
+                    continue
+
+                result = await self.api.update_record(
+                    "pisos", piso_id, {"bloque_id": bloque_id}, notify_errors=False
+                )
+                if result:
+                    progress.record(OK, f"Piso #{piso_id} ({piso_addr})", f"→ Bloque #{bloque_id}")
+                else:
+                    progress.record(ERROR, f"Piso #{piso_id} ({piso_addr})", "Fallo al vincular")
+        finally:
+            self.link_progress.finish()
+
+        success, failed = progress.counts[OK], progress.counts[ERROR]
+        if self.link_log:
+            self.link_log.push(f"Vinculación: {progress.summary()}")
         ui.notify(
             f"Vinculación completada: {success} correctas, {failed} fallidas.",
             type="positive" if failed == 0 else "warning",
@@ -493,6 +691,8 @@ class GenericRelationalImporterView(BaseView):
                     "Reprocesar Filtrados", icon="explore", on_click=self._execute_geolink_enrichment
                 ).props("color=primary").set_enabled(False)
 
+            self.geolink_progress.create()
+
             with ui.card().classes("w-full p-2 h-40 bg-gray-50"):
                 ui.label("Registro de Enriquecimiento").classes("text-caption text-gray-600 mb-1")
                 self.geolink_log = ui.log(max_lines=50).classes("w-full h-28 bg-white font-mono text-xs border rounded p-2")
@@ -566,40 +766,42 @@ class GenericRelationalImporterView(BaseView):
         if self.geolink_log:
             self.geolink_log.clear()
 
-        updated = 0
-        for piso in targets:
-            piso_id = piso.get("id")
-            direccion = piso.get("direccion")
-            municipio = piso.get("municipio") or "Madrid"
-
-            if not piso_id or not direccion:
-                continue
-
-            ref_catastral, lat, lng = await lookup_cadastral_data(direccion, municipio)
-            await asyncio.sleep(RATE_LIMIT_SLEEP)  # misma cortesía de tasa que ETL/02-geolink.py
-
-            payload: Dict[str, Any] = {}
-            if ref_catastral:
-                payload["ref_catastral"] = ref_catastral
-            if lat is not None and lng is not None:
-                payload["coordenadas"] = to_ewkt_point(lat, lng)
-
-            if not payload:
-                if self.geolink_log:
-                    self.geolink_log.push(f"— Piso #{piso_id} ({direccion}): sin coincidencia en CartoCiudad")
-                continue
-
-            result = await self.api.update_record("pisos", piso_id, payload)
-            if result:
-                updated += 1
-                if self.geolink_log:
-                    self.geolink_log.push(f"✔ Piso #{piso_id} ({direccion}): {', '.join(payload.keys())} actualizado")
-            else:
-                if self.geolink_log:
-                    self.geolink_log.push(f"✘ Piso #{piso_id} ({direccion}): fallo al guardar")
+        progress = self.geolink_progress.start(len(targets))
+        try:
+            for piso in targets:
+                piso_id = piso.get("id")
+                direccion = piso.get("direccion")
+                municipio = piso.get("municipio") or "Madrid"
+
+                if not piso_id or not direccion:
+                    progress.record(SKIPPED, f"Piso #{piso_id}", "Sin dirección")
+                    continue
+
+                ref_catastral, lat, lng = await lookup_cadastral_data(direccion, municipio)
+                await asyncio.sleep(RATE_LIMIT_SLEEP)  # misma cortesía de tasa que ETL/02-geolink.py
+
+                payload: Dict[str, Any] = {}
+                if ref_catastral:
+                    payload["ref_catastral"] = ref_catastral
+                if lat is not None and lng is not None:
+                    payload["coordenadas"] = to_ewkt_point(lat, lng)
+
+                if not payload:
+                    progress.record(SKIPPED, f"Piso #{piso_id} ({direccion})", "Sin coincidencia en CartoCiudad")
+                    continue
+
+                result = await self.api.update_record("pisos", piso_id, payload, notify_errors=False)
+                if result:
+                    progress.record(OK, f"Piso #{piso_id} ({direccion})", f"{', '.join(payload.keys())} actualizado")
+                else:
+                    progress.record(ERROR, f"Piso #{piso_id} ({direccion})", "Fallo al guardar")
+        finally:
+            self.geolink_progress.finish()
 
+        if self.geolink_log:
+            self.geolink_log.push(f"Enriquecimiento: {progress.summary()}")
         ui.notify(
-            f"Enriquecimiento finalizado: {updated}/{len(targets)} pisos actualizados.",
+            f"Enriquecimiento finalizado: {progress.counts[OK]}/{len(targets)} pisos actualizados.",
             type="positive",
         )
         # autofilled pisos would automatically drop from the list
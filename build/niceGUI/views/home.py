@@ -1,16 +1,21 @@
 # /build/niceGUI/views/home.py
 import os
-from typing import Callable
+from typing import Callable, Optional
 from nicegui import ui, app
 
+from api.client import APIClient
 from components.base_view import BaseView
 
 
 class HomeView(BaseView):
     """Home page view with role-based card visibility"""
 
-    def __init__(self, navigate: Callable[[str], None]):
+    def __init__(
+        self, navigate: Callable[[str], None], api_client: Optional[APIClient] = None
+    ):
         self.navigate = navigate
+        self.api = api_client
+        self.stats_row = None
 
     def create(self) -> ui.column:
         """Create the home view UI with role-based card visibility"""
@@ -35,6 +40,10 @@ class HomeView(BaseView):
                     "text-subtitle1 text-gray-600 text-center"
                 )
 
+            if self.api and self.has_role("admin", "gestor", "actas"):
+                self.stats_row = ui.row().classes("gap-2 flex-wrap justify-center")
+                ui.timer(0.1, self._load_conflict_stats, once=True)
+
             with ui.row().classes("gap-8 flex-wrap justify-center"):
                 if self.has_role("admin"):
                     self._create_card(
@@ -93,6 +102,24 @@ class HomeView(BaseView):
 
         return container
 
+    async def _load_conflict_stats(self):
+        """Conflict counters from the cached server-side aggregate (no row download)."""
+        stats = await self.api.get_conflict_stats()
+        if not stats or not self.stats_row:
+            return
+        self.stats_row.clear()
+        with self.stats_row:
+            ui.chip(
+                f"Conflictos: {stats.get('total', 0)}", color="blue", icon="gavel"
+            )
+            for estado, count in sorted(stats.get("estado", {}).items()):
+                color = {
+                    "Abierto": "red",
+                    "Victoria": "green",
+                    "Cerrado": "gray",
+                }.get(estado, "blue")
+                ui.chip(f"{estado}: {count}", color=color)
+
     def _create_card(
         self,
         icon: str,
@@ -1,21 +1,40 @@
 from nicegui import ui
+from fastapi import Request
 from api.client import APIClient
+from api.validate import validator
+from services.join_queue import JoinSubmission, JoinSubmissionQueue
 import logging
 from pathlib import Path
 import re
 from datetime import date
+from typing import Optional
 
 log = logging.getLogger(__name__)
 
 LOGO_PATH = Path(__file__).parent.parent / "assets" / "images" / "logo.png"
 
+ALREADY_MEMBER_MESSAGE = (
+    "Ya constaba tu alta previa con este DNI/CIF. "
+    "Para actualizar tus datos, contacta con la oficina "
+    "del sindicato."
+)
+
+
+def client_ip(request: Request) -> str:
+    """Caller's address; behind nginx it comes in X-Real-IP (set from $remote_addr)."""
+    return request.headers.get("x-real-ip") or (request.client.host if request.client else "")
+
+
 class PublicJoinForm:
-    def __init__(self, api_client: APIClient):
+    def __init__(self, api_client: APIClient, join_queue: Optional[JoinSubmissionQueue] = None):
         self.api = api_client
+        # Without a queue (e.g. tests) sign-ups are saved inline, as before
+        self.join_queue = join_queue
 
     def setup_public_routes(self):
         @ui.page("/join")
-        async def join_page():
+        async def join_page(request: Request):
+            ip = client_ip(request)
             form_container = ui.column().classes("w-full items-center mt-10")
 
             with form_container:
@@ -71,6 +90,13 @@ class PublicJoinForm:
                             )
                             return
                         
+                        if self.join_queue and not self.join_queue.allow(ip):
+                            ui.notify(
+                                "Has enviado el formulario demasiadas veces. Espera un minuto e inténtalo de nuevo.",
+                                type="warning",
+                            )
+                            return
+
                         # 1. Data Sanitization 
                         # .strip() naturally removes both leading and trailing whitespaces.
                         # re.sub() removes internal duplicate spaces.
@@ -93,63 +119,16 @@ class PublicJoinForm:
                             "estado": "Bienvenida"
                         }
 
-                        # 2. Application-Level Upsert Logic
-                        # First, check if the pre-afiliada already exists by CIF
-                        existing_records = await self.api.get_records(
-                            "afiliadas", 
-                            filters={"cif": f"eq.{clean_cif}"}
-                        )
+                        is_valid, errors = validator.validate_record("afiliadas", data, "create")
+                        if not is_valid:
+                            ui.notify(f'Revisa los datos: {"; ".join(errors)}', type="warning")
+                            return
 
-                        success = False
-                        
-                        if existing_records:
-                            # They exist! UPDATE the record (transform 'Importado' -> 'TRUE')
-                            existing_id = existing_records[0]["id"]
-                            updated_record = await self.api.update_record(
-                                "afiliadas", 
-                                existing_id, 
-                                data
-                            )
-                            if updated_record:
-                                success = True
-                            else:
-                                ui.notify("Error al actualizar los datos existentes.", type="negative")
+                        # 2. Save: queued for the batch worker, or inline without a queue
+                        if self.join_queue is None:
+                            success = await self._save_inline(data)
                         else:
-                            # They don't exist, INSERT as a brand new record.
-                            #
-                            # Edge case under the new signup RLS (audit item
-                            # #1 — see build/postgreSQL/init-scripts/
-                            # 06-init-rls.sql section 3b): anonymous
-                            # callers can only SEE rows still awaiting
-                            # promotion (estado='Bienvenida'). If this CIF
-                            # was previously registered AND already promoted
-                            # to Alta/Baja, the SELECT above comes back empty
-                            # (RLS hides the row) and we fall through to
-                            # this INSERT — which then hits the UNIQUE
-                            # constraint on `cif` (23505). Detect that
-                            # case here and present a friendly message
-                            # instead of "Error de Duplicado…": we know it
-                            # means the caller is already a real member, so
-                            # point them at the office to update their
-                            # details. This preserves the security property
-                            # (no anonymous overwrites of promoted members)
-                            # without degrading the UX.
-                            created_record, error = await self.api.create_record(
-                                "afiliadas",
-                                data,
-                                return_representation=False
-                            )
-                            if created_record:
-                                success = True
-                            elif error and "Duplicado" in error:
-                                ui.notify(
-                                    "Ya constaba tu alta previa con este DNI/CIF. "
-                                    "Para actualizar tus datos, contacta con la oficina "
-                                    "del sindicato.",
-                                    type="warning",
-                                )
-                            else:
-                                ui.notify(f"{error}", type="negative")
+                            success = await self._enqueue(data)
 
                         # 3. Success UI Update
                         if success:
@@ -167,4 +146,80 @@ class PublicJoinForm:
                                         "Nos pondremos en contacto contigo pronto."
                                     ).classes("text-lg text-center text-gray-700")
 
-                    send_btn.on("click", submit)
\ No newline at end of file
+                    send_btn.on("click", submit)
+
+    async def _enqueue(self, data: dict) -> bool:
+        """
+        Checks the CIF/email with rpc_join_lookup and queues the sign-up for
+        the batch worker (services/join_queue.py); the person is thanked
+        before it reaches the database.
+        """
+        found = await self.join_queue.lookup(data["cif"], data["email"], data["nombre"], data["apellidos"])
+        if found and found[0] == "afiliada":
+            ui.notify(ALREADY_MEMBER_MESSAGE, type="warning")
+            return False
+        pending_id = found[1] if found else None
+        if not self.join_queue.submit(JoinSubmission(data, pending_id)):
+            ui.notify(
+                "Estamos recibiendo muchas inscripciones ahora mismo. "
+                "Inténtalo de nuevo en unos minutos.",
+                type="warning",
+            )
+            return False
+        return True
+
+    async def _save_inline(self, data: dict) -> bool:
+        """Application-level upsert on the shared pool, awaiting each request."""
+        # First, check if the pre-afiliada already exists by CIF
+        existing_records = await self.api.get_records(
+            "afiliadas", 
+            filters={"cif": f"eq.{data['cif']}"}
+        )
+
+        success = False
+
+        if existing_records:
+            # They exist! UPDATE the record (transform 'Importado' -> 'TRUE')
+            existing_id = existing_records[0]["id"]
+            updated_record = await self.api.update_record(
+                "afiliadas", 
+                existing_id, 
+                data
+            )
+            if updated_record:
+                success = True
+            else:
+                ui.notify("Error al actualizar los datos existentes.", type="negative")
+        else:
+            # They don't exist, INSERT as a brand new record.
+            #
+            # Edge case under the new signup RLS (audit item
+            # #1 — see build/postgreSQL/init-scripts/
+            # 06-init-rls.sql section 3b): anonymous
+            # callers can only SEE rows still awaiting
+            # promotion (estado='Bienvenida'). If this CIF
+            # was previously registered AND already promoted
+            # to Alta/Baja, the SELECT above comes back empty
+            # (RLS hides the row) and we fall through to
+            # this INSERT — which then hits the UNIQUE
+            # constraint on `cif` (23505). Detect that
+            # case here and present a friendly message
+            # instead of "Error de Duplicado…": we know it
+            # means the caller is already a real member, so
+            # point them at the office to update their
+            # details. This preserves the security property
+            # (no anonymous overwrites of promoted members)
+            # without degrading the UX.
+            created_record, error = await self.api.create_record(
+                "afiliadas",
+                data,
+                return_representation=False
+            )
+            if created_record:
+                success = True
+            elif error and "Duplicado" in error:
+                ui.notify(ALREADY_MEMBER_MESSAGE, type="warning")
+            else:
+                ui.notify(f"{error}", type="negative")
+
+        return success
@@ -1,6 +1,6 @@
 # build/niceGUI/views/views_explorer.py (Refactored & Secure)
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from nicegui import ui, app
 
 from api.client import APIClient
@@ -9,8 +9,9 @@ from components.data_table import DataTable
 from components.filters import FilterPanel
 from components.exporter import export_to_csv
 from components.relationship_explorer import RelationshipExplorer
+from components.map_panel import MapPanel
 from components.base_view import BaseView
-from config import VIEW_INFO, TABLE_INFO, VIEW_ORDER
+from config import VIEW_INFO, TABLE_INFO, VIEW_ORDER, view_read_source
 
 
 class ViewsExplorerView(BaseView):
@@ -31,6 +32,7 @@ class ViewsExplorerView(BaseView):
         self.filter_panel = None
         self.relationship_explorer = None
         self.data_table_instance = None
+        self.map_panel = None
 
     def create(self) -> ui.column:
         """Create the views explorer UI."""
@@ -65,6 +67,8 @@ class ViewsExplorerView(BaseView):
             # Layout structural placeholders
             self.filter_container = ui.column().classes("w-full")
             self.data_table_container = ui.column().classes("w-full")
+            self.map_panel = MapPanel(self.api)
+            self.map_panel.create()
             ui.separator().classes("my-4")
             self.detail_container = ui.column().classes("w-full")
             self.relationship_explorer = RelationshipExplorer(self.api, self.detail_container)
@@ -114,7 +118,7 @@ class ViewsExplorerView(BaseView):
         with self.data_table_container:
             spinner = ui.spinner(size="lg", color="orange-600").classes("absolute-center")
             try:
-                records = await self.api.get_records(view, limit=20000)
+                records = await self._fetch_view_records(view)
                 base_table_config = TABLE_INFO.get(base_table_name, {})
                 
                 self.state.set_records(records, base_table_config)
@@ -136,11 +140,31 @@ class ViewsExplorerView(BaseView):
             finally:
                 spinner.delete()
 
+    async def _fetch_view_records(self, view: str) -> List[Dict[str, Any]]:
+        """
+        One capped request from offset 0 (the materialized twin if enabled):
+        the whole result is rendered at once, so walking keyset pages would
+        only add round trips.
+        """
+        return await self.api.get_records(view_read_source(view), limit=20000)
+
     async def _on_row_click(self, record: Dict[str, Any]):
         """Delegated action handler when a table row receives a click event."""
         view_name = self.state.selected_entity_name.value
         if view_name:
             await self.relationship_explorer.show_details(record, view_name, "views")
+            if self.map_panel and self.map_panel.is_open:
+                await self._show_record_on_map(view_name, record)
+
+    async def _show_record_on_map(self, view_name: str, record: Dict[str, Any]):
+        """With the map open, a piso/bloque row (or one carrying piso_id) shows its surroundings."""
+        base_table = VIEW_INFO.get(view_name, {}).get("base_table")
+        if base_table == "pisos" and record.get("id"):
+            await self.map_panel.show_nearby(piso_id=record["id"])
+        elif base_table == "bloques" and record.get("id"):
+            await self.map_panel.show_nearby(bloque_id=record["id"])
+        elif record.get("piso_id"):
+            await self.map_panel.show_nearby(piso_id=record["piso_id"])
 
     def _setup_filters(self, base_table_config: Dict[str, Any]):
         """Builds and wires the filter panel container."""
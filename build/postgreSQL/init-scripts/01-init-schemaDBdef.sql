@@ -80,6 +80,7 @@ CREATE TABLE IF NOT EXISTS bloques (
     empresa_id INTEGER REFERENCES empresas (id) ON DELETE SET NULL,
     agrupacion_bloque_id INTEGER REFERENCES agrupacion_bloques (id) ON DELETE SET NULL,
     direccion TEXT UNIQUE,
+    direccion_normalizada TEXT, -- normalize_address_for_match(direccion), mantenida por trigger (02)
     fecha_alta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -118,10 +119,22 @@ CREATE TABLE IF NOT EXISTS pisos (
     vpo_date DATE,
     ref_catastral TEXT,
     coordenadas geometry(Point, 4326),
+    direccion_normalizada TEXT, -- normalize_address_for_match(direccion), mantenida por trigger (02)
     fecha_alta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Mejor bloque candidato de cada piso sin bloque (score > 0.5). La mantienen
+-- los triggers de 02 (recalculo incremental) y rpc_rebuild_sugerencias_pisos_huerfanos.
+-- bloque_id no lleva FK: al borrar un bloque el trigger busca otro candidato
+-- en lugar de perder la sugerencia por cascada.
+CREATE TABLE IF NOT EXISTS sugerencias_pisos_huerfanos (
+    piso_id INTEGER PRIMARY KEY REFERENCES pisos (id) ON DELETE CASCADE,
+    bloque_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 CREATE TABLE IF NOT EXISTS afiliadas (
     id SERIAL PRIMARY KEY,
     piso_id INTEGER REFERENCES pisos (id) ON DELETE SET NULL,
@@ -196,11 +209,48 @@ CREATE TABLE IF NOT EXISTS diario_conflictos (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Trabajos de importación en segundo plano (services/import_jobs.py). El CSV
+-- se guarda en IMPORT_JOBS_DIR del contenedor de la app (ruta_archivo es solo
+-- el nombre generado del fichero, no una ruta); aquí viven el estado
+-- y el resultado de cada fila. filas_procesadas es la marca de agua: las
+-- filas hasta ella están confirmadas (rpc_import_job_commit) y un trabajo
+-- interrumpido se reanuda desde la siguiente.
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER REFERENCES usuarios (id) ON DELETE SET NULL DEFAULT NULLIF(current_setting('request.jwt.claims', true)::jsonb ->> 'sub', '')::INTEGER,
+    archivo TEXT,
+    ruta_archivo TEXT NOT NULL,
+    codificacion TEXT NOT NULL DEFAULT 'utf-8',
+    estado TEXT NOT NULL DEFAULT 'en_cola' CHECK (estado IN ('en_cola', 'en_curso', 'completado', 'cancelado', 'error')),
+    total_filas INTEGER,
+    filas_procesadas INTEGER NOT NULL DEFAULT 0,
+    filas_ok INTEGER NOT NULL DEFAULT 0,
+    filas_error INTEGER NOT NULL DEFAULT 0,
+    cancelacion_solicitada BOOLEAN NOT NULL DEFAULT FALSE,
+    mensaje TEXT,
+    created_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS import_job_filas (
+    job_id INTEGER NOT NULL REFERENCES import_jobs (id) ON DELETE CASCADE,
+    fila INTEGER NOT NULL,
+    estado TEXT NOT NULL CHECK (estado IN ('ok', 'error')),
+    mensaje TEXT,
+    ids JSONB, -- {"bloques": 12, "pisos": 40, ...} creados para la fila
+    PRIMARY KEY (job_id, fila)
+);
+
 -- Crear índices
 CREATE INDEX IF NOT EXISTS idx_nodos_cp_mapping_nodo_id ON nodos_cp_mapping (nodo_id);
 
 CREATE INDEX IF NOT EXISTS idx_empresas_entramado_id ON empresas (entramado_id);
 
+-- Carga ETL (03-load-from-csv.sql): empresas se casan por nombre
+CREATE INDEX IF NOT EXISTS idx_empresas_nombre ON empresas (nombre);
+
 CREATE INDEX IF NOT EXISTS idx_usuario_roles_role_id ON usuario_roles (role_id);
 
 CREATE INDEX IF NOT EXISTS idx_bloques_agrupacion_bloque_id ON bloques (agrupacion_bloque_id);
@@ -211,8 +261,17 @@ CREATE INDEX IF NOT EXISTS idx_pisos_bloque_id ON pisos (bloque_id);
 
 CREATE INDEX IF NOT EXISTS idx_pisos_provincia_id ON pisos (provincia_id);
 
+-- Clave de unión con nodos_cp_mapping en todas las vistas y filtros por nodo
+CREATE INDEX IF NOT EXISTS idx_pisos_cp ON pisos (cp);
+
+-- Carga ETL: propagación de bloque_id entre pisos con la misma referencia catastral
+CREATE INDEX IF NOT EXISTS idx_pisos_ref_catastral ON pisos (ref_catastral) WHERE ref_catastral IS NOT NULL;
+
 CREATE INDEX IF NOT EXISTS idx_afiliadas_piso_id ON afiliadas (piso_id);
 
+-- Paginación por keyset (rpc_page_afiliadas) filtrando por estado
+CREATE INDEX IF NOT EXISTS idx_afiliadas_estado_id ON afiliadas (estado, id);
+
 CREATE INDEX IF NOT EXISTS idx_facturacion_afiliada_id ON facturacion (afiliada_id);
 
 CREATE INDEX IF NOT EXISTS idx_asesorias_afiliada_id ON asesorias (afiliada_id);
@@ -221,9 +280,30 @@ CREATE INDEX IF NOT EXISTS idx_asesorias_tecnica_id ON asesorias (tecnica_id);
 
 CREATE INDEX IF NOT EXISTS idx_conflictos_afiliada_id ON conflictos (afiliada_id);
 
-CREATE INDEX IF NOT EXISTS idx_diario_conflictos_conflicto_id ON diario_conflictos (conflicto_id);
+-- Paginación por keyset (rpc_page_conflictos, id.desc) filtrando por estado
+CREATE INDEX IF NOT EXISTS idx_conflictos_estado_id ON conflictos (estado, id DESC);
+
+-- Historial paginado por keyset (conflicto_id, created_at DESC, id DESC); también cubre la FK
+CREATE INDEX IF NOT EXISTS idx_diario_conflictos_conflicto_fecha ON diario_conflictos (conflicto_id, created_at DESC, id DESC);
 
 CREATE INDEX IF NOT EXISTS idx_diario_conflictos_usuario_id ON diario_conflictos (usuario_id);
 
+CREATE INDEX IF NOT EXISTS idx_sugerencias_pisos_huerfanos_bloque_id ON sugerencias_pisos_huerfanos (bloque_id);
+
+CREATE INDEX IF NOT EXISTS idx_sugerencias_pisos_huerfanos_score ON sugerencias_pisos_huerfanos (score DESC);
+
 -- ÍNDICE ESPACIAL CRUCIAL: Acelera búsquedas de radio, mapas de calor y agrupaciones por zona
-CREATE INDEX IF NOT EXISTS idx_pisos_spatial_coordenadas ON pisos USING gist (coordenadas);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_pisos_spatial_coordenadas ON pisos USING gist (coordenadas);
+
+-- Radios en metros (rpc_pisos_cercanos): ST_DWithin sobre geography necesita su propio índice
+CREATE INDEX IF NOT EXISTS idx_pisos_coordenadas_geog ON pisos USING gist ((coordenadas::geography));
+
+-- Listado de trabajos de importación de cada usuaria (más recientes primero)
+CREATE INDEX IF NOT EXISTS idx_import_jobs_usuario_id ON import_jobs (usuario_id, id DESC);
+
+-- Importador: casar bloques del CSV con los existentes por dirección normalizada (igualdad)
+CREATE INDEX IF NOT EXISTS idx_bloques_direccion_normalizada ON bloques (direccion_normalizada);
+
+-- Formulario público /join (rpc_join_lookup): el CIF ya tiene su índice UNIQUE
+-- (fn_normalize_afiliada_data lo guarda en mayúsculas); el email se compara normalizado
+CREATE INDEX IF NOT EXISTS idx_afiliadas_email_normalizado ON afiliadas (lower(btrim(email)));
@@ -69,6 +69,65 @@ BEGIN
 END;
 $$;
 
+-- =====================================================================
+-- TRIGGER: direccion_normalizada (pisos, bloques)
+-- =====================================================================
+-- La dirección normalizada se guarda en la propia fila para que las
+-- búsquedas difusas no recalculen normalize_address_for_match() por cada
+-- pareja piso/bloque y puedan usar índices trigram en ambos lados.
+-- NULL cuando la dirección no produce nada comparable.
+
+CREATE OR REPLACE FUNCTION sindicato_inq.fn_set_direccion_normalizada()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.direccion_normalizada := NULLIF(sindicato_inq.normalize_address_for_match(NEW.direccion), '');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pisos_direccion_normalizada ON pisos;
+CREATE TRIGGER trg_pisos_direccion_normalizada
+BEFORE INSERT OR UPDATE OF direccion, direccion_normalizada ON pisos
+FOR EACH ROW
+EXECUTE FUNCTION sindicato_inq.fn_set_direccion_normalizada();
+
+DROP TRIGGER IF EXISTS trg_bloques_direccion_normalizada ON bloques;
+CREATE TRIGGER trg_bloques_direccion_normalizada
+BEFORE INSERT OR UPDATE OF direccion, direccion_normalizada ON bloques
+FOR EACH ROW
+EXECUTE FUNCTION sindicato_inq.fn_set_direccion_normalizada();
+
+-- Relleno de filas existentes (no-op en una base recién creada)
+UPDATE pisos
+SET direccion_normalizada = NULLIF(normalize_address_for_match(direccion), '')
+WHERE direccion_normalizada IS DISTINCT FROM NULLIF(normalize_address_for_match(direccion), '');
+
+UPDATE bloques
+SET direccion_normalizada = NULLIF(normalize_address_for_match(direccion), '')
+WHERE direccion_normalizada IS DISTINCT FROM NULLIF(normalize_address_for_match(direccion), '');
+
+-- =====================================================================
+-- INDEX: accelerate normalized comparison
+-- =====================================================================
+-- GIN resuelve el filtro `%` y GiST el orden por distancia `<->` (KNN),
+-- que es lo que usan los LATERAL ... ORDER BY ... LIMIT 1.
+
+DROP INDEX IF EXISTS idx_bloques_normalized_trgm;
+DROP INDEX IF EXISTS bloques_normalized_gist_idx;
+DROP INDEX IF EXISTS pisos_normalized_gist_idx;
+
+CREATE INDEX IF NOT EXISTS idx_bloques_direccion_normalizada_trgm
+ON sindicato_inq.bloques
+USING gin (direccion_normalizada gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_bloques_direccion_normalizada_gist
+ON sindicato_inq.bloques
+USING gist (direccion_normalizada gist_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_pisos_direccion_normalizada_gist
+ON sindicato_inq.pisos
+USING gist (direccion_normalizada gist_trgm_ops);
+
 -- =====================================================================
 -- VIEW: sindicato_inq.v_bloque_suggestion_scores
 -- =====================================================================
@@ -76,49 +135,24 @@ $$;
 DROP VIEW IF EXISTS sindicato_inq.v_bloque_suggestion_scores CASCADE;
 
 CREATE OR REPLACE VIEW sindicato_inq.v_bloque_suggestion_scores AS
-WITH normalized_pisos AS (
-    SELECT
-        p.id AS piso_id,
-        p.direccion AS piso_direccion,
-        normalize_address_for_match(p.direccion) AS normalized_direccion
-    FROM sindicato_inq.pisos p
-    WHERE p.direccion IS NOT NULL
-      AND btrim(p.direccion) <> ''
-      AND normalize_address_for_match(p.direccion) <> ''
-),
-normalized_bloques AS (
+SELECT
+    p.id AS piso_id,
+    p.direccion AS piso_direccion,
+    s.bloque_id AS top_match_bloque_id,
+    s.bloque_direccion AS top_match_bloque_direccion,
+    s.score AS top_match_score
+FROM sindicato_inq.pisos p
+CROSS JOIN LATERAL (
     SELECT
         b.id AS bloque_id,
         b.direccion AS bloque_direccion,
-        normalize_address_for_match(b.direccion) AS normalized_direccion
+        similarity(b.direccion_normalizada, p.direccion_normalizada) AS score
     FROM sindicato_inq.bloques b
-    WHERE b.direccion IS NOT NULL
-      AND btrim(b.direccion) <> ''
-      AND normalize_address_for_match(b.direccion) <> ''
-),
-scored AS (
-    SELECT
-        np.piso_id,
-        np.piso_direccion,
-        nb.bloque_id,
-        nb.bloque_direccion,
-        similarity(np.normalized_direccion, nb.normalized_direccion) AS score,
-        ROW_NUMBER() OVER (
-            PARTITION BY np.piso_id
-            ORDER BY (np.normalized_direccion <-> nb.normalized_direccion) ASC
-        ) AS rn
-    FROM normalized_pisos np
-    JOIN normalized_bloques nb
-      ON (np.normalized_direccion % nb.normalized_direccion)
-)
-SELECT
-    piso_id,
-    piso_direccion,
-    bloque_id AS top_match_bloque_id,
-    bloque_direccion AS top_match_bloque_direccion,
-    score AS top_match_score
-FROM scored
-WHERE rn = 1;
+    WHERE b.direccion_normalizada % p.direccion_normalizada
+    ORDER BY b.direccion_normalizada <-> p.direccion_normalizada ASC
+    LIMIT 1
+) s
+WHERE p.direccion_normalizada IS NOT NULL;
 
 -- =====================================================================
 -- FUNCTION: rpc_get_bloque_suggestions
@@ -175,49 +209,37 @@ BEGIN
                 NULLIF(btrim(value->>'direccion'), '') AS direccion
             FROM jsonb_array_elements(p_addresses) WITH ORDINALITY AS t(value, ord)
         ),
+        -- Las direcciones de entrada se normalizan una sola vez; los bloques ya
+        -- traen la suya almacenada e indexada.
         normalized_inputs AS (
-            SELECT
-                idx,
-                direccion,
-                normalize_address_for_match(direccion) AS normalized
-            FROM input_rows
-            WHERE direccion IS NOT NULL
-              AND normalize_address_for_match(direccion) <> ''
-        ),
-        normalized_bloques AS (
-            SELECT
-                b.id,
-                b.direccion,
-                normalize_address_for_match(b.direccion) AS normalized
-            FROM sindicato_inq.bloques b
-            WHERE b.direccion IS NOT NULL
-              AND btrim(b.direccion) <> ''
-              AND normalize_address_for_match(b.direccion) <> ''
+            SELECT idx, direccion, normalized
+            FROM (
+                SELECT
+                    idx,
+                    direccion,
+                    normalize_address_for_match(direccion) AS normalized
+                FROM input_rows
+                WHERE direccion IS NOT NULL
+            ) n
+            WHERE normalized <> ''
         ),
-        scored AS (
+        ranked AS (
             SELECT
                 ni.idx,
-                ni.direccion,
-                nb.id AS bloque_id,
-                nb.direccion AS bloque_direccion,
-                similarity(ni.normalized, nb.normalized) AS score,
-                ROW_NUMBER() OVER (
-                    PARTITION BY ni.idx
-                    ORDER BY (ni.normalized <-> nb.normalized) ASC
-                ) AS rn
+                CASE WHEN s.score >= p_score_limit THEN s.bloque_id ELSE NULL END AS suggested_bloque_id,
+                CASE WHEN s.score >= p_score_limit THEN s.bloque_direccion ELSE NULL END AS suggested_bloque_direccion,
+                CASE WHEN s.score >= p_score_limit THEN s.score ELSE NULL END AS suggested_score
             FROM normalized_inputs ni
-            JOIN normalized_bloques nb
-              ON (ni.normalized % nb.normalized)
-        ),
-        ranked AS (
-            SELECT
-                idx,
-                direccion,
-                CASE WHEN score >= p_score_limit THEN bloque_id ELSE NULL END AS suggested_bloque_id,
-                CASE WHEN score >= p_score_limit THEN bloque_direccion ELSE NULL END AS suggested_bloque_direccion,
-                CASE WHEN score >= p_score_limit THEN score ELSE NULL END AS suggested_score
-            FROM scored
-            WHERE rn = 1
+            CROSS JOIN LATERAL (
+                SELECT
+                    b.id AS bloque_id,
+                    b.direccion AS bloque_direccion,
+                    similarity(b.direccion_normalizada, ni.normalized) AS score
+                FROM sindicato_inq.bloques b
+                WHERE b.direccion_normalizada % ni.normalized
+                ORDER BY b.direccion_normalizada <-> ni.normalized ASC
+                LIMIT 1
+            ) s
         )
         SELECT
             ir.idx AS piso_id,
@@ -233,14 +255,187 @@ END;
 $$;
 
 -- =====================================================================
--- INDEX: accelerate normalized comparison
+-- TABLE MAINTENANCE: sugerencias_pisos_huerfanos
 -- =====================================================================
+-- La tabla (01) guarda el mejor bloque de cada piso sin bloque. Los triggers
+-- solo recalculan los pisos afectados por cada sentencia: los que cambian de
+-- dirección o de bloque, y los huérfanos cercanos a un bloque nuevo,
+-- modificado o borrado. El umbral de `%` se fija en cada función porque
+-- set_limit() (rpc_get_bloque_suggestions) lo cambia para toda la sesión.
 
-DROP INDEX IF EXISTS idx_bloques_normalized_trgm;
+CREATE OR REPLACE FUNCTION sindicato_inq.fn_recompute_sugerencias_pisos(p_piso_ids INT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = sindicato_inq, public
+SET pg_trgm.similarity_threshold = 0.5
+AS $$
+DECLARE
+    v_rows INTEGER;
+BEGIN
+    IF p_piso_ids IS NULL OR cardinality(p_piso_ids) = 0 THEN
+        RETURN 0;
+    END IF;
 
-CREATE INDEX idx_bloques_normalized_trgm
-ON sindicato_inq.bloques
-USING gin (normalize_address_for_match(direccion) gin_trgm_ops);
+    DELETE FROM sugerencias_pisos_huerfanos WHERE piso_id = ANY (p_piso_ids);
+
+    INSERT INTO sugerencias_pisos_huerfanos (piso_id, bloque_id, score)
+    SELECT p.id, s.id, s.score
+    FROM pisos p
+    CROSS JOIN LATERAL (
+        SELECT
+            b.id,
+            similarity(b.direccion_normalizada, p.direccion_normalizada) AS score
+        FROM bloques b
+        WHERE b.direccion_normalizada % p.direccion_normalizada
+        ORDER BY b.direccion_normalizada <-> p.direccion_normalizada ASC
+        LIMIT 1
+    ) s
+    WHERE p.id = ANY (p_piso_ids)
+      AND p.bloque_id IS NULL
+      AND p.direccion_normalizada IS NOT NULL
+      AND s.score > 0.5
+    ON CONFLICT (piso_id) DO UPDATE
+        SET bloque_id = EXCLUDED.bloque_id,
+            score = EXCLUDED.score,
+            computed_at = CURRENT_TIMESTAMP;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+-- Una sola función para los cinco triggers de sentencia (las tablas de
+-- transición no admiten varios eventos por trigger).
+CREATE OR REPLACE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = sindicato_inq, public
+SET pg_trgm.similarity_threshold = 0.5
+AS $$
+DECLARE
+    v_ids INT[];
+BEGIN
+    IF TG_TABLE_NAME = 'pisos' THEN
+        IF TG_OP = 'INSERT' THEN
+            v_ids := ARRAY(SELECT id FROM new_rows WHERE bloque_id IS NULL);
+        ELSE
+            -- Cambio de dirección, o el piso se vincula / desvincula de un bloque
+            v_ids := ARRAY(
+                SELECT n.id
+                FROM new_rows n
+                JOIN old_rows o ON o.id = n.id
+                WHERE n.direccion_normalizada IS DISTINCT FROM o.direccion_normalizada
+                   OR n.bloque_id IS DISTINCT FROM o.bloque_id
+            );
+        END IF;
+    ELSIF TG_OP = 'INSERT' THEN
+        -- Huérfanos a los que el bloque nuevo puede mejorar la sugerencia
+        v_ids := ARRAY(
+            SELECT DISTINCT p.id
+            FROM new_rows n
+            JOIN pisos p ON p.direccion_normalizada % n.direccion_normalizada
+            WHERE p.bloque_id IS NULL
+        );
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Pisos que apuntaban al bloque y huérfanos cercanos a su nueva dirección
+        v_ids := ARRAY(
+            WITH changed AS (
+                SELECT n.id, n.direccion_normalizada
+                FROM new_rows n
+                JOIN old_rows o ON o.id = n.id
+                WHERE n.direccion_normalizada IS DISTINCT FROM o.direccion_normalizada
+            )
+            SELECT s.piso_id
+            FROM sugerencias_pisos_huerfanos s
+            JOIN changed c ON c.id = s.bloque_id
+            UNION
+            SELECT p.id
+            FROM changed c
+            JOIN pisos p ON p.direccion_normalizada % c.direccion_normalizada
+            WHERE p.bloque_id IS NULL
+        );
+    ELSE
+        -- DELETE: los pisos que lo tenían como sugerencia buscan otro candidato
+        v_ids := ARRAY(
+            SELECT s.piso_id
+            FROM sugerencias_pisos_huerfanos s
+            JOIN old_rows o ON o.id = s.bloque_id
+        );
+    END IF;
+
+    PERFORM fn_recompute_sugerencias_pisos(v_ids);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_sugerencias_pisos_ins ON pisos;
+CREATE TRIGGER trg_sugerencias_pisos_ins
+AFTER INSERT ON pisos
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos();
+
+DROP TRIGGER IF EXISTS trg_sugerencias_pisos_upd ON pisos;
+CREATE TRIGGER trg_sugerencias_pisos_upd
+AFTER UPDATE ON pisos
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos();
+
+DROP TRIGGER IF EXISTS trg_sugerencias_bloques_ins ON bloques;
+CREATE TRIGGER trg_sugerencias_bloques_ins
+AFTER INSERT ON bloques
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos();
+
+DROP TRIGGER IF EXISTS trg_sugerencias_bloques_upd ON bloques;
+CREATE TRIGGER trg_sugerencias_bloques_upd
+AFTER UPDATE ON bloques
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos();
+
+DROP TRIGGER IF EXISTS trg_sugerencias_bloques_del ON bloques;
+CREATE TRIGGER trg_sugerencias_bloques_del
+AFTER DELETE ON bloques
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION sindicato_inq.fn_sync_sugerencias_pisos_huerfanos();
+
+-- Recalculo completo (cambios en normalize_address_for_match, restauraciones,
+-- cargas con triggers desactivados...). Solo admin cuando llega por PostgREST;
+-- sin claims JWT (psql) se permite siempre.
+CREATE OR REPLACE FUNCTION rpc_rebuild_sugerencias_pisos_huerfanos()
+RETURNS INTEGER
+LANGUAGE plpgsql
+VOLATILE
+SECURITY DEFINER
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    v_claims JSONB := NULLIF(current_setting('request.jwt.claims', true), '')::jsonb;
+BEGIN
+    IF v_claims IS NOT NULL AND NOT COALESCE(v_claims -> 'roles' ? 'admin', false) THEN
+        RAISE EXCEPTION 'rpc_rebuild_sugerencias_pisos_huerfanos requiere el rol admin'
+            USING ERRCODE = '42501';
+    END IF;
+
+    -- Bloquea los recalculos incrementales concurrentes mientras se reconstruye
+    LOCK TABLE sugerencias_pisos_huerfanos IN EXCLUSIVE MODE;
+    DELETE FROM sugerencias_pisos_huerfanos;
+
+    RETURN fn_recompute_sugerencias_pisos(ARRAY(
+        SELECT id FROM pisos
+        WHERE bloque_id IS NULL AND direccion_normalizada IS NOT NULL
+    ));
+END;
+$$;
+
+-- Relleno inicial (no-op en una base recién creada; 04/05 lo alimentan vía triggers)
+SELECT rpc_rebuild_sugerencias_pisos_huerfanos();
 
 -- =====================================================================
 -- FUNCTION + TRIGGER: extract_cp_from_direccion
@@ -589,4 +784,736 @@ BEGIN
     roles   := v_roles;
     RETURN NEXT;
 END;
-$$;
\ No newline at end of file
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_conflict_stats
+-- =====================================================================
+-- Recuentos agregados de conflictos (total + por estado, causa, ámbito y
+-- nodo) para un conjunto de filtros, en un único recorrido con GROUPING
+-- SETS. Sustituye a descargar v_conflictos_enhanced entero y contar en
+-- Python desde ConflictsView / HomeView.
+--
+-- SECURITY INVOKER a propósito: las políticas RLS de `conflictos` (Block C
+-- en 06-init-rls.sql) deben seguir aplicando a quien pide las cifras.
+-- Un filtro NULL significa "sin filtrar".
+DROP FUNCTION IF EXISTS rpc_conflict_stats(INTEGER, TEXT, TEXT, TEXT) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_conflict_stats(
+    p_nodo_id INTEGER DEFAULT NULL,
+    p_estado TEXT DEFAULT NULL,
+    p_causa TEXT DEFAULT NULL,
+    p_ambito TEXT DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+    WITH filtrados AS (
+        SELECT
+            COALESCE(c.estado, 'Sin estado') AS estado,
+            COALESCE(c.causa, 'Sin causa') AS causa,
+            COALESCE(c.ambito, 'Sin ámbito') AS ambito,
+            COALESCE(n.nombre, 'Sin nodo') AS nodo
+        FROM conflictos c
+            LEFT JOIN afiliadas a ON c.afiliada_id = a.id
+            LEFT JOIN pisos p ON a.piso_id = p.id
+            LEFT JOIN nodos_cp_mapping ncm ON p.cp = ncm.cp
+            LEFT JOIN nodos n ON ncm.nodo_id = n.id
+        WHERE (p_nodo_id IS NULL OR ncm.nodo_id = p_nodo_id)
+          AND (p_estado IS NULL OR c.estado = p_estado)
+          AND (p_causa IS NULL OR c.causa = p_causa)
+          AND (p_ambito IS NULL OR c.ambito = p_ambito)
+    ),
+    agregados AS (
+        SELECT
+            estado, causa, ambito, nodo,
+            GROUPING(estado, causa, ambito, nodo) AS g,
+            COUNT(*) AS n
+        FROM filtrados
+        GROUP BY GROUPING SETS ((), (estado), (causa), (ambito), (nodo))
+    )
+    -- GROUPING() devuelve un bitmask (estado=8, causa=4, ambito=2, nodo=1);
+    -- 15 = total, y cada desglose deja a 0 solo su propio bit.
+    SELECT jsonb_build_object(
+        'total',  COALESCE((SELECT n FROM agregados WHERE g = 15), 0),
+        'estado', COALESCE((SELECT jsonb_object_agg(estado, n) FROM agregados WHERE g = 7), '{}'::jsonb),
+        'causa',  COALESCE((SELECT jsonb_object_agg(causa, n) FROM agregados WHERE g = 11), '{}'::jsonb),
+        'ambito', COALESCE((SELECT jsonb_object_agg(ambito, n) FROM agregados WHERE g = 13), '{}'::jsonb),
+        'nodo',   COALESCE((SELECT jsonb_object_agg(nodo, n) FROM agregados WHERE g = 14), '{}'::jsonb)
+    );
+$$;
+
+-- =====================================================================
+-- FUNCTION: search_normalize + índices de búsqueda
+-- =====================================================================
+-- Texto de búsqueda sin tildes, en minúsculas y con los espacios colapsados.
+-- VARIADIC para que cada índice de expresión y su consulta en rpc_search
+-- escriban exactamente la misma llamada (los NULL se ignoran).
+--
+-- IMMUTABLE aunque unaccent() es STABLE (su diccionario podría cambiar),
+-- igual que normalize_address_for_match: si se toca el diccionario o esta
+-- función, hay que hacer REINDEX de los idx_*_search_trgm. Sin DROP
+-- FUNCTION para no arrastrar los índices en cada reejecución.
+CREATE OR REPLACE FUNCTION search_normalize(VARIADIC p_parts TEXT[])
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT lower(public.unaccent(
+        'public.unaccent'::regdictionary,
+        regexp_replace(btrim(array_to_string(p_parts, ' ')), '\s+', ' ', 'g')
+    ));
+$$;
+
+-- GIN trigram: resuelve `<%` (similitud por palabra) de rpc_search
+CREATE INDEX IF NOT EXISTS idx_afiliadas_search_trgm
+ON sindicato_inq.afiliadas
+USING gin (search_normalize(nombre, apellidos, cif, num_afiliada, email, telefono,
+                            regexp_replace(telefono, '\D', '', 'g')) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_pisos_search_trgm
+ON sindicato_inq.pisos
+USING gin (search_normalize(direccion, municipio) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_bloques_search_trgm
+ON sindicato_inq.bloques
+USING gin (search_normalize(direccion) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_conflictos_search_trgm
+ON sindicato_inq.conflictos
+USING gin (search_normalize(causa, descripcion, tarea_actual, resolucion) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_diario_conflictos_search_trgm
+ON sindicato_inq.diario_conflictos
+USING gin (search_normalize(accion, notas, tarea_actual) gin_trgm_ops);
+
+-- =====================================================================
+-- FUNCTION: rpc_search
+-- =====================================================================
+-- Búsqueda unificada para la caja del encabezado: afiliadas (nombre, CIF,
+-- nº afiliada, email, teléfono), pisos y bloques (dirección) y conflictos
+-- y su diario (texto). Devuelve aciertos tipados y ordenados por
+-- word_similarity(), con la tabla e id a los que navegar (las entradas del
+-- diario apuntan a su conflicto).
+--
+-- SECURITY INVOKER: RLS decide qué filas ve cada usuaria. El umbral de `<%`
+-- se fija aquí (es de sesión). Consultas de menos de 3 caracteres no tienen
+-- trigramas y devuelven vacío. p_tipos filtra por tipo (NULL = todos).
+DROP FUNCTION IF EXISTS rpc_search(TEXT, INTEGER, TEXT[]) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_search(
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_tipos TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (tipo TEXT, tabla TEXT, id INTEGER, titulo TEXT, detalle TEXT, score REAL)
+LANGUAGE plpgsql
+STABLE
+SET search_path = sindicato_inq, public
+SET pg_trgm.word_similarity_threshold = 0.5
+AS $$
+DECLARE
+    v_q TEXT := search_normalize(p_query);
+    v_limit INTEGER := LEAST(GREATEST(COALESCE(p_limit, 20), 1), 100);
+BEGIN
+    IF v_q IS NULL OR length(v_q) < 3 THEN
+        RETURN;
+    END IF;
+
+    -- Cada rama ordena y corta por su cuenta sobre su índice; el resultado
+    -- final se vuelve a ordenar por score.
+    RETURN QUERY
+    SELECT h.tipo, h.tabla, h.id, h.titulo, h.detalle, h.score
+    FROM (
+        (SELECT 'afiliada'::TEXT AS tipo, 'afiliadas'::TEXT AS tabla, a.id,
+                concat_ws(' ', a.nombre, a.apellidos) AS titulo,
+                NULLIF(concat_ws(' · ', a.cif, a.email, a.telefono), '') AS detalle,
+                word_similarity(v_q, search_normalize(a.nombre, a.apellidos, a.cif, a.num_afiliada, a.email, a.telefono,
+                                                      regexp_replace(a.telefono, '\D', '', 'g'))) AS score
+         FROM afiliadas a
+         WHERE (p_tipos IS NULL OR 'afiliada' = ANY (p_tipos))
+           AND v_q <% search_normalize(a.nombre, a.apellidos, a.cif, a.num_afiliada, a.email, a.telefono,
+                                       regexp_replace(a.telefono, '\D', '', 'g'))
+         ORDER BY score DESC, a.id
+         LIMIT v_limit)
+        UNION ALL
+        (SELECT 'piso', 'pisos', p.id,
+                p.direccion,
+                NULLIF(concat_ws(' · ', p.municipio, p.cp::TEXT), ''),
+                word_similarity(v_q, search_normalize(p.direccion, p.municipio)) AS score
+         FROM pisos p
+         WHERE (p_tipos IS NULL OR 'piso' = ANY (p_tipos))
+           AND v_q <% search_normalize(p.direccion, p.municipio)
+         ORDER BY score DESC, p.id
+         LIMIT v_limit)
+        UNION ALL
+        (SELECT 'bloque', 'bloques', b.id,
+                b.direccion,
+                NULL::TEXT,
+                word_similarity(v_q, search_normalize(b.direccion)) AS score
+         FROM bloques b
+         WHERE (p_tipos IS NULL OR 'bloque' = ANY (p_tipos))
+           AND v_q <% search_normalize(b.direccion)
+         ORDER BY score DESC, b.id
+         LIMIT v_limit)
+        UNION ALL
+        (SELECT 'conflicto', 'conflictos', c.id,
+                concat_ws(' · ', 'Conflicto #' || c.id, c.causa, c.estado),
+                left(c.descripcion, 160),
+                word_similarity(v_q, search_normalize(c.causa, c.descripcion, c.tarea_actual, c.resolucion)) AS score
+         FROM conflictos c
+         WHERE (p_tipos IS NULL OR 'conflicto' = ANY (p_tipos))
+           AND v_q <% search_normalize(c.causa, c.descripcion, c.tarea_actual, c.resolucion)
+         ORDER BY score DESC, c.id
+         LIMIT v_limit)
+        UNION ALL
+        (SELECT 'diario', 'conflictos', d.conflicto_id,
+                concat_ws(' · ', 'Conflicto #' || d.conflicto_id, 'Diario ' || to_char(d.created_at, 'DD/MM/YYYY')),
+                left(COALESCE(d.notas, d.accion), 160),
+                word_similarity(v_q, search_normalize(d.accion, d.notas, d.tarea_actual)) AS score
+         FROM diario_conflictos d
+         WHERE (p_tipos IS NULL OR 'diario' = ANY (p_tipos))
+           AND v_q <% search_normalize(d.accion, d.notas, d.tarea_actual)
+         ORDER BY score DESC, d.id
+         LIMIT v_limit)
+    ) h
+    ORDER BY h.score DESC, h.tipo, h.id
+    LIMIT v_limit;
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_pisos_cercanos
+-- =====================================================================
+-- Pisos a menos de p_radio_m metros de un piso, de un bloque (centroide de
+-- sus pisos geolocalizados) o de un punto (p_lat/p_lng, p. ej. un clic en
+-- el mapa), del más cercano al más lejano y con sus afiliadas. Sirve para
+-- "quién vive en este edificio y alrededor" al organizar un bloque o barrio.
+--
+-- Distancias en metros sobre geography, filtradas con ST_DWithin para que
+-- use idx_pisos_coordenadas_geog. SECURITY INVOKER: RLS decide qué pisos y
+-- afiliadas cuentan. Radio acotado a 5 km y resultado a 2000 filas.
+DROP FUNCTION IF EXISTS rpc_pisos_cercanos(INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_pisos_cercanos(
+    p_piso_id INTEGER DEFAULT NULL,
+    p_bloque_id INTEGER DEFAULT NULL,
+    p_lat DOUBLE PRECISION DEFAULT NULL,
+    p_lng DOUBLE PRECISION DEFAULT NULL,
+    p_radio_m INTEGER DEFAULT 250,
+    p_limit INTEGER DEFAULT 500
+)
+RETURNS TABLE (
+    piso_id INTEGER,
+    bloque_id INTEGER,
+    direccion TEXT,
+    distancia_m DOUBLE PRECISION,
+    n_afiliadas INTEGER,
+    lat DOUBLE PRECISION,
+    lng DOUBLE PRECISION
+)
+LANGUAGE plpgsql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    v_centro geography;
+    v_radio INTEGER := LEAST(GREATEST(COALESCE(p_radio_m, 250), 1), 5000);
+    v_limit INTEGER := LEAST(GREATEST(COALESCE(p_limit, 500), 1), 2000);
+BEGIN
+    IF p_lat IS NOT NULL AND p_lng IS NOT NULL THEN
+        v_centro := ST_SetSRID(ST_MakePoint(p_lng, p_lat), 4326)::geography;
+    ELSIF p_piso_id IS NOT NULL THEN
+        SELECT p.coordenadas::geography INTO v_centro
+        FROM pisos p WHERE p.id = p_piso_id;
+    ELSIF p_bloque_id IS NOT NULL THEN
+        SELECT ST_Centroid(ST_Collect(p.coordenadas))::geography INTO v_centro
+        FROM pisos p WHERE p.bloque_id = p_bloque_id AND p.coordenadas IS NOT NULL;
+    END IF;
+
+    -- Sin centro (piso/bloque sin geolocalizar): nada que buscar
+    IF v_centro IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT
+        p.id,
+        p.bloque_id,
+        p.direccion,
+        ST_Distance(p.coordenadas::geography, v_centro) AS distancia_m,
+        (SELECT COUNT(*)::INTEGER FROM afiliadas a WHERE a.piso_id = p.id),
+        ST_Y(p.coordenadas),
+        ST_X(p.coordenadas)
+    FROM pisos p
+    WHERE ST_DWithin(p.coordenadas::geography, v_centro, v_radio)
+    ORDER BY 4, p.id
+    LIMIT v_limit;
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_mapa_pisos
+-- =====================================================================
+-- Contenido de una ventana de mapa (caja west/south/east/north en grados).
+-- Con zoom < 16 agrupa los pisos en una rejilla de ~1/4 de tesela (celdas
+-- de 360 / 2^zoom / 4 grados) y devuelve un 'cluster' por celda con su
+-- número de pisos y de afiliadas en el centroide; las celdas de un solo
+-- piso salen ya como 'piso'. Con zoom >= 16 devuelve los pisos uno a uno,
+-- como mucho p_max_rows. Así el tamaño de la respuesta depende de la
+-- ventana y no de cuántos pisos estén geolocalizados.
+--
+-- `&&` sobre la caja usa idx_pisos_spatial_coordenadas. SECURITY INVOKER.
+DROP FUNCTION IF EXISTS rpc_mapa_pisos(DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_mapa_pisos(
+    p_west DOUBLE PRECISION,
+    p_south DOUBLE PRECISION,
+    p_east DOUBLE PRECISION,
+    p_north DOUBLE PRECISION,
+    p_zoom INTEGER,
+    p_max_rows INTEGER DEFAULT 1000
+)
+RETURNS TABLE (
+    tipo TEXT,
+    piso_id INTEGER,
+    bloque_id INTEGER,
+    direccion TEXT,
+    n_pisos INTEGER,
+    n_afiliadas INTEGER,
+    lat DOUBLE PRECISION,
+    lng DOUBLE PRECISION
+)
+LANGUAGE plpgsql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    v_caja geometry := ST_MakeEnvelope(p_west, p_south, p_east, p_north, 4326);
+    v_zoom INTEGER := LEAST(GREATEST(COALESCE(p_zoom, 0), 0), 22);
+    v_limit INTEGER := LEAST(GREATEST(COALESCE(p_max_rows, 1000), 1), 5000);
+    v_celda DOUBLE PRECISION;
+BEGIN
+    IF v_zoom >= 16 THEN
+        RETURN QUERY
+        SELECT
+            'piso'::TEXT,
+            p.id,
+            p.bloque_id,
+            p.direccion,
+            1,
+            (SELECT COUNT(*)::INTEGER FROM afiliadas a WHERE a.piso_id = p.id),
+            ST_Y(p.coordenadas),
+            ST_X(p.coordenadas)
+        FROM pisos p
+        WHERE p.coordenadas && v_caja
+        ORDER BY p.id
+        LIMIT v_limit;
+        RETURN;
+    END IF;
+
+    v_celda := 360.0 / power(2, v_zoom) / 4;
+
+    RETURN QUERY
+    WITH en_caja AS (
+        SELECT
+            p.id, p.bloque_id, p.direccion, p.coordenadas,
+            floor(ST_X(p.coordenadas) / v_celda) AS cx,
+            floor(ST_Y(p.coordenadas) / v_celda) AS cy,
+            (SELECT COUNT(*) FROM afiliadas a WHERE a.piso_id = p.id) AS n_af
+        FROM pisos p
+        WHERE p.coordenadas && v_caja
+    ),
+    celdas AS (
+        SELECT
+            COUNT(*) AS n,
+            MIN(e.id) AS id,
+            MIN(e.bloque_id) AS bloque_id,
+            MIN(e.direccion) AS direccion,
+            SUM(e.n_af) AS n_af,
+            ST_Centroid(ST_Collect(e.coordenadas)) AS centro
+        FROM en_caja e
+        GROUP BY e.cx, e.cy
+    )
+    SELECT
+        CASE WHEN c.n = 1 THEN 'piso' ELSE 'cluster' END,
+        CASE WHEN c.n = 1 THEN c.id END,
+        CASE WHEN c.n = 1 THEN c.bloque_id END,
+        CASE WHEN c.n = 1 THEN c.direccion END,
+        c.n::INTEGER,
+        c.n_af::INTEGER,
+        ST_Y(c.centro),
+        ST_X(c.centro)
+    FROM celdas c
+    ORDER BY c.n DESC
+    LIMIT v_limit;
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_check_import_conflicts
+-- =====================================================================
+-- Comprobación previa a una importación: de todas las claves únicas que
+-- trae el CSV (CIF, nº de afiliada), cuáles existen ya. La dirección de piso
+-- no se comprueba: las filas que comparten piso lo reutilizan
+-- (rpc_resolve_import_parents).
+-- Una consulta de pertenencia por clave (= ANY sobre el índice UNIQUE) en
+-- lugar de descubrir cada 23505 fila a fila durante la importación.
+--
+-- SECURITY DEFINER porque la restricción UNIQUE es global: con RLS una
+-- gestora no vería el duplicado de otro nodo y la fila fallaría igual. Solo
+-- devuelve valores que la llamada ya conocía (sin ids ni otros datos) y
+-- exige los roles que tienen el importador (admin, gestor). Los CIF se
+-- comparan como los guarda fn_normalize_afiliada_data (UPPER + TRIM).
+DROP FUNCTION IF EXISTS rpc_check_import_conflicts(TEXT[], TEXT[]) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_check_import_conflicts(
+    p_cifs TEXT[] DEFAULT NULL,
+    p_num_afiliadas TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (tabla TEXT, campo TEXT, valor TEXT)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    v_claims JSONB := NULLIF(current_setting('request.jwt.claims', true), '')::jsonb;
+BEGIN
+    IF v_claims IS NOT NULL AND NOT COALESCE(v_claims -> 'roles' ?| ARRAY['admin', 'gestor'], false) THEN
+        RAISE EXCEPTION 'rpc_check_import_conflicts requiere el rol admin o gestor'
+            USING ERRCODE = '42501';
+    END IF;
+
+    RETURN QUERY
+    SELECT 'afiliadas'::TEXT, 'cif'::TEXT, a.cif
+    FROM afiliadas a
+    WHERE a.cif = ANY (ARRAY(SELECT DISTINCT upper(btrim(x)) FROM unnest(p_cifs) AS x))
+    UNION ALL
+    SELECT 'afiliadas', 'num_afiliada', a.num_afiliada
+    FROM afiliadas a
+    WHERE a.num_afiliada = ANY (p_num_afiliadas);
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_dry_run_import
+-- =====================================================================
+-- Simulación exacta de un trozo de importación relacional: inserta cada
+-- fila del CSV (ya mapeada por el importador: una carga por tabla) en el
+-- orden de p_plan.execution_order, encadenando las FKs de p_plan.foreign_keys
+-- ({"pisos": {"bloque_id": "bloques"}, ...}) igual que la importación real,
+-- con un SAVEPOINT por fila (bloque BEGIN/EXCEPTION) para recoger su
+-- resultado: triggers, FKs, CHECKs, UNIQUE y RLS (42501) incluidos. Al
+-- terminar lanza y captura DRYRN, así que todo se deshace siempre.
+--
+-- Devuelve la forma que consume ValidationPreviewPanel.set_results
+-- (row_number, status, preview_label, issues). SECURITY INVOKER: RLS
+-- responde igual que lo hará en la importación real. Solo admite las tablas
+-- del importador. Si la fila no trae num_afiliada se usa uno provisional
+-- para no gastar la secuencia sin huecos de tg_assign_consecutive_num_afiliada
+-- (los SERIAL sí avanzan, como en cualquier inserción deshecha).
+--
+-- Padres compartidos (bloques, pisos): la fila puede traer
+-- parents.<tabla> = {clave, id} (rpc_resolve_import_parents). Con id se
+-- reutiliza el registro existente; si no, el primero que una fila anterior
+-- del trozo creó con esa clave y terminó bien; si no, se inserta. Igual que
+-- la importación real, que construye cada padre distinto una sola vez.
+DROP FUNCTION IF EXISTS rpc_dry_run_import(JSONB, JSONB) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_dry_run_import(p_plan JSONB, p_rows JSONB)
+RETURNS TABLE (row_number INTEGER, status TEXT, preview_label TEXT, issues TEXT[])
+LANGUAGE plpgsql
+VOLATILE
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    c_tablas CONSTANT TEXT[] := ARRAY['bloques', 'pisos', 'afiliadas', 'facturacion'];
+    v_orden TEXT[] := ARRAY(SELECT jsonb_array_elements_text(p_plan -> 'execution_order'));
+    v_fks JSONB := COALESCE(p_plan -> 'foreign_keys', '{}'::jsonb);
+    v_fila JSONB;
+    v_tabla TEXT;
+    v_payload JSONB;
+    v_ids JSONB;
+    v_id INTEGER;
+    v_padre JSONB;
+    v_claves JSONB := '{}'::jsonb; -- {tabla: {clave: id}} de filas anteriores
+    v_nuevas JSONB;                -- padres creados por la fila en curso
+    v_cols TEXT;
+    v_fk RECORD;
+    v_error TEXT;
+    v_detalle TEXT;
+    v_numeros INTEGER[] := '{}';
+    v_etiquetas TEXT[] := '{}';
+    v_errores TEXT[] := '{}';
+BEGIN
+    IF EXISTS (SELECT 1 FROM unnest(v_orden) AS t WHERE t <> ALL (c_tablas)) THEN
+        RAISE EXCEPTION 'rpc_dry_run_import solo admite las tablas %', c_tablas
+            USING ERRCODE = '22023';
+    END IF;
+
+    BEGIN
+        FOR v_fila IN SELECT value FROM jsonb_array_elements(p_rows) LOOP
+            v_ids := '{}'::jsonb;
+            v_nuevas := '{}'::jsonb;
+            v_error := NULL;
+            v_tabla := NULL;
+
+            BEGIN
+                FOREACH v_tabla IN ARRAY v_orden LOOP
+                    v_payload := v_fila -> 'tables' -> v_tabla;
+                    CONTINUE WHEN v_payload IS NULL OR jsonb_typeof(v_payload) <> 'object';
+
+                    v_padre := v_fila -> 'parents' -> v_tabla;
+                    IF v_padre IS NOT NULL THEN
+                        v_id := COALESCE(
+                            (v_padre ->> 'id')::INTEGER,
+                            (v_claves -> v_tabla ->> (v_padre ->> 'clave'))::INTEGER
+                        );
+                        IF v_id IS NOT NULL THEN
+                            v_ids := v_ids || jsonb_build_object(v_tabla, v_id);
+                            CONTINUE;
+                        END IF;
+                    END IF;
+
+                    -- Linaje de FKs: NULL si el padre opcional se omitió en esta fila
+                    FOR v_fk IN SELECT key AS columna, value #>> '{}' AS padre FROM jsonb_each(v_fks -> v_tabla) LOOP
+                        v_payload := v_payload || jsonb_build_object(v_fk.columna, v_ids -> v_fk.padre);
+                    END LOOP;
+
+                    IF v_tabla = 'afiliadas' AND v_payload ->> 'num_afiliada' IS NULL THEN
+                        v_payload := v_payload || jsonb_build_object('num_afiliada', 'SIMULACION-' || (v_fila ->> 'row_number'));
+                    END IF;
+
+                    SELECT string_agg(quote_ident(k), ', ') INTO v_cols FROM jsonb_object_keys(v_payload) AS k;
+                    IF v_cols IS NULL THEN
+                        EXECUTE format('INSERT INTO %I DEFAULT VALUES RETURNING id', v_tabla) INTO v_id;
+                    ELSE
+                        EXECUTE format(
+                            'INSERT INTO %I (%s) SELECT %s FROM jsonb_populate_record(NULL::%I, $1) RETURNING id',
+                            v_tabla, v_cols, v_cols, v_tabla
+                        ) INTO v_id USING v_payload;
+                    END IF;
+                    v_ids := v_ids || jsonb_build_object(v_tabla, v_id);
+                    IF v_padre IS NOT NULL THEN
+                        v_nuevas := v_nuevas || jsonb_build_object(v_tabla, v_padre ->> 'clave');
+                    END IF;
+                END LOOP;
+
+                -- Solo si la fila entera salió bien: si no, sus inserciones se deshacen
+                SELECT v_claves || COALESCE(jsonb_object_agg(
+                    n.key, COALESCE(v_claves -> n.key, '{}'::jsonb) || jsonb_build_object(n.value, v_ids -> n.key)
+                ), '{}'::jsonb)
+                INTO v_claves
+                FROM jsonb_each_text(v_nuevas) AS n;
+            EXCEPTION WHEN OTHERS THEN
+                GET STACKED DIAGNOSTICS v_detalle = PG_EXCEPTION_DETAIL;
+                v_error := format(
+                    '[%s] %s%s%s',
+                    v_tabla,
+                    CASE SQLSTATE
+                        WHEN '42501' THEN 'Acceso Denegado: '
+                        WHEN '23505' THEN 'Error de Duplicado: '
+                        WHEN '23503' THEN 'Referencia inválida: '
+                        WHEN '23502' THEN 'Falta un valor obligatorio: '
+                        WHEN '23514' THEN 'Restricción incumplida: '
+                        WHEN '22P02' THEN 'Valor con formato inválido: '
+                        WHEN '22007' THEN 'Valor con formato inválido: '
+                        WHEN '22008' THEN 'Valor con formato inválido: '
+                        WHEN '22003' THEN 'Valor fuera de rango: '
+                        ELSE 'Error de Base de Datos: '
+                    END,
+                    SQLERRM,
+                    COALESCE(' (' || NULLIF(v_detalle, '') || ')', '')
+                );
+            END;
+
+            v_numeros := v_numeros || (v_fila ->> 'row_number')::INTEGER;
+            v_etiquetas := v_etiquetas || (v_fila ->> 'preview_label');
+            v_errores := v_errores || v_error;
+        END LOOP;
+
+        -- Deshace todo lo insertado; los resultados viven en las variables
+        RAISE EXCEPTION 'rpc_dry_run_import: rollback' USING ERRCODE = 'DRYRN';
+    EXCEPTION WHEN SQLSTATE 'DRYRN' THEN
+        NULL;
+    END;
+
+    RETURN QUERY
+    SELECT
+        r.n,
+        CASE WHEN r.e IS NULL THEN 'valid' ELSE 'error' END,
+        r.l,
+        CASE WHEN r.e IS NULL THEN ARRAY[]::TEXT[] ELSE ARRAY[r.e] END
+    FROM unnest(v_numeros, v_etiquetas, v_errores) WITH ORDINALITY AS r (n, l, e, orden)
+    ORDER BY r.orden;
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_import_job_commit
+-- =====================================================================
+-- Confirma un trozo de un trabajo de importación en segundo plano
+-- (services/import_jobs.py): guarda el resultado de cada fila y avanza la
+-- marca de agua filas_procesadas en la misma transacción, así que tras un
+-- reinicio el trabajo se reanuda exactamente desde el último trozo
+-- confirmado. Las filas por debajo de la marca se ignoran (reintentos).
+-- Devuelve el estado del trabajo, incluida cancelacion_solicitada, para que
+-- el proceso que importa se entere de una cancelación sin otra consulta.
+-- SECURITY INVOKER: las políticas de import_jobs (06, bloque M) limitan
+-- cada trabajo a quien lo creó y a admin.
+DROP FUNCTION IF EXISTS rpc_import_job_commit(INTEGER, INTEGER, JSONB) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_import_job_commit(p_job_id INTEGER, p_hasta_fila INTEGER, p_filas JSONB)
+RETURNS TABLE (estado TEXT, filas_procesadas INTEGER, filas_ok INTEGER, filas_error INTEGER, cancelacion_solicitada BOOLEAN)
+LANGUAGE plpgsql
+VOLATILE
+SET search_path = sindicato_inq, public
+AS $$
+#variable_conflict use_column
+DECLARE
+    v_marca INTEGER;
+    v_ok INTEGER;
+    v_error INTEGER;
+BEGIN
+    SELECT j.filas_procesadas INTO v_marca
+    FROM import_jobs j
+    WHERE j.id = p_job_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Trabajo de importación % no encontrado', p_job_id USING ERRCODE = 'P0002';
+    END IF;
+
+    WITH nuevas AS (
+        INSERT INTO import_job_filas (job_id, fila, estado, mensaje, ids)
+        SELECT p_job_id, f.fila, f.estado, f.mensaje, f.ids
+        FROM jsonb_to_recordset(COALESCE(p_filas, '[]'::jsonb)) AS f (fila INTEGER, estado TEXT, mensaje TEXT, ids JSONB)
+        WHERE f.fila > v_marca AND f.fila <= p_hasta_fila
+        ON CONFLICT (job_id, fila) DO NOTHING
+        RETURNING import_job_filas.estado
+    )
+    SELECT
+        count(*) FILTER (WHERE n.estado = 'ok'),
+        count(*) FILTER (WHERE n.estado = 'error')
+    INTO v_ok, v_error
+    FROM nuevas n;
+
+    UPDATE import_jobs j
+    SET filas_procesadas = GREATEST(j.filas_procesadas, p_hasta_fila),
+        filas_ok = j.filas_ok + v_ok,
+        filas_error = j.filas_error + v_error,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE j.id = p_job_id;
+
+    RETURN QUERY
+    SELECT j.estado, j.filas_procesadas, j.filas_ok, j.filas_error, j.cancelacion_solicitada
+    FROM import_jobs j
+    WHERE j.id = p_job_id;
+END;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_resolve_import_parents
+-- =====================================================================
+-- Pre-paso de la importación relacional: muchas filas del CSV comparten
+-- bloque o piso. Para cada dirección distinta que trae un trozo devuelve
+-- la clave con la que el importador agrupa las filas y, si ya existe, el
+-- id del registro a reutilizar, en una sola llamada en lugar de un INSERT
+-- por fila que acaba en 23505.
+--   * bloques: clave normalize_address_for_match(direccion), la misma que
+--     mantiene el trigger en direccion_normalizada; se prefiere el bloque
+--     con la dirección exacta y después el de id más bajo.
+--   * pisos: clave la dirección tal cual (es la restricción UNIQUE; la
+--     normalización uniría pisos distintos del mismo portal).
+-- SECURITY INVOKER: solo se reutilizan registros que RLS deja ver; si no,
+-- la inserción falla igual que antes.
+DROP FUNCTION IF EXISTS rpc_resolve_import_parents(TEXT[], TEXT[]) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_resolve_import_parents(
+    p_bloques TEXT[] DEFAULT NULL,
+    p_pisos TEXT[] DEFAULT NULL
+)
+RETURNS TABLE (tabla TEXT, valor TEXT, clave TEXT, id INTEGER)
+LANGUAGE sql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+    SELECT 'bloques'::TEXT, v.valor, COALESCE(v.normalizada, v.valor), b.id
+    FROM (
+        SELECT x AS valor, NULLIF(normalize_address_for_match(x), '') AS normalizada
+        FROM (SELECT DISTINCT x FROM unnest(p_bloques) AS x WHERE x IS NOT NULL) AS d
+    ) AS v
+    LEFT JOIN LATERAL (
+        SELECT b.id
+        FROM bloques b
+        WHERE b.direccion_normalizada = v.normalizada OR b.direccion = v.valor
+        ORDER BY (b.direccion = v.valor) DESC, b.id
+        LIMIT 1
+    ) AS b ON true
+    UNION ALL
+    SELECT 'pisos'::TEXT, v.valor, v.valor, p.id
+    FROM (SELECT DISTINCT x AS valor FROM unnest(p_pisos) AS x WHERE x IS NOT NULL) AS v
+    LEFT JOIN pisos p ON p.direccion = v.valor;
+$$;
+
+-- =====================================================================
+-- FUNCTION: rpc_join_lookup
+-- =====================================================================
+-- Comprobación del formulario público /join antes de aceptar una
+-- inscripción, en una sola consulta indexada (UNIQUE de cif e
+-- idx_afiliadas_email_normalizado) en lugar de un GET por CIF seguido de
+-- un INSERT que acaba en 23505:
+--   * 'afiliada'  el CIF es de una afiliada ya promovida (Alta, Baja...):
+--                 el formulario remite a la oficina, como antes.
+--   * 'pendiente' hay una inscripción 'Bienvenida' con ese CIF o, si no,
+--                 con el mismo email, nombre y apellidos (la misma persona
+--                 corrigiendo su DNI); devuelve su id para actualizarla.
+--   * 'nueva'     nada coincide.
+-- SECURITY DEFINER porque RLS oculta a web_anon las afiliadas promovidas.
+-- Solo devuelve ids de filas 'Bienvenida', que anon_read_signup ya le deja
+-- ver; de una afiliada promovida no sale más que lo que ya delataba el 23505.
+DROP FUNCTION IF EXISTS rpc_join_lookup(TEXT, TEXT, TEXT, TEXT) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_join_lookup(
+    p_cif TEXT,
+    p_email TEXT DEFAULT NULL,
+    p_nombre TEXT DEFAULT NULL,
+    p_apellidos TEXT DEFAULT NULL
+)
+RETURNS TABLE (estado_registro TEXT, afiliada_id INTEGER)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = sindicato_inq, public
+AS $$
+    WITH por_cif AS (
+        SELECT a.id, a.estado
+        FROM afiliadas a
+        WHERE a.cif = upper(btrim(p_cif))
+    ),
+    por_email AS (
+        SELECT a.id
+        FROM afiliadas a
+        WHERE NOT EXISTS (SELECT 1 FROM por_cif)
+          AND NULLIF(btrim(p_email), '') IS NOT NULL
+          AND lower(btrim(a.email)) = lower(btrim(p_email))
+          AND a.estado = 'Bienvenida'
+          AND lower(btrim(a.nombre)) = lower(btrim(p_nombre))
+          AND lower(btrim(a.apellidos)) = lower(btrim(p_apellidos))
+        ORDER BY a.id DESC
+        LIMIT 1
+    )
+    SELECT
+        CASE WHEN c.estado = 'Bienvenida' THEN 'pendiente' ELSE 'afiliada' END,
+        CASE WHEN c.estado = 'Bienvenida' THEN c.id END
+    FROM por_cif c
+    UNION ALL
+    SELECT 'pendiente', e.id FROM por_email e
+    UNION ALL
+    SELECT 'nueva', NULL
+    WHERE NOT EXISTS (SELECT 1 FROM por_cif) AND NOT EXISTS (SELECT 1 FROM por_email);
+$$;
@@ -287,15 +287,19 @@ FROM conflictos c
     LEFT JOIN bloques b ON p.bloque_id = b.id
     LEFT JOIN nodos_cp_mapping ncm ON p.cp = ncm.cp
     LEFT JOIN nodos n ON ncm.nodo_id = n.id
-    LEFT JOIN (
-        SELECT conflicto_id, MAX(created_at) as ultima_actualizacion
-        FROM diario_conflictos
-        GROUP BY conflicto_id
-    ) ult_act ON c.id = ult_act.conflicto_id;
+    -- Lateral por conflicto (índice conflicto_id, created_at DESC): una página
+    -- de rpc_page_conflictos no agrega el diario entero.
+    LEFT JOIN LATERAL (
+        SELECT MAX(d.created_at) AS ultima_actualizacion
+        FROM diario_conflictos d
+        WHERE d.conflicto_id = c.id
+    ) ult_act ON true;
 
 -- =====================================================================
 -- VISTA: v_sugerencias_pisos_huerfanos (Filtrado > 0.5 y Tiers de 0.05)
 -- =====================================================================
+-- Lee la tabla sugerencias_pisos_huerfanos, que los triggers de 02 mantienen
+-- al día; aquí ya no se hace ninguna búsqueda difusa.
 DROP VIEW IF EXISTS v_sugerencias_pisos_huerfanos CASCADE;
 
 CREATE OR REPLACE VIEW v_sugerencias_pisos_huerfanos AS
@@ -304,28 +308,13 @@ SELECT
     p.id AS piso_id,
     p.direccion AS "Dirección Piso",
     p.municipio AS "Municipio",
-    s.id AS "ID Bloque Sugerido",
-    s.direccion AS "Dirección Bloque Sugerido",
+    b.id AS "ID Bloque Sugerido",
+    b.direccion AS "Dirección Bloque Sugerido",
     (ROUND(s.score::numeric * 20) / 20)::numeric(3,2) AS "Score"
-FROM pisos p
-CROSS JOIN LATERAL (
-    SELECT
-        b.id,
-        b.direccion,
-        public.similarity(
-            normalize_address_for_match(p.direccion)::text, 
-            normalize_address_for_match(b.direccion)::text
-        ) AS score
-    FROM bloques b
-    WHERE normalize_address_for_match(p.direccion)::text OPERATOR(public.%) normalize_address_for_match(b.direccion)::text
-    ORDER BY 
-        normalize_address_for_match(p.direccion)::text OPERATOR(public.<->) normalize_address_for_match(b.direccion)::text ASC
-    LIMIT 1
-) s
-WHERE p.bloque_id IS NULL             
-  AND p.direccion IS NOT NULL 
-  AND btrim(p.direccion) <> ''
-  AND s.score > 0.5; -- 💡 Only report records whose match confidence is strictly above 0.5
+FROM sugerencias_pisos_huerfanos s
+    JOIN pisos p ON p.id = s.piso_id
+    JOIN bloques b ON b.id = s.bloque_id
+WHERE p.bloque_id IS NULL;
 
 -- ---------------------------------------------------------------------
 -- VISTA: v_consolidar_pisos_bloques (Consolidada y de Alto Rendimiento)
@@ -346,10 +335,7 @@ SELECT
     -- 1. Métrica de Auditoría: Calidad del enlace actual (Similitud de texto)
     CASE
         WHEN p.bloque_id IS NOT NULL AND b.id IS NOT NULL THEN
-            public.similarity(
-                normalize_address_for_match(p.direccion),
-                normalize_address_for_match(b.direccion)
-            )
+            public.similarity(p.direccion_normalizada, b.direccion_normalizada)
         ELSE NULL
     END AS "Score Enlace Actual",
 
@@ -374,24 +360,145 @@ SELECT
 FROM pisos p
     LEFT JOIN bloques b ON p.bloque_id = b.id
     LEFT JOIN empresas e ON b.empresa_id = e.id
-    -- Búsqueda lateral indexada de máxima velocidad
+    -- Búsqueda lateral indexada (GiST KNN sobre bloques.direccion_normalizada)
     LEFT JOIN LATERAL (
         SELECT
             b_sug.id,
             b_sug.direccion,
-            public.similarity(
-                normalize_address_for_match(p.direccion), 
-                normalize_address_for_match(b_sug.direccion)
-            ) AS score
+            public.similarity(b_sug.direccion_normalizada, p.direccion_normalizada) AS score
         FROM bloques b_sug
-        WHERE normalize_address_for_match(p.direccion) OPERATOR(public.%) normalize_address_for_match(b_sug.direccion)
-        ORDER BY 
-            normalize_address_for_match(p.direccion) OPERATOR(public.<->) normalize_address_for_match(b_sug.direccion) ASC
+        WHERE b_sug.direccion_normalizada OPERATOR(public.%) p.direccion_normalizada
+        ORDER BY
+            b_sug.direccion_normalizada OPERATOR(public.<->) p.direccion_normalizada ASC
         LIMIT 1
-    ) s ON p.direccion IS NOT NULL AND btrim(p.direccion) <> '';
+    ) s ON p.direccion_normalizada IS NOT NULL;
+
+-- Los índices trigram sobre direccion_normalizada se crean en 02-init-plpgsql_functions.sql
+
+-- =====================================================================
+-- PAGINACIÓN POR KEYSET DE LAS VISTAS PRINCIPALES
+-- =====================================================================
+-- El `offset` de PostgREST recorre y descarta todas las filas anteriores,
+-- así que cada página cuesta más que la anterior. Estas RPC reciben en su
+-- lugar el último id de la página previa (p_after_id; NULL = primera
+-- página) y un conjunto de filtros (NULL = sin filtrar), y avanzan por el
+-- índice de la clave primaria: la página 1.000 cuesta lo mismo que la 1.
+-- El cliente (APIClient.iter_pages) encadena las páginas.
+--
+-- SECURITY INVOKER: las vistas y las políticas RLS de 06 siguen aplicando a
+-- quien pagina. Van aquí y no en 02 porque devuelven el tipo de fila de las
+-- vistas; el DROP VIEW ... CASCADE de arriba las elimina y se recrean a
+-- continuación. p_limit se acota a 1..5000.
+
+DROP FUNCTION IF EXISTS rpc_page_afiliadas(INTEGER, INTEGER, TEXT, INTEGER) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_page_afiliadas(
+    p_after_id INTEGER DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500,
+    p_estado TEXT DEFAULT NULL,
+    p_nodo_id INTEGER DEFAULT NULL
+)
+RETURNS SETOF v_afiliadas_detalle
+LANGUAGE sql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+    SELECT v.*
+    FROM v_afiliadas_detalle v
+    WHERE (p_after_id IS NULL OR v.id > p_after_id)
+      AND (p_estado IS NULL OR v."Estado" = p_estado)
+      AND (p_nodo_id IS NULL OR v.piso_id IN (
+            SELECT p.id
+            FROM pisos p
+                JOIN nodos_cp_mapping ncm ON ncm.cp = p.cp
+            WHERE ncm.nodo_id = p_nodo_id
+      ))
+    ORDER BY v.id
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 500), 1), 5000);
+$$;
+
+DROP FUNCTION IF EXISTS rpc_page_pisos(INTEGER, INTEGER, INTEGER, BOOLEAN) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_page_pisos(
+    p_after_id INTEGER DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500,
+    p_bloque_id INTEGER DEFAULT NULL,
+    p_sin_bloque BOOLEAN DEFAULT NULL
+)
+RETURNS SETOF v_consolidar_pisos_bloques
+LANGUAGE sql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+    -- El LIMIT corta antes del lateral KNN: solo se buscan sugerencias para
+    -- los pisos de la página.
+    SELECT v.*
+    FROM v_consolidar_pisos_bloques v
+    WHERE (p_after_id IS NULL OR v.id > p_after_id)
+      AND (p_bloque_id IS NULL OR v.bloque_id = p_bloque_id)
+      AND (p_sin_bloque IS NULL OR (v.bloque_id IS NULL) = p_sin_bloque)
+    ORDER BY v.id
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 500), 1), 5000);
+$$;
+
+DROP FUNCTION IF EXISTS rpc_page_bloques(INTEGER, INTEGER, INTEGER) CASCADE;
+
+CREATE OR REPLACE FUNCTION rpc_page_bloques(
+    p_after_id INTEGER DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500,
+    p_empresa_id INTEGER DEFAULT NULL
+)
+RETURNS SETOF v_resumen_bloques
+LANGUAGE plpgsql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+DECLARE
+    v_ids INTEGER[];
+BEGIN
+    -- v_resumen_bloques agrega por bloque: primero se eligen los ids de la
+    -- página en bloques y luego se pasan como parámetro, que sí se empuja por
+    -- debajo del GROUP BY (una subconsulta no se empujaría).
+    v_ids := ARRAY(
+        SELECT b.id
+        FROM bloques b
+        WHERE (p_after_id IS NULL OR b.id > p_after_id)
+          AND (p_empresa_id IS NULL OR b.empresa_id = p_empresa_id)
+        ORDER BY b.id
+        LIMIT LEAST(GREATEST(COALESCE(p_limit, 500), 1), 5000)
+    );
+
+    RETURN QUERY
+    SELECT v.*
+    FROM v_resumen_bloques v
+    WHERE v.id = ANY (v_ids)
+    ORDER BY v.id;
+END;
+$$;
 
-CREATE INDEX IF NOT EXISTS bloques_normalized_gist_idx 
-ON bloques USING gist (normalize_address_for_match(direccion) public.gist_trgm_ops);
+DROP FUNCTION IF EXISTS rpc_page_conflictos(INTEGER, INTEGER, INTEGER, TEXT, TEXT, TEXT) CASCADE;
 
-CREATE INDEX IF NOT EXISTS pisos_normalized_gist_idx 
-ON pisos USING gist (normalize_address_for_match(direccion) public.gist_trgm_ops);
\ No newline at end of file
+CREATE OR REPLACE FUNCTION rpc_page_conflictos(
+    p_after_id INTEGER DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500,
+    p_nodo_id INTEGER DEFAULT NULL,
+    p_estado TEXT DEFAULT NULL,
+    p_causa TEXT DEFAULT NULL,
+    p_ambito TEXT DEFAULT NULL
+)
+RETURNS SETOF v_conflictos_enhanced
+LANGUAGE sql
+STABLE
+SET search_path = sindicato_inq, public
+AS $$
+    -- Mismo orden que ConflictsView (id.desc): el cursor avanza hacia ids menores.
+    SELECT v.*
+    FROM v_conflictos_enhanced v
+    WHERE (p_after_id IS NULL OR v.id < p_after_id)
+      AND (p_nodo_id IS NULL OR v.nodo_id = p_nodo_id)
+      AND (p_estado IS NULL OR v.estado = p_estado)
+      AND (p_causa IS NULL OR v.causa = p_causa)
+      AND (p_ambito IS NULL OR v.ambito = p_ambito)
+    ORDER BY v.id DESC
+    LIMIT LEAST(GREATEST(COALESCE(p_limit, 500), 1), 5000);
+$$;
@@ -237,7 +237,7 @@ CREATE POLICY anon_update_afiliadas_signup ON sindicato_inq.afiliadas
 DO $$  
 DECLARE
   t text;
-  tables text[] := ARRAY['pisos', 'bloques', 'empresas', 'entramado_empresas'];
+  tables text[] := ARRAY['pisos', 'bloques', 'empresas', 'entramado_empresas', 'sugerencias_pisos_huerfanos'];
 BEGIN
   FOREACH t IN ARRAY tables
   LOOP
@@ -439,4 +439,126 @@ CREATE POLICY admin_all ON sindicato_inq.usuario_roles
 DROP POLICY IF EXISTS self_read ON sindicato_inq.usuario_roles;
 CREATE POLICY self_read ON sindicato_inq.usuario_roles
     FOR SELECT TO web_user
-    USING (usuario_id = NULLIF(current_setting('request.jwt.claims', true)::jsonb ->> 'sub', '')::int);
\ No newline at end of file
+    USING (usuario_id = NULLIF(current_setting('request.jwt.claims', true)::jsonb ->> 'sub', '')::int);
+-- ---------------------------------------------------------------------
+-- BLOCK G: Dashboard statistics RPCs
+-- ---------------------------------------------------------------------
+-- rpc_conflict_stats is SECURITY INVOKER, so Block C still decides which
+-- conflicts get counted. Only authenticated users get the aggregates;
+-- EXECUTE is revoked from PUBLIC (the Postgres default grant).
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_conflict_stats(INTEGER, TEXT, TEXT, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_conflict_stats(INTEGER, TEXT, TEXT, TEXT) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK H: Orphan-piso suggestion maintenance
+-- ---------------------------------------------------------------------
+-- sugerencias_pisos_huerfanos is written only by the SECURITY DEFINER
+-- triggers in 02 (it follows the Block B policies for reads). The
+-- incremental helper is not an API entry point; the full rebuild is
+-- exposed to authenticated users and checks for the admin role itself.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.fn_recompute_sugerencias_pisos(INT[]) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_rebuild_sugerencias_pisos_huerfanos() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_rebuild_sugerencias_pisos_huerfanos() TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK I: Keyset pagination RPCs
+-- ---------------------------------------------------------------------
+-- SECURITY INVOKER over the views, so the view hardening (2b) and the
+-- table policies above decide which rows each page contains.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_page_afiliadas(INTEGER, INTEGER, TEXT, INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_page_pisos(INTEGER, INTEGER, INTEGER, BOOLEAN) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_page_bloques(INTEGER, INTEGER, INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_page_conflictos(INTEGER, INTEGER, INTEGER, TEXT, TEXT, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_page_afiliadas(INTEGER, INTEGER, TEXT, INTEGER) TO web_user;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_page_pisos(INTEGER, INTEGER, INTEGER, BOOLEAN) TO web_user;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_page_bloques(INTEGER, INTEGER, INTEGER) TO web_user;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_page_conflictos(INTEGER, INTEGER, INTEGER, TEXT, TEXT, TEXT) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK J: Unified search RPC
+-- ---------------------------------------------------------------------
+-- rpc_search is SECURITY INVOKER: each branch reads its table under the
+-- policies above, so a hit never reveals a row the caller cannot open.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_search(TEXT, INTEGER, TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_search(TEXT, INTEGER, TEXT[]) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK K: Map and proximity RPCs
+-- ---------------------------------------------------------------------
+-- SECURITY INVOKER: the pisos/afiliadas policies above decide which
+-- points and counts each caller gets back.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_pisos_cercanos(INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_mapa_pisos(DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_pisos_cercanos(INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) TO web_user;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_mapa_pisos(DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK L: Import pre-checks
+-- ---------------------------------------------------------------------
+-- rpc_check_import_conflicts is SECURITY DEFINER (UNIQUE constraints are
+-- global, RLS would hide the conflicting row) and checks the importer
+-- roles itself; it only echoes back values the caller sent.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_check_import_conflicts(TEXT[], TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_check_import_conflicts(TEXT[], TEXT[]) TO web_user;
+
+-- rpc_dry_run_import is SECURITY INVOKER on purpose: it must hit the same
+-- policies (42501) the real import will, and it always rolls back.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_dry_run_import(JSONB, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_dry_run_import(JSONB, JSONB) TO web_user;
+
+-- rpc_resolve_import_parents is SECURITY INVOKER: the importer only reuses
+-- bloques / pisos the caller can already see.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_resolve_import_parents(TEXT[], TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_resolve_import_parents(TEXT[], TEXT[]) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK M: Background import jobs
+-- ---------------------------------------------------------------------
+-- Each job (and its per-row results) belongs to the user who queued it;
+-- admin sees all of them. The app's import worker acts with a token minted
+-- for that same user, so these owner policies cover it too. No web_anon
+-- policy: RLS default-denies the global anonymous SELECT grant.
+ALTER TABLE sindicato_inq.import_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE sindicato_inq.import_job_filas ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS admin_all ON sindicato_inq.import_jobs;
+CREATE POLICY admin_all ON sindicato_inq.import_jobs
+    FOR ALL TO web_user
+    USING (current_setting('request.jwt.claims', true)::jsonb -> 'roles' ? 'admin')
+    WITH CHECK (current_setting('request.jwt.claims', true)::jsonb -> 'roles' ? 'admin');
+
+DROP POLICY IF EXISTS owner_all ON sindicato_inq.import_jobs;
+CREATE POLICY owner_all ON sindicato_inq.import_jobs
+    FOR ALL TO web_user
+    USING (usuario_id = NULLIF(current_setting('request.jwt.claims', true)::jsonb ->> 'sub', '')::int)
+    WITH CHECK (usuario_id = NULLIF(current_setting('request.jwt.claims', true)::jsonb ->> 'sub', '')::int);
+
+-- The row only stores the generated name of the job's CSV in
+-- IMPORT_JOBS_DIR, and the worker later reads and deletes that file. Owners
+-- may update the progress columns (and rpc_import_job_commit, which runs as
+-- them), but never ruta_archivo or the owner itself, so a job cannot be
+-- pointed at another file after it was queued.
+REVOKE UPDATE ON sindicato_inq.import_jobs FROM web_user;
+GRANT UPDATE (estado, total_filas, filas_procesadas, filas_ok, filas_error,
+              cancelacion_solicitada, mensaje, started_at, finished_at, updated_at)
+    ON sindicato_inq.import_jobs TO web_user;
+
+-- Rows follow their job: visible/writable exactly when the job is
+DROP POLICY IF EXISTS job_owner_all ON sindicato_inq.import_job_filas;
+CREATE POLICY job_owner_all ON sindicato_inq.import_job_filas
+    FOR ALL TO web_user
+    USING (EXISTS (SELECT 1 FROM sindicato_inq.import_jobs j WHERE j.id = job_id))
+    WITH CHECK (EXISTS (SELECT 1 FROM sindicato_inq.import_jobs j WHERE j.id = job_id));
+
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_import_job_commit(INTEGER, INTEGER, JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_import_job_commit(INTEGER, INTEGER, JSONB) TO web_user;
+
+-- ---------------------------------------------------------------------
+-- BLOCK N: Public signup lookup (/join)
+-- ---------------------------------------------------------------------
+-- rpc_join_lookup is SECURITY DEFINER so the anonymous form can tell a
+-- promoted member's CIF apart from a new one without seeing that row; it
+-- only hands out ids of 'Bienvenida' rows (already readable by web_anon).
+-- The queued sign-ups are then written by web_anon under section 3b.
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_join_lookup(TEXT, TEXT, TEXT, TEXT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_join_lookup(TEXT, TEXT, TEXT, TEXT) TO web_anon, web_user;
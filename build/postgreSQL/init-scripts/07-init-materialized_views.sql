@@ -0,0 +1,330 @@
+-- =====================================================================
+-- PASO 07: VISTAS MATERIALIZADAS OPCIONALES (REFRESCO POR EVENTOS)
+-- =====================================================================
+-- Copias materializadas de las vistas de informe más pesadas:
+--   v_afiliadas_detalle, v_resumen_bloques, v_resumen_nodos y
+--   v_consolidar_pisos_bloques (esta última hace además una búsqueda
+--   trigram LATERAL por cada piso).
+--
+-- Diseño:
+--   * Las vistas materializadas viven en el esquema privado
+--     `sindicato_inq_cache`, que PostgREST NO expone. Se definen como
+--     `SELECT * FROM sindicato_inq.<vista>`, así que la definición de cada
+--     vista sigue estando en un único sitio (03-init-createViews.sql).
+--   * Cada una tiene un índice ÚNICO sobre `id` para poder usar
+--     REFRESH MATERIALIZED VIEW CONCURRENTLY (las lecturas no se bloquean).
+--   * La API lee a través de las vistas `sindicato_inq.<vista>_mv`.
+--     Una vista materializada NO aplica RLS, así que estas envolturas filtran
+--     explícitamente por el claim `roles` del JWT (admin/gestor/actas, los
+--     mismos roles que ven estas vistas hoy) y se revocan a web_anon.
+--     Consecuencia asumida: gestor ve en los recuentos de los resúmenes las
+--     cuotas de facturación (agregadas, sin datos personales) que la RLS de
+--     `facturacion` le oculta en las vistas en vivo.
+--   * Registro de cambios con antirrebote: triggers de sentencia sobre las
+--     tablas base (los mismos objetos que ya llevan los triggers de
+--     `updated_at`, más las tablas de referencia que usan los joins) AÑADEN
+--     una fila por vista afectada a `mv_change_log`. Solo se inserta, nunca
+--     se actualiza una fila compartida, así que los escritores concurrentes
+--     (edición, /join, importaciones, cargas ETL) no se esperan entre sí.
+--     `rpc_refresh_materialized_views` refresca las vistas que llevan
+--     `p_quiet_seconds` sin cambios (o más de `p_max_delay_seconds` sucias)
+--     y borra los cambios que ha consumido.
+--   * El uso es opt-in por vista: `"materialized": True` en VIEW_INFO
+--     (build/niceGUI/config.py). La app pasa la lista de vistas activas en
+--     cada llamada al RPC; este marca `mv_registry.enabled` y solo deja los
+--     triggers en las tablas de las que depende alguna vista activa. Sin
+--     ninguna activa no hay triggers y las escrituras no pagan nada.
+--   * El RPC solo lo puede ejecutar el rol `mv_maintainer`; la app lo invoca
+--     en segundo plano con un JWT de ese rol (auth/token_utils.py). Además
+--     acota las esperas a un mínimo en el servidor.
+--
+-- NOTA: el DROP VIEW ... CASCADE de 03-init-createViews.sql elimina también
+-- estas vistas materializadas. Si se recarga el 03 en caliente, volver a
+-- ejecutar este script a continuación:
+--   docker exec -i tenantsunion-db-1 psql -U app_user -d mydb -v ON_ERROR_STOP=1 \
+--     -f /docker-entrypoint-initdb.d/07-init-materialized_views.sql
+-- =====================================================================
+
+SET search_path TO sindicato_inq, public;
+
+CREATE SCHEMA IF NOT EXISTS sindicato_inq_cache;
+REVOKE ALL ON SCHEMA sindicato_inq_cache FROM PUBLIC;
+
+-- =====================================================================
+-- 1. REGISTRO DE VISTAS, DEPENDENCIAS Y REGISTRO DE CAMBIOS
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS sindicato_inq_cache.mv_registry (
+    mv_name TEXT PRIMARY KEY,
+    enabled BOOLEAN NOT NULL DEFAULT FALSE,  -- la app lo sincroniza con VIEW_INFO
+    last_refresh_at TIMESTAMPTZ,
+    last_refresh_ms NUMERIC(12, 2)
+);
+
+-- Solo inserciones: una fila por sentencia y vista afectada
+CREATE TABLE IF NOT EXISTS sindicato_inq_cache.mv_change_log (
+    id BIGSERIAL PRIMARY KEY,
+    mv_name TEXT NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS mv_change_log_mv_name_idx
+    ON sindicato_inq_cache.mv_change_log (mv_name, changed_at);
+
+CREATE TABLE IF NOT EXISTS sindicato_inq_cache.mv_dependencies (
+    mv_name TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    PRIMARY KEY (table_name, mv_name)
+);
+
+INSERT INTO sindicato_inq_cache.mv_dependencies (mv_name, table_name) VALUES
+    ('mv_afiliadas_detalle', 'afiliadas'),
+    ('mv_afiliadas_detalle', 'pisos'),
+    ('mv_afiliadas_detalle', 'bloques'),
+    ('mv_afiliadas_detalle', 'empresas'),
+    ('mv_afiliadas_detalle', 'entramado_empresas'),
+    ('mv_afiliadas_detalle', 'provincias'),
+    ('mv_afiliadas_detalle', 'nodos_cp_mapping'),
+    ('mv_afiliadas_detalle', 'nodos'),
+    ('mv_resumen_bloques', 'bloques'),
+    ('mv_resumen_bloques', 'agrupacion_bloques'),
+    ('mv_resumen_bloques', 'empresas'),
+    ('mv_resumen_bloques', 'entramado_empresas'),
+    ('mv_resumen_bloques', 'pisos'),
+    ('mv_resumen_bloques', 'nodos_cp_mapping'),
+    ('mv_resumen_bloques', 'nodos'),
+    ('mv_resumen_bloques', 'afiliadas'),
+    ('mv_resumen_bloques', 'facturacion'),
+    ('mv_resumen_nodos', 'nodos'),
+    ('mv_resumen_nodos', 'nodos_cp_mapping'),
+    ('mv_resumen_nodos', 'pisos'),
+    ('mv_resumen_nodos', 'afiliadas'),
+    ('mv_resumen_nodos', 'conflictos'),
+    ('mv_resumen_nodos', 'facturacion'),
+    ('mv_consolidar_pisos_bloques', 'pisos'),
+    ('mv_consolidar_pisos_bloques', 'bloques'),
+    ('mv_consolidar_pisos_bloques', 'empresas')
+ON CONFLICT DO NOTHING;
+
+-- =====================================================================
+-- 2. VISTAS MATERIALIZADAS + ÍNDICES ÚNICOS
+-- =====================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS sindicato_inq_cache.mv_afiliadas_detalle CASCADE;
+CREATE MATERIALIZED VIEW sindicato_inq_cache.mv_afiliadas_detalle AS
+SELECT * FROM sindicato_inq.v_afiliadas_detalle;
+CREATE UNIQUE INDEX mv_afiliadas_detalle_id_uidx ON sindicato_inq_cache.mv_afiliadas_detalle (id);
+
+DROP MATERIALIZED VIEW IF EXISTS sindicato_inq_cache.mv_resumen_bloques CASCADE;
+CREATE MATERIALIZED VIEW sindicato_inq_cache.mv_resumen_bloques AS
+SELECT * FROM sindicato_inq.v_resumen_bloques;
+CREATE UNIQUE INDEX mv_resumen_bloques_id_uidx ON sindicato_inq_cache.mv_resumen_bloques (id);
+
+DROP MATERIALIZED VIEW IF EXISTS sindicato_inq_cache.mv_resumen_nodos CASCADE;
+CREATE MATERIALIZED VIEW sindicato_inq_cache.mv_resumen_nodos AS
+SELECT * FROM sindicato_inq.v_resumen_nodos;
+CREATE UNIQUE INDEX mv_resumen_nodos_id_uidx ON sindicato_inq_cache.mv_resumen_nodos (id);
+
+DROP MATERIALIZED VIEW IF EXISTS sindicato_inq_cache.mv_consolidar_pisos_bloques CASCADE;
+CREATE MATERIALIZED VIEW sindicato_inq_cache.mv_consolidar_pisos_bloques AS
+SELECT * FROM sindicato_inq.v_consolidar_pisos_bloques;
+CREATE UNIQUE INDEX mv_consolidar_pisos_bloques_id_uidx ON sindicato_inq_cache.mv_consolidar_pisos_bloques (id);
+
+-- Recién creadas, están al día: se olvidan los cambios pendientes.
+-- `enabled` se conserva al volver a ejecutar el script.
+INSERT INTO sindicato_inq_cache.mv_registry (mv_name, last_refresh_at)
+SELECT DISTINCT mv_name, now() FROM sindicato_inq_cache.mv_dependencies
+ON CONFLICT (mv_name) DO UPDATE SET last_refresh_at = now();
+TRUNCATE sindicato_inq_cache.mv_change_log;
+
+-- =====================================================================
+-- 3. VISTAS DE LECTURA PARA LA API (<vista>_mv)
+-- =====================================================================
+-- Sin security_invoker a propósito: deben leer la caché como su dueño.
+-- El WHERE sobre el JWT sustituye a la RLS que la caché no puede aplicar.
+
+CREATE OR REPLACE VIEW v_afiliadas_detalle_mv AS
+SELECT * FROM sindicato_inq_cache.mv_afiliadas_detalle
+WHERE current_setting('request.jwt.claims', true)::jsonb -> 'roles' ?| ARRAY['admin', 'gestor', 'actas'];
+
+CREATE OR REPLACE VIEW v_resumen_bloques_mv AS
+SELECT * FROM sindicato_inq_cache.mv_resumen_bloques
+WHERE current_setting('request.jwt.claims', true)::jsonb -> 'roles' ?| ARRAY['admin', 'gestor', 'actas'];
+
+CREATE OR REPLACE VIEW v_resumen_nodos_mv AS
+SELECT * FROM sindicato_inq_cache.mv_resumen_nodos
+WHERE current_setting('request.jwt.claims', true)::jsonb -> 'roles' ?| ARRAY['admin', 'gestor', 'actas']
+ORDER BY "Conf. Abiertos Bloque" DESC;
+
+CREATE OR REPLACE VIEW v_consolidar_pisos_bloques_mv AS
+SELECT * FROM sindicato_inq_cache.mv_consolidar_pisos_bloques
+WHERE current_setting('request.jwt.claims', true)::jsonb -> 'roles' ?| ARRAY['admin', 'gestor', 'actas'];
+
+-- =====================================================================
+-- 4. TRIGGER DE REGISTRO DE CAMBIOS (nivel sentencia)
+-- =====================================================================
+-- Los triggers de updated_at (02) son BEFORE UPDATE por fila y no ven
+-- INSERT/DELETE; el registro necesita los tres, una vez por sentencia.
+-- SECURITY DEFINER: web_user escribe las tablas base pero no tiene acceso
+-- al esquema de caché.
+CREATE OR REPLACE FUNCTION sindicato_inq.fn_enqueue_mv_refresh()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = sindicato_inq_cache, pg_catalog
+AS $$
+BEGIN
+    -- Solo INSERT: sin fila compartida que bloquear hasta el COMMIT
+    INSERT INTO mv_change_log (mv_name)
+    SELECT d.mv_name
+      FROM mv_dependencies d
+      JOIN mv_registry r ON r.mv_name = d.mv_name AND r.enabled
+     WHERE d.table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$;
+
+-- Deja el trigger solo en las tablas de las que depende alguna vista activa.
+-- Es DDL (bloqueo SHARE ROW EXCLUSIVE sobre la tabla): únicamente se ejecuta
+-- cuando cambia el conjunto de vistas activas.
+CREATE OR REPLACE FUNCTION sindicato_inq_cache.fn_sync_mv_triggers()
+RETURNS VOID
+LANGUAGE plpgsql
+SET search_path = sindicato_inq_cache, pg_catalog
+AS $$
+DECLARE
+    t TEXT;
+    v_needed BOOLEAN;
+    v_exists BOOLEAN;
+BEGIN
+    FOR t, v_needed IN
+        SELECT d.table_name, bool_or(COALESCE(r.enabled, FALSE))
+          FROM mv_dependencies d
+          LEFT JOIN mv_registry r ON r.mv_name = d.mv_name
+         GROUP BY d.table_name
+    LOOP
+        SELECT EXISTS (
+            SELECT 1 FROM pg_trigger
+             WHERE tgname = 'trg_enqueue_mv_refresh'
+               AND tgrelid = format('sindicato_inq.%I', t)::regclass
+        ) INTO v_exists;
+        IF v_needed AND NOT v_exists THEN
+            EXECUTE format(
+                'CREATE TRIGGER trg_enqueue_mv_refresh
+                     AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON sindicato_inq.%I
+                     FOR EACH STATEMENT
+                     EXECUTE FUNCTION sindicato_inq.fn_enqueue_mv_refresh()', t);
+        ELSIF v_exists AND NOT v_needed THEN
+            EXECUTE format('DROP TRIGGER trg_enqueue_mv_refresh ON sindicato_inq.%I', t);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+-- =====================================================================
+-- 5. RPC DE REFRESCO CON ANTIRREBOTE
+-- =====================================================================
+-- `p_enabled`: las vistas materializadas que la app usa (VIEW_INFO). Si
+-- cambian, se actualiza `mv_registry` y los triggers; una vista recién
+-- activada se refresca enseguida porque nadie la mantenía.
+-- Refresca (CONCURRENTLY) las vistas activas con cambios que lleven
+-- `p_quiet_seconds` sin cambios nuevos, o que acumulen más de
+-- `p_max_delay_seconds` desde el primer cambio pendiente (para que un goteo
+-- constante no las deje sin refrescar). Las esperas se acotan a un mínimo
+-- de 5 y 60 s. Un advisory lock evita refrescos solapados desde varias
+-- instancias. Devuelve las vistas refrescadas y lo que tardó cada una.
+DROP FUNCTION IF EXISTS sindicato_inq.rpc_refresh_materialized_views(TEXT[], INTEGER, INTEGER) CASCADE;
+
+CREATE OR REPLACE FUNCTION sindicato_inq.rpc_refresh_materialized_views(
+    p_enabled TEXT[] DEFAULT '{}',
+    p_quiet_seconds INTEGER DEFAULT 30,
+    p_max_delay_seconds INTEGER DEFAULT 300
+)
+RETURNS TABLE(mv_name TEXT, duration_ms NUMERIC)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = sindicato_inq_cache, sindicato_inq, public
+AS $$
+DECLARE
+    r RECORD;
+    v_started TIMESTAMPTZ;
+    v_enabled TEXT[] := COALESCE(p_enabled, '{}');
+    v_quiet INTEGER := GREATEST(COALESCE(p_quiet_seconds, 30), 5);
+    v_max_delay INTEGER := GREATEST(COALESCE(p_max_delay_seconds, 300), 60);
+    v_resync BOOLEAN := FALSE;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('sindicato_inq_cache.mv_refresh')) THEN
+        RETURN;
+    END IF;
+
+    FOR r IN
+        UPDATE mv_registry g
+           SET enabled = NOT g.enabled
+         WHERE g.enabled IS DISTINCT FROM (g.mv_name = ANY(v_enabled))
+        RETURNING g.mv_name, g.enabled
+    LOOP
+        v_resync := TRUE;
+        IF r.enabled THEN
+            INSERT INTO mv_change_log AS l (mv_name, changed_at)
+            VALUES (r.mv_name, now() - make_interval(secs => v_max_delay));
+        ELSE
+            DELETE FROM mv_change_log l WHERE l.mv_name = r.mv_name;
+        END IF;
+    END LOOP;
+    IF v_resync THEN
+        PERFORM sindicato_inq_cache.fn_sync_mv_triggers();
+    END IF;
+
+    FOR r IN
+        SELECT l.mv_name, array_agg(l.id) AS change_ids
+          FROM mv_change_log l
+          JOIN mv_registry g ON g.mv_name = l.mv_name AND g.enabled
+         GROUP BY l.mv_name
+        HAVING max(l.changed_at) <= now() - make_interval(secs => v_quiet)
+            OR min(l.changed_at) <= now() - make_interval(secs => v_max_delay)
+         ORDER BY min(l.changed_at)
+    LOOP
+        v_started := clock_timestamp();
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY sindicato_inq_cache.%I', r.mv_name);
+
+        -- Se borran solo los cambios leídos antes del refresco: los que una
+        -- transacción aún abierta confirme después siguen en el registro y la
+        -- vista queda sucia para la siguiente vuelta.
+        DELETE FROM mv_change_log l WHERE l.id = ANY(r.change_ids);
+        UPDATE mv_registry g
+           SET last_refresh_at = clock_timestamp(),
+               last_refresh_ms = EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000
+         WHERE g.mv_name = r.mv_name;
+
+        mv_name := r.mv_name;
+        duration_ms := ROUND((EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000)::numeric, 2);
+        RETURN NEXT;
+    END LOOP;
+END;
+$$;
+
+-- =====================================================================
+-- 6. PERMISOS
+-- =====================================================================
+REVOKE ALL ON sindicato_inq.v_afiliadas_detalle_mv, sindicato_inq.v_resumen_bloques_mv,
+              sindicato_inq.v_resumen_nodos_mv, sindicato_inq.v_consolidar_pisos_bloques_mv
+    FROM web_anon;
+GRANT SELECT ON sindicato_inq.v_afiliadas_detalle_mv, sindicato_inq.v_resumen_bloques_mv,
+                sindicato_inq.v_resumen_nodos_mv, sindicato_inq.v_consolidar_pisos_bloques_mv
+    TO web_user;
+
+-- Rol de mantenimiento: la app firma un JWT con role=mv_maintainer para el
+-- bucle de refresco (services/materialized_views.py). PostgREST hace SET ROLE
+-- a él, así que app_user tiene que ser miembro (como con web_anon/web_user).
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'mv_maintainer') THEN
+        CREATE ROLE mv_maintainer nologin;
+    END IF;
+END
+$$;
+GRANT mv_maintainer TO app_user;
+GRANT USAGE ON SCHEMA sindicato_inq TO mv_maintainer;
+
+REVOKE EXECUTE ON FUNCTION sindicato_inq_cache.fn_sync_mv_triggers() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION sindicato_inq.rpc_refresh_materialized_views(TEXT[], INTEGER, INTEGER) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION sindicato_inq.rpc_refresh_materialized_views(TEXT[], INTEGER, INTEGER) TO mv_maintainer;
@@ -0,0 +1,17 @@
+"""
+BENCHMARKS de los caminos calientes del lado cliente
+=====================================================================
+Filtrado/ordenación de BaseTableState, normalización de valores,
+FilterPanel, formato de celdas de DataTable, TableValidator, validación
+del importador y exportación a CSV, sobre filas sintéticas realistas
+(synthetic.py) de 1k, 20k y 100k filas.
+
+Uso (desde la raíz del proyecto):
+  python tests/benchmarks/run.py --output benchmarks.json
+  python tests/benchmarks/run.py --sizes 1000 20000 --baseline benchmarks.json --threshold 0.2
+
+Con --baseline, termina con código 1 si algún benchmark es más lento que
+en la referencia por encima del umbral (mediana, ignorando diferencias
+por debajo de --noise-ms), de modo que cada cambio de rendimiento se
+puede demostrar con dos ficheros JSON.
+"""
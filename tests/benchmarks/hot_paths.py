@@ -0,0 +1,147 @@
+"""
+Los caminos calientes del lado cliente, cada uno como una función
+`preparar(datos) -> llamada` que se cronometra sin incluir la preparación.
+
+Cada benchmark mide una sola cosa: la llamada que devuelve es exactamente
+lo que hace la app cuando el usuario filtra, ordena, pinta, valida o
+exporta; solo los componentes NiceGUI se montan en un cliente sin
+navegador (`ui_context`).
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+from nicegui import Client
+from nicegui.page import page
+
+from api.client import APIClient
+from api.validate import validator
+from components.data_table import _format_cell_value
+from components.exporter import export_to_csv
+from components.filters import FilterPanel
+from config import HOUSING_UNION_IMPORT_CONFIG, IMPORT_MANDATORY_FIELDS, VIEW_INFO
+from services.relational_import_service import MultiTableImportService
+from state.base import BaseTableState, _normalize_for_filtering, _normalize_for_sorting
+
+from . import synthetic
+
+
+@contextmanager
+def ui_context():
+    """Un cliente NiceGUI sin navegador para montar elementos fuera de una página."""
+    client = Client(page("/"), request=None)
+    try:
+        with client:
+            yield client
+    finally:
+        client.delete()
+
+
+class OfflineAPI(APIClient):
+    """APIClient sin red: la validación es local y la consulta de claves existentes no encuentra nada."""
+
+    def __init__(self):
+        super().__init__("http://benchmark.invalid")
+
+    async def check_import_conflicts(self, values):
+        return {}
+
+
+class Dataset:
+    """Las filas sintéticas de un tamaño, generadas una vez para todos los benchmarks."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.afiliadas = synthetic.afiliadas_detalle(size)
+        self.pisos = synthetic.pisos(size)
+        self.conflictos = synthetic.conflictos_detalle(size)
+        self.import_rows = synthetic.import_rows(size)
+
+
+def _state(records: List[Dict[str, Any]], config: Dict[str, Any]) -> BaseTableState:
+    state = BaseTableState()
+    state.set_records(records, config)
+    return state
+
+
+def filter_global_search(data: Dataset) -> Callable:
+    state = _state(data.afiliadas, VIEW_INFO.get("v_afiliadas_detalle", {}))
+    state.filters = {"global_search": "garcia madrid"}
+    return state.apply_filters_and_sort
+
+
+def filter_columns(data: Dataset) -> Callable:
+    state = _state(data.conflictos, VIEW_INFO.get("v_conflictos_detalle", {}))
+    state.filters = {
+        "Estado": ["Abierto", "Victoria"],
+        "Causa": "renovación",
+        "date_range_Fecha de Apertura": {"start": "2018-01-01", "end": "2024-12-31"},
+    }
+    return state.apply_filters_and_sort
+
+
+def sort_multi_column(data: Dataset) -> Callable:
+    state = _state(data.afiliadas, VIEW_INFO.get("v_afiliadas_detalle", {}))
+    state.sort_criteria = [("Nodo", True), ("Direccion", False), ("id", True)]
+    return state.apply_filters_and_sort
+
+
+def normalize_for_sorting(data: Dataset) -> Callable:
+    values = [r["Direccion"] for r in data.afiliadas] + [r["id"] for r in data.afiliadas]
+    return lambda: [_normalize_for_sorting(v) for v in values]
+
+
+def normalize_for_filtering(data: Dataset) -> Callable:
+    values = [v for r in data.afiliadas for v in (r["Nombre Completo"], r["Direccion"], r["Correo"])]
+    return lambda: [_normalize_for_filtering(v) for v in values]
+
+
+def filter_panel_refresh(data: Dataset) -> Callable:
+    def run():
+        with ui_context():
+            FilterPanel(data.conflictos, lambda column, value: None).create()
+
+    return run
+
+
+def format_cells(data: Dataset) -> Callable:
+    cells = [(column, value) for row in data.pisos for column, value in row.items()]
+    return lambda: [_format_cell_value(column, value) for column, value in cells]
+
+
+def validate_records(data: Dataset) -> Callable:
+    records = [{k: v for k, v in row.items() if k != "id"} for row in data.pisos]
+    return lambda: [validator.validate_record("pisos", record, "create") for record in records]
+
+
+def validate_import(data: Dataset) -> Callable:
+    service = MultiTableImportService(OfflineAPI(), HOUSING_UNION_IMPORT_CONFIG)
+    mandatory = set(IMPORT_MANDATORY_FIELDS)
+
+    async def run():
+        return await service.validate_relational_import(data.import_rows, mandatory)
+
+    return run
+
+
+def export_csv(data: Dataset) -> Callable:
+    def run():
+        with ui_context():
+            export_to_csv(data.afiliadas, "benchmark.csv")
+
+    return run
+
+
+BENCHMARKS: Dict[str, Callable[[Dataset], Callable]] = {
+    "state.apply_filters_and_sort[global_search]": filter_global_search,
+    "state.apply_filters_and_sort[columns]": filter_columns,
+    "state.apply_filters_and_sort[sort]": sort_multi_column,
+    "state._normalize_for_sorting": normalize_for_sorting,
+    "state._normalize_for_filtering": normalize_for_filtering,
+    "FilterPanel.refresh": filter_panel_refresh,
+    "data_table._format_cell_value": format_cells,
+    "TableValidator.validate_record": validate_records,
+    "MultiTableImportService.validate_relational_import": validate_import,
+    "exporter.export_to_csv": export_csv,
+}
+
@@ -0,0 +1,149 @@
+"""
+Ejecuta los benchmarks de hot_paths.py y guarda/compara resultados JSON
+(ver el docstring del paquete para el uso).
+"""
+
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+if __package__ in (None, ""):
+    # Ejecutado como script: el código de la app y el paquete de benchmarks
+    ROOT = Path(__file__).resolve().parents[2]
+    sys.path.insert(0, str(ROOT / "build" / "niceGUI"))
+    sys.path.insert(0, str(ROOT / "tests"))
+    __package__ = "benchmarks"
+
+from .hot_paths import BENCHMARKS, Dataset  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 20_000, 100_000)
+DEFAULT_REPEAT = 5
+# A regression is a median this much slower than the baseline (0.25 = +25 %) ...
+DEFAULT_THRESHOLD = 0.25
+# ... and at least this many milliseconds slower, so timer noise on tiny runs does not count
+DEFAULT_NOISE_MS = 2.0
+
+
+def result_key(name: str, size: int) -> str:
+    return f"{name}@{size}"
+
+
+async def _time(call, repeat: int) -> List[float]:
+    runs = []
+    is_async = inspect.iscoroutinefunction(call)
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        if is_async:
+            await call()
+        else:
+            call()
+        runs.append(time.perf_counter() - start)
+    return runs
+
+
+async def run_suite(
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    repeat: int = DEFAULT_REPEAT,
+    only: Optional[List[str]] = None,
+    log=print,
+) -> Dict[str, Any]:
+    """Runs every benchmark (or those whose name contains one of `only`) at each size."""
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        data = Dataset(size)
+        for name, prepare in BENCHMARKS.items():
+            if only and not any(part in name for part in only):
+                continue
+            runs = await _time(prepare(data), repeat)
+            entry = {
+                "benchmark": name,
+                "rows": size,
+                "median_s": statistics.median(runs),
+                "min_s": min(runs),
+                "max_s": max(runs),
+                "runs_s": runs,
+            }
+            results[result_key(name, size)] = entry
+            if log:
+                log(f"{name:<55} {size:>7} filas  mediana {entry['median_s'] * 1000:9.1f} ms  mín {entry['min_s'] * 1000:9.1f} ms")
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+    noise_ms: float = DEFAULT_NOISE_MS,
+    metric: str = "median_s",
+) -> List[Dict[str, Any]]:
+    """
+    One row per benchmark present in both runs, with `regression` set when
+    its `metric` got slower beyond the limits.
+    """
+    rows = []
+    for key, entry in current["results"].items():
+        before = baseline.get("results", {}).get(key)
+        if not before:
+            continue
+        old, new = before[metric], entry[metric]
+        ratio = new / old if old else float("inf")
+        rows.append({
+            "key": key,
+            "baseline_s": old,
+            "current_s": new,
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold and (new - old) * 1000 > noise_ms,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", nargs="+", help="Solo los benchmarks cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--output", type=Path, help="Fichero JSON donde guardar los resultados")
+    parser.add_argument("--baseline", type=Path, help="Resultados JSON de referencia con los que comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--noise-ms", type=float, default=DEFAULT_NOISE_MS)
+    args = parser.parse_args(argv)
+
+    current = asyncio.run(run_suite(args.sizes, args.repeat, args.only))
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nResultados guardados en {args.output}")
+    if not args.baseline:
+        return 0
+
+    rows = compare(current, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold, args.noise_ms)
+    print(f"\nComparación con {args.baseline} (umbral +{args.threshold:.0%}, ruido {args.noise_ms} ms):")
+    for row in rows:
+        mark = "REGRESIÓN" if row["regression"] else ""
+        print(f"{row['key']:<65} {row['baseline_s'] * 1000:9.1f} -> {row['current_s'] * 1000:9.1f} ms  x{row['ratio']:.2f}  {mark}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) por encima del umbral.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
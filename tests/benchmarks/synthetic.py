@@ -0,0 +1,229 @@
+"""
+Datos sintéticos con la forma de los que maneja la app en producción:
+filas de v_afiliadas_detalle, pisos (con coordenadas GeoJSON tal como las
+devuelve PostgREST), v_conflictos_detalle y v_conflictos_enhanced, además
+de filas CSV para el importador (HOUSING_UNION_IMPORT_CONFIG). Nombres y
+direcciones en castellano con tildes, eñes, huecos (None / "") y valores
+repetidos en la proporción habitual, para que filtros, ordenación y
+validación trabajen como con datos reales.
+
+Con la misma semilla el resultado es idéntico, así que dos ejecuciones del
+benchmark miden exactamente las mismas filas.
+"""
+
+import random
+from typing import Any, Dict, List, Optional
+
+NOMBRES = [
+    "María", "Lucía", "Martina", "Sofía", "Paula", "Julia", "Carmen", "Begoña", "Íñigo", "José Ángel",
+    "Álvaro", "Javier", "Sergio", "Raúl", "Óscar", "Nuria", "Ainhoa", "Noelia", "Adrián", "Zoe",
+]
+APELLIDOS = [
+    "García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez", "Gómez",
+    "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez", "Romero", "Núñez", "Peña",
+]
+VIAS = ["Calle", "Avenida", "Plaza", "Paseo", "Camino", "Ronda", "Travesía"]
+CALLES = [
+    "Mayor", "de Alcalá", "de la Princesa", "del Doctor Esquerdo", "de Bravo Murillo", "Santa Engracia",
+    "de Toledo", "Embajadores", "de la Castellana", "de los Reyes Católicos", "Ramón y Cajal", "de Andalucía",
+    "del Río Manzanares", "Nuestra Señora de Begoña", "de la Peña Prieta", "Ntra. Sra. de Fátima",
+]
+MUNICIPIOS = [
+    ("Madrid", "280"), ("Móstoles", "289"), ("Alcalá de Henares", "288"), ("Getafe", "289"),
+    ("Leganés", "289"), ("Fuenlabrada", "289"), ("Alcorcón", "289"), ("Parla", "289"),
+]
+PLANTAS = ["Bajo", "1º", "2º", "3º", "4º", "5º", "6º", "Ático"]
+PUERTAS = ["A", "B", "C", "D", "Izq", "Dcha", "1", "2"]
+EMPRESAS = ["Fidere", "Azora", "Blackstone", "Testa", "Elix", "Lazora", "Particular", None]
+NODOS = ["Centro", "Latina", "Usera", "Vallecas", "Tetuán", "Sin Nodo Asignado"]
+ENTRAMADOS = ["Blackstone", "Cerberus", "Sin Entramado"]
+ESTADOS_AFILIADA = ["Alta", "Alta", "Alta", "Baja", "Bienvenida"]
+REGIMENES = ["Alquiler", "Alquiler", "Alquiler social", "Cesión", None]
+CAUSAS = [
+    "No renovación", "Fianza", "Acoso inmobiliario", "Subida de alquiler", "Reparaciones / Habitabilidad",
+    "Venta de la vivienda", "Impago", "Actualización del precio (IPC)", "Otros",
+]
+AMBITOS = ["Afiliada", "Afiliada", "Bloque", "Entramado", "Agrupación de Bloques"]
+ESTADOS_CONFLICTO = ["Abierto", "Abierto", "Cerrado", "Victoria"]
+DNI_LETRAS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def _maybe(rng: random.Random, value: Any, blank_ratio: float = 0.1, blank: Any = None) -> Any:
+    return blank if rng.random() < blank_ratio else value
+
+
+def _dni(rng: random.Random) -> str:
+    number = rng.randrange(10_000_000, 99_999_999)
+    return f"{number}{DNI_LETRAS[number % 23]}"
+
+
+def _fecha(rng: random.Random, desde: int = 2015, hasta: int = 2025, con_hora: bool = False) -> str:
+    fecha = f"{rng.randint(desde, hasta)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    if con_hora:
+        fecha += f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.{rng.randint(0, 999999):06d}"
+    return fecha
+
+
+def _direccion(rng: random.Random) -> str:
+    return f"{rng.choice(VIAS)} {rng.choice(CALLES)} {rng.randint(1, 180)}"
+
+
+def _vivienda(rng: random.Random, bloque: str) -> str:
+    return f"{bloque}, {rng.choice(PLANTAS)} {rng.choice(PUERTAS)}"
+
+
+def _punto(rng: random.Random) -> Optional[Dict[str, Any]]:
+    if rng.random() < 0.2:
+        return None
+    return {"type": "Point", "coordinates": [round(-3.70 + rng.uniform(-0.25, 0.25), 6), round(40.42 + rng.uniform(-0.2, 0.2), 6)]}
+
+
+def pisos(n: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Filas de la tabla pisos, como en la pestaña de Geolink."""
+    rng = random.Random(seed)
+    bloques = [_direccion(rng) for _ in range(max(1, n // 6))]
+    rows = []
+    for i in range(1, n + 1):
+        municipio, cp = rng.choice(MUNICIPIOS)
+        rows.append({
+            "id": i,
+            "direccion": _vivienda(rng, rng.choice(bloques)),
+            "municipio": municipio,
+            "cp": _maybe(rng, int(cp + f"{rng.randint(0, 99):02d}")),
+            "fecha_alta": _fecha(rng, con_hora=True),
+            "updated_at": _fecha(rng, 2023, 2025, con_hora=True),
+            "coordenadas": _punto(rng),
+            "ref_catastral": _maybe(rng, f"{rng.randrange(10**13, 10**14)}AB{rng.randint(1000, 9999)}", 0.4),
+        })
+    return rows
+
+
+def afiliadas_detalle(n: int, seed: int = 2) -> List[Dict[str, Any]]:
+    """Filas de v_afiliadas_detalle (nombres de columna de la vista)."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        municipio, cp = rng.choice(MUNICIPIOS)
+        estado = rng.choice(ESTADOS_AFILIADA)
+        rows.append({
+            "id": i,
+            "Nº Afiliada": f"A{i:05d}",
+            "Nombre Completo": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+            "CIF": _dni(rng),
+            "Correo": _maybe(rng, f"persona{i}@correo.es", 0.15),
+            "Teléfono": _maybe(rng, f"6{rng.randrange(10**7, 10**8)}", 0.2),
+            "Direccion": f"{_vivienda(rng, _direccion(rng))}, {municipio}, {cp}{rng.randint(0, 99):02d}",
+            "Regimen": rng.choice(REGIMENES),
+            "Estado": estado,
+            "Fecha Alta": _fecha(rng),
+            "Fecha Baja": _fecha(rng, 2020) if estado == "Baja" else None,
+            "Fecha Firma": _maybe(rng, _fecha(rng, 2010), 0.3),
+            "Inmob.": _maybe(rng, rng.choice(["Tecnocasa", "Foncasa", "Engel & Völkers"]), 0.6),
+            "Prop. Vert.": rng.choice(["Sí", "No", None]),
+            "Prop. (afiliada)": rng.choice(EMPRESAS),
+            "Prop. (piso)": rng.choice(EMPRESAS),
+            "Entramado": rng.choice(ENTRAMADOS),
+            "Provincia": "Madrid",
+            "Nodo": rng.choice(NODOS),
+        })
+    return rows
+
+
+def conflictos_detalle(n: int, seed: int = 3) -> List[Dict[str, Any]]:
+    """Filas de v_conflictos_detalle."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        estado = rng.choice(ESTADOS_CONFLICTO)
+        rows.append({
+            "id": i,
+            "Estado": estado,
+            "Ámbito": rng.choice(AMBITOS),
+            "Afiliada": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+            "Dirección": _vivienda(rng, _direccion(rng)),
+            "Causa": rng.choice(CAUSAS),
+            "Fecha de Apertura": _fecha(rng),
+            "Fecha Última Actualización": _maybe(rng, _fecha(rng, 2024, 2025, con_hora=True), 0.3),
+            "Descripción": _maybe(rng, f"La propiedad no responde a la solicitud nº {i} sobre la fianza y las reparaciones.", 0.2),
+            "Tarea Actual": _maybe(rng, "Enviar burofax", 0.5),
+            "Fecha de Cierre": _fecha(rng, 2024) if estado != "Abierto" else None,
+            "Resolución": _maybe(rng, "Acuerdo con la propiedad", 0.7),
+            "Nodo": rng.choice(NODOS),
+            "Afiliada ID": rng.randint(1, max(1, n)),
+        })
+    return rows
+
+
+def conflictos_enhanced(n: int, seed: int = 5) -> List[Dict[str, Any]]:
+    """Filas de v_conflictos_enhanced (lo que devuelve rpc_page_conflictos a ConflictsView)."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(1, n + 1):
+        estado = rng.choice(ESTADOS_CONFLICTO)
+        nombre, apellidos = rng.choice(NOMBRES), f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        bloque = _direccion(rng)
+        municipio, cp = rng.choice(MUNICIPIOS)
+        nodo = rng.randrange(len(NODOS))
+        rows.append({
+            "id": i,
+            "estado": estado,
+            "ambito": rng.choice(AMBITOS),
+            "causa": rng.choice(CAUSAS),
+            "tarea_actual": _maybe(rng, "Enviar burofax", 0.5),
+            "fecha_apertura": _fecha(rng),
+            "fecha_cierre": _fecha(rng, 2024) if estado != "Abierto" else None,
+            "descripcion": _maybe(rng, f"La propiedad no responde a la solicitud nº {i} sobre la fianza y las reparaciones.", 0.2),
+            "resolucion": _maybe(rng, "Acuerdo con la propiedad", 0.7),
+            "afiliada_id": rng.randint(1, max(1, n)),
+            "afiliada_nombre": nombre,
+            "afiliada_apellidos": apellidos,
+            "afiliada_nombre_completo": f"{nombre} {apellidos}",
+            "num_afiliada": f"A{i:05d}",
+            "piso_id": i,
+            "piso_direccion": _vivienda(rng, bloque),
+            "piso_municipio": municipio,
+            "piso_cp": int(cp + f"{rng.randint(0, 99):02d}"),
+            "piso_propiedad": rng.choice(EMPRESAS),
+            "piso_inmobiliaria": None,
+            "bloque_id": rng.randint(1, max(1, n // 6)),
+            "bloque_direccion": bloque,
+            "nodo_id": nodo + 1,
+            "nodo_nombre": NODOS[nodo],
+            "ultima_actualizacion": _maybe(rng, _fecha(rng, 2024, 2025, con_hora=True), 0.3),
+            "conflict_label": f"({i}-) {nombre} {apellidos}, {bloque}",
+        })
+    return rows
+
+
+def import_rows(n: int, seed: int = 4) -> List[Dict[str, str]]:
+    """Filas CSV (todo texto, "" para vacío) con las cabeceras de HOUSING_UNION_IMPORT_CONFIG."""
+    rng = random.Random(seed)
+    bloques = [_direccion(rng) for _ in range(max(1, n // 4))]
+    rows = []
+    for i in range(1, n + 1):
+        municipio, cp = rng.choice(MUNICIPIOS)
+        bloque = rng.choice(bloques)
+        rows.append({
+            "direccion_bloque": bloque,
+            "direccion_vivienda_completa": _vivienda(rng, bloque),
+            "localidad": municipio,
+            "codigo_postal": _maybe(rng, f"{cp}{rng.randint(0, 99):02d}", blank=""),
+            "empresa_propietaria": rng.choice(EMPRESAS) or "",
+            "propiedad_vertical": rng.choice(["Si", "No", ""]),
+            "numero_de_inquilinos": _maybe(rng, str(rng.randint(1, 6)), blank=""),
+            "fecha_firma_contrato": _maybe(rng, _fecha(rng, 2010), 0.3, ""),
+            "numero_afiliada": f"A{i:05d}",
+            "nombre_afiliada": rng.choice(NOMBRES),
+            "apellidos_afiliada": f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+            # Algunas repetidas: el validador las marca como duplicadas en el archivo
+            "dni_nie": _dni(rng) if rng.random() > 0.01 else "12345678Z",
+            "fecha_nacimiento": _maybe(rng, _fecha(rng, 1950, 2004), 0.2, ""),
+            "email": _maybe(rng, f"persona{i}@correo.es", 0.15, ""),
+            "telefono": _maybe(rng, f"6{rng.randrange(10**7, 10**8)}", 0.2, ""),
+            "estado_afiliada": rng.choice(ESTADOS_AFILIADA),
+            "cuota": _maybe(rng, f"{rng.choice([5, 10, 15, 120])}.00", 0.1, ""),
+            "periodicidad": rng.choice(["1", "12", "1", ""]),
+            "forma_pago": rng.choice(["Domiciliación", "Transferencia", ""]),
+            "cuenta_bancaria_iban": _maybe(rng, "ES9121000418450200051332", 0.5, ""),
+        })
+    return rows
@@ -0,0 +1,20 @@
+"""
+PRUEBA DE CARGA con varias sesiones simultáneas
+=====================================================================
+Lanza un PostgREST local con datos sintéticos (fake_postgrest.py, filas
+de benchmarks/synthetic.py) y la app real apuntando a él, y abre N
+sesiones que hablan el protocolo de NiceGUI sin navegador (session.py).
+Cada sesión entra, abre Detalle de Afiliadas, busca, ordena, pasa de
+página, abre un conflicto y le añade una nota (scenario.py).
+
+Uso (desde la raíz del proyecto):
+  python tests/loadtest/run.py --sessions 20 --output carga.json
+  python tests/loadtest/run.py --sessions 20 --baseline carga.json --threshold 0.3
+  python tests/loadtest/run.py --app-url http://127.0.0.1:8081 --sessions 5
+
+El informe da los percentiles de latencia de cada acción, la memoria del
+servidor (RSS de la app y sus procesos hijos) antes y con todas las
+sesiones conectadas, y el retraso del bucle de eventos según /metrics.
+Con --baseline, termina con código 1 si el p95 de alguna acción empeora
+por encima del umbral, igual que los benchmarks.
+"""
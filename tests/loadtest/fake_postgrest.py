@@ -0,0 +1,281 @@
+"""
+Sustituto local de PostgREST con datos sintéticos (benchmarks/synthetic.py).
+
+Entiende lo que la app usa de la API: lectura de tablas y vistas con
+filtros `col=op.valor` (eq, neq, gt, gte, lt, lte, in, is, like, ilike),
+order, limit y offset; inserciones, PATCH y DELETE con `id=eq.N`; y las RPC
+de las que dependen los flujos simulados (rpc_login, rpc_page_* por keyset,
+rpc_conflict_stats). Una RPC desconocida responde 404 como una función no
+desplegada, de modo que la app use su ruta de respaldo; una tabla
+desconocida devuelve []. Cada respuesta espera `latency` segundos para
+imitar la ida y vuelta a la base de datos.
+
+GET /_stats devuelve cuántas peticiones recibió cada endpoint y cuáles no
+conocía, para comprobar que el escenario ejercita lo que se cree.
+"""
+
+import asyncio
+import collections
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from benchmarks import synthetic
+
+# rpc_page_* -> (tabla o vista que pagina, orden del cursor)
+KEYSET_RPCS = {
+    "rpc_page_afiliadas": ("v_afiliadas_detalle", "asc"),
+    "rpc_page_conflictos": ("v_conflictos_enhanced", "desc"),
+    "rpc_page_pisos": ("pisos", "asc"),
+}
+
+# Tablas en las que se escribe -> vista que muestra lo escrito
+WRITE_VIEWS = {"diario_conflictos": "v_diario_conflictos_con_afiliada"}
+
+
+def seed_tables(size: int) -> Dict[str, List[Dict[str, Any]]]:
+    """`size` afiliadas y pisos; una décima parte de conflictos, cada uno con dos notas."""
+    conflictos = synthetic.conflictos_enhanced(max(1, size // 10))
+    diario = []
+    for conflicto in conflictos:
+        for n in range(2):
+            diario.append({
+                "id": len(diario) + 1,
+                "conflicto_id": conflicto["id"],
+                "estado": conflicto["estado"],
+                "accion": "Llamada a la propiedad" if n else "Asamblea",
+                "notas": f"Nota {n + 1} del conflicto {conflicto['id']}",
+                "tarea_actual": conflicto["tarea_actual"],
+                "created_at": f"2025-0{n + 1}-15T10:00:00",
+                "usuario_alias": "coordinadora",
+                "afiliada_nombre": conflicto["afiliada_nombre"],
+                "afiliada_apellidos": conflicto["afiliada_apellidos"],
+                "afiliada_nombre_completo": conflicto["afiliada_nombre_completo"],
+            })
+    return {
+        "v_afiliadas_detalle": synthetic.afiliadas_detalle(size),
+        "pisos": synthetic.pisos(size),
+        "v_conflictos_enhanced": conflictos,
+        "v_conflictos_detalle": synthetic.conflictos_detalle(len(conflictos)),
+        "v_diario_conflictos_con_afiliada": diario,
+        "conflictos": [dict(c) for c in conflictos],
+        "diario_conflictos": [dict(d) for d in diario],
+        "usuarios": [],
+        "import_jobs": [],
+        "nodos": [{"id": i + 1, "nombre": nombre} for i, nombre in enumerate(synthetic.NODOS)],
+    }
+
+
+def _coerce(text: str) -> Any:
+    if text == "null":
+        return None
+    if text in ("true", "false"):
+        return text == "true"
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def _like(pattern: str, value: Any, case_sensitive: bool) -> bool:
+    needle = pattern.replace("*", "%").strip("%")
+    haystack = "" if value is None else str(value)
+    if not case_sensitive:
+        needle, haystack = needle.lower(), haystack.lower()
+    return needle in haystack
+
+
+def _condition(expression: str) -> Callable[[Any], bool]:
+    """`eq.5`, `in.(1,2)`, `is.null`, `ilike.*texto*`... como predicado sobre un valor."""
+    op, _, raw = expression.partition(".")
+    negate = op == "not"
+    if negate:
+        op, _, raw = raw.partition(".")
+    if op == "in":
+        values = {_coerce(v.strip().strip('"')) for v in raw.strip("()").split(",") if v.strip()}
+        test = lambda v: v in values  # noqa: E731
+    elif op == "is":
+        target = _coerce(raw)
+        test = lambda v: v is target or v == target  # noqa: E731
+    elif op in ("like", "ilike"):
+        test = lambda v: _like(raw, v, op == "like")  # noqa: E731
+    else:
+        target = _coerce(raw)
+        compare = {
+            "eq": lambda v: v == target or str(v) == str(target),
+            "neq": lambda v: v != target and str(v) != str(target),
+            "gt": lambda v: v is not None and v > target,
+            "gte": lambda v: v is not None and v >= target,
+            "lt": lambda v: v is not None and v < target,
+            "lte": lambda v: v is not None and v <= target,
+        }.get(op)
+        if compare is None:
+            return lambda v: True
+
+        def test(v):
+            try:
+                return compare(v)
+            except TypeError:
+                return False
+    return (lambda v: not test(v)) if negate else test
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    return (value is None, "" if value is None else (value if isinstance(value, (int, float)) else str(value)))
+
+
+def query_rows(rows: List[Dict[str, Any]], params: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Aplica los parámetros de consulta de PostgREST que entiende este sustituto."""
+    conditions = [
+        (column, _condition(value))
+        for column, value in params.items()
+        if column not in ("select", "order", "limit", "offset", "or", "and", "on_conflict", "columns")
+    ]
+    result = [r for r in rows if all(test(r.get(column)) for column, test in conditions)]
+    for part in reversed([p for p in params.get("order", "").split(",") if p]):
+        column, _, direction = part.partition(".")
+        result.sort(key=lambda r: _sort_key(r.get(column)), reverse=direction.startswith("desc"))
+    offset = int(params.get("offset", 0) or 0)
+    limit = params.get("limit")
+    return result[offset: offset + int(limit)] if limit else result[offset:]
+
+
+class FakePostgREST:
+    def __init__(self, size: int = 2_000, latency: float = 0.005, roles: Optional[List[str]] = None):
+        self.tables = seed_tables(size)
+        self.latency = latency
+        self.roles = roles or ["gestor"]
+        self.calls: collections.Counter = collections.Counter()
+        self.unknown: collections.Counter = collections.Counter()
+        self._next_ids: Dict[str, int] = {}
+        self.rpcs = {
+            "rpc_login": self._rpc_login,
+            "rpc_conflict_stats": self._rpc_conflict_stats,
+            **{name: self._keyset(table, order) for name, (table, order) in KEYSET_RPCS.items()},
+        }
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/_stats", self._stats, methods=["GET"]),
+            Route("/rpc/{fn}", self._rpc, methods=["GET", "POST"]),
+            Route("/{table}", self._table, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+
+    # -----------------------------------------------------------------
+    # Tablas
+    # -----------------------------------------------------------------
+
+    async def _table(self, request: Request) -> Response:
+        table = request.path_params["table"]
+        self.calls[f"{request.method} {table}"] += 1
+        await asyncio.sleep(self.latency)
+        params = dict(request.query_params)
+        if table not in self.tables:
+            self.unknown[f"{request.method} {table}"] += 1
+            return JSONResponse([], status_code=200 if request.method == "GET" else 201)
+        rows = self.tables[table]
+
+        if request.method == "GET":
+            return JSONResponse(query_rows(rows, params))
+
+        if request.method == "POST":
+            body = json.loads(await request.body() or b"null")
+            created = [self._insert(table, row) for row in (body if isinstance(body, list) else [body])]
+            return self._written(request, created, 201)
+
+        matched = query_rows(rows, params)
+        if request.method == "PATCH":
+            changes = json.loads(await request.body() or b"{}")
+            for row in matched:
+                row.update(changes)
+            return self._written(request, matched, 200)
+
+        ids = {id(row) for row in matched}
+        self.tables[table] = [row for row in rows if id(row) not in ids]
+        return self._written(request, matched, 200)
+
+    def _insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        rows = self.tables[table]
+        next_id = self._next_ids.get(table) or max((r.get("id") or 0 for r in rows), default=0) + 1
+        self._next_ids[table] = next_id + 1
+        created = {"id": next_id, "created_at": datetime.now().isoformat(), **row}
+        rows.append(created)
+        if table in WRITE_VIEWS:
+            self.tables[WRITE_VIEWS[table]].append({**created, "usuario_alias": "simulada"})
+        return created
+
+    @staticmethod
+    def _written(request: Request, rows: List[Dict[str, Any]], status: int) -> Response:
+        if "return=representation" in request.headers.get("prefer", ""):
+            return JSONResponse(rows, status_code=status)
+        return Response(status_code=201 if status == 201 else 204)
+
+    # -----------------------------------------------------------------
+    # RPC
+    # -----------------------------------------------------------------
+
+    async def _rpc(self, request: Request) -> Response:
+        fn = request.path_params["fn"]
+        self.calls[f"rpc {fn}"] += 1
+        await asyncio.sleep(self.latency)
+        handler = self.rpcs.get(fn)
+        if handler is None:
+            self.unknown[f"rpc {fn}"] += 1
+            return JSONResponse(
+                {"code": "PGRST202", "message": f"Could not find the function {fn}"}, status_code=404
+            )
+        payload = json.loads(await request.body() or b"{}") if request.method == "POST" else dict(request.query_params)
+        return JSONResponse(handler(payload or {}))
+
+    def _rpc_login(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        alias = payload.get("p_alias") or "simulada"
+        # Un id estable por alias: cada sesión simulada es una usuaria distinta
+        user_id = 1000 + sum(alias.encode()) % 100_000
+        usuarios = self.tables["usuarios"]
+        if not any(u["id"] == user_id for u in usuarios):
+            usuarios.append({"id": user_id, "alias": alias, "nombre": alias, "apellidos": "Simulada", "email": None})
+        return [{"user_id": user_id, "alias": alias, "roles": self.roles}]
+
+    def _rpc_conflict_stats(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        rows = [
+            r for r in self.tables["v_conflictos_enhanced"]
+            if all(payload.get(f"p_{k}") in (None, r.get(col)) for k, col in
+                   (("nodo_id", "nodo_id"), ("estado", "estado"), ("causa", "causa"), ("ambito", "ambito")))
+        ]
+        stats = {"total": len(rows)}
+        for key, column, blank in (
+            ("estado", "estado", "Sin estado"), ("causa", "causa", "Sin causa"),
+            ("ambito", "ambito", "Sin ámbito"), ("nodo", "nodo_nombre", "Sin nodo"),
+        ):
+            stats[key] = dict(collections.Counter(r.get(column) or blank for r in rows))
+        return stats
+
+    def _keyset(self, table: str, order: str) -> Callable[[Dict[str, Any]], List[Dict[str, Any]]]:
+        def page(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+            after = payload.get("p_after_id")
+            limit = max(1, min(int(payload.get("p_limit") or 500), 5000))
+            filters = {k[2:]: v for k, v in payload.items() if k not in ("p_after_id", "p_limit") and v is not None}
+            rows = sorted(self.tables[table], key=lambda r: r["id"], reverse=order == "desc")
+            if after is not None:
+                rows = [r for r in rows if (r["id"] < after if order == "desc" else r["id"] > after)]
+            rows = [r for r in rows if all(r.get(k, v) == v for k, v in filters.items())]
+            return rows[:limit]
+
+        return page
+
+    async def _stats(self, request: Request) -> Response:
+        return JSONResponse({"calls": dict(self.calls), "unknown": dict(self.unknown)})
+
+
+def serve(port: int, size: int, latency: float, roles: Optional[List[str]] = None):
+    """Punto de entrada del proceso hijo que lanza run.py."""
+    import uvicorn
+
+    uvicorn.run(
+        FakePostgREST(size, latency, roles).app(), host="127.0.0.1", port=port, log_level="warning"
+    )
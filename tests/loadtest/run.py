@@ -0,0 +1,382 @@
+"""
+Ejecuta el recorrido de scenario.py con N sesiones simultáneas contra la app
+real y guarda/compara el informe JSON (ver el docstring del paquete).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+if __package__ in (None, ""):
+    # Ejecutado como script: el código de la app (lo importan los benchmarks) y los paquetes de pruebas
+    ROOT = Path(__file__).resolve().parents[2]
+    sys.path.insert(0, str(ROOT / "build" / "niceGUI"))
+    sys.path.insert(0, str(ROOT / "tests"))
+    __package__ = "loadtest"
+
+from benchmarks.run import compare  # noqa: E402
+
+from .fake_postgrest import serve  # noqa: E402
+from .scenario import ACTIONS, Scenario  # noqa: E402
+from .session import SimulatedSession  # noqa: E402
+
+APP_DIR = Path(__file__).resolve().parents[2] / "build" / "niceGUI"
+DEFAULT_SESSIONS = 10
+DEFAULT_ROWS = 2_000
+# Una acción regresa si su p95 es un 25 % más lento que en la referencia ...
+DEFAULT_THRESHOLD = 0.25
+# ... y al menos 50 ms más lento: con sesiones concurrentes el ruido es mayor que en los benchmarks
+DEFAULT_NOISE_MS = 50.0
+PERCENTILES = (50, 90, 95, 99)
+
+METRIC_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$")
+
+
+# ---------------------------------------------------------------------
+# Estadística
+# ---------------------------------------------------------------------
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil `q` (0-100) con interpolación lineal entre muestras."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(timings: List[float], errors: int = 0) -> Dict[str, Any]:
+    entry = {"count": len(timings), "errors": errors}
+    for q in PERCENTILES:
+        entry[f"p{q}_s"] = percentile(timings, q)
+    entry["median_s"] = entry["p50_s"]
+    entry["max_s"] = max(timings, default=0.0)
+    return entry
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, str], float]:
+    """Exposición de Prometheus -> {(nombre, etiquetas): valor}."""
+    samples = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line.strip())
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def histogram_quantile(
+    before: Dict[Tuple[str, str], float], after: Dict[Tuple[str, str], float], name: str, q: float
+) -> Optional[float]:
+    """Cuantil de un histograma en el intervalo entre dos lecturas, interpolando como Prometheus."""
+    buckets = []
+    for (metric, labels), value in after.items():
+        if metric == f"{name}_bucket":
+            le = re.search(r'le="([^"]+)"', labels).group(1)
+            buckets.append((float(le), value - before.get((metric, labels), 0.0)))
+    buckets.sort()
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            if count == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = bound, count
+    return buckets[-1][0]
+
+
+def metric_total(samples: Dict[Tuple[str, str], float], name: str) -> float:
+    return sum(value for (metric, _), value in samples.items() if metric == name)
+
+
+# ---------------------------------------------------------------------
+# Procesos
+# ---------------------------------------------------------------------
+
+
+def tree_rss(pid: int) -> int:
+    """RSS en bytes de un proceso y todos sus descendientes (desde /proc)."""
+    children = defaultdict(list)
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children[int(fields[1])].append(int(stat.parent.name))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+        except OSError:
+            continue
+        match = re.search(r"^VmRSS:\s+(\d+) kB", status, re.M)
+        total += int(match.group(1)) * 1024 if match else 0
+    return total
+
+
+def http_get(url: str, timeout: float = 5.0) -> str:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+def wait_until_up(url: str, timeout: float, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and (getattr(process, "exitcode", None) is not None or (
+            hasattr(process, "poll") and process.poll() is not None
+        )):
+            raise RuntimeError(f"El proceso de {url} terminó antes de arrancar")
+        try:
+            http_get(url, timeout=2)
+            return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError(f"{url} no respondió en {timeout:.0f} s")
+
+
+def start_fake_postgrest(port: int, rows: int, latency: float, roles: List[str]) -> multiprocessing.Process:
+    process = multiprocessing.Process(target=serve, args=(port, rows, latency, roles), daemon=True)
+    process.start()
+    wait_until_up(f"http://127.0.0.1:{port}/_stats", 60, process)
+    return process
+
+
+def start_app(port: int, api_url: str, log_path: Path) -> subprocess.Popen:
+    # Lanzada desde pytest, la app no debe creerse un test de NiceGUI (PYTEST_CURRENT_TEST)
+    env = {
+        **{k: v for k, v in os.environ.items() if not k.startswith("PYTEST_")},
+        "POSTGREST_API_URL": api_url,
+        "APP_HOST": "127.0.0.1",
+        "APP_PORT": str(port),
+        "NICEGUI_STORAGE_SECRET": os.environ.get("NICEGUI_STORAGE_SECRET", "loadtest-storage-secret"),
+        "PGRST_JWT_SECRET": os.environ.get("PGRST_JWT_SECRET", "loadtest-jwt-secret-de-al-menos-32-caracteres"),
+        "INSTANCE_NAME": os.environ.get("INSTANCE_NAME", "Carga"),
+        # Las sesiones de la prueba no se mezclan con el almacenamiento de la app de desarrollo
+        "NICEGUI_STORAGE_PATH": str(log_path.parent / "loadtest_storage"),
+    }
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen([sys.executable, "main.py"], cwd=APP_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    wait_until_up(f"http://127.0.0.1:{port}/login", 90, process)
+    return process
+
+
+# ---------------------------------------------------------------------
+# Carga
+# ---------------------------------------------------------------------
+
+
+async def _sample_rss(pid: int, peak: Dict[str, int], stop: asyncio.Event):
+    while not stop.is_set():
+        peak["rss"] = max(peak["rss"], tree_rss(pid))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load(
+    app_url: str,
+    sessions: int = DEFAULT_SESSIONS,
+    ramp: float = 5.0,
+    think: float = 0.5,
+    iterations: int = 1,
+    app_pid: Optional[int] = None,
+    seed: int = 1,
+    log=print,
+) -> Dict[str, Any]:
+    """Lanza `sessions` sesiones escalonadas a lo largo de `ramp` segundos y mide."""
+    metrics_url = f"{app_url.rstrip('/')}/metrics"
+    metrics_before = parse_metrics(http_get(metrics_url))
+    rss_before = tree_rss(app_pid) if app_pid else None
+    peak = {"rss": rss_before or 0}
+    stop_sampling = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(app_pid, peak, stop_sampling)) if app_pid else None
+
+    clients = [SimulatedSession(app_url, f"carga{i:03d}") for i in range(sessions)]
+    failures: List[str] = []
+
+    async def one(i: int, session: SimulatedSession):
+        await asyncio.sleep(ramp * i / max(1, sessions))
+        try:
+            await Scenario(session, session.name, think=think, iterations=iterations, seed=seed + i).run()
+        except Exception as e:
+            failures.append(f"{session.name}: {type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i, s) for i, s in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+
+    # Todas siguen conectadas: es el momento de medir lo que ocupa cada sesión
+    metrics_after = parse_metrics(http_get(metrics_url))
+    rss_connected = tree_rss(app_pid) if app_pid else None
+    stop_sampling.set()
+    if sampler:
+        await sampler
+    await asyncio.gather(*(s.close() for s in clients))
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for session in clients:
+        for action, values in session.timings.items():
+            timings[action].extend(values)
+        for action, count in session.errors.items():
+            errors[action] += count
+    ordered = [a for a in ACTIONS if a in timings or a in errors] + sorted(set(timings) - set(ACTIONS))
+    results = {action: {"action": action, **summarize(timings[action], errors[action])} for action in ordered}
+
+    memory = None
+    if app_pid:
+        memory = {
+            "rss_before_bytes": rss_before,
+            "rss_connected_bytes": rss_connected,
+            "rss_peak_bytes": peak["rss"],
+            "per_session_bytes": (rss_connected - rss_before) / max(1, sessions),
+        }
+    event_loop = {
+        f"lag_p{q}_s": histogram_quantile(metrics_before, metrics_after, "event_loop_lag_seconds", q / 100)
+        for q in (50, 95, 99)
+    }
+    event_loop["stalls"] = metric_total(metrics_after, "event_loop_stalls_total") - metric_total(
+        metrics_before, "event_loop_stalls_total"
+    )
+    event_loop["active_clients"] = metric_total(metrics_after, "nicegui_active_clients")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sessions": sessions,
+            "ramp_s": ramp,
+            "think_s": think,
+            "iterations": iterations,
+            "elapsed_s": elapsed,
+        },
+        "results": results,
+        "memory": memory,
+        "event_loop": event_loop,
+        "failures": failures,
+    }
+    if log:
+        print_report(report, log)
+    return report
+
+
+def print_report(report: Dict[str, Any], log=print):
+    meta = report["meta"]
+    log(f"\n{meta['sessions']} sesiones en {meta['elapsed_s']:.1f} s ({len(report['failures'])} fallidas)")
+    log(f"{'acción':<18} {'n':>5} {'err':>4} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'máx':>9}  (ms)")
+    for action, entry in report["results"].items():
+        log(
+            f"{action:<18} {entry['count']:>5} {entry['errors']:>4}"
+            + "".join(f" {entry[key] * 1000:9.1f}" for key in ("p50_s", "p90_s", "p95_s", "p99_s", "max_s"))
+        )
+    memory = report.get("memory")
+    if memory:
+        log(
+            f"\nMemoria del servidor: {memory['rss_before_bytes'] / 2**20:.0f} MiB antes, "
+            f"{memory['rss_connected_bytes'] / 2**20:.0f} MiB con las sesiones conectadas "
+            f"(pico {memory['rss_peak_bytes'] / 2**20:.0f} MiB), "
+            f"{memory['per_session_bytes'] / 2**20:.2f} MiB por sesión"
+        )
+    loop = report["event_loop"]
+    lags = ", ".join(
+        f"p{q} {loop[f'lag_p{q}_s'] * 1000:.1f} ms" for q in (50, 95, 99) if loop.get(f"lag_p{q}_s") is not None
+    )
+    log(f"Retraso del bucle de eventos: {lags or 'sin datos'}; {loop['stalls']:.0f} bloqueos; "
+        f"{loop['active_clients']:.0f} clientes activos")
+    for failure in report["failures"][:10]:
+        log(f"  fallo: {failure}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument("--ramp", type=float, default=5.0, help="Segundos en los que se van abriendo las sesiones")
+    parser.add_argument("--think-ms", type=float, default=500, help="Pausa media entre pasos de cada sesión")
+    parser.add_argument("--iterations", type=int, default=1, help="Veces que cada sesión repite el recorrido")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Afiliadas sintéticas del PostgREST local")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Latencia añadida a cada respuesta del PostgREST local")
+    parser.add_argument("--roles", nargs="+", default=["gestor"], help="Roles que devuelve rpc_login")
+    parser.add_argument("--api-port", type=int, default=3999)
+    parser.add_argument("--app-port", type=int, default=8090)
+    parser.add_argument("--app-url", help="Usar una app ya arrancada en vez de lanzarla (sin medir su memoria)")
+    parser.add_argument("--output", type=Path, help="Fichero JSON donde guardar el informe")
+    parser.add_argument("--baseline", type=Path, help="Informe JSON de referencia con el que comparar los p95")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--noise-ms", type=float, default=DEFAULT_NOISE_MS)
+    args = parser.parse_args(argv)
+
+    fake = app = None
+    try:
+        if args.app_url:
+            app_url, app_pid = args.app_url, None
+        else:
+            fake = start_fake_postgrest(args.api_port, args.rows, args.latency_ms / 1000, args.roles)
+            log_path = Path(tempfile.gettempdir()) / "loadtest_app.log"
+            app = start_app(args.app_port, f"http://127.0.0.1:{args.api_port}", log_path)
+            app_url, app_pid = f"http://127.0.0.1:{args.app_port}", app.pid
+            print(f"App en {app_url} (registro en {log_path}), PostgREST local con {args.rows} filas")
+        report = asyncio.run(run_load(
+            app_url, args.sessions, args.ramp, args.think_ms / 1000, args.iterations, app_pid
+        ))
+        if fake:
+            report["postgrest"] = json.loads(http_get(f"http://127.0.0.1:{args.api_port}/_stats"))
+            if report["postgrest"]["unknown"]:
+                print(f"Endpoints que el PostgREST local no conoce: {report['postgrest']['unknown']}")
+    finally:
+        if app:
+            app.terminate()
+            try:
+                app.wait(10)
+            except subprocess.TimeoutExpired:
+                app.kill()
+        if fake:
+            fake.terminate()
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nInforme guardado en {args.output}")
+    failed = 1 if report["failures"] else 0
+    if not args.baseline:
+        return failed
+
+    rows = compare(
+        report, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold, args.noise_ms, metric="p95_s"
+    )
+    print(f"\nComparación de p95 con {args.baseline} (umbral +{args.threshold:.0%}, ruido {args.noise_ms} ms):")
+    for row in rows:
+        mark = "REGRESIÓN" if row["regression"] else ""
+        print(f"{row['key']:<18} {row['baseline_s'] * 1000:9.1f} -> {row['current_s'] * 1000:9.1f} ms  x{row['ratio']:.2f}  {mark}")
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} acción(es) por encima del umbral.")
+        return 1
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+El recorrido de una usuaria: entra, abre Detalle de Afiliadas, busca,
+ordena, pasa de página, abre un conflicto y le añade una nota.
+
+Cada paso es una acción cronometrada de `SimulatedSession`; los nombres
+de las acciones son las claves del informe (ACTIONS, en orden).
+"""
+
+import asyncio
+import random
+from typing import Optional
+
+from .session import ActionFailed, SimulatedSession
+
+ACTIONS = (
+    "login_page",
+    "login",
+    "main_page",
+    "open_views",
+    "load_afiliadas",
+    "filter",
+    "sort",
+    "next_page",
+    "open_conflicts",
+    "select_conflict",
+    "open_note_dialog",
+    "save_note",
+)
+
+AFILIADAS_VIEW = "Detalle de Afiliadas"
+SEARCH_TERMS = ("garcia", "calle", "madrid", "lopez", "mar")
+SORT_COLUMNS = ("Nombre Completo", "Fecha Alta", "Nodo", "Estado")
+
+
+class Scenario:
+    def __init__(
+        self,
+        session: SimulatedSession,
+        user: str,
+        password: str = "loadtest",
+        think: float = 0.5,
+        iterations: int = 1,
+        seed: Optional[int] = None,
+    ):
+        self.session = session
+        self.user = user
+        self.password = password
+        self.think = think
+        self.iterations = iterations
+        self.random = random.Random(seed)
+
+    async def pause(self):
+        """Tiempo de lectura entre pasos, como haría una persona."""
+        if self.think > 0:
+            await asyncio.sleep(self.random.uniform(0.5, 1.5) * self.think)
+
+    async def run(self):
+        await self.log_in()
+        for _ in range(self.iterations):
+            await self.browse_afiliadas()
+            await self.add_conflict_note()
+
+    async def log_in(self):
+        s = self.session
+        await s.timed_open("login_page", "/login")
+        await s.type(s.find(label="Username", event="update:*"), self.user)
+        await s.type(s.find(label="Password", event="update:*"), self.password)
+        await s.act(
+            "login",
+            lambda: s.emit(s.find(label="Log in", event="click"), "click"),
+            until=lambda: s.navigated_to is not None,
+        )
+        await s.timed_open("main_page", s.navigated_to or "/")
+        await self.pause()
+
+    async def browse_afiliadas(self):
+        s = self.session
+        await s.act("open_views", lambda: s.emit(s.find(label="Vistas", event="click"), "click"))
+        loaded = len(s.notifications)
+        await s.act(
+            "load_afiliadas",
+            lambda: s.choose(s.find(label="Seleccionar Vista"), AFILIADAS_VIEW),
+            until=lambda: any("Se cargaron" in n for n in s.notifications[loaded:]),
+        )
+        await self.pause()
+
+        await s.act(
+            "filter", lambda: s.type(s.find(label="Búsqueda rápida"), self.random.choice(SEARCH_TERMS))
+        )
+        await self.pause()
+
+        column = self._sortable_column()
+        if column:
+            await s.act("sort", lambda: s.emit(column, "click", {"shiftKey": False}))
+            await self.pause()
+
+        # Con el filtro puede no haber segunda página; entonces se quita el filtro
+        if not self._has_next_page():
+            await s.act("filter", lambda: s.type(s.find(label="Búsqueda rápida"), ""))
+        if self._has_next_page():
+            await s.act("next_page", lambda: s.emit(s.find(icon="chevron_right", event="click"), "click"))
+            await self.pause()
+
+    async def add_conflict_note(self):
+        s = self.session
+        await s.act("open_conflicts", lambda: s.emit(s.find(label="Conflictos", event="click"), "click"))
+        # La lista de conflictos llega con un temporizador al abrir la página
+        await s.wait_for(lambda: bool(self._props(s.find(label="Seleccionar Conflicto")).get("options")))
+        select = s.find(label="Seleccionar Conflicto")
+        option = self.random.choice(self._props(select)["options"])
+        await s.act("select_conflict", lambda: s.choose(select, option["label"]))
+        await self.pause()
+
+        await s.act(
+            "open_note_dialog",
+            lambda: s.emit(s.find(label="Añadir Nota", event="click"), "click"),
+            until=lambda: self._exists(label="Notas", event="update:*"),
+        )
+        note = f"Nota de carga de {self.user} ({self.random.randrange(10**6)})"
+        await s.type(s.find(label="Notas", event="update:*", newest=True), note)
+        # Guardada, la nota aparece en el historial (o llega un aviso de error)
+        notified = len(s.notifications)
+        await s.act(
+            "save_note",
+            lambda: s.emit(s.find(label="Guardar", event="click", newest=True), "click"),
+            until=lambda: len(s.notifications) > notified or any(
+                e.get("text") == note for e in s.elements.values()
+            ),
+        )
+        await self.pause()
+
+    # -----------------------------------------------------------------
+
+    def _props(self, element_id: str) -> dict:
+        return self.session.elements[element_id].get("props") or {}
+
+    def _exists(self, **criteria) -> bool:
+        try:
+            self.session.find(**criteria)
+        except ActionFailed:
+            return False
+        return True
+
+    def _sortable_column(self) -> Optional[str]:
+        for label in self.random.sample(SORT_COLUMNS, len(SORT_COLUMNS)):
+            try:
+                return self.session.find(label=label, event="click")
+            except ActionFailed:
+                continue
+        return None
+
+    def _has_next_page(self) -> bool:
+        try:
+            button = self.session.find(icon="chevron_right", event="click")
+        except ActionFailed:
+            return False
+        return not self._props(button).get("disable")
@@ -0,0 +1,261 @@
+"""
+Una sesión de navegador simulada: habla con la app por HTTP y Socket.IO
+exactamente como lo hace nicegui.js, sin navegador.
+
+La página llega con el árbol de elementos serializado; la sesión lo
+guarda, lo mantiene al día con los mensajes `update` del servidor y manda
+eventos (`click`, `update:...`) a los manejadores reales de la app. Cada
+acción se cronometra desde que se emite el evento hasta el último mensaje
+de respuesta del servidor (tras `settle` segundos sin mensajes nuevos), o
+hasta que se cumple la condición que se le pase.
+"""
+
+import asyncio
+import json
+import re
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+import socketio
+
+ELEMENTS_RE = re.compile(r"parseElements\(String\.raw`(.*?)`\)", re.S)
+CLIENT_ID_RE = re.compile(r"'client_id': '([0-9a-f-]+)'")
+
+Element = Dict[str, Any]
+
+
+class ActionFailed(Exception):
+    """Una acción no obtuvo respuesta a tiempo o no encontró su elemento."""
+
+
+def parse_page(html: str) -> Tuple[str, Dict[str, Element]]:
+    """client_id y árbol de elementos de una página NiceGUI."""
+    client_id = CLIENT_ID_RE.search(html)
+    elements = ELEMENTS_RE.search(html)
+    if not client_id or not elements:
+        raise ActionFailed("La respuesta no es una página NiceGUI")
+    return client_id.group(1), json.loads(elements.group(1))
+
+
+def element_label(element: Element) -> str:
+    props = element.get("props") or {}
+    return str(props.get("label") or element.get("text") or "")
+
+
+class SimulatedSession:
+    def __init__(self, base_url: str, name: str, settle: float = 0.15, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.name = name
+        self.settle = settle
+        self.timeout = timeout
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.notifications: List[str] = []
+        self.elements: Dict[str, Element] = {}
+        self.client_id: Optional[str] = None
+        self.navigated_to: Optional[str] = None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._sio: Optional[socketio.AsyncClient] = None
+        self._messages = 0
+        self._last_message = 0.0
+        self._arrived = asyncio.Event()
+
+    # -----------------------------------------------------------------
+    # Conexión
+    # -----------------------------------------------------------------
+
+    async def open(self, path: str):
+        """Carga una página (con las cookies de la sesión) y conecta su socket."""
+        if self._http is None:
+            self._http = aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+        await self._disconnect_socket()
+        async with self._http.get(self.base_url + path) as response:
+            html = await response.text()
+            if response.status != 200:
+                raise ActionFailed(f"GET {path}: HTTP {response.status}")
+        self.client_id, self.elements = parse_page(html)
+        self.navigated_to = None
+        self._sio = socketio.AsyncClient(reconnection=False, http_session=self._http)
+        for event, handler in (
+            ("update", self._on_update),
+            ("notify", self._on_notify),
+            ("open", self._on_open),
+            ("run_javascript", self._on_javascript),
+        ):
+            self._sio.on(event, handler)
+        query = (
+            f"client_id={self.client_id}&tab_id={uuid.uuid4()}&document_id={uuid.uuid4()}"
+            "&next_message_id=0&implicit_handshake=true"
+        )
+        await self._sio.connect(
+            f"{self.base_url}?{query}", socketio_path="/_nicegui_ws/socket.io", transports=["websocket"]
+        )
+
+    async def close(self):
+        await self._disconnect_socket()
+        if self._http:
+            await self._http.close()
+            self._http = None
+
+    async def _disconnect_socket(self):
+        if self._sio is not None:
+            try:
+                await self._sio.disconnect()
+            except Exception:
+                pass
+            self._sio = None
+
+    # -----------------------------------------------------------------
+    # Mensajes del servidor
+    # -----------------------------------------------------------------
+
+    def _received(self, data: Dict[str, Any]):
+        self._messages += 1
+        self._last_message = time.perf_counter()
+        self._arrived.set()
+        if self._sio is not None and isinstance(data, dict) and "_id" in data:
+            # Como nicegui.js: confirma lo recibido para que el servidor pode su historial
+            asyncio.ensure_future(self._sio.emit("ack", {"client_id": self.client_id, "next_message_id": data["_id"] + 1}))
+
+    async def _on_update(self, data: Dict[str, Any]):
+        for element_id, element in data.items():
+            if element_id == "_id":
+                continue
+            if element is None:
+                self.elements.pop(element_id, None)
+            else:
+                self.elements[element_id] = element
+        self._received(data)
+
+    async def _on_notify(self, data: Dict[str, Any]):
+        self.notifications.append(str(data.get("message", "")))
+        self._received(data)
+
+    async def _on_open(self, data: Dict[str, Any]):
+        self.navigated_to = data.get("path")
+        self._received(data)
+
+    async def _on_javascript(self, data: Dict[str, Any]):
+        # Sin navegador no hay JavaScript que ejecutar; se responde para no dejar esperando al servidor
+        if data.get("request_id") and self._sio is not None:
+            await self._sio.emit(
+                "javascript_response", {"request_id": data["request_id"], "client_id": self.client_id, "result": None}
+            )
+        self._received(data)
+
+    # -----------------------------------------------------------------
+    # Elementos y eventos
+    # -----------------------------------------------------------------
+
+    def find(
+        self,
+        tag: Optional[str] = None,
+        label: Optional[str] = None,
+        contains: Optional[str] = None,
+        event: Optional[str] = None,
+        newest: bool = False,
+        **props: Any,
+    ) -> str:
+        """Id del elemento que encaja (el más antiguo, o el más reciente con `newest`)."""
+        matches = []
+        for element_id, element in self.elements.items():
+            text = element_label(element)
+            if tag and element.get("tag") != tag:
+                continue
+            if label is not None and text != label:
+                continue
+            if contains is not None and contains.lower() not in text.lower():
+                continue
+            if event and not self._listener(element, event):
+                continue
+            if any((element.get("props") or {}).get(k) != v for k, v in props.items()):
+                continue
+            matches.append(int(element_id))
+        if not matches:
+            raise ActionFailed(f"No hay elemento tag={tag} label={label} contains={contains} {props}")
+        return str(max(matches) if newest else min(matches))
+
+    @staticmethod
+    def _listener(element: Element, event: str) -> Optional[str]:
+        for listener in element.get("events") or []:
+            if listener["type"] == event or (event == "update:*" and listener["type"].startswith("update:")):
+                return listener["listener_id"]
+        return None
+
+    async def emit(self, element_id: str, event: str, *args: Any):
+        element = self.elements[element_id]
+        listener_id = self._listener(element, event)
+        if listener_id is None:
+            raise ActionFailed(f"El elemento {element_id} no escucha '{event}'")
+        await self._sio.emit("event", {
+            "id": int(element_id),
+            "client_id": self.client_id,
+            "listener_id": listener_id,
+            "args": [json.dumps(arg) for arg in args],
+        })
+
+    async def type(self, element_id: str, text: str):
+        await self.emit(element_id, "update:*", text)
+
+    async def choose(self, element_id: str, option_label: Optional[str] = None):
+        """Elige en un ui.select la opción con esa etiqueta (o la primera)."""
+        options = (self.elements[element_id].get("props") or {}).get("options") or []
+        option = next((o for o in options if option_label in (None, o.get("label"))), None)
+        if option is None:
+            raise ActionFailed(f"El select {element_id} no tiene la opción {option_label!r}")
+        await self.emit(element_id, "update:*", {"value": option["value"], "label": option["label"]})
+
+    # -----------------------------------------------------------------
+    # Acciones cronometradas
+    # -----------------------------------------------------------------
+
+    async def wait_for(self, condition: Callable[[], bool], timeout: Optional[float] = None):
+        deadline = time.perf_counter() + (timeout or self.timeout)
+        while not condition():
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise ActionFailed("Tiempo de espera agotado")
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def act(self, name: str, trigger, until: Optional[Callable[[], bool]] = None) -> float:
+        """
+        Lanza `trigger` y espera la respuesta: al menos un mensaje, `until` si
+        se da, y `settle` segundos de silencio. Devuelve (y guarda) los segundos
+        hasta el último mensaje recibido.
+        """
+        seen = self._messages
+        started = time.perf_counter()
+        try:
+            result = trigger()
+            if asyncio.iscoroutine(result):
+                await result
+            await self.wait_for(lambda: self._messages > seen and (until is None or until()))
+            while True:
+                quiet = self.settle - (time.perf_counter() - self._last_message)
+                if quiet <= 0:
+                    break
+                await asyncio.sleep(quiet)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        elapsed = self._last_message - started
+        self.timings[name].append(elapsed)
+        return elapsed
+
+    async def timed_open(self, name: str, path: str) -> float:
+        started = time.perf_counter()
+        try:
+            await self.open(path)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        elapsed = time.perf_counter() - started
+        self.timings[name].append(elapsed)
+        return elapsed
@@ -44,7 +44,7 @@ class MockPostgrestAPI:
         self.id_counter = 5000
         self.recorded_payloads = []
 
-    async def create_record(self, table_name: str, payload: dict):
+    async def create_record(self, table_name: str, payload: dict, show_validation_errors: bool = True):
         self.id_counter += 1
         # Captura instantáneas limpias para poder inspeccionar los payloads en las aserciones
         self.recorded_payloads.append({
@@ -54,6 +54,10 @@ class MockPostgrestAPI:
         # Tupla (record, error_msg) idéntica al contrato real de APIClient.create_record
         return {"id": self.id_counter}, None
 
+    async def resolve_import_parents(self, values: dict, notify: bool = True):
+        # Ningún bloque ni piso existe todavía: cada valor es su propia clave
+        return {}
+
 
 @pytest.fixture
 def mock_api():
@@ -191,6 +195,61 @@ async def test_skipping_completely_empty_optional_sub_blocks(import_service, moc
     assert mock_api.recorded_payloads[1]["payload"]["prop_vertical"] == "No"
 
 
+
+@pytest.mark.asyncio
+async def test_shared_parents_are_built_once_and_fanned_out(import_service, mock_api):
+    """
+    Varias filas del mismo portal y piso: el bloque (casado por dirección
+    normalizada) y el piso se crean una sola vez y todas las afiliadas
+    reciben su id; un bloque que ya existe en la BD se reutiliza sin insertar.
+    """
+    async def resolve_import_parents(values, notify=True):
+        normalized = {"Calle Luna 3": "calle luna 3", "Calle Luna 3, Madrid": "calle luna 3", "Calle Sol 9": "calle sol 9"}
+        return {"bloques": {v: (normalized[v], 77 if v == "Calle Sol 9" else None) for v in values["bloques"]}}
+
+    mock_api.resolve_import_parents = resolve_import_parents
+    rows = [
+        {"direccion_bloque": "Calle Luna 3", "direccion_vivienda_completa": "Calle Luna 3, 1º A", "dni_nie": "11111111H"},
+        {"direccion_bloque": "Calle Luna 3, Madrid", "direccion_vivienda_completa": "Calle Luna 3, 1º A", "dni_nie": "22222222J"},
+        {"direccion_bloque": "Calle Luna 3", "direccion_vivienda_completa": "Calle Luna 3, 2º B", "dni_nie": "33333333P"},
+        {"direccion_bloque": "Calle Sol 9", "direccion_vivienda_completa": "Calle Sol 9, Bajo", "dni_nie": "44444444A"},
+    ]
+    logs = [update async for update in import_service.process_relational_import(rows)]
+
+    inserted = [(item["table"], item["payload"]) for item in mock_api.recorded_payloads]
+    assert [table for table, _ in inserted].count("bloques") == 1
+    assert [payload["direccion"] for table, payload in inserted if table == "pisos"] == [
+        "Calle Luna 3, 1º A", "Calle Luna 3, 2º B", "Calle Sol 9, Bajo",
+    ]
+    bloque_id = next(i for i, (t, _) in enumerate(inserted) if t == "bloques") + 5001
+    pisos = {p["direccion"]: p for t, p in inserted if t == "pisos"}
+    assert pisos["Calle Luna 3, 2º B"]["bloque_id"] == bloque_id
+    assert pisos["Calle Sol 9, Bajo"]["bloque_id"] == 77
+
+    piso_ids = [p["piso_id"] for t, p in inserted if t == "afiliadas"]
+    assert piso_ids[0] == piso_ids[1] != piso_ids[2]
+    assert "Success rows: 4" in logs[-1]
+
+
+@pytest.mark.asyncio
+async def test_failed_shared_parent_fails_its_siblings_without_retrying(import_service, mock_api):
+    created = mock_api.create_record
+
+    async def create_record(table_name, payload, show_validation_errors=True):
+        if table_name == "pisos":
+            mock_api.recorded_payloads.append({"table": table_name, "payload": payload.copy()})
+            return None, "Acceso Denegado: No tienes permiso para crear este registro."
+        return await created(table_name, payload)
+
+    mock_api.create_record = create_record
+    rows = [{"direccion_vivienda_completa": "Calle Luna 3, 1º A", "dni_nie": f"{n}1111111H"} for n in range(3)]
+    logs = [update async for update in import_service.process_relational_import(rows)]
+
+    assert [item["table"] for item in mock_api.recorded_payloads] == ["pisos"]
+    assert sum("Acceso Denegado" in line for line in logs) == 3
+    assert "Failed entries: 3" in logs[-1]
+
+
 # =====================================================================
 # PRUEBAS UNITARIAS DE LA CAPA DE PRESENTACIÓN (INTERFAZ)
 # =====================================================================
@@ -201,6 +260,7 @@ def test_view_staging_memory_allocation(mock_nicegui_storage, mock_api):
     # ya fija `schema_config = HOUSING_UNION_IMPORT_CONFIG`, no se le pasa por fuera.
     view_instance = GenericRelationalImporterView(mock_api)
 
-    # Comprobar el correcto enrutamiento del estado interno local
-    assert "generic_importer_records" in mock_nicegui_storage.client
-    assert isinstance(view_instance.raw_records, list)
\ No newline at end of file
+    # Comprobar el correcto enrutamiento del estado interno local: solo se guarda
+    # el fichero temporal de la subida, nunca la lista de filas
+    assert "generic_importer_upload" in mock_nicegui_storage.client
+    assert view_instance.upload is None
\ No newline at end of file
@@ -1,8 +1,10 @@
+import json
 import pytest
 import respx
 from httpx import Response, ConnectError
+from unittest.mock import patch
 
-from api.client import APIClient
+from api.client import APIClient, PageFetchError
 
 # Marks all tests in this file as asyncio
 pytestmark = pytest.mark.asyncio
@@ -155,3 +157,166 @@ async def test_network_error_returns_empty(api_client: APIClient, mock_api_url:
 
     # Assert
     assert records == []
+
+
+@respx.mock
+async def test_conflict_stats_are_cached(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that rpc_conflict_stats receives the filter set as RPC params and that
+    repeated reads within STATS_CACHE_TTL do not hit PostgREST again.
+    """
+    stats = {"total": 3, "estado": {"Abierto": 2, "Cerrado": 1}, "causa": {}, "ambito": {}, "nodo": {}}
+    route = respx.post(f"{mock_api_url}/rpc/rpc_conflict_stats").mock(
+        return_value=Response(200, json=stats)
+    )
+
+    first = await api_client.get_conflict_stats({"estado": "Abierto"})
+    second = await api_client.get_conflict_stats({"estado": "Abierto"})
+
+    assert first == second == stats
+    assert route.call_count == 1
+    payload = json.loads(route.calls.last.request.content)
+    assert payload == {"p_nodo_id": None, "p_estado": "Abierto", "p_causa": None, "p_ambito": None}
+
+    api_client.invalidate_stats_cache()
+    await api_client.get_conflict_stats({"estado": "Abierto"})
+    assert route.call_count == 2
+
+
+@respx.mock
+async def test_conflict_stats_cache_is_bounded(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that expired aggregates are dropped when a new one is stored and that
+    the cache never holds more than STATS_CACHE_MAXSIZE entries.
+    """
+    respx.post(f"{mock_api_url}/rpc/rpc_conflict_stats").mock(return_value=Response(200, json={"total": 0}))
+
+    with patch("api.client.STATS_CACHE_MAXSIZE", 3):
+        for nodo_id in range(5):
+            await api_client.get_conflict_stats({"nodo_id": nodo_id})
+        assert [dict(key[1])["p_nodo_id"] for key in api_client._stats_cache] == [2, 3, 4]
+
+    with patch("api.client.time.monotonic", return_value=10**9):
+        await api_client.get_conflict_stats({"nodo_id": 9})
+    assert len(api_client._stats_cache) == 1
+
+
+@respx.mock
+async def test_conflict_stats_missing_rpc_returns_none(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that a missing RPC (404) yields None so views can fall back to local counts.
+    """
+    respx.post(f"{mock_api_url}/rpc/rpc_conflict_stats").mock(return_value=Response(404))
+    assert await api_client.get_conflict_stats() is None
+
+
+@respx.mock
+async def test_iter_pages_follows_keyset_cursor(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that iter_pages passes the last id of each page as p_after_id, keeps
+    the filter set on every request and stops on a short page.
+    """
+    rows = [{"id": i} for i in range(1, 6)]
+
+    def page(request):
+        payload = json.loads(request.content)
+        after = payload["p_after_id"] or 0
+        return Response(200, json=[r for r in rows if r["id"] > after][: payload["p_limit"]])
+
+    route = respx.post(f"{mock_api_url}/rpc/rpc_page_afiliadas").mock(side_effect=page)
+
+    pages = [p async for p in api_client.iter_pages("rpc_page_afiliadas", {"estado": "Alta"}, page_size=2)]
+
+    assert pages == [rows[0:2], rows[2:4], rows[4:5]]
+    sent = [json.loads(call.request.content) for call in route.calls]
+    assert [p["p_after_id"] for p in sent] == [None, 2, 4]
+    assert all(p["p_estado"] == "Alta" and p["p_limit"] == 2 for p in sent)
+
+
+@respx.mock
+async def test_iter_pages_tells_missing_rpc_empty_result_and_failed_page_apart(
+    api_client: APIClient, mock_api_url: str
+):
+    """
+    Tests that a missing RPC yields nothing (callers fall back), an empty
+    result yields one empty page, and a failure after the first page raises
+    instead of silently truncating the walk.
+    """
+    route = respx.post(f"{mock_api_url}/rpc/rpc_page_conflictos")
+
+    route.mock(return_value=Response(404))
+    assert [p async for p in api_client.iter_pages("rpc_page_conflictos")] == []
+
+    route.mock(return_value=Response(200, json=[]))
+    assert [p async for p in api_client.iter_pages("rpc_page_conflictos")] == [[]]
+
+    route.mock(side_effect=[Response(200, json=[{"id": 9}, {"id": 8}]), Response(404)])
+    pages = []
+    with pytest.raises(PageFetchError):
+        async for page in api_client.iter_pages("rpc_page_conflictos", page_size=2):
+            pages.append(page)
+    assert pages == [[{"id": 9}, {"id": 8}]]
+
+
+@respx.mock
+async def test_search_calls_rpc_and_skips_short_queries(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that search() sends the query to rpc_search and does not hit the
+    API for queries too short to have trigrams.
+    """
+    hits = [{"tipo": "afiliada", "tabla": "afiliadas", "id": 5, "titulo": "Lucía García", "detalle": None, "score": 1.0}]
+    route = respx.post(f"{mock_api_url}/rpc/rpc_search").mock(return_value=Response(200, json=hits))
+
+    assert await api_client.search("lu") == []
+    assert not route.called
+
+    assert await api_client.search("  lucia garcia ") == hits
+    payload = json.loads(route.calls.last.request.content)
+    assert payload == {"p_query": "lucia garcia", "p_limit": 20, "p_tipos": None}
+
+
+@respx.mock
+async def test_map_rpcs_send_viewport_and_centre(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that the map helpers forward the viewport box / proximity centre
+    to their RPCs and degrade to an empty list when the RPC is missing.
+    """
+    clusters = [{"tipo": "cluster", "piso_id": None, "n_pisos": 12, "n_afiliadas": 3, "lat": 40.4, "lng": -3.7}]
+    map_route = respx.post(f"{mock_api_url}/rpc/rpc_mapa_pisos").mock(return_value=Response(200, json=clusters))
+    near_route = respx.post(f"{mock_api_url}/rpc/rpc_pisos_cercanos").mock(return_value=Response(404))
+
+    bounds = {"west": -3.8, "south": 40.3, "east": -3.6, "north": 40.5}
+    assert await api_client.get_map_pisos(bounds, 12.0) == clusters
+    assert json.loads(map_route.calls.last.request.content) == {
+        "p_west": -3.8, "p_south": 40.3, "p_east": -3.6, "p_north": 40.5, "p_zoom": 12, "p_max_rows": 1000,
+    }
+
+    assert await api_client.get_nearby_pisos(bloque_id=7, radius_m=500) == []
+    assert json.loads(near_route.calls.last.request.content) == {
+        "p_piso_id": None, "p_bloque_id": 7, "p_lat": None, "p_lng": None, "p_radio_m": 500, "p_limit": 500,
+    }
+
+
+@respx.mock
+async def test_pool_stats_track_latency_by_endpoint_and_verb(api_client: APIClient, mock_api_url: str):
+    """
+    Tests that every request through the shared pool is recorded under
+    "<VERB> <table or rpc/fn>", with 5xx answers counted as errors.
+    """
+    respx.get(f"{mock_api_url}/afiliadas").mock(return_value=Response(200, json=[]))
+    respx.post(f"{mock_api_url}/rpc/rpc_conflict_stats").mock(return_value=Response(503, text="down"))
+
+    await api_client.get_records("afiliadas")
+    await api_client.get_records("afiliadas")
+    with patch("api.client.ui.notify"):
+        await api_client.call_rpc("rpc_conflict_stats", {})
+
+    stats = api_client.pool_stats()
+    assert stats["requests_in_flight"] == 0
+    assert stats["latency"]["GET afiliadas"]["count"] == 2
+    assert stats["latency"]["GET afiliadas"]["errors"] == 0
+    assert stats["latency"]["POST rpc/rpc_conflict_stats"]["errors"] == 1
+
+    # Per-call budgets replace read/write but keep the configured connect/pool limits
+    budget = api_client._operation_timeout(5.0)
+    assert budget.read == 5.0 and budget.pool == api_client.settings.HTTP_POOL_TIMEOUT
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from benchmarks import synthetic
+from benchmarks.hot_paths import BENCHMARKS
+from benchmarks.run import compare, main, run_suite
+
+
+def test_synthetic_rows_are_deterministic_and_realistic():
+    assert synthetic.afiliadas_detalle(50) == synthetic.afiliadas_detalle(50)
+    pisos = synthetic.pisos(200)
+    assert any(p["coordenadas"] is None for p in pisos)
+    assert all(p["coordenadas"]["type"] == "Point" for p in pisos if p["coordenadas"])
+    assert any(ch in "".join(r["Nombre Completo"] for r in synthetic.afiliadas_detalle(200)) for ch in "áéíóúñ")
+    assert set(synthetic.import_rows(1)[0]) >= {"direccion_vivienda_completa", "nombre_afiliada", "dni_nie"}
+
+
+@pytest.mark.asyncio
+async def test_suite_runs_every_hot_path():
+    report = await run_suite(sizes=[50], repeat=1, log=None)
+
+    assert set(report["results"]) == {f"{name}@50" for name in BENCHMARKS}
+    assert all(entry["median_s"] > 0 for entry in report["results"].values())
+    json.dumps(report)
+
+
+def _report(**medians):
+    return {"results": {key: {"median_s": value} for key, value in medians.items()}}
+
+
+def test_compare_flags_slowdowns_above_threshold_and_noise():
+    baseline = _report(a=0.100, b=0.100, c=0.0005, gone=1.0)
+    current = _report(a=0.130, b=0.110, c=0.0015, new=1.0)
+
+    rows = {row["key"]: row for row in compare(current, baseline, threshold=0.25, noise_ms=2.0)}
+
+    assert set(rows) == {"a", "b", "c"}
+    assert rows["a"]["regression"]  # +30 %
+    assert not rows["b"]["regression"]  # +10 %
+    assert not rows["c"]["regression"]  # x3, pero solo 1 ms
+
+
+def test_cli_exits_non_zero_on_regression(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(_report(**{"state._normalize_for_sorting@20": 1e-9})))
+
+    assert main(["--sizes", "20", "--repeat", "1", "--only", "_normalize_for_sorting",
+                 "--baseline", str(baseline), "--noise-ms", "0"]) == 1
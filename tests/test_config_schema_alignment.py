@@ -2,7 +2,7 @@
 import pytest
 import re
 from pathlib import Path
-from config import TABLE_INFO, VIEW_INFO
+from config import TABLE_INFO, VIEW_INFO, view_read_source
 
 # Helper function to parse SQL schema
 def parse_sql_schema(sql_content):
@@ -36,6 +36,9 @@ def parse_sql_views(sql_content):
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 SCHEMA_PATH = PROJECT_ROOT / "build" / "postgreSQL" / "init-scripts" / "01-init-schemaDBdef.sql"
 VIEWS_PATH = PROJECT_ROOT / "build" / "postgreSQL" / "init-scripts" / "03-init-createViews.sql"
+MATVIEWS_PATH = PROJECT_ROOT / "build" / "postgreSQL" / "init-scripts" / "07-init-materialized_views.sql"
+FUNCTIONS_PATH = PROJECT_ROOT / "build" / "postgreSQL" / "init-scripts" / "02-init-plpgsql_functions.sql"
+RLS_PATH = PROJECT_ROOT / "build" / "postgreSQL" / "init-scripts" / "06-init-rls.sql"
 
 # Read the schema definition file
 with SCHEMA_PATH.open("r", encoding="utf-8") as f:
@@ -84,3 +87,115 @@ def test_view_existence():
     missing_views = config_views_lower - db_views_lower
     assert not missing_views, f"Views from config.py not found in the database schema: {missing_views}"
 
+
+
+# Test case for the opt-in materialized twins of VIEW_INFO views
+@pytest.mark.parametrize(
+    "view_name", [v for v, info in VIEW_INFO.items() if "materialized" in info]
+)
+def test_materialized_view_twins_exist(view_name, monkeypatch):
+    """Views that can be switched to materialized reads must have their `_mv` twin and cache in 07."""
+    matviews_sql = MATVIEWS_PATH.read_text(encoding="utf-8")
+    twin_views = parse_sql_views(matviews_sql)
+
+    monkeypatch.setitem(VIEW_INFO[view_name], "materialized", True)
+    twin = view_read_source(view_name)
+    assert twin != view_name
+    assert twin in twin_views, f"'{twin}' not defined in 07-init-materialized_views.sql"
+    assert f"FROM sindicato_inq.{view_name};" in matviews_sql
+
+    monkeypatch.setitem(VIEW_INFO[view_name], "materialized", False)
+    assert view_read_source(view_name) == view_name
+
+
+def test_materialized_view_refresh_is_maintainer_only(monkeypatch):
+    """The refresh RPC is granted only to mv_maintainer and knows every view the app can enable."""
+    from services.materialized_views import enabled_materialized_views
+
+    matviews_sql = MATVIEWS_PATH.read_text(encoding="utf-8")
+    grants = re.findall(
+        r"GRANT EXECUTE ON FUNCTION sindicato_inq\.rpc_refresh_materialized_views\(.*?\) TO (\w+);",
+        matviews_sql,
+    )
+    assert grants == ["mv_maintainer"]
+
+    for view_name, info in VIEW_INFO.items():
+        if "materialized" in info:
+            monkeypatch.setitem(info, "materialized", True)
+    for mv_name in enabled_materialized_views():
+        assert f"CREATE MATERIALIZED VIEW sindicato_inq_cache.{mv_name}" in matviews_sql
+
+
+@pytest.mark.parametrize(
+    "view_name", [v for v, info in VIEW_INFO.items() if info.get("page_rpc")]
+)
+def test_page_rpcs_return_their_view(view_name):
+    """Each VIEW_INFO "page_rpc" is defined in 03 over that same view and granted in 06."""
+    rpc = VIEW_INFO[view_name]["page_rpc"]
+    match = re.search(
+        rf"CREATE OR REPLACE FUNCTION {rpc}\((.*?)\)\s+RETURNS SETOF {view_name}\b",
+        views_sql,
+        re.DOTALL,
+    )
+    assert match, f"'{rpc}' returning SETOF {view_name} not defined in 03-init-createViews.sql"
+    assert "p_after_id INTEGER" in match.group(1)
+
+    rls_sql = RLS_PATH.read_text(encoding="utf-8")
+    assert f"GRANT EXECUTE ON FUNCTION sindicato_inq.{rpc}(" in rls_sql
+
+
+def test_orphan_suggestions_view_reads_maintained_table():
+    """v_sugerencias_pisos_huerfanos must read the trigger-maintained table, with triggers on every write path."""
+    assert "sugerencias_pisos_huerfanos" in db_schema
+
+    view_sql = views_sql.split("CREATE OR REPLACE VIEW v_sugerencias_pisos_huerfanos", 1)[1].split(";", 1)[0]
+    assert "FROM sugerencias_pisos_huerfanos" in view_sql
+    assert "%" not in view_sql and "<->" not in view_sql
+
+    functions_sql = FUNCTIONS_PATH.read_text(encoding="utf-8")
+    for event, table in [("INSERT", "pisos"), ("UPDATE", "pisos"), ("INSERT", "bloques"),
+                         ("UPDATE", "bloques"), ("DELETE", "bloques")]:
+        assert re.search(
+            rf"AFTER {event} ON {table}\s+REFERENCING .*?\s+FOR EACH STATEMENT\s+"
+            r"EXECUTE FUNCTION sindicato_inq\.fn_sync_sugerencias_pisos_huerfanos\(\)",
+            functions_sql,
+        ), f"missing {event} trigger on {table}"
+
+
+def test_search_rpc_uses_indexed_expressions():
+    """Each idx_*_search_trgm expression must appear verbatim (per alias) in rpc_search, or the index is never used."""
+    functions_sql = FUNCTIONS_PATH.read_text(encoding="utf-8")
+    rpc_sql = functions_sql.split("CREATE OR REPLACE FUNCTION rpc_search(", 1)[1].split("$$;", 1)[0]
+    rpc_flat = re.sub(r"\s+", " ", rpc_sql)
+
+    indexes = re.findall(
+        r"CREATE INDEX IF NOT EXISTS idx_\w+_search_trgm\s+ON sindicato_inq\.(\w+)\s+"
+        r"USING gin \((search_normalize\(.*?\)) gin_trgm_ops\);",
+        functions_sql,
+        re.DOTALL,
+    )
+    assert {table for table, _ in indexes} == {"afiliadas", "pisos", "bloques", "conflictos", "diario_conflictos"}
+
+    aliases = {"afiliadas": "a", "pisos": "p", "bloques": "b", "conflictos": "c", "diario_conflictos": "d"}
+    for table, expr in indexes:
+        alias = aliases[table]
+        qualified = re.sub(r"\b(nombre|apellidos|cif|num_afiliada|email|telefono|direccion|municipio|"
+                           r"causa|descripcion|tarea_actual|resolucion|accion|notas)\b",
+                           rf"{alias}.\1", re.sub(r"\s+", " ", expr))
+        assert f"v_q <% {qualified}" in rpc_flat, f"rpc_search does not filter {table} on its index expression"
+
+
+def test_proximity_rpc_filters_on_indexed_geography():
+    """rpc_pisos_cercanos must filter on coordenadas::geography, the expression idx_pisos_coordenadas_geog indexes."""
+    schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
+    assert "idx_pisos_coordenadas_geog ON pisos USING gist ((coordenadas::geography))" in schema_sql
+
+    functions_sql = FUNCTIONS_PATH.read_text(encoding="utf-8")
+    rpc_sql = functions_sql.split("CREATE OR REPLACE FUNCTION rpc_pisos_cercanos(", 1)[1].split("$$;", 1)[0]
+    assert "ST_DWithin(p.coordenadas::geography, v_centro, v_radio)" in rpc_sql
+    map_sql = functions_sql.split("CREATE OR REPLACE FUNCTION rpc_mapa_pisos(", 1)[1].split("$$;", 1)[0]
+    assert map_sql.count("p.coordenadas && v_caja") == 2
+
+    rls_sql = RLS_PATH.read_text(encoding="utf-8")
+    for fn in ("rpc_pisos_cercanos", "rpc_mapa_pisos"):
+        assert f"GRANT EXECUTE ON FUNCTION sindicato_inq.{fn}(" in rls_sql
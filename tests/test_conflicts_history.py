@@ -0,0 +1,67 @@
+import types
+import pytest
+
+from views.conflicts import ConflictsView, HISTORY_PAGE_SIZE
+from state.app_state import AppState
+
+
+class MockDiarioAPI:
+    """Devuelve entradas del diario ordenadas por (created_at, id) DESC y registra las peticiones."""
+
+    def __init__(self, total: int):
+        self.rows = [
+            {"id": i, "conflicto_id": 1, "created_at": f"2025-01-01T10:00:{i % 3:02d}"}
+            for i in range(1, total + 1)
+        ]
+        self.rows.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        self.calls = []
+
+    async def get_records(self, table, filters=None, order=None, limit=None, offset=None):
+        self.calls.append({"table": table, "filters": dict(filters or {}), "order": order, "limit": limit})
+        rows = self.rows
+        if filters and "or" in filters:
+            rows = [r for r in rows if (r["created_at"], r["id"]) < self._cursor]
+        return rows[:limit]
+
+
+@pytest.fixture
+def mock_nicegui_storage(monkeypatch):
+    from nicegui import app
+    mock_storage = types.SimpleNamespace(client={}, user={})
+    monkeypatch.setattr(app, "storage", mock_storage, raising=False)
+    return mock_storage
+
+
+def test_history_cursor_filter_matches_keyset_order():
+    """El filtro keyset debe expresar (created_at, id) < (cursor) en sintaxis PostgREST."""
+    f = ConflictsView._history_cursor_filter({"id": 42, "created_at": "2025-03-01T12:30:00.5"})
+    assert f == {
+        "or": '(created_at.lt."2025-03-01T12:30:00.5",'
+        'and(created_at.eq."2025-03-01T12:30:00.5",id.lt.42))'
+    }
+
+    null_cursor = ConflictsView._history_cursor_filter({"id": 7, "created_at": None})
+    assert null_cursor == {"or": "(created_at.not.is.null,and(created_at.is.null,id.lt.7))"}
+
+
+@pytest.mark.asyncio
+async def test_history_pages_walk_without_overlap(mock_nicegui_storage):
+    """Cada página pide HISTORY_PAGE_SIZE + 1 filas y las páginas encadenadas no se solapan."""
+    api = MockDiarioAPI(total=HISTORY_PAGE_SIZE * 2 + 5)
+    view = ConflictsView(api, AppState())
+
+    first, has_more = await view._fetch_history_page(1)
+    assert len(first) == HISTORY_PAGE_SIZE and has_more
+    assert api.calls[0]["order"] == "created_at.desc,id.desc"
+    assert api.calls[0]["limit"] == HISTORY_PAGE_SIZE + 1
+    assert "or" not in api.calls[0]["filters"]
+
+    seen = list(first)
+    last = first[-1]
+    while has_more:
+        api._cursor = (last["created_at"], last["id"])
+        page, has_more = await view._fetch_history_page(1, last)
+        seen.extend(page)
+        last = page[-1]
+
+    assert [r["id"] for r in seen] == [r["id"] for r in api.rows]
@@ -0,0 +1,98 @@
+import pytest
+
+from config import HOUSING_UNION_IMPORT_CONFIG
+from services.csv_stream import CsvUpload, iter_chunks
+from services.relational_import_service import MultiTableImportService
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "raw, encoding",
+    [
+        ("\ufeffnombre,ciudad\nMaría,Móstoles\n".encode("utf-8"), "utf-8-sig"),
+        ("nombre,ciudad\nMaría,Móstoles\n".encode("utf-8"), "utf-8"),
+        ("nombre,ciudad\nMaría,Móstoles\n".encode("cp1252"), "cp1252"),
+        ("\ufeffnombre,ciudad\nMaría,Móstoles\n".encode("utf-16-le"), "utf-16"),
+    ],
+)
+async def test_spooled_upload_sniffs_encoding_across_chunk_boundaries(raw, encoding):
+    # Trozos de 3 bytes: las secuencias multibyte quedan partidas entre trozos
+    upload = await CsvUpload.from_chunks(_chunks(raw, 3))
+    try:
+        assert upload.encoding == encoding
+        assert list(upload.iter_rows()) == [{"nombre": "María", "ciudad": "Móstoles"}]
+        assert upload.row_count == 1
+        # Se puede volver a leer (vista previa, simulación e importación)
+        assert list(upload.iter_rows()) == [{"nombre": "María", "ciudad": "Móstoles"}]
+    finally:
+        upload.close()
+
+
+def test_rows_stream_with_quoted_newlines_and_chunking():
+    body = "a,b\n" + "".join(f'{i},"línea\n{i}"\n' for i in range(25))
+    upload = CsvUpload.from_bytes(body.encode("utf-8"))
+    rows = upload.iter_rows()
+    first = next(rows)
+    assert first == {"a": "0", "b": "línea\n0"}
+    assert 0 < upload.progress <= 1
+    chunks = list(iter_chunks(rows, 10))
+    assert [len(c) for c in chunks] == [10, 10, 4]
+    assert upload.row_count == 25
+    upload.close()
+
+
+@pytest.mark.asyncio
+async def test_chunked_preview_numbers_rows_and_finds_duplicates_across_chunks():
+    class OfflineAPI:
+        async def validate_column_data(self, table, columns, operation, row_count=None):
+            return [[] for _ in range(row_count)]
+
+        async def check_import_conflicts(self, candidates):
+            return None
+
+    service = MultiTableImportService(OfflineAPI(), HOUSING_UNION_IMPORT_CONFIG)
+    rows = [{"direccion_vivienda_completa": f"Calle {i}", "dni_nie": f"{i:08d}X"} for i in range(5)]
+    rows.append({"direccion_vivienda_completa": "Calle 1", "dni_nie": "00000003x"})
+
+    chunked = []
+    async for results in service.validate_relational_import_chunks(iter_chunks(rows, 2), set()):
+        chunked.extend(results)
+    whole = await service.validate_relational_import(rows, set())
+
+    assert chunked == whole
+    assert [r["row_number"] for r in chunked] == [1, 2, 3, 4, 5, 6]
+    # Repeating a piso is fine (rows share it); repeating a CIF is not
+    assert chunked[5]["conflicts"] == [
+        "Duplicado en el archivo: el CIF '00000003X' ya aparece en la fila 4",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_import_consumes_row_generator_lazily():
+    consumed = []
+
+    class RecordingAPI:
+        async def create_record(self, table, payload, show_validation_errors=True):
+            return {"id": len(consumed)}, None
+
+        async def resolve_import_parents(self, values, notify=True):
+            return {}
+
+    def rows():
+        for i in range(3):
+            consumed.append(i)
+            yield {"direccion_vivienda_completa": f"Calle {i}"}
+
+    service = MultiTableImportService(RecordingAPI(), HOUSING_UNION_IMPORT_CONFIG)
+    updates = service.process_relational_import(rows(), chunk_size=1)
+    assert (await updates.__anext__()).startswith("Starting processing loop for streamed")
+    assert (await updates.__anext__()).startswith("[1]")
+    assert consumed == [0]
+    remaining = [u async for u in updates]
+    assert consumed == [0, 1, 2]
+    assert "Success rows: 3" in remaining[-1]
@@ -0,0 +1,217 @@
+import asyncio
+import json
+
+import pytest
+import respx
+from httpx import Response
+
+from api.client import APIClient
+from config import HOUSING_UNION_IMPORT_CONFIG
+from services.csv_stream import CsvUpload
+from services.import_jobs import ImportJobManager, JobOwner
+from services.relational_import_service import RowImportOutcome
+
+API = "http://test-api:300"
+OWNER = JobOwner(user_id=1, username="ana", roles=("gestor",))
+CSV = "dni_nie,nombre\n" + "".join(
+    f"{'' if n == 3 else f'0000000{n}X'},Persona {n}\n" for n in range(1, 8)
+)
+
+
+class FakePostgrest:
+    """Keeps the import_jobs row and the committed rows the way rpc_import_job_commit would."""
+
+    def __init__(self):
+        self.job = {}
+        self.filas = {}
+        self.tokens = []
+
+    def create(self, request):
+        self.tokens.append(request.headers.get("authorization"))
+        self.job = {"id": 7, "estado": "en_cola", "filas_procesadas": 0, "filas_ok": 0,
+                    "filas_error": 0, "cancelacion_solicitada": False, **json.loads(request.content)}
+        return Response(201, json=[self.job])
+
+    def patch(self, request):
+        self.tokens.append(request.headers.get("authorization"))
+        self.job.update(json.loads(request.content))
+        return Response(200, json=[self.job])
+
+    def commit(self, request):
+        self.tokens.append(request.headers.get("authorization"))
+        body = json.loads(request.content)
+        for fila in body["p_filas"]:
+            if fila["fila"] > self.job["filas_procesadas"]:
+                self.filas[fila["fila"]] = fila
+        self.job["filas_procesadas"] = max(self.job["filas_procesadas"], body["p_hasta_fila"])
+        self.job["filas_ok"] = sum(f["estado"] == "ok" for f in self.filas.values())
+        self.job["filas_error"] = len(self.filas) - self.job["filas_ok"]
+        return Response(200, json=[{k: self.job[k] for k in (
+            "estado", "filas_procesadas", "filas_ok", "filas_error", "cancelacion_solicitada")}])
+
+
+@pytest.fixture
+def postgrest():
+    fake = FakePostgrest()
+    with respx.mock:
+        respx.post(f"{API}/import_jobs").mock(side_effect=fake.create)
+        respx.patch(url__startswith=f"{API}/import_jobs?").mock(side_effect=fake.patch)
+        respx.post(f"{API}/rpc/rpc_import_job_commit").mock(side_effect=fake.commit)
+        yield fake
+
+
+@pytest.fixture
+def no_slot(monkeypatch):
+    """ui.notify as it behaves in the running app when called from a background task."""
+    def notify(*args, **kwargs):
+        raise RuntimeError("The current slot cannot be determined")
+
+    monkeypatch.setattr("api.client.ui.notify", notify)
+
+
+def make_manager(tmp_path, imported):
+    manager = ImportJobManager(
+        APIClient(API), HOUSING_UNION_IMPORT_CONFIG,
+        jobs_dir=str(tmp_path), chunk_rows=3, owner_token=lambda owner: f"token-{owner.user_id}",
+    )
+
+    async def import_row(raw_row, parents=None, notify=True):
+        imported.append(raw_row["nombre"])
+        if not raw_row["dni_nie"]:
+            return RowImportOutcome({}, "afiliadas", "Falta el CIF")
+        return RowImportOutcome({"afiliadas": len(imported)})
+
+    manager.service.import_row = import_row
+    return manager
+
+
+async def wait_for(job, states=("completado", "cancelado", "error")):
+    for _ in range(200):
+        if job.estado in states:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stuck in {job.estado}")
+
+
+@pytest.mark.asyncio
+async def test_job_commits_chunks_as_the_owner(tmp_path, postgrest):
+    """El trabajo importa por trozos, confirma cada uno con el token de la dueña y borra el CSV al terminar."""
+    imported = []
+    manager = make_manager(tmp_path, imported)
+    manager.start()
+    try:
+        job = await manager.submit(CsvUpload.from_bytes(CSV.encode(), "socias.csv"), OWNER)
+        await wait_for(job)
+    finally:
+        await manager.stop()
+
+    assert job.estado == "completado"
+    assert len(imported) == 7
+    assert sorted(postgrest.filas) == list(range(1, 8))
+    assert postgrest.filas[3] == {"fila": 3, "estado": "error", "mensaje": "[afiliadas] Falta el CIF", "ids": None}
+    assert (job.processed, job.ok, job.errors, job.total) == (7, 6, 1, 7)
+    assert postgrest.job["estado"] == "completado"
+    assert set(postgrest.tokens) == {"Bearer token-1"}
+    assert "/" not in postgrest.job["ruta_archivo"] and postgrest.job["ruta_archivo"].endswith(".csv")
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_rows_before_the_watermark(tmp_path, postgrest):
+    imported = []
+    manager = make_manager(tmp_path, imported)
+    path = tmp_path / "pendiente.csv"
+    path.write_text(CSV, encoding="utf-8")
+    postgrest.job = {"id": 7, "estado": "en_curso", "filas_procesadas": 3, "filas_ok": 2,
+                     "filas_error": 1, "cancelacion_solicitada": False}
+    postgrest.filas = {n: {"fila": n, "estado": "ok"} for n in (1, 2)} | {3: {"fila": 3, "estado": "error"}}
+
+    manager.start()
+    try:
+        job = await manager.resume(
+            {**postgrest.job, "ruta_archivo": "pendiente.csv", "codificacion": "utf-8", "archivo": "socias.csv"}, OWNER
+        )
+        assert job.processed == 3
+        await wait_for(job)
+    finally:
+        await manager.stop()
+
+    assert imported == ["Persona 4", "Persona 5", "Persona 6", "Persona 7"]
+    assert (job.processed, job.ok, job.errors) == (7, 6, 1)
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_after_the_current_row(tmp_path, postgrest):
+    imported = []
+    manager = make_manager(tmp_path, imported)
+    manager.start()
+    try:
+        job = await manager.submit(CsvUpload.from_bytes(CSV.encode()), OWNER)
+        assert await manager.cancel(job.id, OWNER)
+        await wait_for(job)
+    finally:
+        await manager.stop()
+
+    assert job.estado == "cancelado"
+    assert imported == []
+    assert postgrest.job["cancelacion_solicitada"] is True
+    assert postgrest.job["estado"] == "cancelado"
+
+
+@pytest.mark.asyncio
+async def test_resume_never_leaves_the_jobs_dir(tmp_path, postgrest):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    outside = tmp_path / "ajeno.csv"
+    outside.write_text(CSV, encoding="utf-8")
+    manager = ImportJobManager(
+        APIClient(API), HOUSING_UNION_IMPORT_CONFIG,
+        jobs_dir=str(jobs_dir), owner_token=lambda owner: f"token-{owner.user_id}",
+    )
+    postgrest.job = {"id": 7, "estado": "error", "filas_procesadas": 0}
+
+    for ruta in (str(outside), "../ajeno.csv", ".."):
+        assert await manager.resume({**postgrest.job, "ruta_archivo": ruta}, OWNER) is None
+        assert postgrest.job["estado"] == "error"
+    assert outside.exists()
+
+
+@pytest.mark.asyncio
+async def test_worker_stores_validation_errors_without_notifying(tmp_path, postgrest, no_slot):
+    """The worker has no page: a row failing client-side validation keeps its message."""
+    manager = ImportJobManager(
+        APIClient(API), HOUSING_UNION_IMPORT_CONFIG,
+        jobs_dir=str(tmp_path), owner_token=lambda owner: f"token-{owner.user_id}",
+    )
+    upload = CsvUpload.from_bytes("nombre_afiliada,email\nAna,no-es-un-email\n".encode())
+    # prop_vertical is filled in even when the CSV has no piso columns
+    respx.post(f"{API}/pisos").mock(return_value=Response(201, json=[{"id": 11}]))
+
+    manager.start()
+    try:
+        job = await manager.submit(upload, OWNER)
+        await wait_for(job)
+    finally:
+        await manager.stop()
+
+    assert job.estado == "completado"
+    assert postgrest.filas[1]["estado"] == "error"
+    assert postgrest.filas[1]["mensaje"] == "[afiliadas] Validation failed: Formato de email inválido para 'email'"
+
+
+@pytest.mark.asyncio
+async def test_worker_reports_a_failed_commit_as_the_job_message(tmp_path, postgrest, no_slot):
+    imported = []
+    manager = make_manager(tmp_path, imported)
+    respx.post(f"{API}/rpc/rpc_import_job_commit").mock(return_value=Response(500, text="boom"))
+
+    manager.start()
+    try:
+        job = await manager.submit(CsvUpload.from_bytes(CSV.encode()), OWNER)
+        await wait_for(job)
+    finally:
+        await manager.stop()
+
+    assert job.estado == "error"
+    assert postgrest.job["estado"] == "error"
+    assert postgrest.job["mensaje"] == "No se pudo confirmar el trozo hasta la fila 3"
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from components.importer_utils import transform_and_validate_frame, transform_and_validate_row
+
+
+def gravity_row(**cells):
+    """Una fila del export de Gravity Forms (27 columnas) con los valores indicados por posición."""
+    row = [""] * 27
+    row[0], row[2], row[3], row[6] = "Lucía", "Fernández", "Ruiz", "12345678z"
+    for key, value in cells.items():
+        row[int(key[1:])] = value
+    return row
+
+
+FIXTURES = [
+    gravity_row(),
+    gravity_row(c0='<"Ana">', c5="01/02/1990", c9="Calle Mayor 3", c10="2º", c11="B", c13="Madrid", c14="28013",
+                c15="3", c16="2021-06-30", c23="15 € mes", c26="es91 2100 0418 4502 0005 1332"),
+    gravity_row(c5="1990-13-40", c9="Calle Luna", c10=" 10B ", c12="Bajo", c14="28", c24="120,5€año"),
+    gravity_row(c5="1/2/1600", c9="Avenida , de la Paz,, 4", c16="31/02/2020", c25="importe: 7.5 € mes", c21="Sí"),
+    gravity_row(c9="Plaza Sol", c10="Izq", c13="Getafe", c14="28901", c8="no-es-un-email", c17="LAU"),
+    gravity_row(c0="   "),  # sin nombre
+    gravity_row(c0='<>"'),  # sin nombre tras limpiar
+    gravity_row(c15="²"),  # isdigit() pero int() falla
+    gravity_row(c4="Mujer", c7="600000000", c18="Foncasa", c20="Rentista SL", c23="", c24="", c25="gratis"),
+]
+
+
+def per_row(frame):
+    return [transform_and_validate_row(row) for _, row in frame.iterrows()]
+
+
+def test_frame_matches_row_by_row_transformer():
+    frame = pd.DataFrame(FIXTURES, dtype=object)
+    expected = per_row(frame)
+
+    records, rejected = transform_and_validate_frame(frame)
+
+    # repr: same values and same Python types (28013, not 28013.0)
+    assert repr(records) == repr([r for r in expected if r is not None])
+    assert list(rejected.index) == [i for i, r in enumerate(expected) if r is None]
+    assert rejected["motivo"].tolist() == ["Falta el nombre", "Falta el nombre", "Número no válido en código postal o personas"]
+
+
+def test_frame_handles_missing_columns_and_non_text_cells():
+    frame = pd.DataFrame([gravity_row()[:20], gravity_row(c0="Bea")[:20], gravity_row()[:20]], dtype=object)
+    frame.iloc[2, 7] = float("nan")  # celda vacía leída sin keep_default_na=False
+    expected = per_row(frame)
+
+    records, rejected = transform_and_validate_frame(frame)
+
+    assert repr(records) == repr([r for r in expected if r is not None])
+    assert expected[2] is None
+    assert rejected["motivo"].tolist() == ["Valor vacío o no textual en la columna 7"]
+    assert records[1]["facturacion"] == {
+        "cuota": 0.0, "periodicidad": 1, "forma_pago": "Otro", "iban": None, "afiliada_id": None,
+    }
+
+
+@pytest.mark.parametrize("address", ["Calle Santa Fe 3, 1º", "Calle Mayor, 1º, 10B", "Plaza, Bajo", "", "Calle 5a"])
+def test_frame_short_address_matches_helper(address):
+    from components.importer_utils import short_address
+
+    records, _ = transform_and_validate_frame(pd.DataFrame([gravity_row(c9=address)], dtype=object))
+    assert records[0]["bloque"]["direccion"] == short_address(records[0]["piso"]["direccion"])
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+import respx
+from httpx import Response
+
+from api.client import APIClient
+from services.join_queue import JoinSubmission, JoinSubmissionQueue, RateLimiter
+
+API = "http://test-api:300"
+
+
+def signup(cif, nombre="Ana", afiliada_id=None):
+    data = {"nombre": nombre, "apellidos": "Pérez", "email": f"{cif.lower()}@x.org", "cif": cif,
+            "telefono": None, "afiliacion": "true", "estado": "Bienvenida"}
+    return JoinSubmission(data, afiliada_id)
+
+
+def test_rate_limiter_slides_and_forgets_idle_ips():
+    now = [0.0]
+    limiter = RateLimiter(limit=2, window=60, clock=lambda: now[0])
+
+    assert limiter.allow("1.1.1.1") and limiter.allow("1.1.1.1")
+    assert not limiter.allow("1.1.1.1")
+    assert limiter.allow("2.2.2.2")  # otra IP, otra ventana
+
+    now[0] = 61
+    assert limiter.allow("1.1.1.1")
+    assert set(limiter._hits) == {"1.1.1.1"}  # 2.2.2.2 ya no ocupa memoria
+
+
+def test_submit_rejects_when_full_or_not_started():
+    queue = JoinSubmissionQueue(APIClient(API), maxsize=1)
+    assert not queue.submit(signup("00000001R"))
+
+
+@pytest.mark.asyncio
+async def test_batch_is_deduplicated_and_bulk_inserted():
+    queue = JoinSubmissionQueue(APIClient(API))
+    with respx.mock:
+        insert = respx.post(f"{API}/afiliadas").mock(return_value=Response(201))
+        update = respx.patch(f"{API}/afiliadas?id=eq.9").mock(return_value=Response(200, json=[{"id": 9}]))
+
+        await queue.flush([
+            signup("00000001R"), signup("00000002W"), signup("00000001R", nombre="Ana María"),
+            signup("00000003A", afiliada_id=9),
+        ])
+
+    assert insert.call_count == 1
+    body = json.loads(insert.calls[0].request.content)
+    assert [(r["cif"], r["nombre"]) for r in body] == [("00000002W", "Ana"), ("00000001R", "Ana María")]
+    assert insert.calls[0].request.headers["prefer"] == "return=minimal"
+    assert "authorization" not in insert.calls[0].request.headers  # web_anon
+    assert update.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_bulk_insert_falls_back_row_by_row():
+    """Un CIF duplicado en el lote: el resto se guarda y la inscripción pendiente se actualiza."""
+    queue = JoinSubmissionQueue(APIClient(API))
+    duplicate = Response(409, json={"code": "23505", "message": 'duplicate key value violates "afiliadas_cif_key"'})
+
+    def insert(request):
+        body = json.loads(request.content)
+        if isinstance(body, list) or body["cif"] in ("00000002W", "00000003A"):
+            return duplicate
+        return Response(201)
+
+    def lookup(request):
+        pendiente = json.loads(request.content)["p_cif"] == "00000002W"
+        return Response(200, json=[{"estado_registro": "pendiente" if pendiente else "afiliada",
+                                    "afiliada_id": 5 if pendiente else None}])
+
+    with respx.mock:
+        inserts = respx.post(f"{API}/afiliadas").mock(side_effect=insert)
+        respx.post(f"{API}/rpc/rpc_join_lookup").mock(side_effect=lookup)
+        update = respx.patch(f"{API}/afiliadas?id=eq.5").mock(return_value=Response(200, json=[{"id": 5}]))
+
+        await queue.flush([signup("00000001R"), signup("00000002W"), signup("00000003A")])
+
+    assert inserts.call_count == 4
+    assert update.call_count == 1
+    assert json.loads(update.calls[0].request.content)["cif"] == "00000002W"
+
+
+@pytest.mark.asyncio
+async def test_worker_saves_queued_signups_in_one_batch():
+    queue = JoinSubmissionQueue(APIClient(API), batch_wait=0.05)
+    with respx.mock:
+        insert = respx.post(f"{API}/afiliadas").mock(return_value=Response(201))
+        queue.start()
+        try:
+            assert all(queue.submit(signup(f"0000000{n}R")) for n in range(1, 4))
+        finally:
+            await queue.stop()
+
+    assert insert.call_count == 1
+    assert len(json.loads(insert.calls[0].request.content)) == 3
+    assert queue.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_lookup_does_not_drop_the_rest_of_the_batch(monkeypatch):
+    """Sin página en el worker: un error de rpc_join_lookup no puede cortar el lote."""
+    def notify(*args, **kwargs):
+        raise RuntimeError("The current slot cannot be determined")
+
+    monkeypatch.setattr("api.client.ui.notify", notify)
+    queue = JoinSubmissionQueue(APIClient(API))
+    duplicate = Response(409, json={"code": "23505", "message": 'duplicate key value violates "afiliadas_cif_key"'})
+
+    def insert(request):
+        body = json.loads(request.content)
+        if isinstance(body, list) or body["cif"] == "00000001R":
+            return duplicate
+        return Response(201)
+
+    with respx.mock:
+        inserts = respx.post(f"{API}/afiliadas").mock(side_effect=insert)
+        respx.post(f"{API}/rpc/rpc_join_lookup").mock(return_value=Response(500, text="boom"))
+
+        await queue.flush([signup("00000001R"), signup("00000002W"), signup("00000003A")])
+
+    saved = [json.loads(call.request.content) for call in inserts.calls[1:]]
+    assert [row["cif"] for row in saved] == ["00000001R", "00000002W", "00000003A"]
+    assert inserts.calls[-1].response.status_code == 201
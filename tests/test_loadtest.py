@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+from loadtest.fake_postgrest import FakePostgREST, query_rows
+from loadtest.run import histogram_quantile, main, parse_metrics, percentile, summarize
+from loadtest.session import ActionFailed, SimulatedSession, parse_page
+
+
+@pytest.fixture
+def fake():
+    return FakePostgREST(size=200, latency=0)
+
+
+@pytest.fixture
+async def api(fake):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app()), base_url="http://fake") as client:
+        yield client
+
+
+def test_query_rows_understands_postgrest_filters():
+    rows = [{"id": i, "estado": e, "nota": n} for i, (e, n) in enumerate(
+        [("Abierto", "Llamada"), ("Cerrado", None), ("Abierto", "asamblea"), ("En proceso", "LLAMADA")], 1
+    )]
+
+    assert [r["id"] for r in query_rows(rows, {"estado": "eq.Abierto"})] == [1, 3]
+    assert [r["id"] for r in query_rows(rows, {"id": "in.(2,4)"})] == [2, 4]
+    assert [r["id"] for r in query_rows(rows, {"nota": "is.null"})] == [2]
+    assert [r["id"] for r in query_rows(rows, {"nota": "ilike.*llamada*"})] == [1, 4]
+    assert [r["id"] for r in query_rows(rows, {"estado": "not.eq.Abierto"})] == [2, 4]
+    assert [r["id"] for r in query_rows(rows, {"order": "id.desc", "limit": "2", "offset": "1"})] == [3, 2]
+
+
+@pytest.mark.asyncio
+async def test_fake_postgrest_pages_by_keyset_and_reflects_writes(fake, api):
+    first = (await api.post("/rpc/rpc_page_afiliadas", json={"p_after_id": None, "p_limit": 150})).json()
+    rest = (await api.post("/rpc/rpc_page_afiliadas", json={"p_after_id": first[-1]["id"], "p_limit": 150})).json()
+    assert len(first) + len(rest) == 200
+    assert [r["id"] for r in first + rest] == sorted(r["id"] for r in first + rest)
+
+    conflicts = (await api.post("/rpc/rpc_page_conflictos", json={"p_after_id": None, "p_limit": 500})).json()
+    assert conflicts[0]["id"] > conflicts[-1]["id"]
+    conflict_id = conflicts[0]["id"]
+
+    created = await api.post(
+        "/diario_conflictos",
+        json={"conflicto_id": conflict_id, "notas": "Nueva"},
+        headers={"Prefer": "return=representation"},
+    )
+    assert created.status_code == 201 and created.json()[0]["id"]
+    history = (await api.get(
+        "/v_diario_conflictos_con_afiliada", params={"conflicto_id": f"eq.{conflict_id}", "order": "created_at.desc"}
+    )).json()
+    assert history[0]["notas"] == "Nueva" and len(history) == 3
+
+    stats = (await api.post("/rpc/rpc_conflict_stats", json={})).json()
+    assert stats["total"] == 20 and sum(stats["estado"].values()) == 20
+
+
+@pytest.mark.asyncio
+async def test_fake_postgrest_reports_what_it_does_not_know(fake, api):
+    login = (await api.post("/rpc/rpc_login", json={"p_alias": "carga001", "p_password": "x"})).json()
+    assert login[0]["alias"] == "carga001" and login[0]["roles"] == ["gestor"]
+
+    missing = await api.post("/rpc/rpc_no_desplegada", json={})
+    assert missing.status_code == 404 and missing.json()["code"] == "PGRST202"
+    assert (await api.get("/tabla_desconocida")).json() == []
+
+    stats = (await api.get("/_stats")).json()
+    assert stats["unknown"] == {"rpc rpc_no_desplegada": 1, "GET tabla_desconocida": 1}
+    assert stats["calls"]["rpc rpc_login"] == 1
+
+
+PAGE = """<html><script>
+  const elements = parseElements(String.raw`{"0": {"tag": "q-layout", "children": [1, 2, 3]},
+    "1": {"tag": "nicegui-input", "props": {"label": "Username"},
+          "events": [{"listener_id": "a1", "type": "update:value"}]},
+    "2": {"tag": "q-btn", "props": {"label": "Guardar"}, "events": [{"listener_id": "b1", "type": "click"}]},
+    "3": {"tag": "q-btn", "props": {"label": "Guardar"}, "events": [{"listener_id": "b2", "type": "click"}]},
+    "4": {"tag": "q-btn", "props": {"icon": "chevron_right", "disable": true}}}`);
+  createApp({data() { return {'client_id': '0b7c6f2e-1d2a-4c3b-9e8f-0123456789ab'} }});
+</script></html>"""
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def emit(self, event, data):
+        self.sent.append((event, data))
+
+
+@pytest.mark.asyncio
+async def test_session_finds_elements_and_emits_nicegui_events():
+    session = SimulatedSession("http://app", "carga000")
+    session.client_id, session.elements = parse_page(PAGE)
+    session._sio = RecordingSocket()
+
+    assert session.client_id == "0b7c6f2e-1d2a-4c3b-9e8f-0123456789ab"
+    assert session.find(label="Guardar") == "2"
+    assert session.find(label="Guardar", newest=True) == "3"
+    assert session.find(icon="chevron_right") == "4"
+    with pytest.raises(ActionFailed):
+        session.find(icon="chevron_right", event="click")
+
+    await session.type("1", "coordinadora")
+    await session.emit("3", "click")
+    assert session._sio.sent == [
+        ("event", {"id": 1, "client_id": session.client_id, "listener_id": "a1", "args": ['"coordinadora"']}),
+        ("event", {"id": 3, "client_id": session.client_id, "listener_id": "b2", "args": []}),
+    ]
+
+    await session._on_update({"3": None, "5": {"tag": "div", "text": "Nota guardada"}, "_id": 7})
+    await asyncio.sleep(0)
+    assert "3" not in session.elements and session.find(label="Nota guardada") == "5"
+    assert session._sio.sent[-1] == ("ack", {"client_id": session.client_id, "next_message_id": 8})
+
+
+def test_percentiles_and_lag_quantiles_from_metrics():
+    assert percentile([0.1, 0.2, 0.3, 0.4, 0.5], 50) == 0.3
+    assert percentile([1.0, 2.0], 90) == pytest.approx(1.9)
+    entry = summarize([0.1, 0.2, 0.3], errors=1)
+    assert entry["median_s"] == entry["p50_s"] == 0.2 and entry["max_s"] == 0.3 and entry["errors"] == 1
+
+    before = parse_metrics(
+        'event_loop_lag_seconds_bucket{le="0.01"} 10\n'
+        'event_loop_lag_seconds_bucket{le="0.1"} 10\n'
+        'event_loop_lag_seconds_bucket{le="+Inf"} 10\n'
+    )
+    after = parse_metrics(
+        "# TYPE event_loop_lag_seconds histogram\n"
+        'event_loop_lag_seconds_bucket{le="0.01"} 100\n'
+        'event_loop_lag_seconds_bucket{le="0.1"} 110\n'
+        'event_loop_lag_seconds_bucket{le="+Inf"} 110\n'
+    )
+    # 90 latidos nuevos por debajo de 10 ms y 10 entre 10 y 100 ms
+    assert histogram_quantile(before, after, "event_loop_lag_seconds", 0.5) == pytest.approx(0.01 * 50 / 90)
+    assert histogram_quantile(before, after, "event_loop_lag_seconds", 0.95) == pytest.approx(0.055)
+    assert histogram_quantile(after, after, "event_loop_lag_seconds", 0.5) is None
+
+
+@pytest.mark.skipif(not os.environ.get("LOADTEST_E2E"), reason="arranca la app real; LOADTEST_E2E=1 para ejecutarla")
+def test_two_sessions_complete_the_scenario_against_the_real_app(tmp_path):
+    output = tmp_path / "carga.json"
+
+    assert main(["--sessions", "2", "--ramp", "0.5", "--think-ms", "0", "--rows", "300",
+                 "--api-port", "3998", "--app-port", "8091", "--output", str(output)]) == 0
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["results"]["save_note"]["count"] == 2
+    assert report["memory"]["per_session_bytes"] > 0
+    assert not report["postgrest"]["unknown"].get("rpc rpc_page_afiliadas")
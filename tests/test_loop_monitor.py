@@ -0,0 +1,92 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import metrics
+from services.loop_monitor import LoopLagMonitor, ProfileReport, describe_stack
+
+TESTS = Path(__file__).resolve().parent
+
+
+class ConflictsLikeView:
+    def refresh(self):
+        return self._render()
+
+    def _render(self):
+        return describe_stack(sys._getframe(), root=TESTS)
+
+
+def test_describe_stack_names_view_handler_and_location():
+    info = describe_stack(sys._getframe(), root=TESTS)
+    assert info["view"] is None
+    assert info["handler"] == "test_loop_monitor.py:test_describe_stack_names_view_handler_and_location"
+
+    info = ConflictsLikeView().refresh()
+    assert info["view"] == "ConflictsLikeView"
+    assert info["location"].endswith("in ConflictsLikeView._render")
+    assert [line.rsplit(" in ", 1)[1] for line in info["stack"]][-2:] == [
+        "ConflictsLikeView.refresh", "ConflictsLikeView._render"
+    ]
+
+
+def blocking_handler(seconds):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_monitor_logs_the_stall_with_what_was_running(caplog):
+    monitor = LoopLagMonitor(interval=0.02, threshold=0.1)
+    stalls_before = metrics.EVENT_LOOP_STALLS.value(view="unknown")
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_handler(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall.seconds >= 0.2
+    assert "blocking_handler" in stall.location
+    assert "Event loop blocked" in caplog.text
+    assert metrics.EVENT_LOOP_STALLS.value(view="unknown") == stalls_before + 1
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profile_samples_the_loop_thread():
+    monitor = LoopLagMonitor(sample_interval=0.002)
+    task = asyncio.create_task(monitor.profile(0.4))
+    await asyncio.sleep(0.05)
+    spin(0.2)
+    report = await task
+
+    assert not monitor.profiling
+    assert report.samples > 20
+    spinning = next(row for row in report.top(100) if row["function"].endswith(":spin"))
+    # mientras el bucle gira, el muestreador solo obtiene el GIL cada ~5 ms
+    assert spinning["self"] >= 10
+    text = report.to_text()
+    assert "Pilas plegadas" in text
+    assert any(line.endswith(tuple("0123456789")) and "spin" in line for line in report.folded())
+
+
+def test_report_counts_idle_samples_and_inclusive_totals():
+    idle = (("asyncio/base_events.py", "BaseEventLoop._run_once", 1), ("selectors.py", "EpollSelector.select", 2))
+    busy = (("asyncio/base_events.py", "BaseEventLoop._run_once", 1), ("views/conflicts.py", "ConflictsView.refresh", 9))
+    report = ProfileReport({idle: 3, busy: 1}, seconds=1.0, interval=0.005)
+
+    assert report.idle_samples == 3
+    rows = {row["function"]: row for row in report.top()}
+    assert rows["asyncio/base_events.py:BaseEventLoop._run_once"]["total"] == 4
+    assert rows["asyncio/base_events.py:BaseEventLoop._run_once"]["self"] == 0
+    assert rows["views/conflicts.py:ConflictsView.refresh"]["self_pct"] == 25.0
@@ -0,0 +1,89 @@
+import pytest
+import respx
+from httpx import Response
+
+import metrics
+from api.client import APIClient
+from services import geolink_service
+
+API = "http://test-api:300"
+
+
+def test_registry_renders_the_text_exposition_format():
+    registry = metrics.Registry()
+    hits = registry.register(metrics.Counter("hits_total", "Hits.", ("path",)))
+    latency = registry.register(metrics.Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    hits.inc(path='/a"b')
+    hits.inc(2, path='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE hits_total counter" in lines
+    assert 'hits_total{path="/a\\"b"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_labels_must_match_the_declared_names():
+    with pytest.raises(ValueError):
+        metrics.Counter("x_total", "X.", ("outcome",)).inc(result="ok")
+
+
+def test_scrape_needs_the_token_or_an_allowed_address():
+    allowed = "127.0.0.1, 10.0.0.0/8,not-a-network"
+
+    assert metrics.scrape_allowed("10.1.2.3", "", "", allowed)
+    assert not metrics.scrape_allowed("203.0.113.9", "", "", allowed)
+    assert metrics.scrape_allowed("203.0.113.9", "s3cret", "s3cret", allowed)
+    assert not metrics.scrape_allowed("203.0.113.9", "guess", "s3cret", allowed)
+    assert not metrics.scrape_allowed("203.0.113.9", "", "", allowed)  # sin token configurado, nada que comparar
+    assert not metrics.scrape_allowed("", "", "", allowed)
+
+
+@pytest.mark.asyncio
+async def test_postgrest_requests_feed_the_process_metrics():
+    client = APIClient(API)
+    labels = {"endpoint": "afiliadas", "method": "GET"}
+    before = metrics.POSTGREST_REQUEST_SECONDS.count(**labels)
+    errors_before = metrics.POSTGREST_REQUEST_ERRORS.value(**labels)
+    try:
+        with respx.mock:
+            respx.get(url__startswith=f"{API}/afiliadas").mock(
+                side_effect=[Response(200, json=[]), Response(503)]
+            )
+            await client.get_records("afiliadas")
+            # el 503 directamente sobre el pool, sin el ui.notify de get_records
+            await client._ensure_client().get(f"{API}/afiliadas")
+    finally:
+        await client.close()
+
+    assert metrics.POSTGREST_REQUEST_SECONDS.count(**labels) == before + 2
+    assert metrics.POSTGREST_REQUEST_ERRORS.value(**labels) == errors_before + 1
+    assert metrics.POSTGREST_IN_FLIGHT.value() == 0
+    assert 'postgrest_request_duration_seconds_count{endpoint="afiliadas",method="GET"}' in metrics.REGISTRY.render()
+
+
+@pytest.mark.asyncio
+async def test_geolink_counts_results_and_retries(monkeypatch):
+    monkeypatch.setattr(geolink_service, "RETRY_BACKOFF_BASE", 0)
+    retries = metrics.GEOLINK_RETRIES.value()
+    matches = metrics.GEOLINK_LOOKUPS.value(result="match")
+    skipped = metrics.GEOLINK_LOOKUPS.value(result="skipped")
+
+    with respx.mock:
+        respx.get(url__startswith=geolink_service.API_URL).mock(
+            side_effect=[Response(500), Response(200, json=[{"refCatastral": "123", "lat": "40.4", "lng": "-3.7"}])]
+        )
+        found = await geolink_service.lookup_cadastral_data("Calle Mayor 1")
+    await geolink_service.lookup_cadastral_data("")
+
+    assert found == ("123", 40.4, -3.7)
+    assert metrics.GEOLINK_RETRIES.value() == retries + 1
+    assert metrics.GEOLINK_LOOKUPS.value(result="match") == matches + 1
+    assert metrics.GEOLINK_LOOKUPS.value(result="skipped") == skipped + 1
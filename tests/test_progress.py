@@ -0,0 +1,69 @@
+import pytest
+
+from config import HOUSING_UNION_IMPORT_CONFIG
+from services.progress import ERROR, OK, SKIPPED, ProgressTracker, format_duration
+from services.relational_import_service import MultiTableImportService
+
+
+def test_tracker_flushes_at_most_once_per_interval():
+    now = [0.0]
+    flushed = []
+    tracker = ProgressTracker(total=100, on_flush=flushed.append, interval=1.0, clock=lambda: now[0])
+
+    for n in range(50):
+        now[0] = n * 0.1  # 10 filas por segundo
+        tracker.record(OK if n % 10 else ERROR, f"fila {n}")
+    assert len(flushed) == 4  # a los 1, 2, 3 y 4 segundos, no 50 veces
+
+    tracker.finish()
+    last = flushed[-1]
+    assert (last["processed"], last[OK], last[ERROR], last["finished"]) == (50, 45, 5, True)
+    assert last["fraction"] == 1.0 and last["eta"] is None
+
+
+def test_tracker_rate_eta_and_report():
+    now = [0.0]
+    tracker = ProgressTracker(total=10, clock=lambda: now[0])
+    now[0] = 2.0
+    tracker.record(OK, "Piso #1", "coordenadas actualizado")
+    tracker.record(SKIPPED, "Piso #2", "Sin coincidencia")
+
+    snapshot = tracker.snapshot()
+    assert snapshot["rate"] == 1.0
+    assert snapshot["eta"] == 8.0
+    assert "2/10 procesadas" in tracker.summary() and "quedan 8 s" in tracker.summary()
+    assert tracker.to_csv_bytes().decode("utf-8-sig").splitlines() == [
+        "n,elemento,estado,mensaje",
+        "1,Piso #1,Correcto,coordenadas actualizado",
+        "2,Piso #2,Omitido,Sin coincidencia",
+    ]
+
+
+@pytest.mark.parametrize("seconds, text", [(4.6, "5 s"), (125, "2 min 05 s"), (3725, "1 h 02 min")])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
+
+
+@pytest.mark.asyncio
+async def test_import_with_tracker_yields_per_chunk_not_per_row():
+    class API:
+        async def create_record(self, table, payload, show_validation_errors=True):
+            if payload.get("cif") == "BAD":
+                return None, "Error de Duplicado: Ya existe una afiliada con este CIF."
+            return {"id": 1}, None
+
+        async def resolve_import_parents(self, values, notify=True):
+            return {}
+
+    rows = [{"dni_nie": "BAD" if n == 2 else f"0000000{n}X", "nombre_afiliada": f"Persona {n}"} for n in range(5)]
+    tracker = ProgressTracker(total=len(rows))
+    service = MultiTableImportService(API(), HOUSING_UNION_IMPORT_CONFIG)
+
+    lines = [line async for line in service.process_relational_import(rows, chunk_size=2, progress=tracker)]
+
+    assert len(lines) == 1 + 3 + 1  # inicio, un resumen por trozo y el final
+    assert "Success rows: 4" in lines[-1] and "Failed entries: 1" in lines[-1]
+    assert tracker.counts[OK] == 4 and tracker.counts[ERROR] == 1
+    failed = next(e for e in tracker.entries if e.status == ERROR)
+    assert failed.number == 3 and failed.item.startswith("Fila 3: BAD")
+    assert failed.message == "[afiliadas] Error de Duplicado: Ya existe una afiliada con este CIF."
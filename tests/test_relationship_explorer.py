@@ -0,0 +1,91 @@
+import pytest
+
+from components.relationship_explorer import (
+    RelationshipExplorer,
+    build_tree_select,
+    _strip_embeds,
+)
+from config import TABLE_INFO
+
+
+class FakeRelationsAPI:
+    """API mínima: tablas en memoria y registro de cada petición realizada."""
+
+    def __init__(self, embed_result=None):
+        self.embed_result = embed_result
+        self.embed_calls = []
+        self.get_calls = []
+        self.tables = {
+            "bloques": [{"id": 1, "direccion": "Calle Falsa 1", "empresa_id": 10}],
+            "empresas": [{"id": 10, "nombre": "Fondo SA"}],
+            "pisos": [
+                {"id": 100, "bloque_id": 1, "direccion": "Calle Falsa 1, 1A"},
+                {"id": 101, "bloque_id": 1, "direccion": "Calle Falsa 1, 1B"},
+            ],
+            "afiliadas": [{"id": 500, "piso_id": 100, "nombre": "Ana"}],
+        }
+
+    async def get_embedded_record(self, table, record_id, select):
+        self.embed_calls.append((table, record_id, select))
+        return self.embed_result
+
+    async def get_records(self, table, filters=None, **_):
+        self.get_calls.append((table, dict(filters or {})))
+        (field, expr), = filters.items()
+        op, raw = expr.split(".", 1)
+        if op == "eq":
+            wanted = {int(raw)}
+        else:  # in.(a,b)
+            wanted = {int(x) for x in raw.strip("()").split(",")}
+        return [r for r in self.tables.get(table, []) if r.get(field) in wanted]
+
+
+def test_tree_select_follows_table_info():
+    """El select embebido se deriva de relations/child_relations de TABLE_INFO."""
+    select = build_tree_select(TABLE_INFO["bloques"])
+    assert select.startswith("*,")
+    assert "parent__empresa_id:empresas!empresa_id(*)" in select
+    assert "child__pisos__bloque_id:pisos!bloque_id(*," in select
+    # Nietos (afiliadas de cada piso) dentro del embed de pisos
+    assert "child__afiliadas__piso_id:afiliadas!piso_id(*," in select
+
+
+@pytest.mark.asyncio
+async def test_embedded_tree_is_one_round_trip():
+    tree = {"id": 1, "child__pisos__bloque_id": []}
+    api = FakeRelationsAPI(embed_result=tree)
+    explorer = RelationshipExplorer(api, container=None)
+
+    result = await explorer._fetch_tree(
+        "bloques", {"id": 1}, 1,
+        TABLE_INFO["bloques"]["relations"], TABLE_INFO["bloques"]["child_relations"],
+    )
+    assert result is tree
+    assert len(api.embed_calls) == 1 and api.get_calls == []
+
+    # Segunda visita: servida desde la caché de subárboles
+    await explorer._fetch_tree("bloques", {"id": 1}, 1, {}, TABLE_INFO["bloques"]["child_relations"])
+    assert len(api.embed_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_fallback_builds_same_tree_shape():
+    """Si el embedding falla (None) se construye el mismo árbol con consultas por nivel."""
+    api = FakeRelationsAPI(embed_result=None)
+    explorer = RelationshipExplorer(api, container=None)
+    record = api.tables["bloques"][0]
+
+    tree = await explorer._fetch_tree(
+        "bloques", record, 1,
+        TABLE_INFO["bloques"]["relations"], TABLE_INFO["bloques"]["child_relations"],
+    )
+
+    assert tree["parent__empresa_id"]["nombre"] == "Fondo SA"
+    pisos = tree["child__pisos__bloque_id"]
+    assert [p["id"] for p in pisos] == [100, 101]
+    assert pisos[0]["child__afiliadas__piso_id"][0]["nombre"] == "Ana"
+    assert pisos[1]["child__afiliadas__piso_id"] == []
+    assert pisos[0]["ref__bloque_id"]["direccion"] == "Calle Falsa 1"
+    assert _strip_embeds(pisos[0]) == api.tables["pisos"][0]
+    # El registro original no se modifica
+    assert "child__pisos__bloque_id" not in record
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+import respx
+from httpx import Response
+
+from api.client import APIClient
+from api.validate import TableValidator
+from config import HOUSING_UNION_IMPORT_CONFIG
+from services.relational_import_service import MultiTableImportService
+
+
+ROWS = [
+    {"cif": "12345678Z", "nombre": "Ana", "email": "ana@example.org", "estado": "Alta", "fecha_nac": "1990-02-01"},
+    {"cif": "", "nombre": "Bea", "email": "sin-arroba", "estado": "Inventado", "fecha_nac": "01/02/1990"},
+    {"cif": None, "nombre": None, "email": None, "estado": None, "fecha_nac": None, "piso_id": "x"},
+]
+
+
+def test_validate_columns_matches_validate_record():
+    """El lote por columnas devuelve, fila a fila, lo mismo que validate_record."""
+    validator = TableValidator()
+    for table in ("afiliadas", "facturacion", "pisos"):
+        fields = sorted({f for row in ROWS for f in row})
+        columns = {f: [row.get(f) for row in ROWS] for f in fields}
+        batch = validator.validate_columns(table, columns)
+        for row, errors in zip(ROWS, batch):
+            expected = validator.validate_record(table, {f: row.get(f) for f in fields})[1]
+            assert errors == expected
+
+
+def test_validation_plan_is_compiled_once():
+    validator = TableValidator()
+    plan = validator.plan("facturacion")
+    assert validator.plan("facturacion") is plan
+    assert all(hasattr(regex, "match") for _, regex, _ in plan.patterns)
+    assert validator.plan("no_existe") is None
+    assert validator.validate_columns("no_existe", {"a": [1, 2]}) == [["Unknown table: no_existe"]] * 2
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_import_preview_reports_row_issues_and_duplicates():
+    """La previsualización por lotes conserva el orden por fila y marca claves duplicadas."""
+    route = respx.post("http://test-api:300/rpc/rpc_check_import_conflicts").mock(
+        return_value=Response(200, json=[{"tabla": "afiliadas", "campo": "cif", "valor": "00000001R"}])
+    )
+    service = MultiTableImportService(APIClient("http://test-api:300"), HOUSING_UNION_IMPORT_CONFIG)
+    rows = [
+        {"direccion_vivienda_completa": "Calle Mayor 1, 1º A", "dni_nie": "12345678Z", "email": "a@b.es",
+         "periodicidad": "12", "cuenta_bancaria_iban": "ES" + "1" * 22},
+        {"direccion_vivienda_completa": "", "dni_nie": "00000002W", "email": "nope",
+         "periodicidad": "12", "cuenta_bancaria_iban": "XX"},
+        {"direccion_vivienda_completa": "Calle Mayor 1, 1º A", "dni_nie": " 12345678z"},
+        {"direccion_vivienda_completa": "Calle Mayor 2", "dni_nie": "00000001r"},
+    ]
+    results = await service.validate_relational_import(rows, {"direccion_vivienda_completa"})
+
+    assert [r["status"] for r in results] == ["valid", "error", "error", "error"]
+    issues = results[1]["issues"]
+    assert issues[0] == "Falta el campo obligatorio: direccion_vivienda_completa"
+    assert "Formato de email inválido para 'email'" in issues
+    assert issues[-1].startswith("El IBAN debe tener el formato español")
+    assert results[1]["conflicts"] == []
+
+    assert results[2]["issues"] == []
+    assert results[2]["conflicts"] == [
+        "Duplicado en el archivo: el CIF '12345678Z' ya aparece en la fila 1",
+    ]
+    assert results[3]["conflicts"] == ["Ya existe una afiliada con el CIF '00000001R'"]
+
+    # Una sola llamada con los valores distintos, normalizados como los guarda la BD
+    assert route.call_count == 1
+    payload = json.loads(route.calls.last.request.content)
+    assert payload["p_cifs"] == ["00000001R", "00000002W", "12345678Z"]
+    assert payload["p_num_afiliadas"] is None
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_database_simulation_sends_payloads_and_fk_plan_in_chunks():
+    """La simulación envía las mismas cargas que la importación real, por trozos, con el linaje de FKs."""
+    calls = []
+
+    def dry_run(request):
+        body = json.loads(request.content)
+        calls.append(body)
+        return Response(200, json=[
+            {"row_number": r["row_number"], "status": "error" if r["row_number"] == 2 else "valid",
+             "preview_label": r["preview_label"],
+             "issues": ["[afiliadas] Error de Duplicado: cif"] if r["row_number"] == 2 else []}
+            for r in body["p_rows"]
+        ])
+
+    respx.post("http://test-api:300/rpc/rpc_dry_run_import").mock(side_effect=dry_run)
+    respx.post("http://test-api:300/rpc/rpc_resolve_import_parents").mock(side_effect=lambda request: Response(
+        200, json=[
+            {"tabla": "pisos", "valor": v, "clave": v, "id": 40 if v == "Calle Mayor 3" else None}
+            for v in json.loads(request.content)["p_pisos"]
+        ]
+    ))
+    service = MultiTableImportService(APIClient("http://test-api:300"), HOUSING_UNION_IMPORT_CONFIG)
+    rows = [
+        {"direccion_vivienda_completa": "Calle Mayor 1, 1º A", "dni_nie": "12345678Z", "periodicidad": "12"},
+        {"direccion_vivienda_completa": "Calle Mayor 1, 2º A", "dni_nie": "12345678Z"},
+        {"direccion_vivienda_completa": "Calle Mayor 3"},
+    ]
+    results = await service.simulate_relational_import(rows, chunk_size=2)
+
+    assert [r["status"] for r in results] == ["valid", "error", "valid"]
+    assert results[1]["issues"] == ["[afiliadas] Error de Duplicado: cif"]
+    assert [len(c["p_rows"]) for c in calls] == [2, 1]
+
+    plan = calls[0]["p_plan"]
+    assert plan["execution_order"] == HOUSING_UNION_IMPORT_CONFIG["execution_order"]
+    assert plan["foreign_keys"]["pisos"] == {"bloque_id": "bloques"}
+    first = calls[0]["p_rows"][0]["tables"]
+    assert first["pisos"]["direccion"] == "Calle Mayor 1, 1º A"
+    assert first["pisos"]["prop_vertical"] == "No"
+    assert first["facturacion"]["periodicidad"] == 12
+    assert "bloque_id" not in first["pisos"]  # lo rellena la función, no el cliente
+    # Sin datos de facturación en la fila 3: se omite igual que en la importación real
+    assert "facturacion" not in calls[1]["p_rows"][0]["tables"]
+    # Pisos compartidos: la clave de cada uno y el id del que ya existe
+    assert calls[0]["p_rows"][0]["parents"] == {"pisos": {"clave": "Calle Mayor 1, 1º A", "id": None}}
+    assert calls[1]["p_rows"][0]["parents"] == {"pisos": {"clave": "Calle Mayor 3", "id": 40}}
+
+
+@pytest.mark.asyncio
+@respx.mock
+async def test_database_simulation_unavailable_returns_none():
+    respx.post("http://test-api:300/rpc/rpc_dry_run_import").mock(return_value=Response(404))
+    service = MultiTableImportService(APIClient("http://test-api:300"), HOUSING_UNION_IMPORT_CONFIG)
+    assert await service.simulate_relational_import([{"dni_nie": "12345678Z"}]) is None
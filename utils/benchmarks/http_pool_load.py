@@ -0,0 +1,179 @@
+"""
+BENCHMARK: pool HTTP de APIClient contra un PostgREST simulado
+=====================================================================
+Levanta en otro proceso un sustituto de PostgREST (uvicorn + Starlette) que
+responde a GET /<tabla> y POST /rpc/<fn> tras una latencia fija, y lanza
+--sessions sesiones concurrentes haciendo --requests peticiones cada una
+(lecturas y RPCs alternadas) a través de APIClient con varias
+configuraciones de pool:
+
+  * httpx-default: lo que hacía _ensure_client antes (httpx.AsyncClient
+    por defecto: 100 conexiones, 20 keep-alive, caducidad 5 s)
+  * ajustado-estrecho: pocas conexiones y sin keep-alive, para ver la cola
+  * ajustado-keepalive: tantas conexiones keep-alive como conexiones
+  * config: los valores HTTP_* actuales de config.py (o del entorno)
+
+Para cada una muestra peticiones/s, latencia p50/p95, espera por conexión
+(p95) según APIClient.pool_stats() y cuántas conexiones TCP abrió el
+cliente (vistas por el servidor).
+
+Ojo: httpcore comprueba cada conexión ociosa en cada asignación, así que
+un keep-alive muy grande puede alargar la cola con mucha concurrencia en
+lugar de acortarla; conviene medirlo aquí antes de subir HTTP_MAX_KEEPALIVE.
+
+Uso (desde la raíz del proyecto):
+  python utils/benchmarks/http_pool_load.py --sessions 50 --requests 40 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "build" / "niceGUI"))
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from api.client import APIClient  # noqa: E402
+from config import config  # noqa: E402
+
+ROWS = [{"id": i, "nombre": f"Afiliada {i}", "estado": "Alta"} for i in range(50)]
+
+
+def build_stand_in(latency: float) -> Starlette:
+    peers: set = set()
+
+    async def table(request):
+        peers.add(request.client.port)
+        await asyncio.sleep(latency)
+        return JSONResponse(ROWS)
+
+    async def rpc(request):
+        peers.add(request.client.port)
+        await request.body()
+        await asyncio.sleep(latency)
+        return JSONResponse({"total": len(ROWS)})
+
+    async def connections(request):
+        # Conexiones TCP distintas vistas desde el último reinicio
+        count = len(peers)
+        if request.method == "DELETE":
+            peers.clear()
+        return JSONResponse({"connections": count})
+
+    return Starlette(routes=[
+        Route("/_connections", connections, methods=["GET", "DELETE"]),
+        Route("/rpc/{fn}", rpc, methods=["POST"]),
+        Route("/{table}", table, methods=["GET"]),
+    ])
+
+
+def serve_stand_in(port: int, latency: float):
+    uvicorn.run(
+        build_stand_in(latency), host="127.0.0.1", port=port,
+        log_level="warning", backlog=4096, timeout_keep_alive=60,
+    )
+
+
+def scenarios():
+    return {
+        "httpx-default": dataclasses.replace(
+            config, HTTP_MAX_CONNECTIONS=100, HTTP_MAX_KEEPALIVE=20, HTTP_KEEPALIVE_EXPIRY=5.0,
+            HTTP_CONNECT_TIMEOUT=30.0, HTTP_READ_TIMEOUT=30.0, HTTP_WRITE_TIMEOUT=30.0,
+            HTTP_POOL_TIMEOUT=30.0, HTTP2=False,
+        ),
+        "ajustado-estrecho": dataclasses.replace(
+            config, HTTP_MAX_CONNECTIONS=10, HTTP_MAX_KEEPALIVE=0, HTTP_POOL_TIMEOUT=60.0,
+        ),
+        "ajustado-keepalive": dataclasses.replace(
+            config, HTTP_MAX_CONNECTIONS=50, HTTP_MAX_KEEPALIVE=50, HTTP_KEEPALIVE_EXPIRY=30.0,
+        ),
+        "config": config,
+    }
+
+
+async def run_scenario(name, settings, base_url, sessions, requests_per_session):
+    client = APIClient(base_url, settings=settings)
+    latencies = []
+
+    async def session(n):
+        for i in range(requests_per_session):
+            started = time.perf_counter()
+            if (n + i) % 2:
+                await client.get_records("afiliadas", limit=50)
+            else:
+                await client.call_rpc("rpc_conflict_stats", {"p_nodo_id": None})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(n) for n in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stats = client.pool_stats()
+    await client.close()
+    async with httpx.AsyncClient() as probe:
+        tcp = (await probe.delete(f"{base_url}/_connections")).json()["connections"]
+
+    latencies.sort()
+    return {
+        "escenario": name,
+        "max_conn": settings.HTTP_MAX_CONNECTIONS,
+        "keepalive": settings.HTTP_MAX_KEEPALIVE,
+        "req/s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        "espera_p95_ms": stats["pool_wait"]["p95_ms"],
+        "max_en_vuelo": stats["peak_requests_in_flight"],
+        "conexiones_tcp": tcp,
+    }
+
+
+async def wait_until_up(base_url: str):
+    async with httpx.AsyncClient() as probe:
+        for _ in range(100):
+            try:
+                await probe.delete(f"{base_url}/_connections")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError("El PostgREST simulado no arrancó")
+
+
+async def main(args):
+    server = multiprocessing.Process(
+        target=serve_stand_in, args=(args.port, args.latency_ms / 1000), daemon=True
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{args.port}"
+    results = []
+    try:
+        await wait_until_up(base_url)
+        for name, settings in scenarios().items():
+            results.append(await run_scenario(
+                name, settings, base_url, args.sessions, args.requests
+            ))
+    finally:
+        server.terminate()
+        server.join()
+
+    columns = list(results[0])
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print(" | ".join(c.ljust(widths[c]) for c in columns))
+    print("-+-".join("-" * widths[c] for c in columns))
+    for row in results:
+        print(" | ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=3999)
+    asyncio.run(main(parser.parse_args()))
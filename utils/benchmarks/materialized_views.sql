@@ -0,0 +1,88 @@
+-- =====================================================================
+-- BENCHMARK: vistas en vivo vs. vistas materializadas (07-init-materialized_views.sql)
+-- =====================================================================
+-- Ejecuta cada consulta de lectura completa (la misma que hace el explorador
+-- de vistas) :iterations veces contra la vista en vivo y contra su copia
+-- materializada, y muestra mediana / p95 / máximo en milisegundos.
+-- También mide un REFRESH CONCURRENTLY de cada vista materializada.
+--
+-- Uso (desde la raíz del proyecto):
+--   docker exec -i tenantsunion-db-1 psql -U app_user -d mydb \
+--     -v iterations=20 < utils/benchmarks/materialized_views.sql
+--
+-- Se ejecuta como dueño de las tablas (sin RLS) para comparar solo el coste
+-- de las consultas; todo corre en una transacción que se deshace al final.
+-- =====================================================================
+
+\if :{?iterations}
+\else
+    \set iterations 10
+\endif
+
+SET search_path TO sindicato_inq, public;
+SET client_min_messages TO warning;
+
+BEGIN;
+
+CREATE TEMP TABLE bench_samples (
+    vista TEXT,
+    origen TEXT,
+    filas BIGINT,
+    ms NUMERIC
+) ON COMMIT DROP;
+
+SELECT set_config('bench.iterations', :'iterations', true);
+
+DO $$
+DECLARE
+    v_name TEXT;
+    v_src TEXT;
+    v_origen TEXT;
+    v_started TIMESTAMPTZ;
+    v_rows BIGINT;
+    i INT;
+    n INT := current_setting('bench.iterations')::int;
+BEGIN
+    FOREACH v_name IN ARRAY ARRAY['v_afiliadas_detalle', 'v_resumen_bloques',
+                                  'v_resumen_nodos', 'v_consolidar_pisos_bloques']
+    LOOP
+        FOREACH v_origen IN ARRAY ARRAY['vista', 'materializada']
+        LOOP
+            v_src := CASE v_origen
+                WHEN 'vista' THEN format('sindicato_inq.%I', v_name)
+                ELSE format('sindicato_inq_cache.%I', 'mv_' || substr(v_name, 3))
+            END;
+            -- Calentamiento (caché de páginas y planes). SELECT * completo y no
+            -- count(*), para que el planificador no pueda saltarse columnas o joins.
+            EXECUTE format('SELECT * FROM %s', v_src);
+            FOR i IN 1..n LOOP
+                v_started := clock_timestamp();
+                EXECUTE format('SELECT * FROM %s', v_src);
+                GET DIAGNOSTICS v_rows = ROW_COUNT;
+                INSERT INTO bench_samples
+                VALUES (v_name, v_origen, v_rows, EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000);
+            END LOOP;
+        END LOOP;
+
+        v_started := clock_timestamp();
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY sindicato_inq_cache.%I',
+                       'mv_' || substr(v_name, 3));
+        INSERT INTO bench_samples
+        VALUES (v_name, 'refresh concurrently', NULL, EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000);
+    END LOOP;
+END
+$$;
+
+SELECT
+    vista,
+    origen,
+    COUNT(*) AS muestras,
+    MAX(filas) AS filas,
+    ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY ms)::numeric, 2) AS mediana_ms,
+    ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY ms)::numeric, 2) AS p95_ms,
+    ROUND(MAX(ms), 2) AS max_ms
+FROM bench_samples
+GROUP BY vista, origen
+ORDER BY vista, array_position(ARRAY['vista', 'materializada', 'refresh concurrently'], origen);
+
+ROLLBACK;
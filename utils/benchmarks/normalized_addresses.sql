@@ -0,0 +1,214 @@
+-- =====================================================================
+-- BENCHMARK: sugerencias piso -> bloque con direccion_normalizada almacenada
+-- =====================================================================
+-- Carga :pisos pisos sintéticos (uno de cada dos sin bloque) y :pisos / 8
+-- bloques, y compara las consultas de sugerencias tal y como eran antes
+-- (normalize_address_for_match() en ambos lados, índices de expresión)
+-- con las actuales (columna direccion_normalizada + índices trigram).
+-- La vista de pisos huérfanos se mide además en su forma actual, leyendo la
+-- tabla sugerencias_pisos_huerfanos que mantienen los triggers (variante
+-- 'tabla'); el coste de esos triggers queda incluido en el tiempo de carga.
+-- Muestra mediana / p95 / máximo en milisegundos y los planes de la vista de
+-- pisos huérfanos.
+--
+-- Uso (desde la raíz del proyecto), a 10k y a 100k pisos:
+--   docker exec -i tenantsunion-db-1 psql -U app_user -d mydb \
+--     -v pisos=10000 < utils/benchmarks/normalized_addresses.sql
+--   docker exec -i tenantsunion-db-1 psql -U app_user -d mydb \
+--     -v pisos=100000 -v iterations=3 < utils/benchmarks/normalized_addresses.sql
+--
+-- Todo corre en una transacción que se deshace al final.
+-- =====================================================================
+
+\if :{?pisos}
+\else
+    \set pisos 10000
+\endif
+\if :{?iterations}
+\else
+    \set iterations 5
+\endif
+
+SET search_path TO sindicato_inq, public;
+SET client_min_messages TO warning;
+
+BEGIN;
+
+SELECT set_config('bench.pisos', :'pisos', true);
+SELECT set_config('bench.iterations', :'iterations', true);
+
+-- ---------------------------------------------------------------------
+-- Datos sintéticos: bloques "<tipo> <nombre> <num>" y pisos "<bloque>, <planta>º <letra>"
+-- ---------------------------------------------------------------------
+CREATE TEMP TABLE bench_bloques (id INT, direccion TEXT) ON COMMIT DROP;
+
+WITH params AS (
+    SELECT
+        ARRAY['Calle', 'Avenida', 'Paseo', 'Plaza', 'Ronda', 'Travesía', 'Camino', 'Glorieta', 'Costanilla', 'Carrera'] AS tipos,
+        ARRAY['Mayor', 'de Alcalá', 'de Atocha', 'Bravo Murillo', 'de la Albufera', 'Príncipe de Vergara',
+              'de Segovia', 'Fuencarral', 'de Toledo', 'del Pilar', 'de la Ermita', 'San Bernardo',
+              'de Embajadores', 'Doctor Esquerdo', 'de los Olivos', 'del Río', 'Santa Engracia',
+              'de Valencia', 'de Andalucía', 'Pío XII', 'de Ávila', 'del Carmen', 'de Goya',
+              'Marqués de Vadillo', 'de la Paz', 'Sagunto', 'de Cea Bermúdez', 'Ferraz',
+              'de Extremadura', 'Méndez Álvaro'] AS nombres,
+        GREATEST(1, current_setting('bench.pisos')::int / 8) AS n_bloques
+),
+ins AS (
+    INSERT INTO bloques (direccion)
+    SELECT format('%s %s %s', tipos[1 + g % 10], nombres[1 + (g / 10) % 30], 1 + g / 300)
+    FROM params, generate_series(0, n_bloques - 1) AS g
+    ON CONFLICT (direccion) DO NOTHING
+    RETURNING id, direccion
+)
+INSERT INTO bench_bloques SELECT id, direccion FROM ins;
+
+WITH numbered AS (
+    SELECT id, direccion, ROW_NUMBER() OVER (ORDER BY id) - 1 AS rn, COUNT(*) OVER () AS n
+    FROM bench_bloques
+)
+INSERT INTO pisos (direccion, bloque_id)
+SELECT
+    format(
+        '%s, %sº %s',
+        CASE WHEN g % 3 = 0 THEN upper(b.direccion) ELSE b.direccion END,
+        1 + (g / b.n) % 10,
+        chr(65 + ((g / (b.n * 10)) % 8)::int)
+    ),
+    CASE WHEN g % 2 = 0 THEN NULL ELSE b.id END
+FROM generate_series(0, current_setting('bench.pisos')::int - 1) AS g
+JOIN numbered b ON b.rn = g % b.n
+ON CONFLICT (direccion) DO NOTHING;
+
+-- Índices de expresión de la versión anterior, para comparar en igualdad de condiciones
+CREATE INDEX bench_bloques_expr_gin ON bloques USING gin (normalize_address_for_match(direccion) gin_trgm_ops);
+CREATE INDEX bench_bloques_expr_gist ON bloques USING gist (normalize_address_for_match(direccion) gist_trgm_ops);
+CREATE INDEX bench_pisos_expr_gist ON pisos USING gist (normalize_address_for_match(direccion) gist_trgm_ops);
+
+ANALYZE bloques;
+ANALYZE pisos;
+
+SELECT
+    (SELECT COUNT(*) FROM pisos) AS pisos,
+    (SELECT COUNT(*) FROM pisos WHERE bloque_id IS NULL) AS pisos_huerfanos,
+    (SELECT COUNT(*) FROM bloques) AS bloques;
+
+-- ---------------------------------------------------------------------
+-- Consultas a comparar
+-- ---------------------------------------------------------------------
+CREATE TEMP TABLE bench_queries (consulta TEXT, variante TEXT, sql TEXT) ON COMMIT DROP;
+
+INSERT INTO bench_queries VALUES
+('v_sugerencias_pisos_huerfanos', 'expresión', $q$
+    SELECT p.id, s.id, s.score
+    FROM pisos p
+    CROSS JOIN LATERAL (
+        SELECT b.id,
+               similarity(normalize_address_for_match(p.direccion), normalize_address_for_match(b.direccion)) AS score
+        FROM bloques b
+        WHERE normalize_address_for_match(p.direccion) % normalize_address_for_match(b.direccion)
+        ORDER BY normalize_address_for_match(p.direccion) <-> normalize_address_for_match(b.direccion)
+        LIMIT 1
+    ) s
+    WHERE p.bloque_id IS NULL AND btrim(p.direccion) <> '' AND s.score > 0.5
+$q$),
+('v_sugerencias_pisos_huerfanos', 'almacenada', $q$
+    SELECT p.id, s.id, s.score
+    FROM pisos p
+    CROSS JOIN LATERAL (
+        SELECT b.id,
+               similarity(b.direccion_normalizada, p.direccion_normalizada) AS score
+        FROM bloques b
+        WHERE b.direccion_normalizada % p.direccion_normalizada
+        ORDER BY b.direccion_normalizada <-> p.direccion_normalizada
+        LIMIT 1
+    ) s
+    WHERE p.bloque_id IS NULL AND p.direccion_normalizada IS NOT NULL AND s.score > 0.5
+$q$),
+('v_sugerencias_pisos_huerfanos', 'tabla', $q$
+    SELECT * FROM v_sugerencias_pisos_huerfanos
+$q$),
+('v_bloque_suggestion_scores', 'expresión', $q$
+    WITH np AS (
+        SELECT p.id, normalize_address_for_match(p.direccion) AS n
+        FROM pisos p WHERE normalize_address_for_match(p.direccion) <> ''
+    ), nb AS (
+        SELECT b.id, normalize_address_for_match(b.direccion) AS n
+        FROM bloques b WHERE normalize_address_for_match(b.direccion) <> ''
+    ), scored AS (
+        SELECT np.id AS piso_id, nb.id AS bloque_id, similarity(np.n, nb.n) AS score,
+               ROW_NUMBER() OVER (PARTITION BY np.id ORDER BY np.n <-> nb.n) AS rn
+        FROM np JOIN nb ON np.n % nb.n
+    )
+    SELECT piso_id, bloque_id, score FROM scored WHERE rn = 1
+$q$),
+('v_bloque_suggestion_scores', 'almacenada', $q$
+    SELECT * FROM v_bloque_suggestion_scores
+$q$),
+('v_consolidar_pisos_bloques', 'expresión', $q$
+    SELECT p.id, s.id, s.score
+    FROM pisos p
+    LEFT JOIN LATERAL (
+        SELECT b.id,
+               similarity(normalize_address_for_match(p.direccion), normalize_address_for_match(b.direccion)) AS score
+        FROM bloques b
+        WHERE normalize_address_for_match(p.direccion) % normalize_address_for_match(b.direccion)
+        ORDER BY normalize_address_for_match(p.direccion) <-> normalize_address_for_match(b.direccion)
+        LIMIT 1
+    ) s ON btrim(p.direccion) <> ''
+$q$),
+('v_consolidar_pisos_bloques', 'almacenada', $q$
+    SELECT * FROM v_consolidar_pisos_bloques
+$q$);
+
+CREATE TEMP TABLE bench_samples (consulta TEXT, variante TEXT, filas BIGINT, ms NUMERIC) ON COMMIT DROP;
+
+DO $$
+DECLARE
+    q RECORD;
+    v_started TIMESTAMPTZ;
+    v_rows BIGINT;
+    i INT;
+    n INT := current_setting('bench.iterations')::int;
+BEGIN
+    FOR q IN SELECT * FROM bench_queries LOOP
+        EXECUTE q.sql; -- calentamiento
+        FOR i IN 1..n LOOP
+            v_started := clock_timestamp();
+            EXECUTE q.sql;
+            GET DIAGNOSTICS v_rows = ROW_COUNT;
+            INSERT INTO bench_samples
+            VALUES (q.consulta, q.variante, v_rows, EXTRACT(EPOCH FROM clock_timestamp() - v_started) * 1000);
+        END LOOP;
+    END LOOP;
+END
+$$;
+
+SELECT
+    consulta,
+    variante,
+    COUNT(*) AS muestras,
+    MAX(filas) AS filas,
+    ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY ms)::numeric, 2) AS mediana_ms,
+    ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY ms)::numeric, 2) AS p95_ms,
+    ROUND(MAX(ms), 2) AS max_ms
+FROM bench_samples
+GROUP BY consulta, variante
+ORDER BY consulta, array_position(ARRAY['expresión', 'almacenada', 'tabla'], variante);
+
+-- ---------------------------------------------------------------------
+-- Planes de la vista de pisos huérfanos
+-- ---------------------------------------------------------------------
+\echo '== v_sugerencias_pisos_huerfanos (expresión) =='
+SELECT sql AS huerfanos_expresion FROM bench_queries
+WHERE consulta = 'v_sugerencias_pisos_huerfanos' AND variante = 'expresión' \gset
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) :huerfanos_expresion;
+
+\echo '== v_sugerencias_pisos_huerfanos (almacenada) =='
+SELECT sql AS huerfanos_almacenada FROM bench_queries
+WHERE consulta = 'v_sugerencias_pisos_huerfanos' AND variante = 'almacenada' \gset
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) :huerfanos_almacenada;
+
+\echo '== v_sugerencias_pisos_huerfanos (tabla mantenida por triggers) =='
+EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) SELECT * FROM v_sugerencias_pisos_huerfanos;
+
+ROLLBACK;
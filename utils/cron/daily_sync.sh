@@ -1,9 +1,13 @@
 #!/bin/bash
 # daily_sync.sh
-# Dynamic ETL: Extracts last 24h Gravity Forms data, enriches via CartoCiudad, and loads to PostgreSQL.
-# Include as crontab -e: 0 2 * * * $HOME/github/prod/tenantsUnion/utils/cron/daily_sync.sh >> $HOME/github/prod/tenantsUnion/utils/cron/cron_errors.log 2>&1
+# Incremental ETL: extracts the Gravity Forms entries newer than the persisted
+# watermark (sindicato_etl.sync_state), enriches them via CartoCiudad, and loads
+# them to PostgreSQL. Every run writes a metrics row to sindicato_etl.sync_runs.
+# Idempotent, so it can run hourly; a skipped or failed run is caught up by the next one.
+# Include as crontab -e: 0 * * * * $HOME/github/prod/tenantsUnion/utils/cron/daily_sync.sh >> $HOME/github/prod/tenantsUnion/utils/cron/cron_errors.log 2>&1
 
 set -e # Exit immediately if a command exits with a non-zero status
+set -o pipefail # ...including a failing mysql at the head of the extraction pipe
 
 : "${HOME:?HOME is not set — aborting}"
 PROJECT_DIR="${HOME}/github/prod/tenantsUnion"
@@ -26,6 +30,17 @@ fi
 # Set a fallback connection mode if it's missing from the .env file
 CONNECTION_MODE="${GF_CONNECTION_MODE:-tunnel}"
 
+# Watermark key: one per Gravity Forms origin (defaults to the extract folder, e.g. "madrid")
+ETL_INSTANCE="${ETL_INSTANCE:-$(basename "$(dirname "$ETL_EXTRACT_PATH")")}"
+
+# Hourly runs must never overlap: skip this one if the previous is still going
+LOCK_FILE="${PROJECT_DIR}/utils/cron/.sync.lock"
+exec 9>"$LOCK_FILE"
+if ! flock -n 9; then
+    echo "[$TIMESTAMP] Previous sync still running; skipping this run." >> "$LOG_FILE"
+    exit 0
+fi
+
 # ==============================================================================
 # NETWORKING TARGET SETUP
 # ==============================================================================
@@ -47,10 +62,47 @@ fi
 # Execution Paths
 SQL_QUERY_PATH="${PROJECT_DIR}/${ETL_EXTRACT_PATH#./}"
 GEOLINK_SCRIPT_PATH="${PROJECT_DIR}/ETL/02-geolink.py"
+PG_STATE_SCRIPT="${PROJECT_DIR}/ETL/00-sync-state.sql"
 PG_IMPORT_SCRIPT="${PROJECT_DIR}/ETL/03-load-from-csv.sql"
 CSV_DEST_PATH="${PROJECT_DIR}/ETL/tmp/mariadb_export.csv"
 CSV_TMP_PATH="${CSV_DEST_PATH}.tmp"
 
+# ==============================================================================
+# RUN METRICS HELPERS
+# ==============================================================================
+RUN_STARTED_AT="$(date -Iseconds)"
+STAGE="extraccion"
+SINCE_ENTRY_ID=""
+ROWS_EXTRACTED=""
+EXTRACT_MS=""
+GEOCODE_MS=""
+
+now_ms() { date +%s%3N; }
+
+pg() {
+    docker exec -i "$DB_CONTAINER_NAME" psql -U "$POSTGRES_USER" -d "$POSTGRES_DB" -v ON_ERROR_STOP=1 "$@"
+}
+
+# Runs that end before the load script (no new entries, or a failure) record their own metrics row
+record_run() {
+    pg -q -v instancia="$ETL_INSTANCE" -v estado="$1" -v etapa="${2:-}" \
+        -v started_at="$RUN_STARTED_AT" -v desde="$SINCE_ENTRY_ID" -v filas="$ROWS_EXTRACTED" \
+        -v extract_ms="$EXTRACT_MS" -v geocode_ms="$GEOCODE_MS" <<'SQL'
+INSERT INTO sindicato_etl.sync_runs (
+    instancia, started_at, estado, etapa_fallida, desde_entry_id, filas_extraidas, extract_ms, geocode_ms
+) VALUES (
+    :'instancia', :'started_at', :'estado', NULLIF(:'etapa', ''), NULLIF(:'desde', '')::BIGINT,
+    NULLIF(:'filas', '')::INTEGER, NULLIF(:'extract_ms', '')::INTEGER, NULLIF(:'geocode_ms', '')::INTEGER
+);
+SQL
+}
+
+on_error() {
+    echo "[$TIMESTAMP] ERROR during stage '${STAGE}'. Watermark left unchanged; the next run retries." >> "$LOG_FILE"
+    record_run error "$STAGE" >> "$LOG_FILE" 2>&1 || true
+}
+trap on_error ERR
+
 # ==============================================================================
 # CLEANUP TRAP
 # ==============================================================================
@@ -84,15 +136,34 @@ if [ "$CONNECTION_MODE" = "tunnel" ]; then
     sleep 3 # Wait for the socket to stabilize
 fi
 
-# 2. Extract Data via MySQL CLI Client Tools
+# 2. Read the watermark (last entry_id loaded for this instance; empty on the first run)
+pg -q < "$PG_STATE_SCRIPT" >> "$LOG_FILE" 2>&1
+SINCE_ENTRY_ID="$(pg -qtA -v instancia="$ETL_INSTANCE" <<'SQL'
+SELECT ultimo_entry_id FROM sindicato_etl.sync_state WHERE instancia = :'instancia';
+SQL
+)"
+MYSQL_SINCE="${SINCE_ENTRY_ID:-NULL}"
+echo "[$TIMESTAMP] Watermark for '${ETL_INSTANCE}': entry_id > ${MYSQL_SINCE} (NULL = last 24h)." >> "$LOG_FILE"
+
+# 3. Extract Data via MySQL CLI Client Tools
 echo "[$TIMESTAMP] Executing SQL extraction from target engine..." >> "$LOG_FILE"
-mysql -h "$TARGET_MYSQL_HOST" -P "$TARGET_MYSQL_PORT" -u "$WP_DB_USER" -p"$WP_DB_PASS" "$WP_DB_NAME" < "$SQL_QUERY_PATH" | sed "s/'/\'/;s/\t/\",\"/g;s/^/\"/;s/$/\"/;s/\n//g" > "$CSV_DEST_PATH"
+STAGE_STARTED=$(now_ms)
+{ echo "SET @since_entry_id = ${MYSQL_SINCE};"; cat "$SQL_QUERY_PATH"; } \
+    | mysql -h "$TARGET_MYSQL_HOST" -P "$TARGET_MYSQL_PORT" -u "$WP_DB_USER" -p"$WP_DB_PASS" "$WP_DB_NAME" \
+    | sed "s/'/\'/;s/\t/\",\"/g;s/^/\"/;s/$/\"/;s/\n//g" > "$CSV_DEST_PATH"
+EXTRACT_MS=$(( $(now_ms) - STAGE_STARTED ))
+ROWS_EXTRACTED=$(( $(wc -l < "$CSV_DEST_PATH") - 1 ))
+if [ "$ROWS_EXTRACTED" -lt 0 ]; then
+    ROWS_EXTRACTED=0
+fi
 
-# 3. Check if CSV has data (more than just the header row) before running enrichment
-if [ $(wc -l < "$CSV_DEST_PATH") -le 1 ]; then
-    echo "[$TIMESTAMP] No new records found in the last 24 hours. Aborting pipeline." >> "$LOG_FILE"
+# 3b. Check if CSV has data (more than just the header row) before running enrichment
+if [ "$ROWS_EXTRACTED" -eq 0 ]; then
+    echo "[$TIMESTAMP] No new records since the last watermark. Aborting pipeline." >> "$LOG_FILE"
+    record_run sin_datos >> "$LOG_FILE" 2>&1
     exit 0
 fi
+echo "[$TIMESTAMP] Extracted ${ROWS_EXTRACTED} new entries in ${EXTRACT_MS} ms." >> "$LOG_FILE"
 
 # ==============================================================================
 # 2b. ENRICHMENT PHASE (GEO-LINKING & SANITIZATION)
@@ -104,20 +175,27 @@ if [ -d "${PROJECT_DIR}/.venv" ]; then
 fi
 
 # Process the CSV file using the temporary track
+STAGE="geocodificacion"
+STAGE_STARTED=$(now_ms)
 python3 "$GEOLINK_SCRIPT_PATH" "$CSV_DEST_PATH" "$CSV_TMP_PATH" >> "$LOG_FILE" 2>&1
+GEOCODE_MS=$(( $(now_ms) - STAGE_STARTED ))
 
 # Atomically overwrite original file path with the enriched dataset
 mv "$CSV_TMP_PATH" "$CSV_DEST_PATH"
 
 # Deactivate virtual environment if it was opened
-if [ -n "$VIRTUAL_ENV" ]; then
+if [ -n "${VIRTUAL_ENV:-}" ]; then
     deactivate
 fi
 
 # ==============================================================================
 # 4. TRIGGER POSTGRESQL DATA INTEGRATION
 # ==============================================================================
+# The load script advances the watermark and writes the run's metrics row as its
+# last step, so a failure anywhere before that leaves the watermark untouched.
 echo "[$TIMESTAMP] Triggering PostgreSQL Import Script..." >> "$LOG_FILE"
-docker exec -i "$DB_CONTAINER_NAME" psql -U "$POSTGRES_USER" -d "$POSTGRES_DB" < "$PG_IMPORT_SCRIPT" >> "$LOG_FILE" 2>&1
+STAGE="carga"
+pg -v instancia="$ETL_INSTANCE" -v started_at="$RUN_STARTED_AT" -v desde_entry_id="$SINCE_ENTRY_ID" \
+    -v extract_ms="$EXTRACT_MS" -v geocode_ms="$GEOCODE_MS" < "$PG_IMPORT_SCRIPT" >> "$LOG_FILE" 2>&1
 
 echo "[$TIMESTAMP] ETL pipeline completed successfully." >> "$LOG_FILE"
\ No newline at end of file